@@ -0,0 +1,10 @@
+"""
+Benchmarks do LabBridge
+Gerador de relatorios sinteticos COMPULAB/SIMUS e suite de desempenho ponta a ponta.
+
+Uso:
+    python -m benchmarks --sizes 1000,10000,100000 --output bench.json
+    python -m benchmarks compare base.json bench.json
+    python -m benchmarks.equivalence --sizes 1k,5k
+    python -m benchmarks.split --lines 50k
+"""
@@ -0,0 +1,75 @@
+"""
+Linha de comando da suite de benchmark
+LabBridge
+"""
+import argparse
+import json
+import logging
+import sys
+
+from .suite import DEFAULT_PDF_MAX_ROWS, DEFAULT_SIZES, compare_reports, run_suite
+
+
+def _parse_sizes(text: str):
+    sizes = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        multiplier = 1
+        if part.endswith("k"):
+            part, multiplier = part[:-1], 1000
+        sizes.append(int(float(part) * multiplier))
+    return sizes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark ponta a ponta do LabBridge")
+    sub = parser.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="Executa a suite (padrao)")
+    compare = sub.add_parser("compare", help="Compara dois relatorios JSON")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+
+    for target in (parser, run):
+        target.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                            help="Tamanhos (linhas COMPULAB), ex.: 1k,10k,100k,500k")
+        target.add_argument("--seed", type=int, default=42)
+        target.add_argument("--pdf-max-rows", type=int, default=DEFAULT_PDF_MAX_ROWS,
+                            help="Gera/extrai PDFs apenas ate este tamanho")
+        target.add_argument("--simus-layout", choices=("text", "table"), default="text")
+        target.add_argument("--no-tracemalloc", action="store_true",
+                            help="Desativa medicao de memoria (tempos mais fieis)")
+        target.add_argument("--output", "-o", default="", help="Arquivo JSON de saida (padrao: stdout)")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    if args.command == "compare":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        print("\n".join(compare_reports(baseline, current)))
+        return 0
+
+    report = run_suite(
+        sizes=_parse_sizes(args.sizes),
+        seed=args.seed,
+        pdf_max_rows=args.pdf_max_rows,
+        simus_layout=args.simus_layout,
+        trace_memory=not args.no_tracemalloc,
+    )
+    payload = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+        logging.info(f"Relatorio gravado em {args.output}")
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Verificacao de equivalencia de compare_exams
+LabBridge
+
+Compara, caso a caso, a saida de analysis_module.compare_exams (motor em
+tabelas) com a implementacao de referencia paciente a paciente
+(benchmarks/reference.py) sobre o conjunto sintetico: dados limpos, dados
+perturbados (codigos ausentes ou invalidos, nomes com caixa/espacos,
+pacientes em branco, linhas duplicadas e embaralhadas), nomes de exame
+com erros de digitacao para o pareamento fuzzy e valores em formatos
+misturados ("R$ 1,85", "1,85", "1.85", float, Decimal, fracao de
+centavo), em branco ou invalidos, com linhas duplicadas, alem de casos
+fixos de regressao. As listas de resultado e o resumo precisam ser
+identicos (repr), inclusive em qual linha forma cada par.
+
+Uso:
+    python -m benchmarks.equivalence --sizes 1k,5k --seeds 1,2
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .reference import reference_compare_exams
+from .suite import _to_frame
+from .synthetic import generate_dataset
+
+RESULT_KEYS = ("missing_in_simus", "missing_in_compulab", "value_divergences", "summary")
+DEFAULT_SIZES = (1000, 5000)
+DEFAULT_SEEDS = (1, 2)
+
+Frames = Tuple[pd.DataFrame, pd.DataFrame, Dict[str, str]]
+
+
+def _perturb(comp: pd.DataFrame, sim: pd.DataFrame, rng: random.Random, seed: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    comp, sim = comp.copy(), sim.copy()
+    for i in rng.sample(range(len(sim)), len(sim) // 5):
+        sim.at[i, "Codigo_Exame"] = rng.choice(["", "nan", "0202999999", " 02.02.01.047-3 "])
+    for i in rng.sample(range(len(comp)), len(comp) // 10):
+        comp.at[i, "Codigo_Exame"] = rng.choice(["", None, "ABC"])
+    for i in rng.sample(range(len(sim)), len(sim) // 10):
+        sim.at[i, "Paciente"] = sim.at[i, "Paciente"].lower() + " "
+    for i in rng.sample(range(len(comp)), len(comp) // 20):
+        comp.at[i, "Paciente"] = ""
+    comp = pd.concat([comp, comp.sample(len(comp) // 20, random_state=seed)], ignore_index=True)
+    sim = sim.sample(frac=1, random_state=seed).reset_index(drop=True)
+    return comp, sim
+
+
+def _fuzzy(comp: pd.DataFrame, sim: pd.DataFrame, rng: random.Random, seed: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    comp, sim = comp.copy(), sim.copy()
+    for i in range(len(sim)):
+        if rng.random() < 0.6:
+            sim.at[i, "Codigo_Exame"] = ""
+        if rng.random() < 0.4:
+            name = sim.at[i, "Nome_Exame"]
+            k = rng.randrange(len(name))
+            sim.at[i, "Nome_Exame"] = name[:k] + name[k + 1:]
+    for i in rng.sample(range(len(comp)), len(comp) // 3):
+        comp.at[i, "Codigo_Exame"] = ""
+    return comp, sim
+
+
+def _money_text(value: Decimal, rng: random.Random) -> Any:
+    roll = rng.random()
+    if roll < 0.25:
+        return f"R$ {value:.2f}".replace(".", ",")
+    if roll < 0.5:
+        return f"{value:.2f}".replace(".", ",")
+    if roll < 0.65:
+        return f"{value:.2f}"
+    if roll < 0.75:
+        return f"{value + Decimal('0.005'):.3f}".replace(".", ",")
+    if roll < 0.85:
+        # Separador de milhar ("1.850,00")
+        return f"{value * 1000:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return rng.choice(["", "abc", "-", "R$", "0", "0,00"])
+
+
+def _duplicated(frame: pd.DataFrame, rng: random.Random, seed: int) -> pd.DataFrame:
+    # Duplicatas e codigos apagados: linhas do mesmo exame, com o mesmo valor, que so
+    # se distinguem na saida pelo codigo; o desempate decide qual delas forma o par
+    frame = pd.concat([frame, frame.sample(len(frame) // 10, random_state=seed)], ignore_index=True)
+    for i in rng.sample(range(len(frame)), len(frame) // 3):
+        frame.at[i, "Codigo_Exame"] = ""
+    return frame
+
+
+def _money_formats(comp: pd.DataFrame, sim: pd.DataFrame, rng: random.Random, seed: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # Somente texto: colunas de string (valores distintos agrupados pelo texto)
+    comp, sim = _duplicated(comp, rng, seed), _duplicated(sim, rng, seed + 1)
+    for frame in (comp, sim):
+        frame["Valor"] = [_money_text(value, rng) for value in frame["Valor"].tolist()]
+    return comp, sim
+
+
+def _money_mixed(comp: pd.DataFrame, sim: pd.DataFrame, rng: random.Random, seed: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # Texto, float, Decimal e None na mesma coluna (dtype object)
+    comp, sim = _duplicated(comp, rng, seed), _duplicated(sim, rng, seed + 1)
+    for frame in (comp, sim):
+        values = []
+        for value in frame["Valor"].tolist():
+            roll = rng.random()
+            if roll < 0.3:
+                values.append(float(value))
+            elif roll < 0.45:
+                values.append(value + Decimal("0.0049"))
+            elif roll < 0.5:
+                values.append(None)
+            elif roll < 0.7:
+                values.append(value)
+            else:
+                values.append(_money_text(value, rng))
+        frame["Valor"] = pd.Series(values, dtype=object)
+    return comp, sim
+
+
+# Variantes do conjunto sintetico: nome -> transformacao (COMPULAB, SIMUS)
+VARIANTS: Dict[str, Optional[Callable[..., Tuple[pd.DataFrame, pd.DataFrame]]]] = {
+    "clean": None,
+    "perturbed": _perturb,
+    "fuzzy": _fuzzy,
+    "money-text": _money_formats,
+    "money-mixed": _money_mixed,
+}
+
+_COLUMNS = ["Paciente", "Nome_Exame", "Codigo_Exame", "Valor"]
+
+# Casos fixos: textos diferentes para o mesmo valor nao podem mudar qual linha forma o par
+FIXED_CASES: List[Tuple[str, Frames]] = [
+    ("fixed-equal-values-text", (
+        pd.DataFrame([["JOAO", "UREIA", "", "R$ 10,00"],
+                      ["ANA LIMA", "TSH", "0202010", "10,00"],
+                      ["ANA LIMA", "TSH", "", "R$ 10,00"]], columns=_COLUMNS),
+        pd.DataFrame([["ANA LIMA", "TSH", "", "12,00"]], columns=_COLUMNS),
+        {},
+    )),
+    ("fixed-blank-and-invalid", (
+        pd.DataFrame([["JOAO", "UREIA", "", "abc"],
+                      ["ANA LIMA", "TSH", "0202010", ""],
+                      ["ANA LIMA", "TSH", "", "abc"]], columns=_COLUMNS),
+        pd.DataFrame([["ANA LIMA", "TSH", "", "1,00"]], columns=_COLUMNS),
+        {},
+    )),
+]
+
+
+def corpus(sizes: Iterable[int], seeds: Iterable[int]) -> Iterable[Tuple[str, Frames]]:
+    """Casos (nome, (COMPULAB, SIMUS, sinonimos)): os fixos e os do conjunto sintetico."""
+    yield from FIXED_CASES
+    for rows in sizes:
+        for seed in seeds:
+            dataset = generate_dataset(rows, seed)
+            comp = _to_frame(dataset.patients("compulab"))
+            sim = _to_frame(dataset.patients("simus"))
+            for variant, transform in VARIANTS.items():
+                frames = (comp, sim) if transform is None else transform(comp, sim, random.Random(seed), seed)
+                yield f"{variant}-{rows}-s{seed}", (frames[0], frames[1], dataset.synonyms)
+
+
+def first_difference(current: Dict[str, Any], reference: Dict[str, Any]) -> Optional[str]:
+    """Descricao da primeira diferenca entre dois resultados (None se identicos)."""
+    for key in RESULT_KEYS:
+        if repr(current[key]) == repr(reference[key]):
+            continue
+        if key == "summary":
+            return f"summary\n  atual:      {current[key]}\n  referencia: {reference[key]}"
+        for position, (got, expected) in enumerate(zip(current[key], reference[key])):
+            if repr(got) != repr(expected):
+                return f"{key}[{position}]\n  atual:      {got}\n  referencia: {expected}"
+        return f"{key}: {len(current[key])} itens (referencia: {len(reference[key])})"
+    return None
+
+
+def check(cases: Iterable[Tuple[str, Frames]], fuzzy_modes: Iterable[bool] = (False, True)) -> List[str]:
+    """Executa os dois motores em cada caso; retorna os nomes dos casos divergentes."""
+    from labbridge.utils.analysis_module import compare_exams
+
+    failures = []
+    for name, (comp, sim, synonyms) in cases:
+        for enable_fuzzy in fuzzy_modes:
+            label = f"{name} fuzzy={'on' if enable_fuzzy else 'off'}"
+            started = time.perf_counter()
+            current = compare_exams(comp, sim, synonyms, enable_fuzzy=enable_fuzzy)
+            elapsed = time.perf_counter() - started
+            reference = reference_compare_exams(comp, sim, synonyms, enable_fuzzy=enable_fuzzy)
+            difference = first_difference(current, reference)
+            if difference:
+                failures.append(label)
+                print(f"DIFF {label}: {difference}")
+            else:
+                print(f"OK   {label} ({elapsed * 1000:.0f} ms, {current['summary']['value_divergences_count']} divergencias)")
+    return failures
+
+
+def _parse_list(text: str) -> List[int]:
+    values = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        if part:
+            values.append(int(float(part[:-1]) * 1000) if part.endswith("k") else int(part))
+    return values
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.equivalence",
+                                     description="Compara compare_exams com a implementacao de referencia")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--seeds", default=",".join(str(s) for s in DEFAULT_SEEDS))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    failures = check(corpus(_parse_list(args.sizes), _parse_list(args.seeds)))
+    print(f"{len(failures)} caso(s) divergente(s)" if failures else "Saidas identicas em todos os casos")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+Implementacao de referencia de compare_exams
+LabBridge
+
+Comparacao original, paciente a paciente, com valores em Decimal: registros
+por paciente, pareamento por codigo, nome canonico e fuzzy exaustivo
+(Jaro-Winkler em todos os pares restantes). Nao e usada pela aplicacao;
+serve de gabarito para o motor em tabelas de analysis_module (ver
+benchmarks/equivalence.py). Reaproveita apenas os auxiliares de
+normalizacao e interpretacao de valores do modulo.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from labbridge.utils.analysis_module import (
+    clean_code,
+    jaro_winkler_similarity,
+    map_to_canonical,
+    normalize_patient_name,
+    normalize_synonyms,
+    safe_decimal,
+    standardize_columns,
+)
+
+
+def reference_compare_exams(
+    df_compulab: pd.DataFrame,
+    df_simus: pd.DataFrame,
+    synonyms: Optional[Dict[str, str]] = None,
+    *,
+    tolerance: float = 0.01,
+    enable_fuzzy: bool = True,
+    fuzzy_threshold: float = 0.93,
+) -> Dict[str, Any]:
+    """Mesmo contrato (e mesma saida) de analysis_module.compare_exams."""
+    normalized_synonyms = normalize_synonyms(synonyms or {})
+
+    comp_patients = build_patient_records(prepare_dataframe(df_compulab, normalized_synonyms))
+    sim_patients = build_patient_records(prepare_dataframe(df_simus, normalized_synonyms))
+
+    missing_in_simus: List[Dict[str, Any]] = []
+    missing_in_compulab: List[Dict[str, Any]] = []
+    value_divergences: List[Dict[str, Any]] = []
+    tolerance_dec = Decimal(str(tolerance))
+
+    for patient_key in sorted(set(comp_patients) | set(sim_patients)):
+        comp_records = comp_patients.get(patient_key, [])
+        sim_records = sim_patients.get(patient_key, [])
+
+        pairs, comp_unmatched, sim_unmatched = match_records(
+            comp_records,
+            sim_records,
+            enable_fuzzy=enable_fuzzy,
+            fuzzy_threshold=fuzzy_threshold,
+        )
+
+        for comp_idx, sim_idx in pairs:
+            comp_record = comp_records[comp_idx]
+            sim_record = sim_records[sim_idx]
+            if abs(comp_record["value"] - sim_record["value"]) > tolerance_dec:
+                value_divergences.append(build_result_row(
+                    patient=comp_record["patient"] or sim_record["patient"],
+                    code=comp_record["code"] or sim_record["code"],
+                    canonical_name=comp_record["canonical_name"] or sim_record["canonical_name"],
+                    comp_value=comp_record["value"],
+                    sim_value=sim_record["value"],
+                    comp_exam_name=comp_record["exam_name"],
+                    sim_exam_name=sim_record["exam_name"],
+                ))
+
+        for comp_idx in comp_unmatched:
+            record = comp_records[comp_idx]
+            missing_in_simus.append(build_result_row(
+                patient=record["patient"],
+                code=record["code"],
+                canonical_name=record["canonical_name"],
+                comp_value=record["value"],
+                sim_value=None,
+                comp_exam_name=record["exam_name"],
+                sim_exam_name="",
+            ))
+
+        for sim_idx in sim_unmatched:
+            record = sim_records[sim_idx]
+            missing_in_compulab.append(build_result_row(
+                patient=record["patient"],
+                code=record["code"],
+                canonical_name=record["canonical_name"],
+                comp_value=None,
+                sim_value=record["value"],
+                comp_exam_name="",
+                sim_exam_name=record["exam_name"],
+            ))
+
+    result_key = lambda r: (r["Paciente"], r["Nome_Canonico"], r["Codigo_Exame"])
+    missing_in_simus.sort(key=result_key)
+    missing_in_compulab.sort(key=result_key)
+    value_divergences.sort(key=result_key)
+
+    summary = {
+        "missing_in_simus_count": len(missing_in_simus),
+        "missing_in_compulab_count": len(missing_in_compulab),
+        "value_divergences_count": len(value_divergences),
+        "missing_in_simus_total": float(sum_decimal(r["Valor_COMPULAB"] for r in missing_in_simus)),
+        "missing_in_compulab_total": float(sum_decimal(r["Valor_SIMUS"] for r in missing_in_compulab)),
+        "divergences_total": float(sum_decimal(abs_decimal(r["Diferenca"]) for r in value_divergences)),
+    }
+
+    return {
+        "missing_in_simus": missing_in_simus,
+        "missing_in_compulab": missing_in_compulab,
+        "value_divergences": value_divergences,
+        "summary": summary,
+    }
+
+
+def prepare_dataframe(df: pd.DataFrame, synonyms: Dict[str, str]) -> pd.DataFrame:
+    """Colunas padronizadas, linha a linha, com Valor em Decimal."""
+    standardized = standardize_columns(df)
+    standardized["Paciente"] = standardized["Paciente"].astype(str).fillna("")
+    standardized["Nome_Exame"] = standardized["Nome_Exame"].astype(str).fillna("")
+    standardized["Codigo_Exame"] = standardized["Codigo_Exame"].astype(str).fillna("")
+
+    standardized["Paciente_Normalizado"] = standardized["Paciente"].apply(normalize_patient_name)
+    standardized["Codigo_Exame"] = standardized["Codigo_Exame"].apply(clean_code)
+    standardized["Nome_Canonico"] = standardized["Nome_Exame"].apply(lambda x: map_to_canonical(x, synonyms))
+    standardized["Valor"] = standardized["Valor"].apply(safe_decimal)
+    return standardized
+
+
+def build_patient_records(df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
+    """Registros de exame por paciente normalizado, na ordem das linhas."""
+    patients: Dict[str, List[Dict[str, Any]]] = {}
+    for row in df.itertuples(index=False):
+        patient_norm = getattr(row, "Paciente_Normalizado", "")
+        if not patient_norm:
+            continue
+        patients.setdefault(patient_norm, []).append({
+            "patient": getattr(row, "Paciente", ""),
+            "exam_name": getattr(row, "Nome_Exame", ""),
+            "canonical_name": getattr(row, "Nome_Canonico", ""),
+            "code": getattr(row, "Codigo_Exame", ""),
+            "value": getattr(row, "Valor", Decimal("0")),
+        })
+    return patients
+
+
+def match_records(
+    comp_records: List[Dict[str, Any]],
+    sim_records: List[Dict[str, Any]],
+    *,
+    enable_fuzzy: bool = True,
+    fuzzy_threshold: float = 0.93,
+) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """Pareamento por codigo, nome canonico e fuzzy, nesta ordem."""
+    comp_unmatched = set(range(len(comp_records)))
+    sim_unmatched = set(range(len(sim_records)))
+    pairs: List[Tuple[int, int]] = []
+
+    def take(candidates: Iterable[Tuple[int, int]]) -> None:
+        for comp_idx, sim_idx in candidates:
+            if comp_idx in comp_unmatched and sim_idx in sim_unmatched:
+                pairs.append((comp_idx, sim_idx))
+                comp_unmatched.remove(comp_idx)
+                sim_unmatched.remove(sim_idx)
+
+    for key in ("code", "canonical_name"):
+        comp_by_key = group_by(comp_records, sorted(comp_unmatched), key)
+        sim_by_key = group_by(sim_records, sorted(sim_unmatched), key)
+        for value in sorted(set(comp_by_key) & set(sim_by_key)):
+            take(zip(sort_indices(comp_by_key[value], comp_records), sort_indices(sim_by_key[value], sim_records)))
+
+    if enable_fuzzy and comp_unmatched and sim_unmatched:
+        take(fuzzy_match_pairs(comp_records, sim_records, sorted(comp_unmatched), sorted(sim_unmatched),
+                               threshold=fuzzy_threshold))
+
+    return pairs, sorted(comp_unmatched), sorted(sim_unmatched)
+
+
+def group_by(records: List[Dict[str, Any]], indices: Iterable[int], key: str) -> Dict[str, List[int]]:
+    """Indices agrupados pelo valor (nao vazio) de `key`."""
+    grouped: Dict[str, List[int]] = {}
+    for idx in indices:
+        value = str(records[idx].get(key, "")).strip()
+        if value:
+            grouped.setdefault(value, []).append(idx)
+    return grouped
+
+
+def sort_indices(indices: List[int], records: List[Dict[str, Any]]) -> List[int]:
+    """Ordem de desempate: nome canonico, texto do valor (estavel pela linha)."""
+    return sorted(indices, key=lambda idx: (records[idx].get("canonical_name", ""), str(records[idx].get("value", ""))))
+
+
+def fuzzy_match_pairs(
+    comp_records: List[Dict[str, Any]],
+    sim_records: List[Dict[str, Any]],
+    comp_unmatched: Iterable[int],
+    sim_unmatched: Iterable[int],
+    *,
+    threshold: float,
+) -> List[Tuple[int, int]]:
+    """Pares Jaro-Winkler >= threshold, escolhidos do maior score para o menor."""
+    candidates: List[Tuple[float, int, int]] = []
+    sim_unmatched = list(sim_unmatched)
+    for comp_idx in comp_unmatched:
+        comp_record = comp_records[comp_idx]
+        comp_name = comp_record.get("canonical_name", "")
+        if not comp_name:
+            continue
+        for sim_idx in sim_unmatched:
+            sim_record = sim_records[sim_idx]
+            sim_name = sim_record.get("canonical_name", "")
+            if not sim_name or (comp_record.get("code") and sim_record.get("code")):
+                continue
+            score = jaro_winkler_similarity(comp_name, sim_name)
+            if score >= threshold:
+                candidates.append((score, comp_idx, sim_idx))
+
+    candidates.sort(key=lambda item: (-item[0], comp_records[item[1]].get("canonical_name", "")))
+
+    pairs: List[Tuple[int, int]] = []
+    used_comp = set()
+    used_sim = set()
+    for _, comp_idx, sim_idx in candidates:
+        if comp_idx in used_comp or sim_idx in used_sim:
+            continue
+        pairs.append((comp_idx, sim_idx))
+        used_comp.add(comp_idx)
+        used_sim.add(sim_idx)
+    return pairs
+
+
+def build_result_row(
+    *,
+    patient: str,
+    code: str,
+    canonical_name: str,
+    comp_value: Optional[Decimal],
+    sim_value: Optional[Decimal],
+    comp_exam_name: str,
+    sim_exam_name: str,
+) -> Dict[str, Any]:
+    """Registro de resultado com valores arredondados a centavos."""
+    comp_val = float(quantize_decimal(comp_value)) if comp_value is not None else None
+    sim_val = float(quantize_decimal(sim_value)) if sim_value is not None else None
+    diff_val = None
+    if comp_val is not None and sim_val is not None:
+        diff_val = float(quantize_decimal(Decimal(str(comp_val)) - Decimal(str(sim_val))))
+    elif comp_val is not None:
+        diff_val = comp_val
+    elif sim_val is not None:
+        diff_val = float(quantize_decimal(Decimal("0") - Decimal(str(sim_val))))
+
+    return {
+        "Paciente": patient,
+        "Codigo_Exame": code,
+        "Nome_Canonico": canonical_name,
+        "Nome_Exame_Compulab": comp_exam_name,
+        "Nome_Exame_Simus": sim_exam_name,
+        "Valor_COMPULAB": comp_val,
+        "Valor_SIMUS": sim_val,
+        "Diferenca": diff_val,
+    }
+
+
+def quantize_decimal(value: Any) -> Decimal:
+    """Arredonda para 2 casas (ROUND_HALF_UP)."""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def sum_decimal(values: Iterable[Any]) -> Decimal:
+    """Soma em Decimal (None ignorado), arredondada a centavos."""
+    total = Decimal("0")
+    for value in values:
+        if value is not None:
+            total += safe_decimal(value, Decimal("0"))
+    return quantize_decimal(total)
+
+
+def abs_decimal(value: Any) -> Decimal:
+    """Valor absoluto como Decimal."""
+    return abs(safe_decimal(value, Decimal("0")))
@@ -0,0 +1,143 @@
+"""
+Micro-benchmark da fronteira paciente/exame do COMPULAB
+LabBridge
+
+Mede _split_patient_exam (trie de tokens, ExamNameTrie) contra a busca
+original por sufixos (normalize_exam_name de cada sufixo da linha) sobre
+linhas de primeiro exame do paciente ("SEQ PACIENTE EXAME CODIGO QTD
+VALOR", ja sem o numero de sequencia), com nomes de paciente distintos e
+caches de normalizacao vazios a cada rodada. Alem do tempo por linha,
+conta as linhas em que as duas divisoes diferem, inclusive em linhas
+embaralhadas com termos genericos, acentos, pontuacao e as reescritas
+(G O T, G P T, TIROXINA LIVRE).
+
+Uso:
+    python -m benchmarks.split --lines 50k --fuzzed 200k
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Callable, List, Sequence
+
+from .synthetic import EXAM_CATALOG, FIRST_NAMES, LAST_NAMES
+
+DEFAULT_LINES = 50000
+DEFAULT_FUZZED = 20000
+DEFAULT_REPEAT = 3
+
+# Pecas usadas nas linhas embaralhadas (alem dos nomes do catalogo)
+_FUZZ_PIECES = [
+    "DOSAGEM DE", "DOSAGEM", "PESQUISA DE", "DETERMINACAO DE", "QUANTITATIVO", "G O T", "G P T",
+    "TIROXINA LIVRE", "(TGO)", "T4", "HDL", "-", ".", "ÁCIDO", "ÚRICO", "JOSÉ", "DE", "DA", "LIVRE",
+]
+
+
+def reference_split(tokens: Sequence[str], exam_names) -> tuple:
+    """Divisao original: primeiro sufixo (i > 0) cujo nome normalizado e conhecido."""
+    from labbridge.utils.pdf_processor import normalize_exam_name
+
+    if not tokens:
+        return [], []
+    for i in range(1, len(tokens)):
+        if normalize_exam_name(" ".join(tokens[i:])) in exam_names:
+            return tokens[:i], tokens[i:]
+    split_idx = min(4, max(2, len(tokens) - 1))
+    return tokens[:split_idx], tokens[split_idx:]
+
+
+def _patient_names(count: int, rng: random.Random) -> List[str]:
+    names, seen = [], set()
+    while len(names) < count:
+        name = " ".join([rng.choice(FIRST_NAMES)] + [rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 3))])
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def first_patient_lines(count: int, seed: int) -> List[List[str]]:
+    """Tokens "PACIENTE EXAME" de `count` linhas com pacientes distintos."""
+    rng = random.Random(seed)
+    return [
+        f"{patient} {rng.choice(EXAM_CATALOG)[0]}".split()
+        for patient in _patient_names(count, rng)
+    ]
+
+
+def fuzzed_lines(count: int, seed: int) -> List[List[str]]:
+    """Linhas com nomes do catalogo e pecas que exercitam a normalizacao."""
+    rng = random.Random(seed)
+    pieces = [exam[0] for exam in EXAM_CATALOG] + _FUZZ_PIECES + FIRST_NAMES[:5] + LAST_NAMES[:5]
+    return [
+        " ".join(rng.choice(pieces) for _ in range(rng.randint(1, 6))).split()
+        for _ in range(count)
+    ]
+
+
+def exam_vocabulary():
+    """(ExamNameTrie, set) com os nomes do catalogo normalizados como no parser."""
+    from labbridge.utils.pdf_processor import ExamNameTrie, normalize_exam_name
+
+    trie = ExamNameTrie()
+    for exam in EXAM_CATALOG:
+        trie.add(normalize_exam_name(exam[0]))
+    return trie, set(trie)
+
+
+def time_split(split: Callable, lines: List[List[str]], exam_names, repeat: int) -> float:
+    """Melhor tempo por linha (us) em `repeat` rodadas com caches frios."""
+    from labbridge.utils.normalize import clear_normalization_caches
+
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        clear_normalization_caches()
+        started = time.perf_counter()
+        for tokens in lines:
+            split(tokens, exam_names)
+        best = min(best, time.perf_counter() - started)
+    return best / max(1, len(lines)) * 1e6
+
+
+def count_mismatches(lines: List[List[str]], trie, names: set) -> int:
+    from labbridge.utils.pdf_processor import _split_patient_exam
+
+    return sum(
+        1 for tokens in lines
+        if tuple(map(tuple, _split_patient_exam(tokens, trie))) != tuple(map(tuple, reference_split(tokens, names)))
+    )
+
+
+def _parse_count(text: str) -> int:
+    text = text.strip().lower()
+    return int(float(text[:-1]) * 1000) if text.endswith("k") else int(text)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.split",
+                                     description="Micro-benchmark da divisao paciente/exame do COMPULAB")
+    parser.add_argument("--lines", default=str(DEFAULT_LINES), help="Linhas de primeiro exame (ex.: 50k)")
+    parser.add_argument("--fuzzed", default=str(DEFAULT_FUZZED), help="Linhas embaralhadas para a conferencia")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from labbridge.utils.pdf_processor import _split_patient_exam
+
+    trie, names = exam_vocabulary()
+    lines = first_patient_lines(_parse_count(args.lines), args.seed)
+    print(f"{len(lines)} linhas, vocabulario de {len(names)} nomes, caches frios")
+    reference_us = time_split(reference_split, lines, names, args.repeat)
+    current_us = time_split(_split_patient_exam, lines, trie, args.repeat)
+    print(f"  busca por sufixos: {reference_us:.1f} us/linha")
+    print(f"  trie de tokens:    {current_us:.1f} us/linha ({reference_us / current_us:.1f}x)")
+
+    mismatches = count_mismatches(lines, trie, names)
+    fuzzed = fuzzed_lines(_parse_count(args.fuzzed), args.seed)
+    mismatches += count_mismatches(fuzzed, trie, names)
+    print(f"{mismatches} divergencia(s) em {len(lines) + len(fuzzed)} linhas")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Suite de benchmark ponta a ponta
+LabBridge
+
+Mede tempo (perf_counter) e pico de memoria (tracemalloc) de cada etapa do
+pipeline sobre conjuntos sinteticos de tamanhos crescentes e grava um
+relatorio JSON. Cada etapa registra tambem um hash do resultado, de modo
+que dois relatorios (ex.: antes/depois de uma otimizacao) mostram tanto a
+variacao de desempenho quanto eventuais mudancas de saida.
+"""
+import hashlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from .synthetic import (
+    SyntheticDataset,
+    generate_dataset,
+    write_compulab_pdf,
+    write_simus_pdf,
+    write_table_file,
+)
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMAT_VERSION = 1
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_PDF_MAX_ROWS = 20000
+# Variacao relativa de tempo a partir da qual o comparador sinaliza a etapa
+COMPARE_THRESHOLD = 0.10
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, default=str, ensure_ascii=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _patients_digest(patients: Dict[str, Dict]) -> str:
+    return _digest({
+        name: sorted((e["exam_name"], e["code"], str(e["value"])) for e in data["exams"])
+        for name, data in (patients or {}).items()
+    })
+
+
+def _to_frame(patients: Dict[str, Dict]):
+    """DataFrame (Paciente, Nome_Exame, Codigo_Exame, Valor) como o estado monta para a analise profunda."""
+    import pandas as pd
+
+    rows = [
+        {"Paciente": name, "Nome_Exame": e["exam_name"], "Codigo_Exame": e["code"], "Valor": e["value"]}
+        for name, data in patients.items()
+        for e in data["exams"]
+    ]
+    return pd.DataFrame(rows, columns=["Paciente", "Nome_Exame", "Codigo_Exame", "Valor"])
+
+
+class StageRecorder:
+    """Registra duracao, pico de memoria e hash de resultado por etapa."""
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        info: Dict[str, Any] = {}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield info
+        finally:
+            info["seconds"] = round(time.perf_counter() - started, 4)
+            if self.trace_memory:
+                info["peak_mb"] = round((tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024), 2)
+            self.stages[name] = info
+            logger.info(f"  {name}: {info['seconds']:.3f}s" + (
+                f", pico {info['peak_mb']:.1f} MB" if "peak_mb" in info else ""))
+
+
+def run_size(rows: int, seed: int = 42, pdf_max_rows: int = DEFAULT_PDF_MAX_ROWS,
+             simus_layout: str = "text", trace_memory: bool = True,
+             workdir: Optional[str] = None) -> Dict[str, Any]:
+    """Executa todas as etapas para um conjunto sintetico de `rows` linhas COMPULAB."""
+    from labbridge.services.mapping_service import mapping_service
+    from labbridge.utils.analysis_module import compare_exams, run_deep_analysis
+    from labbridge.utils.comparison import run_complete_analysis
+    from labbridge.utils.pdf_processor import SimusPDFParser, extract_compulab_patients, load_from_excel
+
+    recorder = StageRecorder(trace_memory)
+    logger.info(f"Conjunto de {rows} linhas (semente {seed})")
+
+    with recorder.stage("generate") as info:
+        dataset: SyntheticDataset = generate_dataset(rows, seed)
+        info["rows"] = {"compulab": len(dataset.compulab), "simus": len(dataset.simus)}
+
+    # Os sinonimos do conjunto alimentam o parser SIMUS e a comparacao
+    mapping_service.load_snapshot(dataset.synonyms)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        compulab_xlsx = os.path.join(tmp, "compulab.xlsx")
+        simus_xlsx = os.path.join(tmp, "simus.xlsx")
+        with recorder.stage("write_xlsx"):
+            write_table_file(dataset, "compulab", compulab_xlsx, "xlsx")
+            write_table_file(dataset, "simus", simus_xlsx, "xlsx")
+
+        if rows <= pdf_max_rows:
+            compulab_pdf = os.path.join(tmp, "compulab.pdf")
+            simus_pdf = os.path.join(tmp, "simus.pdf")
+            with recorder.stage("write_pdf"):
+                write_compulab_pdf(dataset, compulab_pdf)
+                write_simus_pdf(dataset, simus_pdf, layout=simus_layout)
+
+            with recorder.stage("extract_compulab_patients") as info:
+                compulab_pdf_patients, _ = extract_compulab_patients(compulab_pdf)
+                info["patients"] = len(compulab_pdf_patients or {})
+                info["digest"] = _patients_digest(compulab_pdf_patients)
+
+            with recorder.stage("simus_pdf_parser") as info:
+                simus_pdf_patients, _, _, _ = SimusPDFParser(simus_pdf, workers=1).extract()
+                info["patients"] = len(simus_pdf_patients or {})
+                info["digest"] = _patients_digest(simus_pdf_patients)
+        else:
+            logger.info(f"  etapas de PDF ignoradas (> {pdf_max_rows} linhas)")
+
+        with recorder.stage("load_from_excel") as info:
+            compulab_patients, compulab_total = load_from_excel(compulab_xlsx)
+            simus_patients, simus_total = load_from_excel(simus_xlsx)
+            info["patients"] = {"compulab": len(compulab_patients or {}), "simus": len(simus_patients or {})}
+
+    df_compulab = _to_frame(compulab_patients)
+    df_simus = _to_frame(simus_patients)
+
+    with recorder.stage("compare_exams") as info:
+        comparison = compare_exams(df_compulab, df_simus, dataset.synonyms)
+        info["summary"] = comparison["summary"]
+        info["digest"] = _digest({k: comparison[k] for k in ("missing_in_simus", "missing_in_compulab", "value_divergences")})
+
+    with recorder.stage("run_complete_analysis") as info:
+        report = run_complete_analysis(compulab_patients, simus_patients)
+        info["digest"] = _digest(report.to_dict())
+
+    with recorder.stage("run_deep_analysis") as info:
+        deep = run_deep_analysis(
+            df_compulab, df_simus,
+            float(compulab_total or Decimal("0")), float(simus_total or Decimal("0")),
+            {"summary": comparison["summary"]},
+            analysis_date="31/01/2024",
+        )
+        deep.get("executive_summary", {}).pop("generated_at", None)
+        info["digest"] = _digest(deep)
+
+    return {
+        "rows": rows,
+        "seed": seed,
+        "simus_layout": simus_layout,
+        "truth": dataset.truth,
+        "stages": recorder.stages,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10, check=True,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(sizes: Iterable[int] = DEFAULT_SIZES, seed: int = 42,
+              pdf_max_rows: int = DEFAULT_PDF_MAX_ROWS, simus_layout: str = "text",
+              trace_memory: bool = True) -> Dict[str, Any]:
+    """Executa run_size para cada tamanho e monta o relatorio completo."""
+    from labbridge.utils.extraction_cache import extraction_cache
+
+    # O cache de extracao mascararia o custo real dos parsers
+    cache_enabled = extraction_cache.enabled
+    extraction_cache.enabled = False
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        runs = [run_size(rows, seed, pdf_max_rows, simus_layout, trace_memory) for rows in sizes]
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        extraction_cache.enabled = cache_enabled
+
+    return {
+        "format": REPORT_FORMAT_VERSION,
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "trace_memory": trace_memory,
+        },
+        "runs": runs,
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = COMPARE_THRESHOLD) -> List[str]:
+    """Linhas de texto comparando duas execucoes da suite (mesmo tamanho e etapa)."""
+    lines = [
+        f"base: {baseline['meta'].get('commit')}  atual: {current['meta'].get('commit')}",
+        f"{'linhas':>8}  {'etapa':<26} {'base(s)':>9} {'atual(s)':>9} {'var':>7}  {'MB base':>8} {'MB atual':>8}  saida",
+    ]
+    base_runs = {run["rows"]: run for run in baseline.get("runs", [])}
+    for run in current.get("runs", []):
+        base_run = base_runs.get(run["rows"])
+        if not base_run:
+            continue
+        for stage, info in run["stages"].items():
+            base_info = base_run["stages"].get(stage)
+            if not base_info:
+                continue
+            before, after = base_info["seconds"], info["seconds"]
+            change = (after - before) / before if before else 0.0
+            flag = " <" if change <= -threshold else (" >" if change >= threshold else "")
+            output = ""
+            if "digest" in info and "digest" in base_info:
+                output = "igual" if info["digest"] == base_info["digest"] else "DIFERENTE"
+            lines.append(
+                f"{run['rows']:>8}  {stage:<26} {before:>9.3f} {after:>9.3f} {change:>+7.0%}{flag:<2}"
+                f"{base_info.get('peak_mb', 0):>8.1f} {info.get('peak_mb', 0):>8.1f}  {output}"
+            )
+    return lines
@@ -0,0 +1,295 @@
+"""
+Gerador de relatorios sinteticos COMPULAB/SIMUS
+LabBridge
+
+Produz um conjunto de dados deterministico (por semente) com o formato dos
+relatorios reais e as imperfeicoes que a reconciliacao precisa tratar:
+sinonimos de exame no SIMUS, erros de digitacao em nomes de paciente,
+exames repetidos, pacientes ausentes em um dos sistemas e divergencias de
+valor. O gabarito dessas perturbacoes acompanha o conjunto de dados.
+"""
+import random
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+# (nome COMPULAB, codigo SIGTAP, valor, sinonimos usados pelo SIMUS)
+EXAM_CATALOG: List[Tuple[str, str, str, Tuple[str, ...]]] = [
+    ("HEMOGRAMA COMPLETO", "0202020380", "4,11", ("HEMOGRAMA",)),
+    ("GLICOSE", "0202010473", "1,85", ("DOSAGEM DE GLICOSE", "GLICEMIA")),
+    ("COLESTEROL HDL", "0202010279", "3,51", ("DOSAGEM DE COLESTEROL HDL", "HDL COLESTEROL")),
+    ("COLESTEROL LDL", "0202010287", "3,51", ("DOSAGEM DE COLESTEROL LDL",)),
+    ("TRIGLICERIDEOS", "0202010678", "3,51", ("DOSAGEM DE TRIGLICERIDEOS", "TRIGLICERIDES")),
+    ("CREATININA", "0202010317", "1,85", ("DOSAGEM DE CREATININA",)),
+    ("UREIA", "0202010694", "1,85", ("DOSAGEM DE UREIA",)),
+    ("ACIDO URICO", "0202010120", "1,85", ("DOSAGEM DE ACIDO URICO",)),
+    ("TIREOTROFINA (TSH)", "0202060250", "8,96", ("DOSAGEM DE HORMONIO TIREOESTIMULANTE", "TSH")),
+    ("TIROXINA LIVRE (T4 LIVRE)", "0202060380", "11,60", ("DOSAGEM DE TIROXINA LIVRE", "T4 LIVRE")),
+    ("HEMOGLOBINA GLICADA", "0202010503", "7,86", ("DOSAGEM DE HEMOGLOBINA GLICOSILADA", "HBA1C")),
+    ("TRANSAMINASE OXALACETICA (TGO)", "0202010643", "2,01", ("DOSAGEM DE TRANSAMINASE OXALACETICA", "TGO")),
+    ("TRANSAMINASE PIRUVICA (TGP)", "0202010651", "2,01", ("DOSAGEM DE TRANSAMINASE PIRUVICA", "TGP")),
+    ("GAMA GLUTAMIL TRANSFERASE", "0202010465", "3,51", ("DOSAGEM DE GAMA GT", "GAMA GT")),
+    ("FOSFATASE ALCALINA", "0202010422", "2,01", ("DOSAGEM DE FOSFATASE ALCALINA",)),
+    ("POTASSIO", "0202010600", "1,85", ("DOSAGEM DE POTASSIO",)),
+    ("SODIO", "0202010635", "1,85", ("DOSAGEM DE SODIO",)),
+    ("CALCIO", "0202010210", "1,85", ("DOSAGEM DE CALCIO",)),
+    ("MAGNESIO", "0202010562", "2,01", ("DOSAGEM DE MAGNESIO",)),
+    ("FERRITINA", "0202010384", "15,59", ("DOSAGEM DE FERRITINA",)),
+    ("FERRO SERICO", "0202010392", "3,51", ("DOSAGEM DE FERRO SERICO",)),
+    ("VITAMINA B12", "0202010708", "15,24", ("DOSAGEM DE VITAMINA B12", "CIANOCOBALAMINA")),
+    ("PROTEINA C REATIVA", "0202030202", "9,25", ("DOSAGEM DE PROTEINA C REATIVA", "PCR")),
+    ("URINA TIPO I (EAS)", "0202050017", "3,70", ("ANALISE DE CARACTERES FISICOS ELEMENTOS E SEDIMENTO DA URINA", "EAS")),
+    ("UROCULTURA", "0202080080", "5,62", ("CULTURA DE BACTERIAS PARA IDENTIFICACAO",)),
+    ("PARASITOLOGICO DE FEZES", "0202040127", "1,65", ("PESQUISA DE OVOS E CISTOS DE PARASITAS", "EPF")),
+    ("TEMPO DE PROTROMBINA", "0202020142", "2,73", ("DETERMINACAO DE TEMPO E ATIVIDADE DA PROTROMBINA", "TAP")),
+    ("TEMPO DE TROMBOPLASTINA PARCIAL", "0202020134", "5,77", ("DETERMINACAO DE TEMPO DE TROMBOPLASTINA PARCIAL ATIVADA", "TTPA")),
+    ("VDRL", "0202031110", "2,83", ("TESTE NAO TREPONEMICO P DETECCAO DE SIFILIS",)),
+    ("BETA HCG", "0202060217", "7,85", ("DOSAGEM DE GONADOTROFINA CORIONICA HUMANA", "HCG")),
+]
+
+FIRST_NAMES = [
+    "MARIA", "JOSE", "ANA", "JOAO", "ANTONIO", "FRANCISCA", "CARLOS", "PAULO", "PEDRO", "LUCAS",
+    "LUIZ", "MARCOS", "LUIS", "GABRIEL", "RAFAEL", "ADRIANA", "JULIANA", "MARCIA", "FERNANDA", "PATRICIA",
+    "ALINE", "SANDRA", "CAMILA", "AMANDA", "BRUNO", "EDUARDO", "FELIPE", "RAIMUNDO", "RODRIGO", "MANOEL",
+]
+LAST_NAMES = [
+    "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "RODRIGUES", "FERREIRA", "ALVES", "PEREIRA", "LIMA", "GOMES",
+    "COSTA", "RIBEIRO", "MARTINS", "CARVALHO", "ALMEIDA", "LOPES", "SOARES", "FERNANDES", "VIEIRA", "BARBOSA",
+    "ROCHA", "DIAS", "NASCIMENTO", "ANDRADE", "MOREIRA", "NUNES", "MARQUES", "MACHADO", "MENDES", "FREITAS",
+]
+
+# Taxas padrao das perturbacoes
+MISSING_IN_SIMUS_RATE = 0.02
+MISSING_IN_COMPULAB_RATE = 0.01
+PATIENT_TYPO_RATE = 0.01
+SYNONYM_RATE = 0.35
+DUPLICATE_RATE = 0.01
+VALUE_DIVERGENCE_RATE = 0.01
+DROPPED_EXAM_RATE = 0.01
+MAX_EXAMS_PER_PATIENT = 6
+
+
+@dataclass
+class ExamRow:
+    patient: str
+    exam_name: str
+    code: str
+    value: Decimal
+
+
+@dataclass
+class SyntheticDataset:
+    """Linhas COMPULAB/SIMUS, mapeamentos de sinonimos e gabarito das perturbacoes."""
+    seed: int
+    compulab: List[ExamRow] = field(default_factory=list)
+    simus: List[ExamRow] = field(default_factory=list)
+    synonyms: Dict[str, str] = field(default_factory=dict)
+    truth: Dict[str, int] = field(default_factory=dict)
+
+    def patients(self, source: str) -> Dict[str, Dict]:
+        """Formato {paciente: {'exams': [...], 'total': Decimal}} dos extratores de PDF."""
+        rows = self.compulab if source == "compulab" else self.simus
+        patients: Dict[str, Dict] = {}
+        for row in rows:
+            entry = patients.setdefault(row.patient, {"exams": [], "total": Decimal("0")})
+            entry["exams"].append({"exam_name": row.exam_name, "code": row.code, "value": row.value})
+            entry["total"] += row.value
+        return patients
+
+    def table_rows(self, source: str) -> List[Tuple[str, str, str, float]]:
+        """Linhas (Paciente, Nome_Exame, Codigo_Exame, Valor) para planilhas."""
+        rows = self.compulab if source == "compulab" else self.simus
+        return [(row.patient, row.exam_name, row.code, float(row.value)) for row in rows]
+
+
+def _money(text: str) -> Decimal:
+    return Decimal(text.replace(",", "."))
+
+
+def _format_money(value: Decimal) -> str:
+    return f"{value:.2f}".replace(".", ",")
+
+
+def _typo(rng: random.Random, name: str) -> str:
+    """Troca, remove ou duplica uma letra (mantem apenas A-Z e espacos)."""
+    positions = [i for i, ch in enumerate(name) if ch.isalpha()]
+    i = rng.choice(positions)
+    kind = rng.randrange(3)
+    if kind == 0 and i + 1 < len(name) and name[i + 1].isalpha():
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    if kind == 1 and len(positions) > 6:
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i] + name[i:]
+
+
+def generate_dataset(rows: int, seed: int = 42) -> SyntheticDataset:
+    """Gera aproximadamente `rows` linhas de exame COMPULAB e o SIMUS correspondente."""
+    rng = random.Random(seed)
+    dataset = SyntheticDataset(seed=seed)
+    for name, _, _, synonyms in EXAM_CATALOG:
+        for synonym in synonyms:
+            dataset.synonyms[synonym] = name
+
+    truth = {key: 0 for key in (
+        "patients", "compulab_rows", "simus_rows", "missing_in_simus", "missing_in_compulab",
+        "patient_typos", "synonyms", "duplicates", "value_divergences", "dropped_exams",
+    )}
+    used_names = set()
+    sequence = 0
+    while len(dataset.compulab) < rows:
+        sequence += 1
+        while True:
+            name = " ".join([rng.choice(FIRST_NAMES)] + [rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 3))])
+            if name not in used_names:
+                used_names.add(name)
+                break
+        truth["patients"] += 1
+        exams = rng.sample(EXAM_CATALOG, rng.randint(1, MAX_EXAMS_PER_PATIENT))
+
+        roll = rng.random()
+        in_compulab = roll >= MISSING_IN_COMPULAB_RATE
+        in_simus = roll < MISSING_IN_COMPULAB_RATE or roll >= MISSING_IN_COMPULAB_RATE + MISSING_IN_SIMUS_RATE
+        if not in_compulab:
+            truth["missing_in_compulab"] += 1
+        if not in_simus:
+            truth["missing_in_simus"] += 1
+
+        simus_name = name
+        if in_simus and in_compulab and rng.random() < PATIENT_TYPO_RATE:
+            simus_name = _typo(rng, name)
+            truth["patient_typos"] += 1
+
+        for exam_name, code, value_text, synonyms in exams:
+            value = _money(value_text)
+            if in_compulab:
+                dataset.compulab.append(ExamRow(name, exam_name, code, value))
+            if not in_simus:
+                continue
+            if in_compulab and rng.random() < DROPPED_EXAM_RATE:
+                truth["dropped_exams"] += 1
+                continue
+            simus_exam = exam_name
+            if rng.random() < SYNONYM_RATE:
+                simus_exam = rng.choice(synonyms)
+                truth["synonyms"] += 1
+            simus_value = value
+            if in_compulab and rng.random() < VALUE_DIVERGENCE_RATE:
+                simus_value = value + Decimal(rng.choice(["0.50", "1.00", "-0.35", "2.10"]))
+                truth["value_divergences"] += 1
+            dataset.simus.append(ExamRow(simus_name, simus_exam, code, simus_value))
+            if rng.random() < DUPLICATE_RATE:
+                dataset.simus.append(ExamRow(simus_name, simus_exam, code, simus_value))
+                truth["duplicates"] += 1
+
+    truth["compulab_rows"] = len(dataset.compulab)
+    truth["simus_rows"] = len(dataset.simus)
+    dataset.truth = truth
+    return dataset
+
+
+# ----- Escrita dos arquivos -----
+
+def _grouped(rows: List[ExamRow]) -> List[Tuple[str, List[ExamRow]]]:
+    groups: List[Tuple[str, List[ExamRow]]] = []
+    for row in rows:
+        if groups and groups[-1][0] == row.patient:
+            groups[-1][1].append(row)
+        else:
+            groups.append((row.patient, [row]))
+    return groups
+
+
+def write_compulab_pdf(dataset: SyntheticDataset, path: str) -> str:
+    """Relatorio COMPULAB em texto: 'SEQ PACIENTE EXAME CODIGO QTD VALOR' e rodape com TOTAL."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(path, pagesize=A4)
+    state = {"y": 0}
+
+    def new_page():
+        pdf.setFont("Helvetica", 7)
+        state["y"] = 810
+        line("RELACAO DOS EXAMES REALIZADOS PERIODO 01/01/2024 A 31/01/2024")
+        line("SEQ NOME EXAME CODIGO QTD VALOR")
+
+    def line(text):
+        pdf.drawString(20, state["y"], text)
+        state["y"] -= 10
+
+    new_page()
+    total = Decimal("0")
+    for sequence, (patient, rows) in enumerate(_grouped(dataset.compulab), start=1):
+        for index, row in enumerate(rows):
+            if state["y"] < 30:
+                line(f"PAGINA {pdf.getPageNumber()}")
+                pdf.showPage()
+                new_page()
+            prefix = f"{sequence} {patient} " if index == 0 else ""
+            line(f"{prefix}{row.exam_name} {row.code} 1 {_format_money(row.value)}")
+            total += row.value
+    total_text = f"{total:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    line(f"TOTAL GERAL: R$ {total_text}")
+    pdf.save()
+    return path
+
+
+def write_simus_pdf(dataset: SyntheticDataset, path: str, layout: str = "text") -> str:
+    """Relatorio SIMUS em texto (paciente + linhas 'CODIGO EXAME VALOR') ou tabela com grade."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfgen import canvas
+
+    total = sum((row.value for row in dataset.simus), Decimal("0"))
+    total_text = f"{total:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    header = f"RELATORIO SIMUS R$ {total_text} (SIGTAP) R$ {total_text} (Contratualizados)"
+
+    if layout == "table":
+        doc = SimpleDocTemplate(path, pagesize=A4, topMargin=20, bottomMargin=20)
+        data = [["PACIENTE", "EXAME", "CODIGO", "VALOR"]]
+        # O parser so carrega o paciente dentro da propria tabela: repete o nome em cada linha
+        for row in dataset.simus:
+            data.append([row.patient, row.exam_name, row.code, _format_money(row.value)])
+        table = Table(data, repeatRows=1)
+        table.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
+            ("FONTSIZE", (0, 0), (-1, -1), 6),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 1),
+            ("TOPPADDING", (0, 0), (-1, -1), 1),
+        ]))
+        doc.build([Paragraph(header, getSampleStyleSheet()["Normal"]), table])
+        return path
+
+    pdf = canvas.Canvas(path, pagesize=A4)
+    state = {"y": 0}
+
+    def line(text):
+        pdf.drawString(20, state["y"], text)
+        state["y"] -= 10
+
+    pdf.setFont("Helvetica", 7)
+    state["y"] = 810
+    line(header)
+    for sequence, (patient, rows) in enumerate(_grouped(dataset.simus), start=1):
+        for index, row in enumerate([None] + rows):
+            if state["y"] < 30:
+                pdf.showPage()
+                pdf.setFont("Helvetica", 7)
+                state["y"] = 810
+            if row is None:
+                line(f"{sequence:05d} {patient} 15/01/2024")
+            else:
+                line(f"{row.code} {row.exam_name} {_format_money(row.value)}")
+    pdf.save()
+    return path
+
+
+def write_table_file(dataset: SyntheticDataset, source: str, path: str, fmt: str) -> str:
+    """Planilha convertida (mesmas colunas do conversor) em xlsx, csv ou parquet."""
+    from labbridge.utils.export_utils import write_rows
+    from labbridge.utils.pdf_processor import CONVERTED_COLUMNS
+
+    write_rows(path, fmt, CONVERTED_COLUMNS, dataset.table_rows(source), sheet_name=source.upper())
+    return path
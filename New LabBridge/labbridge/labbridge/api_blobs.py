@@ -0,0 +1,45 @@
+"""
+API de download dos arquivos temporários (blob_store).
+
+Os estados guardam apenas o token do arquivo; o navegador baixa o conteúdo
+por estas rotas. FileResponse envia o arquivo em blocos e atende
+requisições Range (206 Partial Content), usadas pelo visualizador de PDF e
+para retomar downloads.
+"""
+
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import FileResponse
+
+from .services.blob_store import BLOB_URL_PREFIX, blob_store
+
+blobs_router = APIRouter(prefix=BLOB_URL_PREFIX, tags=["blobs"])
+
+
+def _blob_response(token: str, download: bool) -> FileResponse:
+    blob = blob_store.get(token)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado ou expirado")
+    return FileResponse(
+        blob.path,
+        media_type=blob.content_type,
+        filename=blob.filename,
+        content_disposition_type="attachment" if download else "inline",
+        headers={"Cache-Control": "private, no-store"},
+    )
+
+
+@blobs_router.api_route("/{token}", methods=["GET", "HEAD"])
+async def get_blob(token: str, download: bool = True):
+    """Arquivo do token (?download=false para exibir no navegador)."""
+    return _blob_response(token, download)
+
+
+@blobs_router.api_route("/{token}/{filename}", methods=["GET", "HEAD"])
+async def get_blob_named(token: str, filename: str, download: bool = True):
+    """Mesmo arquivo; o nome no final da URL é apenas para o navegador."""
+    return _blob_response(token, download)
+
+
+# App FastAPI montado à frente do backend do Reflex (rx.App(api_transformer=...))
+blobs_api = FastAPI(title="LabBridge Blobs", docs_url=None, redoc_url=None, openapi_url=None)
+blobs_api.include_router(blobs_router)
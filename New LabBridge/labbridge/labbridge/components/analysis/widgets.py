@@ -3,6 +3,7 @@ from typing import Any
 from ...state import State
 from ...components import ui
 from ...styles import Color, Design, Spacing, Typography, CARD_STYLE
+from ...utils.result_table import RESULT_PAGE_SIZES
 
 # === ANALYSIS PAGE COMPONENTS (REMASTERED PREMIUM) ===
 
@@ -255,7 +256,11 @@ def action_table(
     is_divergence: bool = False,
     error_options: list[str] = None,
 ) -> rx.Component:
-    """Tabela de dados REMASTERED"""
+    """Tabela de dados REMASTERED
+
+    `data` é a página corrente (State.result_rows / State.result_match_rows):
+    busca, ordenação pelos cabeçalhos e paginação rodam no servidor.
+    """
 
     def render_row(item: Any, i: rx.Var[int]):
         # Row styling
@@ -314,14 +319,65 @@ def action_table(
             transition="all 0.2s ease"
         )
 
+    toolbar = rx.hstack(
+        rx.input(
+            placeholder="Buscar paciente ou exame...",
+            value=State.result_search,
+            on_change=State.set_result_search,
+            debounce_timeout=300,
+            size="2",
+            width="280px",
+        ),
+        rx.spacer(),
+        rx.text(State.result_page_label, size="1", color=Color.TEXT_SECONDARY),
+        align_items="center",
+        width="100%",
+        padding="12px 20px",
+        border_bottom=f"1px solid {Color.BORDER}",
+    )
+
+    pager = rx.hstack(
+        rx.hstack(
+            rx.text("Itens por página", size="1", color=Color.TEXT_SECONDARY),
+            ui.select(
+                RESULT_PAGE_SIZES,
+                value=State.result_page_size_option,
+                on_change=State.set_result_page_size,
+                width="90px",
+            ),
+            spacing="2", align_items="center",
+        ),
+        rx.spacer(),
+        ui.button("", icon="chevron-left", on_click=State.prev_result_page, variant="ghost", size="2", padding="6px",
+                  disabled=State.result_page == 0),
+        rx.text("Página ", State.result_page + 1, " de ", State.result_page_count, size="1", color=Color.TEXT_SECONDARY),
+        ui.button("", icon="chevron-right", on_click=State.next_result_page, variant="ghost", size="2", padding="6px",
+                  disabled=State.result_page + 1 >= State.result_page_count),
+        align_items="center",
+        width="100%",
+        padding="12px 20px",
+        border_top=f"1px solid {Color.BORDER}",
+    )
+
     return rx.box(
+        toolbar,
         rx.table.root(
             rx.table.header(
                 rx.table.row(
                     *[rx.table.column_header_cell(
-                        rx.text(h, size="1", weight="bold", color=Color.TEXT_SECONDARY, text_transform="uppercase", letter_spacing="1px"),
+                        rx.hstack(
+                            rx.text(h, size="1", weight="bold", color=Color.TEXT_SECONDARY, text_transform="uppercase", letter_spacing="1px"),
+                            rx.cond(
+                                State.result_sort_key == key,
+                                rx.icon(rx.cond(State.result_sort_desc, "arrow-down", "arrow-up"), size=12, color=Color.PRIMARY),
+                                rx.icon("arrow-up-down", size=12, color=Color.TEXT_SECONDARY, opacity="0.4"),
+                            ),
+                            spacing="1", align_items="center",
+                        ),
+                        on_click=State.sort_results(key),
+                        cursor="pointer",
                         padding="16px 20px", bg="rgba(248, 250, 252, 0.8)", border_bottom=f"2px solid {Color.BORDER}"
-                    ) for h in headers],
+                    ) for h, key in zip(headers, columns_keys)],
                     rx.table.column_header_cell(
                         rx.text("AÇÕES", size="1", weight="bold", color=Color.TEXT_SECONDARY, text_align="right", text_transform="uppercase"),
                         padding="16px 20px", bg="rgba(248, 250, 252, 0.8)", border_bottom=f"2px solid {Color.BORDER}"
@@ -332,6 +388,7 @@ def action_table(
             variant="ghost",
             width="100%",
         ),
+        pager,
         bg="rgba(255, 255, 255, 0.6)",
         backdrop_filter="blur(10px)",
         border=f"1px solid {Color.BORDER}",
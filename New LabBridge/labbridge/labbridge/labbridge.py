@@ -6,6 +6,7 @@ import logging
 import reflex as rx
 from .config import Config
 from .state import State
+from .api_blobs import blobs_api
 
 logger = logging.getLogger(__name__)
 
@@ -173,6 +174,8 @@ app = rx.App(
         "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap",
         "/custom.css",
     ],
+    # Downloads de PDFs/planilhas gerados no backend (/api/blobs)
+    api_transformer=blobs_api,
 )
 
 # Adicionar rotas explícitas - Isso resolve os erros 404 e permite refresh
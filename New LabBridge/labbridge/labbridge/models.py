@@ -71,7 +71,12 @@ class AnalysisResult(BaseModel):
     tenant_id: str = ""
 
 
-
+class PatientMatch(BaseModel):
+    """Par de pacientes conciliado por nome semelhante (grafia ou sobrenome omitido)"""
+    compulab_name: str = ""
+    simus_name: str = ""
+    confidence: float = 0.0
+    kind: str = ""
 
 
 class PatientHistoryEntry(BaseModel):
@@ -162,6 +162,12 @@ def analise_page() -> rx.Component:
                                     border_radius="full",
                                     overflow="hidden",
                                 ),
+                                ui.button(
+                                    "Cancelar",
+                                    icon="x",
+                                    variant="ghost",
+                                    on_click=State.cancel_processing,
+                                ),
                                 spacing="2",
                                 width="100%",
                                 align_items="center",
@@ -391,6 +397,7 @@ def analise_page() -> rx.Component:
                                     {"label": "Exames somente COMPULAB", "value": "exams_only_compulab"},
                                     {"label": "Exames somente SIMUS", "value": "exams_only_simus"},
                                     {"label": "Diferença de Valores", "value": "value_diffs"},
+                                    {"label": "Pacientes com nome divergente", "value": "patient_matches"},
                                 ],
                                 State.analysis_active_tab,
                                 State.set_analysis_active_tab,
@@ -403,23 +410,27 @@ def analise_page() -> rx.Component:
                         rx.box(
                             rx.cond(
                                 State.analysis_active_tab == "patients_only_compulab",
-                                action_table(["Paciente", "Qtd Exames", "Valor Total"], State.patients_only_compulab, ["patient", "exams_count", "total_value"], patient_key="patient", error_options=State.ERROR_TYPES_PATIENTS_COMPULAB),
+                                action_table(["Paciente", "Qtd Exames", "Valor Total"], State.result_rows, ["patient", "exams_count", "total_value"], patient_key="patient", error_options=State.ERROR_TYPES_PATIENTS_COMPULAB),
                             ),
                             rx.cond(
                                 State.analysis_active_tab == "patients_only_simus",
-                                action_table(["Paciente", "Qtd Exames", "Valor Total"], State.patients_only_simus, ["patient", "exams_count", "total_value"], patient_key="patient", error_options=State.ERROR_TYPES_PATIENTS_SIMUS),
+                                action_table(["Paciente", "Qtd Exames", "Valor Total"], State.result_rows, ["patient", "exams_count", "total_value"], patient_key="patient", error_options=State.ERROR_TYPES_PATIENTS_SIMUS),
                             ),
                             rx.cond(
                                 State.analysis_active_tab == "exams_only_compulab",
-                                action_table(["Paciente", "Exame", "Valor Compulab"], State.exams_only_compulab, ["patient", "exam_name", "compulab_value"], error_options=State.ERROR_TYPES_EXAMS_COMPULAB),
+                                action_table(["Paciente", "Exame", "Valor Compulab"], State.result_rows, ["patient", "exam_name", "compulab_value"], error_options=State.ERROR_TYPES_EXAMS_COMPULAB),
                             ),
                             rx.cond(
                                 State.analysis_active_tab == "exams_only_simus",
-                                action_table(["Paciente", "Exame", "Valor Simus"], State.exams_only_simus, ["patient", "exam_name", "simus_value"], error_options=State.ERROR_TYPES_EXAMS_SIMUS),
+                                action_table(["Paciente", "Exame", "Valor Simus"], State.result_rows, ["patient", "exam_name", "simus_value"], error_options=State.ERROR_TYPES_EXAMS_SIMUS),
                             ),
                             rx.cond(
                                 State.analysis_active_tab == "value_diffs",
-                                action_table(["Paciente", "Exame", "Compulab", "Simus", "Diferença"], State.value_divergences, ["patient", "exam_name", "compulab_value", "simus_value", "difference"], is_divergence=True, error_options=State.ERROR_TYPES_VALUE_DIFFS),
+                                action_table(["Paciente", "Exame", "Compulab", "Simus", "Diferença"], State.result_rows, ["patient", "exam_name", "compulab_value", "simus_value", "difference"], is_divergence=True, error_options=State.ERROR_TYPES_VALUE_DIFFS),
+                            ),
+                            rx.cond(
+                                State.analysis_active_tab == "patient_matches",
+                                action_table(["Paciente COMPULAB", "Paciente SIMUS", "Confiança", "Tipo"], State.result_match_rows, ["compulab_name", "simus_name", "confidence", "kind"], patient_key="compulab_name", error_options=State.ERROR_TYPES_PATIENTS_COMPULAB),
                             ),
                             width="100%",
                         ),
@@ -278,6 +278,12 @@ def conversor_page() -> rx.Component:
                                     border_radius="full",
                                     overflow="hidden",
                                 ),
+                                ui.button(
+                                    "Cancelar",
+                                    icon="x",
+                                    variant="ghost",
+                                    on_click=State.cancel_processing,
+                                ),
                                 spacing="2",
                                 width="100%",
                                 align_items="center",
@@ -293,7 +299,22 @@ def conversor_page() -> rx.Component:
                         ),
                     ),
 
-                    # Botão de Ação Principal
+                    # Formato de saída + Botão de Ação Principal
+                    rx.cond(
+                        ~State.csv_generated & ~State.is_generating_csv,
+                        rx.hstack(
+                            rx.text("Formato de saída", font_size="0.85rem", color=Color.TEXT_SECONDARY),
+                            rx.select(
+                                ["xlsx", "csv", "parquet"],
+                                value=State.export_format,
+                                on_change=State.set_export_format,
+                                size="2",
+                            ),
+                            align_items="center",
+                            spacing="3",
+                            margin_top=Spacing.LG,
+                        ),
+                    ),
                     rx.cond(
                         ~State.csv_generated & ~State.is_generating_csv,
                         ui.button(
@@ -328,14 +349,14 @@ def conversor_page() -> rx.Component:
                         ui.text("Seus arquivos foram padronizados e estão prontos para download.", color=Color.TEXT_SECONDARY),
                         rx.grid(
                             rx.link(
-                                ui.button("Baixar COMPULAB (.xlsx)", icon="download", variant="primary", width="100%", height="48px"),
-                                download="compulab_data.xlsx",
-                                href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64," + State.compulab_csv,
+                                ui.button("Baixar COMPULAB (." + State.export_format + ")", icon="download", variant="primary", width="100%", height="48px"),
+                                download="compulab_data." + State.export_format,
+                                href=rx.get_upload_url(State.compulab_export_file),
                             ),
                             rx.link(
-                                ui.button("Baixar SIMUS (.xlsx)", icon="download", variant="primary", width="100%", height="48px"),
-                                download="simus_data.xlsx",
-                                href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64," + State.simus_csv,
+                                ui.button("Baixar SIMUS (." + State.export_format + ")", icon="download", variant="primary", width="100%", height="48px"),
+                                download="simus_data." + State.export_format,
+                                href=rx.get_upload_url(State.simus_export_file),
                             ),
                             columns={"initial": "1", "sm": "2"},
                             spacing="4",
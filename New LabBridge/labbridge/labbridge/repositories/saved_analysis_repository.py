@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 from datetime import date
 from ..services.supabase_client import supabase
 from ..services.local_storage import local_storage
+from ..services.dashboard_metrics import dashboard_metrics, month_aggregates, month_range
 from ..schemas.analysis_schemas import SavedAnalysisCreate, AnalysisItemCreate, analysis_to_dict
 import logging
 
@@ -54,6 +55,7 @@ class SavedAnalysisRepository:
 
             if response.data:
                 logger.info(f"Analise '{data.analysis_name}' salva com sucesso!")
+                dashboard_metrics.invalidate(tenant_id)
                 return response.data[0]
             return None
 
@@ -186,6 +188,8 @@ class SavedAnalysisRepository:
                 .delete()\
                 .eq("id", analysis_id)\
                 .execute()
+            if response.data:
+                dashboard_metrics.invalidate(response.data[0].get("tenant_id"))
             return bool(response.data)
         except Exception as e:
             logger.error(f"Erro ao deletar analise {analysis_id}: {e}")
@@ -319,3 +323,42 @@ class SavedAnalysisRepository:
         except Exception as e:
             logger.error(f"Erro ao gerar resumo mensal: {e}")
             return local_storage.get_monthly_summary(tenant_id, year, month)
+
+    @staticmethod
+    def get_monthly_aggregates(tenant_id: str, year: int, month: int, months: int = 6) -> List[Dict[str, Any]]:
+        """
+        Contagem e totais por mês dos `months` meses terminados em year/month,
+        do mais antigo ao mais recente (ver dashboard_metrics).
+        """
+        if SavedAnalysisRepository._use_local(tenant_id):
+            return local_storage.get_monthly_aggregates(tenant_id, year, month, months)
+
+        try:
+            periods = month_range(year, month, months)
+            first_year, first_month = periods[0]
+            start_date = f"{first_year}-{first_month:02d}-01"
+            end_date = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+
+            # Uma consulta para todo o período, só com as colunas somadas
+            # (agregações do PostgREST dependem de configuração do projeto)
+            response = supabase.table(SavedAnalysisRepository.table_name)\
+                .select("analysis_date, compulab_total, simus_total")\
+                .eq("tenant_id", tenant_id)\
+                .gte("analysis_date", start_date)\
+                .lt("analysis_date", end_date)\
+                .execute()
+
+            if not response.data:
+                return local_storage.get_monthly_aggregates(tenant_id, year, month, months)
+
+            totals = {}
+            for a in response.data:
+                period = str(a.get('analysis_date') or '')[:7]
+                count, total_compulab, total_simus = totals.get(period, (0, 0.0, 0.0))
+                totals[period] = (count + 1,
+                                  total_compulab + (a.get('compulab_total', 0) or 0),
+                                  total_simus + (a.get('simus_total', 0) or 0))
+            return month_aggregates(periods, totals)
+        except Exception as e:
+            logger.error(f"Erro ao gerar resumo mensal: {e}")
+            return local_storage.get_monthly_aggregates(tenant_id, year, month, months)
@@ -0,0 +1,419 @@
+"""
+Conciliacao em lote de varios periodos
+LabBridge
+
+Processa uma lista de pares COMPULAB/SIMUS (manifesto JSON ou diretorio)
+num pool de processos: extracao, conciliacao e analise profunda de cada par
+rodam num processo de trabalho, com o snapshot de mapeamentos do processo
+principal; o principal grava cada resultado pelo SavedAnalysisService
+(Supabase ou SQLite local) assim que ele chega. O andamento fica num
+arquivo JSON, de modo que um lote interrompido continua de onde parou: pares
+ja concluidos com os mesmos arquivos e mapeamentos sao pulados. Ao final o
+relatorio traz o tempo de cada etapa por par e a vazao do lote (pares por
+minuto).
+
+Uso:
+    python -m labbridge.services.batch_service <manifesto.json | diretorio> [--workers N]
+
+Manifesto: lista de {"name", "compulab", "simus", "date" (opcional)}, com
+caminhos relativos ao manifesto. Diretorio: arquivos (.pdf, .xlsx, .xls,
+.csv) com "compulab" ou "simus" no nome sao pareados pelo restante do nome
+(ex.: 2024-01_compulab.pdf + 2024-01_simus.pdf) ou pela subpasta.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from .mapping_service import mapping_service
+
+logger = logging.getLogger(__name__)
+
+# Processos do lote (0 = CPUs disponiveis)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0") or 0)
+# Arquivo de andamento gravado no diretorio do lote
+BATCH_PROGRESS_FILE = ".labbridge_batch.json"
+BATCH_PROGRESS_VERSION = 1
+
+SUPPORTED_EXTENSIONS = (".pdf", ".xlsx", ".xls", ".csv")
+COMPULAB_MARKER = "compulab"
+SIMUS_MARKER = "simus"
+
+STATUS_DONE = "concluido"
+STATUS_FAILED = "erro"
+
+_PERIOD_PATTERN = re.compile(r"(?<!\d)(\d{4})[-_./]?(\d{2})(?:[-_./]?(\d{2}))?(?!\d)")
+
+
+@dataclass(frozen=True)
+class BatchPair:
+    """Par de arquivos de um periodo."""
+    name: str
+    compulab_path: str
+    simus_path: str
+    analysis_date: Optional[str] = None
+
+
+def load_manifest(path: str) -> List[BatchPair]:
+    """Pares de um manifesto JSON (lista ou {"pairs": [...]})."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("pairs", []) if isinstance(data, dict) else data
+    base_dir = os.path.dirname(os.path.abspath(path))
+    pairs = []
+    for position, entry in enumerate(entries, start=1):
+        compulab = entry.get("compulab")
+        simus = entry.get("simus")
+        if not compulab or not simus:
+            raise ValueError(f"Entrada {position} do manifesto sem 'compulab' ou 'simus'")
+        pairs.append(BatchPair(
+            name=str(entry.get("name") or f"par-{position}"),
+            compulab_path=os.path.join(base_dir, compulab),
+            simus_path=os.path.join(base_dir, simus),
+            analysis_date=entry.get("date"),
+        ))
+    names = [pair.name for pair in pairs]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"Nomes repetidos no manifesto: {', '.join(duplicated)}")
+    return pairs
+
+
+def discover_pairs(directory: str) -> List[BatchPair]:
+    """Pares encontrados em um diretorio (ver docstring do modulo), ordenados pelo nome."""
+    found: Dict[str, Dict[str, str]] = {}
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        relative_dir = os.path.relpath(root, directory).replace(os.sep, "/")
+        for file_name in sorted(files):
+            stem, extension = os.path.splitext(file_name)
+            if extension.lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            lowered = stem.lower()
+            sources = [source for source in (COMPULAB_MARKER, SIMUS_MARKER) if source in lowered]
+            if len(sources) != 1:
+                continue
+            period = lowered.replace(sources[0], "").strip("_-. ")
+            name = "/".join(part for part in (relative_dir if relative_dir != "." else "", period) if part)
+            slot = found.setdefault(name or os.path.basename(os.path.abspath(directory)), {})
+            if sources[0] in slot:
+                logger.warning(f"Lote: mais de um arquivo {sources[0]} para '{name}', usando {slot[sources[0]]}")
+                continue
+            slot[sources[0]] = os.path.join(root, file_name)
+
+    pairs = []
+    for name in sorted(found):
+        slot = found[name]
+        if COMPULAB_MARKER not in slot or SIMUS_MARKER not in slot:
+            logger.warning(f"Lote: '{name}' sem par COMPULAB/SIMUS, ignorado")
+            continue
+        pairs.append(BatchPair(name, slot[COMPULAB_MARKER], slot[SIMUS_MARKER]))
+    return pairs
+
+
+def period_date(pair: BatchPair) -> date:
+    """Data da analise: a do manifesto, a do periodo no nome (AAAA-MM[-DD]) ou hoje."""
+    if pair.analysis_date:
+        return date.fromisoformat(pair.analysis_date)
+    match = _PERIOD_PATTERN.search(pair.name)
+    if match:
+        year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3) or 1)
+        try:
+            return date(year, month, day)
+        except ValueError:
+            pass
+    return date.today()
+
+
+def resolve_batch_workers(workers: Optional[int], pairs: int) -> int:
+    """Processos do lote (argumento > BATCH_WORKERS > CPUs), no maximo um por par."""
+    if workers is None:
+        workers = BATCH_WORKERS
+    if workers <= 0:
+        try:
+            workers = len(os.sched_getaffinity(0))
+        except AttributeError:
+            workers = os.cpu_count() or 1
+    return max(1, min(workers, pairs))
+
+
+# ----- Processo de trabalho -----
+
+def _init_batch_worker(mappings: Dict[str, str]) -> None:
+    """Inicializa um processo de trabalho com o snapshot de mapeamentos do principal."""
+    mapping_service.load_snapshot(mappings)
+
+
+def _load_patients(path: str, source: str) -> Tuple[Dict[str, Any], Any]:
+    from ..utils import pdf_processor
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        if source == COMPULAB_MARKER:
+            patients, total = pdf_processor.extract_compulab_patients_cached(path)
+        else:
+            # Um processo por par: o parser SIMUS nao abre outro pool
+            patients, total, _, _ = pdf_processor.extract_simus_patients_cached(path, workers=1)
+    elif extension == ".csv":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            patients, total = pdf_processor.load_from_csv(f.read())
+    else:
+        patients, total = pdf_processor.load_from_excel(path)
+    if patients is None:
+        raise ValueError(f"Falha ao processar arquivo {source.upper()}: {path}")
+    return dict(patients), total
+
+
+def _reconcile_pair(pair: BatchPair) -> Dict[str, Any]:
+    """Extracao, conciliacao e analise profunda de um par (executa no processo de trabalho)."""
+    from .reconciliation_service import RESULT_KEYS, Reconciliation, reconcile_patients
+
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = round(now - started, 3)
+        started = now
+
+    try:
+        compulab_patients, compulab_total = _load_patients(pair.compulab_path, COMPULAB_MARKER)
+        lap("extracao_compulab")
+        simus_patients, simus_total = _load_patients(pair.simus_path, SIMUS_MARKER)
+        lap("extracao_simus")
+        reconciliation = Reconciliation(
+            "", compulab_patients, simus_patients, float(compulab_total or 0), float(simus_total or 0),
+            reconcile_patients(compulab_patients, simus_patients),
+        )
+        lap("conciliacao")
+        patient_analysis, repeated_analysis = reconciliation.deep_analysis()
+        lap("analise_profunda")
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "timings": timings}
+
+    return {
+        "compulab_total": reconciliation.compulab_total,
+        "simus_total": reconciliation.simus_total,
+        "results": {name: reconciliation.results[name] for name in RESULT_KEYS},
+        "deep": {
+            "extra_patients_count": patient_analysis.get("extra_patients_count", 0),
+            "extra_patients_value": patient_analysis.get("extra_patients_value", 0.0),
+            "repeated_exams_count": repeated_analysis.get("total_repeated_count", 0),
+            "repeated_exams_value": repeated_analysis.get("total_repeated_value", 0.0),
+        },
+        "timings": timings,
+    }
+
+
+# ----- Processo principal -----
+
+def _save_pair(pair: BatchPair, outcome: Dict[str, Any], tenant_id: str) -> str:
+    """Grava o resultado de um par como analise salva; retorna o id."""
+    from .saved_analysis_service import saved_analysis_service
+
+    results = outcome["results"]
+    deep = outcome["deep"]
+    compulab_file_name = os.path.basename(pair.compulab_path)
+    simus_file_name = os.path.basename(pair.simus_path)
+    saved = asyncio.run(saved_analysis_service.save_complete_analysis(
+        name=pair.name,
+        analysis_date=period_date(pair),
+        description=(
+            f"Conciliação em lote. Pacientes extras: {deep['extra_patients_count']} "
+            f"(R$ {deep['extra_patients_value']:,.2f}); exames repetidos: {deep['repeated_exams_count']} "
+            f"(R$ {deep['repeated_exams_value']:,.2f})."
+        ),
+        compulab_file_name=compulab_file_name,
+        simus_file_name=simus_file_name,
+        compulab_total=outcome["compulab_total"],
+        simus_total=outcome["simus_total"],
+        missing_patients_count=len(results["patients_only_compulab"]),
+        missing_patients_total=sum(r.total_value for r in results["patients_only_compulab"]),
+        missing_exams_count=len(results["exams_only_compulab"]),
+        missing_exams_total=sum(r.compulab_value for r in results["exams_only_compulab"]),
+        divergences_count=len(results["value_divergences"]),
+        divergences_total=sum(abs(r.difference) for r in results["value_divergences"]),
+        extra_simus_count=len(results["exams_only_simus"]),
+        missing_patients=results["patients_only_compulab"],
+        missing_exams=results["exams_only_compulab"],
+        value_divergences=results["value_divergences"],
+        extra_simus_exams=results["exams_only_simus"],
+        tags=["lote", f"compulab:{compulab_file_name}", f"simus:{simus_file_name}"],
+        tenant_id=tenant_id,
+    ))
+    if not saved.get("success"):
+        raise RuntimeError(saved.get("message", "Erro ao salvar análise"))
+    return str(saved["analysis_id"])
+
+
+def _load_progress(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            progress = json.load(f)
+        if progress.get("version") == BATCH_PROGRESS_VERSION:
+            return progress
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Lote: andamento ilegivel em {path} ({e}), recomecando")
+    return {"version": BATCH_PROGRESS_VERSION, "pairs": {}}
+
+
+def _write_progress(path: str, progress: Dict[str, Any]) -> None:
+    # Gravacao atomica: uma interrupcao nunca deixa o arquivo pela metade
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(progress, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def run_batch(pairs: List[BatchPair], progress_path: str, workers: Optional[int] = None,
+              tenant_id: str = "", save: bool = True) -> Dict[str, Any]:
+    """
+    Concilia os pares num pool de processos e retorna o relatorio do lote.
+
+    Pares ja concluidos (mesmos arquivos e mesmos mapeamentos, segundo o
+    arquivo de andamento) sao pulados; pares com erro sao refeitos. Um par
+    com arquivo ausente ou ilegivel e registrado com erro sem interromper
+    os demais.
+    """
+    from ..utils.extraction_cache import file_digest
+
+    progress = _load_progress(progress_path)
+    fingerprint = mapping_service.get_fingerprint()
+    pending: List[Tuple[BatchPair, List[str]]] = []
+    skipped: List[str] = []
+    unreadable = 0
+    for pair in pairs:
+        try:
+            digests = [file_digest(pair.compulab_path), file_digest(pair.simus_path)]
+        except OSError as e:
+            progress["pairs"][pair.name] = {"status": STATUS_FAILED, "digests": [], "error": str(e), "timings": {}}
+            unreadable += 1
+            logger.error(f"Lote: {pair.name} falhou: {e}")
+            continue
+        entry = progress["pairs"].get(pair.name) or {}
+        if entry.get("status") == STATUS_DONE and entry.get("digests") == digests and entry.get("mappings") == fingerprint:
+            skipped.append(pair.name)
+            continue
+        pending.append((pair, digests))
+    if skipped:
+        logger.info(f"Lote: {len(skipped)} par(es) ja concluido(s), pulando")
+    if unreadable:
+        _write_progress(progress_path, progress)
+
+    completed = failed = 0
+    started = time.perf_counter()
+    if pending:
+        workers = resolve_batch_workers(workers, len(pending))
+        logger.info(f"Lote: {len(pending)} par(es) em {workers} processo(s)")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_batch_worker,
+            initargs=(dict(mapping_service.get_all_synonyms()),),
+        ) as pool:
+            futures = {pool.submit(_reconcile_pair, pair): (pair, digests) for pair, digests in pending}
+            for future in as_completed(futures):
+                pair, digests = futures[future]
+                save_started = time.perf_counter()
+                outcome: Dict[str, Any] = {}
+                try:
+                    outcome = future.result()
+                    if "error" in outcome:
+                        raise RuntimeError(outcome["error"])
+                    analysis_id = _save_pair(pair, outcome, tenant_id) if save else ""
+                    timings = dict(outcome["timings"], gravacao=round(time.perf_counter() - save_started, 3))
+                    entry = {
+                        "status": STATUS_DONE,
+                        "digests": digests,
+                        "mappings": fingerprint,
+                        "analysis_id": analysis_id,
+                        "seconds": round(sum(timings.values()), 3),
+                        "timings": timings,
+                        "compulab_total": outcome["compulab_total"],
+                        "simus_total": outcome["simus_total"],
+                        "counts": {name: len(items) for name, items in outcome["results"].items()},
+                        "deep": outcome["deep"],
+                    }
+                    completed += 1
+                    logger.info(f"Lote: {pair.name} concluido em {entry['seconds']:.2f}s "
+                                f"({completed + failed}/{len(pending)})")
+                except Exception as e:
+                    entry = {"status": STATUS_FAILED, "digests": digests, "error": str(e),
+                             "timings": outcome.get("timings", {})}
+                    failed += 1
+                    logger.error(f"Lote: {pair.name} falhou: {e} ({completed + failed}/{len(pending)})")
+                progress["pairs"][pair.name] = entry
+                _write_progress(progress_path, progress)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "pairs": {pair.name: progress["pairs"].get(pair.name) for pair in pairs},
+        "summary": {
+            "pairs": len(pairs),
+            "completed": completed,
+            "failed": failed + unreadable,
+            "skipped": len(skipped),
+            "wall_seconds": round(elapsed, 3),
+            "pairs_per_minute": round(completed / elapsed * 60, 2) if completed and elapsed > 0 else 0.0,
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m labbridge.services.batch_service",
+                                     description="Conciliacao em lote de pares COMPULAB/SIMUS")
+    parser.add_argument("source", help="Manifesto JSON ou diretorio com os arquivos")
+    parser.add_argument("--workers", type=int, default=None, help="Processos (padrao: BATCH_WORKERS/CPUs)")
+    parser.add_argument("--tenant", default="", help="Tenant das analises salvas (padrao: armazenamento local)")
+    parser.add_argument("--progress", default="", help="Arquivo de andamento (padrao: junto ao manifesto/diretorio)")
+    parser.add_argument("--no-save", action="store_true", help="Nao grava as analises (apenas mede)")
+    parser.add_argument("--output", "-o", default="", help="Relatorio JSON do lote (padrao: stdout)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    if os.path.isdir(args.source):
+        pairs = discover_pairs(args.source)
+        progress_path = args.progress or os.path.join(args.source, BATCH_PROGRESS_FILE)
+    else:
+        pairs = load_manifest(args.source)
+        progress_path = args.progress or f"{args.source}.progress.json"
+    if not pairs:
+        logger.error("Nenhum par COMPULAB/SIMUS encontrado.")
+        return 1
+
+    asyncio.run(mapping_service.load_mappings())
+    report = run_batch(pairs, progress_path, workers=args.workers, tenant_id=args.tenant, save=not args.no_save)
+    summary = report["summary"]
+    logger.info(
+        f"Lote: {summary['completed']} concluido(s), {summary['failed']} com erro, {summary['skipped']} pulado(s) "
+        f"em {summary['wall_seconds']:.1f}s ({summary['pairs_per_minute']:.2f} pares/min)"
+    )
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+        logger.info(f"Relatorio gravado em {args.output}")
+    else:
+        print(payload)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
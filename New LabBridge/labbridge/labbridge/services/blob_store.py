@@ -0,0 +1,181 @@
+"""
+Armazenamento Local de Arquivos Temporarios
+LabBridge
+
+PDFs de relatorio, planilhas e CSVs exportados ficavam no estado do Reflex
+(bytes ou base64) ou eram enviados pelo websocket como data: URL. Aqui eles
+sao gravados num diretorio temporario e identificados por um token
+aleatorio; o estado guarda apenas o token/URL e o navegador baixa o arquivo
+pela rota GET /api/blobs/{token}/{nome} (api_blobs.py), com suporte a Range.
+
+Cada arquivo expira apos BLOB_TTL_MINUTES sem acesso e o diretorio e
+limitado por tamanho (BLOB_STORE_MAX_MB), com remocao LRU pela data de
+ultimo acesso, como no cache de extracao.
+"""
+import json
+import logging
+import mimetypes
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from typing import List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "") or os.path.join(tempfile.gettempdir(), "labbridge_blobs")
+BLOB_TTL_MINUTES = max(1, int(os.getenv("BLOB_TTL_MINUTES", "60") or 60))
+BLOB_STORE_MAX_MB = max(1, int(os.getenv("BLOB_STORE_MAX_MB", "512") or 512))
+# Prefixo das rotas de download (api_blobs.py)
+BLOB_URL_PREFIX = "/api/blobs"
+
+_DATA_SUFFIX = ".bin"
+_META_SUFFIX = ".json"
+_TOKEN_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class Blob(NamedTuple):
+    """Arquivo armazenado: caminho local e metadados do download."""
+    token: str
+    path: str
+    filename: str
+    content_type: str
+    size: int
+
+
+def _backend_url() -> str:
+    # Frontend e backend podem estar em origens diferentes: a URL aponta para o backend
+    try:
+        from reflex.config import get_config
+
+        return (get_config().api_url or "").rstrip("/")
+    except Exception:
+        return ""
+
+
+class BlobStore:
+    """Arquivos temporarios por token, com TTL e limite de tamanho."""
+
+    def __init__(self, directory: str = BLOB_STORE_DIR, ttl_minutes: int = BLOB_TTL_MINUTES,
+                 max_mb: int = BLOB_STORE_MAX_MB):
+        self.directory = directory
+        self.ttl_seconds = ttl_minutes * 60
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+
+    def _paths(self, token: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, token)
+        return base + _DATA_SUFFIX, base + _META_SUFFIX
+
+    def put(self, data: bytes, filename: str, content_type: Optional[str] = None) -> str:
+        """Grava `data` e retorna o token do arquivo."""
+        os.makedirs(self.directory, exist_ok=True)
+        token = secrets.token_urlsafe(24)
+        data_path, meta_path = self._paths(token)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            with open(meta_path, "w", encoding="utf-8") as handle:
+                json.dump({"filename": filename, "content_type": content_type}, handle)
+            # O arquivo de dados e o ultimo a aparecer: get() so o encontra completo
+            os.replace(tmp_path, data_path)
+        except Exception:
+            self._remove(tmp_path)
+            self._remove(meta_path)
+            raise
+        self._evict()
+        return token
+
+    def get(self, token: str) -> Optional[Blob]:
+        """Arquivo do token, ou None se nao existir ou tiver expirado."""
+        if not token or not _TOKEN_RE.match(token):
+            return None
+        data_path, meta_path = self._paths(token)
+        try:
+            stat = os.stat(data_path)
+            if time.time() - stat.st_mtime > self.ttl_seconds:
+                self.delete(token)
+                return None
+            with open(meta_path, encoding="utf-8") as handle:
+                meta = json.load(handle)
+            os.utime(data_path)  # marca como usado recentemente (TTL e LRU)
+        except (OSError, ValueError):
+            return None
+        return Blob(token, data_path, meta.get("filename") or token,
+                    meta.get("content_type") or "application/octet-stream", stat.st_size)
+
+    def read(self, token: str) -> Optional[bytes]:
+        """Conteudo do arquivo do token (None se nao existir)."""
+        blob = self.get(token)
+        if blob is None:
+            return None
+        try:
+            with open(blob.path, "rb") as handle:
+                return handle.read()
+        except OSError:
+            return None
+
+    def delete(self, token: str) -> None:
+        if token and _TOKEN_RE.match(token):
+            for path in self._paths(token):
+                self._remove(path)
+
+    def url(self, token: str, filename: str = "", inline: bool = False) -> str:
+        """
+        URL absoluta de download do token (o nome no final e so para o
+        navegador). `inline` exibe o arquivo em vez de baixa-lo (preview).
+        """
+        url = f"{_backend_url()}{BLOB_URL_PREFIX}/{token}"
+        if filename:
+            url = f"{url}/{quote(filename)}"
+        return f"{url}?download=false" if inline else url
+
+    def clear(self) -> None:
+        """Remove todos os arquivos."""
+        for token, _, _ in self._entries():
+            self.delete(token)
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(_DATA_SUFFIX):
+                        stat = entry.stat()
+                        entries.append((entry.name[:-len(_DATA_SUFFIX)], stat.st_mtime, stat.st_size))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self) -> None:
+        with self._lock:
+            cutoff = time.time() - self.ttl_seconds
+            total = 0
+            alive = []
+            for token, mtime, size in self._entries():
+                if mtime < cutoff:
+                    self.delete(token)
+                else:
+                    alive.append((token, mtime, size))
+                    total += size
+            for token, _, size in sorted(alive, key=lambda item: item[1]):
+                if total <= self.max_bytes:
+                    break
+                self.delete(token)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# Singleton para uso simplificado
+blob_store = BlobStore()
@@ -0,0 +1,130 @@
+"""
+Metricas do Dashboard
+LabBridge
+
+Resumos mensais das analises salvas (contagem e totais) e a meta mensal do
+usuario, lidos uma vez e compartilhados por todas as sessoes do processo,
+por tenant. A serie de meses vem de uma unica consulta agrupada
+(SavedAnalysisRepository.get_monthly_aggregates).
+
+As entradas de um tenant sao invalidadas quando uma analise e criada ou
+removida (LocalStorage.create_analysis/delete_analysis,
+SavedAnalysisRepository.create/delete) ou quando as configuracoes sao
+salvas; o TTL cobre gravacoes feitas por outros processos (Supabase). Os
+valores retornados sao compartilhados e nao devem ser alterados.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+DASHBOARD_METRICS_TTL_SECONDS = max(1, int(os.getenv("DASHBOARD_METRICS_TTL_SECONDS", "300") or 300))
+# Meses exibidos no grafico de analises do dashboard
+DASHBOARD_CHART_MONTHS = 6
+DEFAULT_MONTHLY_GOAL = 150000.0
+MONTH_NAMES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+# Entradas mantidas em memoria (todos os tenants do processo)
+_MAX_ENTRIES = 256
+
+
+def month_range(year: int, month: int, months: int) -> List[Tuple[int, int]]:
+    """(ano, mes) dos `months` meses terminados em year/month, do mais antigo ao mais recente."""
+    last = year * 12 + month - 1
+    return [(index // 12, index % 12 + 1) for index in range(last - max(1, months) + 1, last + 1)]
+
+
+def month_aggregates(periods: List[Tuple[int, int]],
+                     totals: Dict[str, Tuple[int, float, float]]) -> List[Dict[str, Any]]:
+    """Resumo de cada periodo a partir de {"AAAA-MM": (contagem, total COMPULAB, total SIMUS)}."""
+    aggregates = []
+    for year, month in periods:
+        count, total_compulab, total_simus = totals.get(f"{year}-{month:02d}", (0, 0.0, 0.0))
+        aggregates.append({
+            "year": year,
+            "month": month,
+            "count": count,
+            "total_compulab": total_compulab,
+            "total_simus": total_simus,
+            "total_difference": total_compulab - total_simus,
+        })
+    return aggregates
+
+
+class DashboardMetrics:
+    """Cache das metricas do dashboard, por tenant."""
+
+    _entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+    # Invalidacoes por tenant e gerais: leituras iniciadas antes de uma invalidacao nao sao guardadas
+    _generations: Dict[str, int] = {}
+    _generation = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def _version(cls, tenant_id: str) -> Tuple[int, int]:
+        return cls._generation, cls._generations.get(tenant_id, 0)
+
+    @classmethod
+    def _cached(cls, tenant_id: str, key: Hashable, load: Callable[[], Any]) -> Any:
+        entry_key = (tenant_id, key)
+        with cls._lock:
+            entry = cls._entries.get(entry_key)
+            if entry is not None and entry[0] > time.monotonic():
+                cls._entries.move_to_end(entry_key)
+                return entry[1]
+            version = cls._version(tenant_id)
+        value = load()
+        with cls._lock:
+            if cls._version(tenant_id) == version:
+                cls._entries[entry_key] = (time.monotonic() + DASHBOARD_METRICS_TTL_SECONDS, value)
+                cls._entries.move_to_end(entry_key)
+                while len(cls._entries) > _MAX_ENTRIES:
+                    cls._entries.popitem(last=False)
+        return value
+
+    @classmethod
+    def monthly(cls, tenant_id: str, months: int = DASHBOARD_CHART_MONTHS,
+                today: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Resumo dos `months` meses ate o atual (o ultimo item e o mes corrente)."""
+        today = today or datetime.now()
+
+        def load() -> List[Dict[str, Any]]:
+            from ..repositories.saved_analysis_repository import SavedAnalysisRepository
+
+            return SavedAnalysisRepository.get_monthly_aggregates(tenant_id, today.year, today.month, months)
+
+        return cls._cached(tenant_id, ("monthly", today.year, today.month, months), load)
+
+    @classmethod
+    def monthly_goal(cls, tenant_id: str, user_id: str) -> float:
+        """Meta mensal das configuracoes do usuario (DEFAULT_MONTHLY_GOAL se ausente)."""
+        def load() -> float:
+            from .local_storage import local_storage
+
+            settings = local_storage.get_user_settings(tenant_id, user_id)
+            if settings:
+                try:
+                    goal_str = settings.get("monthly_goal", "150000")
+                    return float(goal_str) if goal_str else DEFAULT_MONTHLY_GOAL
+                except (ValueError, TypeError):
+                    pass
+            return DEFAULT_MONTHLY_GOAL
+
+        return cls._cached(tenant_id, ("monthly_goal", user_id), load)
+
+    @classmethod
+    def invalidate(cls, tenant_id: Optional[str] = None) -> None:
+        """Descarta as metricas do tenant (de todos, se None)."""
+        with cls._lock:
+            if tenant_id is None:
+                cls._generation += 1
+                cls._entries.clear()
+                return
+            cls._generations[tenant_id] = cls._generations.get(tenant_id, 0) + 1
+            for key in [key for key in cls._entries if key[0] == tenant_id]:
+                del cls._entries[key]
+
+
+# Singleton para uso simplificado
+dashboard_metrics = DashboardMetrics()
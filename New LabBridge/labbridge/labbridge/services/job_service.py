@@ -0,0 +1,417 @@
+"""
+Servico de Tarefas em Segundo Plano
+LabBridge
+
+Fila unica, por processo, para o trabalho pesado disparado pelos estados
+(conversao de PDFs, comparacao, relatorios). Ha duas faixas com capacidade
+limitada: 'cpu' (pool de processos) e 'io' (pool de threads). As tarefas
+recebem um ID, uma prioridade e um JobContext cujo `progress` e usado como
+callback de progresso pelos parsers; o mesmo callback verifica o pedido de
+cancelamento e interrompe a tarefa. Quando a capacidade esta ocupada as
+tarefas aguardam na fila em vez de disputar a CPU.
+"""
+import asyncio
+import ctypes
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .mapping_service import mapping_service
+
+logger = logging.getLogger(__name__)
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Tarefas pesadas simultaneas (pool de processos) e tarefas de I/O (threads)
+JOB_CPU_WORKERS = max(1, int(os.getenv("JOB_CPU_WORKERS", "0") or 0) or min(2, _available_cpus()))
+JOB_IO_WORKERS = max(1, int(os.getenv("JOB_IO_WORKERS", "4") or 4))
+# Tarefas concluidas mantidas para consulta
+JOB_HISTORY_SIZE = 200
+# Intervalo minimo entre atualizacoes de progresso enviadas pelos processos
+PROGRESS_THROTTLE_SECONDS = 0.1
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+LANE_CPU = "cpu"
+LANE_IO = "io"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+
+class JobCancelled(BaseException):
+    """
+    Tarefa cancelada. Deriva de BaseException (como asyncio.CancelledError)
+    para atravessar os `except Exception` dos parsers.
+    """
+
+
+class JobContext:
+    """Progresso e cancelamento de uma tarefa, repassado a funcao executada."""
+
+    def __init__(self, job_id: str, cancelled: Callable[[], bool], publish: Callable[[str, int, str], None],
+                 throttle: float = 0.0):
+        self.job_id = job_id
+        self._cancelled = cancelled
+        self._publish = publish
+        self._throttle = throttle
+        self._last_publish = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled()
+
+    def check(self) -> None:
+        """Interrompe a tarefa se o cancelamento foi solicitado."""
+        if self._cancelled():
+            raise JobCancelled(self.job_id)
+
+    def progress(self, percentage: int, stage: str = "") -> None:
+        """Callback de progresso (percentual, etapa); tambem verifica o cancelamento."""
+        self.check()
+        now = time.monotonic()
+        if self._throttle and percentage < 100 and now - self._last_publish < self._throttle:
+            return
+        self._last_publish = now
+        self._publish(self.job_id, int(percentage), stage)
+
+
+class Job:
+    """Estado de uma tarefa enfileirada."""
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, name: str, lane: str, priority: int,
+                 owner: Optional[str]):
+        self.id = uuid.uuid4().hex[:12]
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name
+        self.lane = lane
+        self.priority = priority
+        self.owner = owner
+        self.status = STATUS_QUEUED
+        self.progress = 0
+        self.stage = ""
+        self.error = ""
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.completion: Future = Future()
+        # Em execucao desde a criacao: cancelar quem aguarda nao cancela a tarefa
+        self.completion.set_running_or_notify_cancel()
+        self.cancel_event = threading.Event()
+        self.slot: Optional[int] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "lane": self.lane,
+            "priority": self.priority,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "error": self.error,
+        }
+
+
+# ----- Lado do processo de trabalho (faixa 'cpu') -----
+
+_worker_progress_queue = None
+_worker_cancel_flags = None
+_worker_mapping_fingerprint = None
+
+
+def _init_job_process(progress_queue, cancel_flags):
+    global _worker_progress_queue, _worker_cancel_flags
+    _worker_progress_queue = progress_queue
+    _worker_cancel_flags = cancel_flags
+
+
+def _publish_from_process(job_id: str, percentage: int, stage: str) -> None:
+    _worker_progress_queue.put((job_id, percentage, stage))
+
+
+def _run_in_process(fn, args, kwargs, job_id, slot, mappings_fingerprint, mappings):
+    """Executa `fn(ctx, *args, **kwargs)` num processo do pool."""
+    global _worker_mapping_fingerprint
+    if mappings is not None and mappings_fingerprint != _worker_mapping_fingerprint:
+        mapping_service.load_snapshot(mappings)
+        _worker_mapping_fingerprint = mappings_fingerprint
+    ctx = JobContext(job_id, lambda: bool(_worker_cancel_flags[slot]), _publish_from_process,
+                     throttle=PROGRESS_THROTTLE_SECONDS)
+    return fn(ctx, *args, **kwargs)
+
+
+# ----- Lado do servidor -----
+
+class JobService:
+    """
+    Fila de tarefas com prioridade e capacidade limitada por faixa.
+
+    A funcao submetida recebe um JobContext como primeiro argumento. Na faixa
+    'cpu' ela roda num processo (deve ser uma funcao de modulo, com
+    argumentos serializaveis) e recebe o snapshot atual de mapeamentos.
+    """
+
+    def __init__(self, cpu_workers: int = JOB_CPU_WORKERS, io_workers: int = JOB_IO_WORKERS):
+        self._limits = {LANE_CPU: cpu_workers, LANE_IO: io_workers}
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, Job] = {}
+        self._queues: Dict[str, List[Tuple[int, int, str]]] = {LANE_CPU: [], LANE_IO: []}
+        self._running: Dict[str, int] = {LANE_CPU: 0, LANE_IO: 0}
+        self._sequence = itertools.count()
+        self._free_slots = list(range(cpu_workers))
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._progress_queue = None
+        self._cancel_flags = None
+        self._relay_thread: Optional[threading.Thread] = None
+
+    @property
+    def cpu_workers(self) -> int:
+        return self._limits[LANE_CPU]
+
+    def parser_workers(self) -> int:
+        """Processos que cada tarefa 'cpu' pode usar no parser sem exceder as CPUs."""
+        return max(1, _available_cpus() // self.cpu_workers)
+
+    # ----- Submissao e consulta -----
+
+    def submit(self, fn: Callable, *args, name: str = "", lane: str = LANE_CPU,
+               priority: int = PRIORITY_NORMAL, owner: Optional[str] = None, **kwargs) -> str:
+        """Enfileira `fn(ctx, *args, **kwargs)` e retorna o ID da tarefa."""
+        if lane not in self._limits:
+            raise ValueError(f"Faixa de tarefa invalida: {lane}")
+        job = Job(fn, args, kwargs, name or getattr(fn, "__name__", "tarefa"), lane, priority, owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            heapq.heappush(self._queues[lane], (priority, next(self._sequence), job.id))
+            self._prune()
+            self._dispatch(lane)
+        logger.debug(f"Tarefa {job.id} ({job.name}) enfileirada na faixa {lane}")
+        return job.id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    def queue_position(self, job_id: str) -> int:
+        """Posicao na fila da faixa (0 = em execucao ou concluida)."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != STATUS_QUEUED:
+            return 0
+        with self._lock:
+            ordered = sorted(self._queues[job.lane])
+            for position, (_, _, queued_id) in enumerate(ordered, start=1):
+                if queued_id == job_id:
+                    return position
+        return 0
+
+    async def result(self, job_id: str) -> Any:
+        """Aguarda a tarefa e retorna seu resultado (ou propaga o erro/JobCancelled)."""
+        return await asyncio.wrap_future(self._jobs[job_id].completion)
+
+    async def watch(self, job_id: str, interval: float = 0.2) -> AsyncIterator[Job]:
+        """Gera a tarefa sempre que o progresso muda, ate ela terminar."""
+        job = self._jobs[job_id]
+        done = asyncio.wrap_future(job.completion)
+        last = None
+        try:
+            while True:
+                snapshot = (job.status, job.progress, job.stage)
+                if snapshot != last:
+                    last = snapshot
+                    yield job
+                if job.finished:
+                    return
+                await asyncio.wait({done}, timeout=interval)
+        finally:
+            if not done.done():
+                done.cancel()
+
+    # ----- Cancelamento -----
+
+    def cancel(self, job_id: str) -> bool:
+        """Solicita o cancelamento; tarefas na fila sao descartadas imediatamente."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            if job.status == STATUS_QUEUED:
+                queue_ = self._queues[job.lane]
+                queue_[:] = [item for item in queue_ if item[2] != job_id]
+                heapq.heapify(queue_)
+                self._complete(job, STATUS_CANCELLED, exception=JobCancelled(job_id))
+            elif job.slot is not None and self._cancel_flags is not None:
+                self._cancel_flags[job.slot] = True
+        logger.debug(f"Cancelamento solicitado para tarefa {job_id}")
+        return True
+
+    def cancel_owner(self, owner: str) -> int:
+        """Cancela todas as tarefas pendentes de um dono (ex.: sessao do navegador)."""
+        with self._lock:
+            job_ids = [job.id for job in self._jobs.values() if job.owner == owner and not job.finished]
+        return sum(1 for job_id in job_ids if self.cancel(job_id))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for job_id in [job.id for job in self._jobs.values() if not job.finished]:
+                self.cancel(job_id)
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=False, cancel_futures=True)
+                self._thread_pool = None
+            if self._progress_queue is not None:
+                self._progress_queue.put(None)
+
+    # ----- Execucao -----
+
+    def _dispatch(self, lane: str) -> None:
+        queue_ = self._queues[lane]
+        while queue_ and self._running[lane] < self._limits[lane]:
+            _, _, job_id = heapq.heappop(queue_)
+            job = self._jobs.get(job_id)
+            if job is None or job.status != STATUS_QUEUED:
+                continue
+            job.status = STATUS_RUNNING
+            job.started_at = time.time()
+            self._running[lane] += 1
+            try:
+                future = self._start(job)
+            except Exception as e:
+                self._running[lane] -= 1
+                self._release_slot(job)
+                self._complete(job, STATUS_FAILED, exception=e)
+                continue
+            future.add_done_callback(lambda f, job=job: self._on_done(job, f))
+
+    def _start(self, job: Job) -> Future:
+        if job.lane == LANE_IO:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(max_workers=self._limits[LANE_IO],
+                                                       thread_name_prefix="labbridge-job")
+            ctx = JobContext(job.id, job.cancel_event.is_set, self._publish)
+            return self._thread_pool.submit(job.fn, ctx, *job.args, **job.kwargs)
+
+        pool = self._ensure_process_pool()
+        job.slot = self._free_slots.pop()
+        self._cancel_flags[job.slot] = False
+        mappings = mapping_service.get_all_synonyms()
+        return pool.submit(_run_in_process, job.fn, job.args, job.kwargs, job.id, job.slot,
+                           mapping_service.get_fingerprint(), dict(mappings))
+
+    def _ensure_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            if self._progress_queue is None:
+                self._progress_queue = multiprocessing.Queue()
+                self._cancel_flags = multiprocessing.Array(ctypes.c_bool, self._limits[LANE_CPU], lock=False)
+                self._relay_thread = threading.Thread(target=self._relay_progress, name="labbridge-job-progress",
+                                                      daemon=True)
+                self._relay_thread.start()
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self._limits[LANE_CPU],
+                initializer=_init_job_process,
+                initargs=(self._progress_queue, self._cancel_flags),
+            )
+        return self._process_pool
+
+    def _relay_progress(self) -> None:
+        while True:
+            try:
+                message = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            self._publish(*message)
+
+    def _publish(self, job_id: str, percentage: int, stage: str) -> None:
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return
+        job.progress = percentage
+        if stage:
+            job.stage = stage
+
+    def _on_done(self, job: Job, future: Future) -> None:
+        with self._lock:
+            self._running[job.lane] -= 1
+            self._release_slot(job)
+            try:
+                result = future.result()
+            except JobCancelled as e:
+                self._complete(job, STATUS_CANCELLED, exception=e)
+            except BrokenProcessPool as e:
+                logger.error(f"Pool de processos interrompido na tarefa {job.id}: {e}")
+                self._process_pool = None
+                self._complete(job, STATUS_FAILED, exception=e)
+            except BaseException as e:
+                if job.cancel_event.is_set():
+                    self._complete(job, STATUS_CANCELLED, exception=JobCancelled(job.id))
+                else:
+                    logger.error(f"Tarefa {job.id} ({job.name}) falhou: {e}")
+                    self._complete(job, STATUS_FAILED, exception=e)
+            else:
+                self._complete(job, STATUS_DONE, result=result)
+            self._dispatch(job.lane)
+
+    def _release_slot(self, job: Job) -> None:
+        if job.slot is not None:
+            self._free_slots.append(job.slot)
+            job.slot = None
+
+    def _complete(self, job: Job, status: str, result: Any = None, exception: Optional[BaseException] = None) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        job.fn = None
+        job.args = ()
+        job.kwargs = {}
+        if status == STATUS_DONE:
+            job.progress = 100
+            job.completion.set_result(result)
+        else:
+            job.error = str(exception) if status == STATUS_FAILED else "Cancelado"
+            job.completion.set_exception(exception)
+        if job.started_at:
+            logger.debug(f"Tarefa {job.id} ({job.name}) {status} em {job.finished_at - job.started_at:.2f}s")
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - JOB_HISTORY_SIZE
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.finished_at or 0)[:excess]:
+                self._jobs.pop(job.id, None)
+
+
+# Singleton para uso simplificado
+job_service = JobService()
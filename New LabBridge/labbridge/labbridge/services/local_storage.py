@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 import secrets
 
+from .dashboard_metrics import dashboard_metrics, month_aggregates, month_range
+
 logger = logging.getLogger(__name__)
 
 
@@ -240,6 +242,12 @@ class LocalStorage:
             )
         """)
 
+        # Resumos mensais do dashboard (get_monthly_aggregates) filtram por tenant e período
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_saved_analyses_tenant_date
+            ON saved_analyses (tenant_id, analysis_date)
+        """)
+
         self._conn.commit()
 
     def _seed_initial_data(self):
@@ -807,7 +815,6 @@ class LocalStorage:
     def create_analysis(self, data: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]], str]:
         """Cria nova análise salva"""
         try:
-            analysis_id = str(int(datetime.utcnow().timestamp() * 1000))
             now = datetime.utcnow().isoformat()
 
             # Calcular diferença
@@ -816,6 +823,11 @@ class LocalStorage:
             difference = compulab_total - simus_total
 
             cursor = self._conn.cursor()
+            # ID em milissegundos; análises salvas em sequência (lote) não colidem
+            analysis_number = int(datetime.utcnow().timestamp() * 1000)
+            while cursor.execute("SELECT 1 FROM saved_analyses WHERE id = ?", (str(analysis_number),)).fetchone():
+                analysis_number += 1
+            analysis_id = str(analysis_number)
             cursor.execute("""
                 INSERT INTO saved_analyses (
                     id, tenant_id, analysis_name, analysis_date, description,
@@ -852,6 +864,7 @@ class LocalStorage:
                 now
             ))
             self._conn.commit()
+            dashboard_metrics.invalidate(data.get("tenant_id", "local"))
 
             return True, {"id": analysis_id, **data}, ""
         except Exception as e:
@@ -933,10 +946,13 @@ class LocalStorage:
         """Remove análise e seus itens"""
         try:
             cursor = self._conn.cursor()
+            row = cursor.execute("SELECT tenant_id FROM saved_analyses WHERE id = ?", (analysis_id,)).fetchone()
             # Items são deletados automaticamente via CASCADE (se SQLite suportar)
             cursor.execute("DELETE FROM analysis_items WHERE analysis_id = ?", (analysis_id,))
             cursor.execute("DELETE FROM saved_analyses WHERE id = ?", (analysis_id,))
             self._conn.commit()
+            if row:
+                dashboard_metrics.invalidate(row["tenant_id"])
             return True, ""
         except Exception as e:
             return False, f"Erro ao remover análise: {str(e)}"
@@ -990,6 +1006,32 @@ class LocalStorage:
             "total_difference": total_compulab - total_simus
         }
 
+    def get_monthly_aggregates(self, tenant_id: str, year: int, month: int, months: int = 6) -> List[Dict[str, Any]]:
+        """
+        Contagem e totais por mês dos `months` meses terminados em year/month
+        (do mais antigo ao mais recente, meses sem análises com zero), numa
+        única consulta agrupada.
+        """
+        periods = month_range(year, month, months)
+        first_year, first_month = periods[0]
+        start_date = f"{first_year}-{first_month:02d}-01"
+        end_date = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+
+        cursor = self._conn.cursor()
+        cursor.execute("""
+            SELECT substr(analysis_date, 1, 7) AS period,
+                   COUNT(*) AS count,
+                   COALESCE(SUM(compulab_total), 0) AS total_compulab,
+                   COALESCE(SUM(simus_total), 0) AS total_simus
+            FROM saved_analyses
+            WHERE tenant_id = ? AND analysis_date >= ? AND analysis_date < ?
+            GROUP BY period
+        """, (tenant_id, start_date, end_date))
+
+        totals = {row["period"]: (row["count"], row["total_compulab"], row["total_simus"])
+                  for row in cursor.fetchall()}
+        return month_aggregates(periods, totals)
+
     # =========================================================================
     # USER SETTINGS CRUD
     # =========================================================================
@@ -1099,6 +1141,7 @@ class LocalStorage:
                 ))
 
             self._conn.commit()
+            dashboard_metrics.invalidate(tenant_id)
             return True, ""
         except Exception as e:
             return False, f"Erro ao salvar configurações: {str(e)}"
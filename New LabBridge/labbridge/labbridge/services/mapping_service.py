@@ -2,20 +2,98 @@
 Servico de Mapeamento de Exames
 LabBridge
 """
+import hashlib
 import json
 import logging
 import os
-from typing import Dict
+from typing import Dict, List, Optional
 from .supabase_client import supabase
 
 logger = logging.getLogger(__name__)
 
+# Limite de entradas memorizadas por snapshot do resolvedor
+RESOLVER_MEMO_SIZE = 65536
+
+
+class SynonymResolver:
+    """
+    Snapshot indexado dos mapeamentos para resolucao rapida de sinonimos.
+
+    Reproduz a busca de map_simus_to_compulab_exam_name (exato, normalizado
+    e heuristica de sobreposicao de palavras) sem normalizar todas as chaves
+    a cada linha: as chaves normalizadas ficam num dicionario e a heuristica
+    parcial consulta um indice invertido de tokens. Cada entrada distinta e
+    memorizada enquanto o snapshot for valido.
+    """
+
+    def __init__(self, mappings: Dict[str, str], version: int = 0):
+        # Import tardio: utils importa este modulo durante a inicializacao
+        from ..utils.normalize import normalize_parsed_exam_name
+
+        self.version = version
+        self.fingerprint = hashlib.sha256(
+            json.dumps(list(mappings.items()), ensure_ascii=True).encode("utf-8")
+        ).hexdigest()[:16]
+        self._normalize = normalize_parsed_exam_name
+        self._exact = dict(mappings)
+        self._by_normalized: Dict[str, str] = {}
+        self._entries: List[tuple] = []
+        self._token_index: Dict[str, List[int]] = {}
+        self._memo: Dict[str, str] = {}
+
+        for original, canonical in mappings.items():
+            normalized_key = normalize_parsed_exam_name(original) if original else ""
+            self._by_normalized.setdefault(normalized_key, canonical)
+            position = len(self._entries)
+            self._entries.append((normalized_key, canonical))
+            for token in set(normalized_key.split()):
+                self._token_index.setdefault(token, []).append(position)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Retorna o nome canonico para `name` ou None se nao houver mapeamento."""
+        try:
+            return self._memo[name]
+        except KeyError:
+            pass
+        result = self._resolve(name)
+        if len(self._memo) >= RESOLVER_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[name] = result
+        return result
+
+    def _resolve(self, name: str) -> Optional[str]:
+        name_clean = name.strip().upper()
+
+        # 1. Mapeamento exato
+        canonical = self._exact.get(name_clean.upper().strip(), name_clean)
+        if canonical != name_clean:
+            return canonical
+
+        # 2. Mapeamento via normalizacao
+        normalized = self._normalize(name_clean) if name_clean else ""
+        if normalized in self._by_normalized:
+            return self._by_normalized[normalized]
+
+        # 3. Match parcial: candidatos precisam compartilhar >= 2 palavras
+        hits: Dict[int, int] = {}
+        for token in set(normalized.split()):
+            for position in self._token_index.get(token, ()):
+                hits[position] = hits.get(position, 0) + 1
+        for position in sorted(p for p, count in hits.items() if count >= 2):
+            normalized_key, canonical = self._entries[position]
+            if normalized_key in normalized or normalized in normalized_key:
+                return canonical
+
+        return None
+
 
 class MappingService:
     """Gerencia sinonimos e nomes canonicos de exames."""
 
     _cache: Dict[str, str] = {}
     _is_loaded: bool = False
+    _version: int = 0
+    _resolver: Optional[SynonymResolver] = None
 
     @classmethod
     def _local_file_path(cls) -> str:
@@ -92,6 +170,7 @@ class MappingService:
                 logger.debug("MappingService sem mapeamentos (local e remoto vazios).")
 
         cls._is_loaded = loaded
+        cls._invalidate_resolver()
 
     @classmethod
     async def get_canonical_name(cls, original_name: str) -> str:
@@ -127,15 +206,47 @@ class MappingService:
                     logger.error(f"Erro ao adicionar mapeamento: {e}")
 
         cls._cache[data["original_name"]] = data["canonical_name"]
+        cls._invalidate_resolver()
         cls._save_local_mappings(cls._cache)
         if not success:
             logger.debug("Mapeamento salvo localmente (fallback).")
 
+    @classmethod
+    def load_snapshot(cls, mappings: Dict[str, str]) -> None:
+        """Carrega um snapshot ja resolvido (ex.: processos de trabalho do parser)."""
+        cls._cache = dict(mappings or {})
+        cls._is_loaded = True
+        cls._invalidate_resolver()
+
     @classmethod
     def get_all_synonyms(cls) -> Dict[str, str]:
         """Retorna todos os sinonimos (para uso em prompts de IA)."""
         return cls._cache
 
+    @classmethod
+    def _invalidate_resolver(cls) -> None:
+        cls._version += 1
+        cls._resolver = None
+
+    @classmethod
+    def get_version(cls) -> int:
+        """Versao do snapshot de mapeamentos (muda a cada alteracao do cache)."""
+        return cls._version
+
+    @classmethod
+    def get_fingerprint(cls) -> str:
+        """Hash do conteudo dos mapeamentos (estavel entre processos e reinicios)."""
+        return cls.get_resolver().fingerprint
+
+    @classmethod
+    def get_resolver(cls) -> SynonymResolver:
+        """Retorna o resolvedor indexado do snapshot atual (reconstruido sob demanda)."""
+        resolver = cls._resolver
+        if resolver is None or resolver.version != cls._version:
+            resolver = SynonymResolver(cls._cache, cls._version)
+            cls._resolver = resolver
+        return resolver
+
 
 # Singleton para uso simplificado
 mapping_service = MappingService()
@@ -0,0 +1,698 @@
+"""
+Servico de Conciliacao COMPULAB x SIMUS
+LabBridge
+
+Resultado canonico da conciliacao entre os dois sistemas. E calculado uma
+unica vez por (COMPULAB, SIMUS, snapshot de mapeamentos) e guardado num
+cache LRU por tenant; o dashboard, a analise profunda, a auditoria de IA,
+o Detetive e o relatorio PDF consomem o mesmo objeto. As visoes derivadas
+(DataFrames, analise profunda, contexto da IA, PDF) sao memorizadas no
+proprio resultado e descartadas junto com ele.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from ..models import AnalysisResult
+from .mapping_service import mapping_service
+
+logger = logging.getLogger(__name__)
+
+# Conciliacoes mantidas em memoria (todas as sessoes/tenants do processo)
+RECONCILIATION_CACHE_SIZE = max(1, int(os.getenv("RECONCILIATION_CACHE_SIZE", "8") or 8))
+
+RESULT_KEYS = (
+    "patients_only_compulab",
+    "patients_only_simus",
+    "exams_only_compulab",
+    "value_divergences",
+    "exams_only_simus",
+)
+
+
+def _patient_exams(data: Any) -> list:
+    if isinstance(data, dict):
+        return data.get('exams', [])
+    return data if isinstance(data, list) else []
+
+
+def patients_digest(patients: Dict[str, Any]) -> str:
+    """SHA-256 do conteudo (paciente, exame, codigo, valor) de um dicionario de pacientes."""
+    from ..utils.exam_table import ExamTable
+
+    digest = hashlib.sha256()
+    if isinstance(patients, ExamTable):
+        # Mesmo texto da versao por dicionarios, montado pelas colunas
+        exam_names, codes = patients.exam_names, patients.codes
+        value_texts = [str(value) for value in patients.values]
+        exam_ids, code_ids, value_ids = (
+            patients.exam_ids.tolist(), patients.code_ids.tolist(), patients.value_ids.tolist()
+        )
+        offsets = patients.offsets.tolist()
+        for position, patient_name in enumerate(patients.patient_names):
+            rows = range(offsets[position], offsets[position + 1])
+            digest.update(f"\x1e{patient_name}".encode("utf-8"))
+            digest.update("".join(
+                f"\x1f{exam_names[exam_ids[row]]}\x1f{codes[code_ids[row]]}\x1f{value_texts[value_ids[row]]}"
+                for row in rows
+            ).encode("utf-8"))
+        return digest.hexdigest()
+    for patient_name, data in (patients or {}).items():
+        digest.update(f"\x1e{patient_name}".encode("utf-8"))
+        for exam in _patient_exams(data):
+            if isinstance(exam, dict):
+                digest.update(
+                    f"\x1f{exam.get('exam_name', '')}\x1f{exam.get('code', '')}\x1f{exam.get('value', '')}".encode("utf-8")
+                )
+    return digest.hexdigest()
+
+
+def patients_total(patients: Dict[str, Any]) -> Decimal:
+    """Soma dos valores de todos os exames."""
+    from ..utils.exam_table import ExamTable
+    from ..utils.normalize import safe_decimal
+
+    if isinstance(patients, ExamTable):
+        return patients.total()
+    total = Decimal("0")
+    for data in (patients or {}).values():
+        for exam in _patient_exams(data):
+            if isinstance(exam, dict):
+                total += safe_decimal(exam.get('value', 0))
+    return total
+
+
+def _build_patient_summary(patient_name: str, exams: list) -> AnalysisResult:
+    exams_count = len(exams)
+    total_value = sum(float(exam.get('value', 0) or 0) for exam in exams)
+    return AnalysisResult(
+        patient=patient_name,
+        exam_name=f"{exams_count} exame(s)",
+        value=total_value,
+        exams_count=exams_count,
+        total_value=total_value,
+    )
+
+
+class PatientComparison(NamedTuple):
+    """Resultado da comparacao dos exames de um paciente comum."""
+    simus_name: str
+    exams_only_compulab: List[AnalysisResult]
+    value_divergences: List[AnalysisResult]
+    exams_only_simus: List[AnalysisResult]
+    # (indices COMPULAB, indices SIMUS) nao conciliados, ou None
+    pending: Optional[Tuple[List[int], List[int]]]
+
+
+class ExamKeys:
+    """
+    Nome canonico de cada nome de exame e assinatura de cada nome canonico,
+    calculados uma unica vez por conciliacao sob os mapeamentos vigentes.
+
+    Fica guardado no resultado: comparado com os mapeamentos atuais, indica
+    quais nomes mudaram de chave (changed_names) e portanto quais pacientes
+    precisam ser recomparados.
+    """
+
+    def __init__(self):
+        self.canonical_keys: Dict[str, str] = {}
+        self.signatures: Dict[str, Any] = {}
+
+    def canonical_key(self, exam_name: str) -> str:
+        key = self.canonical_keys.get(exam_name)
+        if key is None:
+            from ..utils import pdf_processor
+
+            key = self.canonical_keys[exam_name] = pdf_processor.canonicalize_exam_name(exam_name)
+        return key
+
+    def signature(self, exam_key: str):
+        found = self.signatures.get(exam_key)
+        if found is None:
+            from ..utils import pdf_processor
+
+            found = self.signatures[exam_key] = pdf_processor.exam_signature(exam_key)
+        return found
+
+    def refreshed(self) -> Tuple["ExamKeys", set]:
+        """
+        (chaves recalculadas sob os mapeamentos atuais, nomes de exame cuja
+        chave ou assinatura mudou).
+        """
+        fresh = ExamKeys()
+        changed_keys = {
+            exam_key for exam_key, signature in self.signatures.items()
+            if fresh.signature(exam_key) != signature
+        }
+        changed = {
+            exam_name for exam_name, exam_key in self.canonical_keys.items()
+            if fresh.canonical_key(exam_name) != exam_key or exam_key in changed_keys
+        }
+        return fresh, changed
+
+
+def compare_patient_exams(patient_name: str, simus_name: str, compulab_exams: list, simus_exams: list,
+                          exam_keys: ExamKeys) -> PatientComparison:
+    """
+    Concilia os exames de um paciente comum (ver reconcile_patients).
+
+    Cada exame COMPULAB procura, nesta ordem, um exame SIMUS livre com o
+    mesmo codigo, com o mesmo nome canonico e, por fim, com nome
+    equivalente, consultando um indice invertido (ExamNameIndex) dos
+    exames SIMUS do paciente.
+    """
+    from ..utils import pdf_processor
+
+    canonical_key = exam_keys.canonical_key
+    signature = exam_keys.signature
+    exams_only_compulab_list: List[AnalysisResult] = []
+    value_divergences_list: List[AnalysisResult] = []
+
+    simus_exam_map: Dict[str, List[int]] = {}
+    simus_code_map: Dict[str, List[int]] = {}
+    for position, exam in enumerate(simus_exams):
+        exam_key = canonical_key(exam['exam_name'])
+        simus_exam_map.setdefault(exam_key, []).append(position)
+        exam_code = str(exam.get('code', '')).strip()
+        if exam_code:
+            simus_code_map.setdefault(exam_code, []).append(position)
+
+    matched = [False] * len(simus_exams)
+    simus_keys = list(simus_exam_map)
+    simus_index = None
+    pending_compulab: List[int] = []
+    pending_simus: List[int] = []
+
+    def take(candidates: List[int]) -> Optional[int]:
+        for position in candidates:
+            if not matched[position]:
+                matched[position] = True
+                return position
+        return None
+
+    for comp_position, comp_exam in enumerate(compulab_exams):
+        comp_name = comp_exam['exam_name']
+        comp_key = canonical_key(comp_name)
+        comp_value = float(comp_exam['value'])
+        comp_code = str(comp_exam.get('code', '')).strip()
+
+        match_position = None
+        if comp_code and comp_code in simus_code_map:
+            match_position = take(simus_code_map[comp_code])
+
+        if match_position is None:
+            match_position = take(simus_exam_map.get(comp_key, []))
+
+        if match_position is None:
+            if simus_index is None:
+                simus_index = pdf_processor.ExamNameIndex(simus_keys, signature)
+            for key_position in simus_index.matches(signature(comp_key)):
+                match_position = take(simus_exam_map[simus_keys[key_position]])
+                if match_position is not None:
+                    break
+
+        if match_position is None:
+            pending_compulab.append(comp_position)
+            exams_only_compulab_list.append(
+                AnalysisResult(
+                    patient=patient_name,
+                    exam_name=comp_exam['exam_name'],
+                    value=comp_value,
+                    compulab_value=comp_value,
+                )
+            )
+        else:
+            simus_value = float(simus_exams[match_position]['value'])
+            diff = abs(comp_value - simus_value)
+            if diff > 0.01:
+                pending_compulab.append(comp_position)
+                pending_simus.append(match_position)
+                value_divergences_list.append(
+                    AnalysisResult(
+                        patient=patient_name,
+                        exam_name=comp_exam['exam_name'],
+                        compulab_value=comp_value,
+                        simus_value=simus_value,
+                        difference=comp_value - simus_value,
+                    )
+                )
+
+    exams_only_simus_list = [
+        AnalysisResult(
+            patient=patient_name,
+            exam_name=simus_exam['exam_name'],
+            simus_value=float(simus_exam['value']),
+        )
+        for position, simus_exam in enumerate(simus_exams)
+        if not matched[position]
+    ]
+    pending_simus.extend(position for position, used in enumerate(matched) if not used)
+    return PatientComparison(
+        simus_name,
+        exams_only_compulab_list,
+        value_divergences_list,
+        exams_only_simus_list,
+        (pending_compulab, sorted(pending_simus)) if pending_compulab or pending_simus else None,
+    )
+
+
+def _comparison_results(comparisons: Dict[str, PatientComparison]) -> Dict[str, Any]:
+    # Listas planas (na ordem dos pacientes) e pendencias das comparacoes por paciente
+    exams_only_compulab_list: List[AnalysisResult] = []
+    value_divergences_list: List[AnalysisResult] = []
+    exams_only_simus_list: List[AnalysisResult] = []
+    pending: Dict[str, Tuple[List[int], List[int]]] = {}
+    for patient_name, comparison in comparisons.items():
+        exams_only_compulab_list.extend(comparison.exams_only_compulab)
+        value_divergences_list.extend(comparison.value_divergences)
+        exams_only_simus_list.extend(comparison.exams_only_simus)
+        if comparison.pending is not None:
+            pending[patient_name] = comparison.pending
+    return {
+        "exams_only_compulab": exams_only_compulab_list,
+        "value_divergences": value_divergences_list,
+        "exams_only_simus": exams_only_simus_list,
+        "pending": pending,
+    }
+
+
+def reconcile_patients(comp_data: dict, sim_data: dict,
+                       progress: Optional[Callable[[int], None]] = None,
+                       match_names: bool = True) -> dict:
+    """
+    Compara os pacientes dos dois sistemas (motor do dashboard).
+
+    Pacientes sem nome identico nos dois lados passam pelo indice de nomes
+    (match_patient_names); os pares propostos sao comparados como pacientes
+    comuns, sob o nome COMPULAB, e listados em `patient_matches`.
+
+    Os exames de cada paciente comum sao conciliados por
+    compare_patient_exams; nome canonico e assinatura de cada nome distinto
+    sao calculados uma unica vez por conciliacao (ExamKeys). Alem das cinco
+    listas exibidas, o resultado traz em `pending` os indices dos exames nao
+    conciliados (sem par ou com valor divergente) de cada paciente comum, e
+    em `comparisons`/`exam_keys` o necessario para Reconciliation.relink
+    recomparar apenas os pacientes afetados por um novo mapeamento.
+    """
+    from ..utils.patient_matching import match_patient_names
+
+    patients_only_compulab_list: List[AnalysisResult] = []
+    patients_only_simus_list: List[AnalysisResult] = []
+    exam_keys = ExamKeys()
+
+    compulab_patient_names = set(comp_data.keys())
+    simus_patient_names = set(sim_data.keys())
+
+    # Pares por nome semelhante entre os pacientes de um lado so
+    patient_matches = []
+    if match_names:
+        patient_matches = match_patient_names(
+            compulab_patient_names - simus_patient_names,
+            simus_patient_names - compulab_patient_names,
+        )
+    matched_compulab = {match.compulab_name for match in patient_matches}
+    matched_simus = {match.simus_name for match in patient_matches}
+
+    # Pacientes somente COMPULAB
+    for patient_name in compulab_patient_names - simus_patient_names - matched_compulab:
+        patient_data = comp_data[patient_name]
+        patients_only_compulab_list.append(
+            _build_patient_summary(patient_name, _patient_exams(patient_data))
+        )
+
+    # Pacientes somente SIMUS
+    for patient_name in simus_patient_names - compulab_patient_names - matched_simus:
+        patient_data = sim_data[patient_name]
+        patients_only_simus_list.append(
+            _build_patient_summary(patient_name, _patient_exams(patient_data))
+        )
+
+    # Exames somente COMPULAB, diferenças e extras no SIMUS
+    # (nome COMPULAB, nome SIMUS): identicos, seguidos dos pares por nome
+    common_patients = [(patient_name, patient_name) for patient_name in compulab_patient_names & simus_patient_names]
+    common_patients.extend((match.compulab_name, match.simus_name) for match in patient_matches)
+    total_common = len(common_patients)
+    comparisons: Dict[str, PatientComparison] = {}
+    for index, (patient_name, simus_name) in enumerate(common_patients, start=1):
+        if progress:
+            progress(index * 100 // total_common)
+        comparisons[patient_name] = compare_patient_exams(
+            patient_name,
+            simus_name,
+            _patient_exams(comp_data[patient_name]),
+            _patient_exams(sim_data[simus_name]),
+            exam_keys,
+        )
+
+    results = _comparison_results(comparisons)
+    return {
+        "patients_only_compulab": patients_only_compulab_list,
+        "patients_only_simus": patients_only_simus_list,
+        "exams_only_compulab": results["exams_only_compulab"],
+        "value_divergences": results["value_divergences"],
+        "exams_only_simus": results["exams_only_simus"],
+        "pending": results["pending"],
+        "patient_matches": patient_matches,
+        "comparisons": comparisons,
+        "exam_keys": exam_keys,
+    }
+
+
+class Reconciliation:
+    """
+    Resultado canonico de uma conciliacao.
+
+    Guarda os pacientes de cada lado, os totais e as listas produzidas por
+    reconcile_patients. Cada consumidor obtem sua visao por um metodo que
+    a calcula na primeira chamada e a reaproveita nas seguintes.
+    """
+
+    def __init__(self, key: str, compulab_patients: Dict[str, Any], simus_patients: Dict[str, Any],
+                 compulab_total: float, simus_total: float, results: Dict[str, Any]):
+        self.key = key
+        self.compulab_patients = compulab_patients
+        self.simus_patients = simus_patients
+        self.compulab_total = float(compulab_total or 0)
+        self.simus_total = float(simus_total or 0)
+        self.results = {name: list(results.get(name, [])) for name in RESULT_KEYS}
+        self.pending: Optional[Dict[str, Tuple[List[int], List[int]]]] = results.get("pending")
+        self.patient_matches: Optional[list] = results.get("patient_matches")
+        # Comparacao por paciente comum e chaves de exame usadas (ausentes se recriado do estado)
+        self.comparisons: Optional[Dict[str, PatientComparison]] = results.get("comparisons")
+        self.exam_keys: Optional[ExamKeys] = results.get("exam_keys")
+        self._views: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    def view(self, name: Any, factory: Callable[[], Any]) -> Any:
+        """Retorna a visao `name`, calculando-a com `factory` na primeira vez."""
+        with self._lock:
+            if name not in self._views:
+                self._views[name] = factory()
+            return self._views[name]
+
+    def lookup(self, name: Any, default: Any = None) -> Any:
+        return self._views.get(name, default)
+
+    def store(self, name: Any, value: Any) -> None:
+        with self._lock:
+            self._views[name] = value
+
+    # ----- Visoes derivadas -----
+
+    def _recomputed(self) -> Dict[str, Any]:
+        # Resultado recriado a partir do estado (sem `pending`): refaz a comparacao uma vez
+        return self.view("recomputed", lambda: reconcile_patients(self.compulab_patients, self.simus_patients))
+
+    def pending_exams(self) -> Dict[str, Tuple[List[int], List[int]]]:
+        """Indices dos exames nao conciliados por paciente comum (ver reconcile_patients)."""
+        if self.pending is not None:
+            return self.pending
+        return self._recomputed()["pending"]
+
+    def matched_patients(self) -> list:
+        """Pares de pacientes conciliados por nome semelhante (PatientNameMatch)."""
+        if self.patient_matches is not None:
+            return self.patient_matches
+        return self._recomputed()["patient_matches"]
+
+    def exam_patients(self) -> Dict[str, List[str]]:
+        """Nome de exame -> pacientes comuns (nome COMPULAB) com esse exame em algum dos lados."""
+        def compute():
+            index: Dict[str, List[str]] = {}
+            for patient_name, comparison in (self.comparisons or {}).items():
+                names = {exam.get('exam_name') for exam in _patient_exams(self.compulab_patients[patient_name])}
+                names.update(exam.get('exam_name') for exam in _patient_exams(self.simus_patients[comparison.simus_name]))
+                for exam_name in names:
+                    index.setdefault(exam_name, []).append(patient_name)
+            return index
+        return self.view("exam_patients", compute)
+
+    def relink(self, key: str) -> "Reconciliation":
+        """
+        Conciliacao dos mesmos pacientes sob os mapeamentos atuais.
+
+        Apenas os pacientes comuns com algum exame cujo nome canonico (ou
+        assinatura) mudou sao recomparados; os demais, as listas de
+        pacientes de um lado so, os pares por nome e as visoes que nao
+        dependem dos mapeamentos (DataFrames, analise profunda) sao
+        reaproveitados. Sem as comparacoes por paciente (resultado recriado
+        do estado) a comparacao e refeita por inteiro.
+        """
+        if self.comparisons is None or self.exam_keys is None:
+            results = reconcile_patients(self.compulab_patients, self.simus_patients)
+        else:
+            exam_keys, changed = self.exam_keys.refreshed()
+            exam_patients = self.exam_patients()
+            affected = {patient_name for exam_name in changed for patient_name in exam_patients.get(exam_name, ())}
+            logger.debug(f"Mapeamentos: {len(changed)} nome(s) de exame alterado(s), {len(affected)} paciente(s) recomparado(s)")
+
+            comparisons = dict(self.comparisons)
+            for patient_name in affected:
+                simus_name = comparisons[patient_name].simus_name
+                comparisons[patient_name] = compare_patient_exams(
+                    patient_name,
+                    simus_name,
+                    _patient_exams(self.compulab_patients[patient_name]),
+                    _patient_exams(self.simus_patients[simus_name]),
+                    exam_keys,
+                )
+            results = dict(self.results)
+            results.update(_comparison_results(comparisons))
+            results.update(patient_matches=self.patient_matches, comparisons=comparisons, exam_keys=exam_keys)
+
+        reconciliation = Reconciliation(
+            key, self.compulab_patients, self.simus_patients, self.compulab_total, self.simus_total, results
+        )
+        for name in ("frames", "deep_analysis", "exam_patients"):
+            if name in self._views:
+                reconciliation.store(name, self._views[name])
+        return reconciliation
+
+    def frames(self):
+        """DataFrames (Paciente, Nome_Exame, Codigo_Exame, Valor) de cada lado."""
+        return self.view("frames", lambda: (_to_frame(self.compulab_patients), _to_frame(self.simus_patients)))
+
+    def deep_analysis(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """(pacientes extras, exames repetidos) da analise profunda."""
+        def compute():
+            from ..utils.analysis_module import analyze_patient_count_difference, detect_repeated_exams
+
+            df_compulab, df_simus = self.frames()
+            return (
+                analyze_patient_count_difference(df_compulab, df_simus),
+                detect_repeated_exams(df_compulab, df_simus),
+            )
+        return self.view("deep_analysis", compute)
+
+    def discrepancies(self) -> Dict[str, Any]:
+        """Discrepancias no formato do relatorio de auditoria de IA."""
+        def compute():
+            results = self.results
+            missing_patients = results["patients_only_compulab"]
+            missing_exams = results["exams_only_compulab"]
+            divergences = results["value_divergences"]
+            return {
+                "pacientes_ausentes_simus": [
+                    {"nome": r.patient, "valor_total": r.total_value, "qtd_exames": r.exams_count}
+                    for r in missing_patients
+                ],
+                "pacientes_ausentes_compulab": [
+                    {"nome": r.patient, "valor_total": r.total_value, "qtd_exames": r.exams_count}
+                    for r in results["patients_only_simus"]
+                ],
+                "exames_ausentes_simus": [
+                    {"paciente": r.patient, "exame": r.exam_name, "valor": r.compulab_value}
+                    for r in missing_exams
+                ],
+                "exames_ausentes_compulab": [
+                    {"paciente": r.patient, "exame": r.exam_name, "valor": r.simus_value}
+                    for r in results["exams_only_simus"]
+                ],
+                "divergencias_valor": [
+                    {
+                        "paciente": r.patient,
+                        "exame": r.exam_name,
+                        "valor_compulab": r.compulab_value,
+                        "valor_simus": r.simus_value,
+                        "diferenca": r.difference,
+                    }
+                    for r in divergences
+                ],
+                "totais": {
+                    "compulab_total": round(self.compulab_total, 2),
+                    "simus_total": round(self.simus_total, 2),
+                    "impacto_pacientes": round(sum(r.total_value for r in missing_patients), 2),
+                    "impacto_exames": round(sum(r.compulab_value for r in missing_exams), 2),
+                    "impacto_divergencias": round(sum(r.difference for r in divergences), 2),
+                },
+            }
+        return self.view("discrepancies", compute)
+
+    def unreconciled_patients(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Pacientes que ainda precisam de revisao (pre-filtro da auditoria de IA).
+
+        Pacientes de um lado so seguem completos; nos pacientes comuns (e nos
+        pares por nome, ambos sob o nome COMPULAB) ficam apenas os exames
+        nao conciliados.
+        """
+        def compute():
+            simus_names = {match.compulab_name: match.simus_name for match in self.matched_patients()}
+            paired_simus = set(simus_names.values())
+            filtered_compulab: Dict[str, Any] = {}
+            filtered_simus: Dict[str, Any] = {}
+            for patient_name, data in self.compulab_patients.items():
+                if patient_name not in self.simus_patients and patient_name not in simus_names:
+                    filtered_compulab[patient_name] = data
+            for patient_name, data in self.simus_patients.items():
+                if patient_name not in self.compulab_patients and patient_name not in paired_simus:
+                    filtered_simus[patient_name] = data
+            for patient_name, (compulab_positions, simus_positions) in self.pending_exams().items():
+                simus_name = simus_names.get(patient_name, patient_name)
+                filtered_compulab[patient_name] = _with_exams(self.compulab_patients[patient_name], compulab_positions)
+                filtered_simus[patient_name] = _with_exams(self.simus_patients[simus_name], simus_positions)
+            return filtered_compulab, filtered_simus
+        return self.view("unreconciled_patients", compute)
+
+    def context_items(self) -> List[Dict[str, Any]]:
+        """Itens de divergencia usados como contexto pelo Detetive de Dados."""
+        def compute():
+            items: List[Dict[str, Any]] = []
+            for div in self.results["value_divergences"]:
+                items.append({
+                    "tipo": "DIVERGENCIA_VALOR",
+                    "paciente": div.patient,
+                    "exame": div.exam_name,
+                    "valor_compulab": div.compulab_value,
+                    "valor_simus": div.simus_value,
+                    "diferenca": div.difference,
+                    "status": "ERRO_VALOR"
+                })
+            for missing in self.results["exams_only_compulab"]:
+                items.append({
+                    "tipo": "EXAME_FALTANTE_SIMUS",
+                    "paciente": missing.patient,
+                    "exame": missing.exam_name,
+                    "valor": missing.compulab_value,
+                    "status": "GLOSADO_PROVAVEL"
+                })
+            for patient in self.results["patients_only_compulab"]:
+                items.append({
+                    "tipo": "PACIENTE_NAO_ENCONTRADO",
+                    "paciente": patient.patient,
+                    "qtd_exames": patient.exams_count,
+                    "valor_total": patient.total_value,
+                    "status": "NAO_FATURADO"
+                })
+            return items
+        return self.view("context_items", compute)
+
+
+def _with_exams(data: Any, positions: List[int]) -> Any:
+    exams = _patient_exams(data)
+    selected = [exams[position] for position in positions]
+    if isinstance(data, dict):
+        copy = data.copy()
+        copy['exams'] = selected
+        return copy
+    return selected
+
+
+def _to_frame(patients: Dict[str, Any]):
+    import pandas as pd
+    from ..utils.exam_table import ExamTable
+
+    if isinstance(patients, ExamTable):
+        frame = patients.to_frame()
+        if not all(patients.values):
+            frame['Valor'] = frame['Valor'].map(lambda value: value or 0)
+        return frame
+    rows = []
+    for patient_name, data in (patients or {}).items():
+        for exam in _patient_exams(data):
+            if isinstance(exam, dict):
+                rows.append({
+                    'Paciente': patient_name,
+                    'Nome_Exame': exam.get('exam_name', ''),
+                    'Codigo_Exame': exam.get('code', ''),
+                    'Valor': exam.get('value', 0) or 0,
+                })
+    return pd.DataFrame(rows, columns=['Paciente', 'Nome_Exame', 'Codigo_Exame', 'Valor'])
+
+
+class ReconciliationService:
+    """Cache LRU, por tenant, dos resultados de conciliacao do processo."""
+
+    _entries: "OrderedDict[str, Reconciliation]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def make_key(cls, tenant_id: str, compulab_digest: str, simus_digest: str) -> str:
+        """Chave (tenant, COMPULAB, SIMUS, snapshot de mapeamentos) de uma conciliacao."""
+        return "|".join((tenant_id or "", compulab_digest, simus_digest, mapping_service.get_fingerprint()))
+
+    @classmethod
+    def get(cls, key: str) -> Optional[Reconciliation]:
+        if not key:
+            return None
+        with cls._lock:
+            reconciliation = cls._entries.get(key)
+            if reconciliation is not None:
+                cls._entries.move_to_end(key)
+            return reconciliation
+
+    @classmethod
+    def put(cls, reconciliation: Reconciliation) -> Reconciliation:
+        with cls._lock:
+            cls._entries[reconciliation.key] = reconciliation
+            cls._entries.move_to_end(reconciliation.key)
+            while len(cls._entries) > RECONCILIATION_CACHE_SIZE:
+                cls._entries.popitem(last=False)
+        return reconciliation
+
+    @classmethod
+    def build(cls, compulab_patients: Dict[str, Any], simus_patients: Dict[str, Any],
+              tenant_id: str = "") -> Reconciliation:
+        """Conciliacao de dois dicionarios de pacientes (reaproveitada do cache se ja existir)."""
+        key = cls.make_key(tenant_id, patients_digest(compulab_patients), patients_digest(simus_patients))
+        reconciliation = cls.get(key)
+        if reconciliation is None:
+            logger.debug("Conciliacao calculada sob demanda")
+            reconciliation = cls.put(Reconciliation(
+                key,
+                compulab_patients,
+                simus_patients,
+                float(patients_total(compulab_patients)),
+                float(patients_total(simus_patients)),
+                reconcile_patients(compulab_patients, simus_patients),
+            ))
+        return reconciliation
+
+    @classmethod
+    def relink(cls, reconciliation: Reconciliation) -> Reconciliation:
+        """Conciliacao sob os mapeamentos atuais, recomparando so os pacientes afetados (ver Reconciliation.relink)."""
+        tenant_id, compulab_digest, simus_digest = reconciliation.key.split("|")[:3]
+        key = cls.make_key(tenant_id, compulab_digest, simus_digest)
+        found = cls.get(key)
+        if found is None:
+            found = cls.put(reconciliation.relink(key))
+        return found
+
+    @classmethod
+    def invalidate(cls, tenant_id: Optional[str] = None) -> None:
+        """Descarta as conciliacoes do tenant (ou todas)."""
+        with cls._lock:
+            if tenant_id is None:
+                cls._entries.clear()
+                return
+            prefix = f"{tenant_id}|"
+            for key in [k for k in cls._entries if k.startswith(prefix)]:
+                del cls._entries[key]
+
+
+# Singleton para uso simplificado
+reconciliation_service = ReconciliationService()
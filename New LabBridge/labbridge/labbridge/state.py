@@ -13,8 +13,8 @@ logger = logging.getLogger(__name__)
 from .states.detective_state import DetectiveState
 from .services.mapping_service import mapping_service
 from .services.ai_service import ai_service
+from .services.dashboard_metrics import DASHBOARD_CHART_MONTHS, MONTH_NAMES, dashboard_metrics
 from .repositories.audit_repository import AuditRepository
-from .models import TopOffender
 
 
 class State(DetectiveState):
@@ -31,10 +31,6 @@ class State(DetectiveState):
     show_chat_panel: bool = False
     _chat_context_loaded: bool = False
 
-    # Cache de metricas do dashboard
-    _dashboard_cache: Dict[str, Any] = {}
-    _dashboard_cache_time: str = ""
-
     def toggle_chat_panel(self):
         """Abre/fecha o painel flutuante de chat"""
         self.show_chat_panel = not self.show_chat_panel
@@ -62,38 +58,23 @@ class State(DetectiveState):
     # =====================================================
 
     def _get_monthly_data(self) -> Dict[str, Any]:
-        """Busca dados do mes atual do banco (com cache de 5 min)"""
-        from .services.saved_analysis_service import saved_analysis_service
-
-        now = datetime.now()
-        cache_key = f"{now.year}-{now.month}"
-
-        # Verificar cache (5 minutos)
-        if self._dashboard_cache.get("key") == cache_key and self._dashboard_cache_time:
-            try:
-                cache_time = datetime.fromisoformat(self._dashboard_cache_time)
-                if (now - cache_time).seconds < 300:
-                    return self._dashboard_cache.get("data", {})
-            except (ValueError, TypeError):
-                pass
-
-        # Buscar dados do banco
+        """Resumo do mes atual (cache de metricas do processo, por tenant)"""
         tenant_id = self.current_tenant.id if self.current_tenant else ""
         if not tenant_id:
             return {}
 
         try:
-            report = saved_analysis_service.get_monthly_report(
-                tenant_id=tenant_id, year=now.year, month=now.month
-            )
-            data = report or {}
-            self._dashboard_cache = {"key": cache_key, "data": data}
-            self._dashboard_cache_time = now.isoformat()
-            return data
+            return dashboard_metrics.monthly(tenant_id)[-1]
         except Exception as e:
             logger.error(f"Erro ao buscar dados mensais: {e}")
             return {}
 
+    def _monthly_goal(self) -> float:
+        """Meta mensal configurada (cache de metricas do processo)"""
+        tenant_id = self.current_user.tenant_id if self.current_user else ""
+        user_id = self.current_user.id if self.current_user else ""
+        return dashboard_metrics.monthly_goal(tenant_id, user_id)
+
     @rx.var(auto_deps=False, deps=["has_analysis"])
     def analyses_today(self) -> int:
         """Total de analises - usa dados reais se disponiveis"""
@@ -125,41 +106,21 @@ class State(DetectiveState):
     @rx.var
     def active_divergences(self) -> int:
         """Numero de divergencias ativas"""
-        return len(self.value_divergences)
+        return len(self._value_divergences)
 
     @rx.var(auto_deps=False, deps=["has_analysis"])
     def monthly_analyses_chart(self) -> List[Dict[str, Any]]:
         """Dados para gráfico de análises mensais - DADOS REAIS do banco"""
-        from .services.local_storage import local_storage
-
         try:
             tenant_id = self.current_user.tenant_id if self.current_user else ""
             if not tenant_id:
                 return [{"name": m, "analises": 0} for m in ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun"]]
-            now = datetime.now()
-            
-            # Buscar últimos 6 meses
-            chart_data = []
-            month_names = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-            
-            for i in range(5, -1, -1):
-                # Calcular mês
-                month = now.month - i
-                year = now.year
-                while month <= 0:
-                    month += 12
-                    year -= 1
-                
-                # Buscar resumo do mês
-                summary = local_storage.get_monthly_summary(tenant_id, year, month)
-                count = summary.get("count", 0) if summary else 0
-                
-                chart_data.append({
-                    "name": month_names[month - 1],
-                    "analises": count
-                })
-            
-            return chart_data
+
+            # Últimos 6 meses numa única consulta agrupada (compartilhada entre sessões)
+            return [
+                {"name": MONTH_NAMES[summary["month"] - 1], "analises": summary["count"]}
+                for summary in dashboard_metrics.monthly(tenant_id, DASHBOARD_CHART_MONTHS)
+            ]
         except Exception as e:
             logger.error(f"Erro ao gerar gráfico: {e}")
             # Fallback
@@ -178,27 +139,14 @@ class State(DetectiveState):
         return [
             {"name": "Pacientes", "value": self.patients_only_compulab_count},
             {"name": "Exames", "value": self.exams_only_compulab_count},
-            {"name": "Valores", "value": len(self.value_divergences)},
+            {"name": "Valores", "value": len(self._value_divergences)},
             {"name": "Extras", "value": self.exams_only_simus_count},
         ]
 
     @rx.var(auto_deps=False, deps=["compulab_total"])
     def goal_progress(self) -> int:
         """Progresso da meta mensal (percentual) - usa meta configurável"""
-        from .services.local_storage import local_storage
-
-        # Buscar meta das configurações
-        tenant_id = self.current_user.tenant_id if self.current_user else ""
-        user_id = self.current_user.id if self.current_user else ""
-        settings = local_storage.get_user_settings(tenant_id, user_id)
-        monthly_goal = 150000.0
-        if settings:
-            try:
-                goal_str = settings.get("monthly_goal", "150000")
-                monthly_goal = float(goal_str) if goal_str else 150000.0
-            except (ValueError, TypeError):
-                pass
-        
+        monthly_goal = self._monthly_goal()
         current = float(self.compulab_total or 0)
         if monthly_goal == 0:
             return 0
@@ -215,20 +163,7 @@ class State(DetectiveState):
     @rx.var(auto_deps=False, deps=["compulab_total"])
     def formatted_monthly_goal(self) -> str:
         """Meta mensal formatada - usa meta configurável"""
-        from .services.local_storage import local_storage
-
-        tenant_id = self.current_user.tenant_id if self.current_user else ""
-        user_id = self.current_user.id if self.current_user else ""
-        settings = local_storage.get_user_settings(tenant_id, user_id)
-        monthly_goal = 150000.0
-        if settings:
-            try:
-                goal_str = settings.get("monthly_goal", "150000")
-                monthly_goal = float(goal_str) if goal_str else 150000.0
-            except (ValueError, TypeError):
-                pass
-        
-        return f"R$ {monthly_goal:,.2f}"
+        return f"R$ {self._monthly_goal():,.2f}"
 
     @rx.var
     def formatted_revenue_forecast(self) -> str:
@@ -270,22 +205,4 @@ class State(DetectiveState):
     @rx.var
     def divergences_count(self) -> int:
         """Alias para contagem de divergencias"""
-        return len(self.value_divergences)
-
-    @rx.var
-    def top_offenders(self) -> List[TopOffender]:
-        """Top exames com mais problemas"""
-        counts: Dict[str, int] = {}
-
-        for item in self.exams_only_compulab:
-            name = getattr(item, "exam_name", "") if hasattr(item, "exam_name") else item.get("exam_name", "")
-            if name:
-                counts[name] = counts.get(name, 0) + 1
-
-        for item in self.value_divergences:
-            name = getattr(item, "exam_name", "") if hasattr(item, "exam_name") else item.get("exam_name", "")
-            if name:
-                counts[name] = counts.get(name, 0) + 1
-
-        sorted_exams = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        return [TopOffender(name=str(n), count=int(c)) for n, c in sorted_exams]
+        return len(self._value_divergences)
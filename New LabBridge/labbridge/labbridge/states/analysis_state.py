@@ -1,15 +1,14 @@
 import reflex as rx
-from typing import List, Dict, Any, Optional, Set
-from difflib import SequenceMatcher
+from typing import List, Dict, Any, Optional
 import asyncio
 import json
 import os
 import tempfile
-import base64
 import gc
+import hashlib
+import shutil
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -17,36 +16,173 @@ from ..services.cloudinary_service import CloudinaryService
 from ..services.audit_service import AuditService
 from ..services.saved_analysis_service import saved_analysis_service
 from ..services.mapping_service import mapping_service
+from ..services.blob_store import blob_store
+from ..services.reconciliation_service import (
+    Reconciliation,
+    reconcile_patients,
+    reconciliation_service,
+    patients_digest,
+)
+from ..services.job_service import (
+    job_service,
+    JobCancelled,
+    LANE_IO,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    STATUS_QUEUED,
+)
 from datetime import datetime, date
-from ..models import AnalysisResult, PatientHistoryEntry, PatientModel, TopOffender
+from ..models import AnalysisResult, PatientHistoryEntry, PatientMatch, PatientModel, TopOffender
 from ..utils import pdf_processor # Import module to access functions dynamically
 from ..utils.timing import TimingCollector
-from ..utils.analysis_pdf_report import generate_analysis_pdf
+from ..utils.result_table import RESULT_PAGE_SIZE, ResultIndex, result_index_cache
+from ..utils.derived_index import DerivedIndex, MappingView, derived_index_cache
+from ..utils.analysis_pdf_report import DETAIL_SECTIONS, render_analysis_pdf, report_detail, report_summary
+from ..utils.export_utils import TABLE_EXPORT_FORMATS
 from ..styles import Color
 from .auth_state import AuthState
+from .downloads import blob_download
 
 # Cloudinary Service Instance
 cloudinary_service = CloudinaryService()
 
+# Subdiretório (em rx.get_upload_dir()) das planilhas convertidas e tempo de retenção
+CONVERSIONS_DIR = "conversoes"
+CONVERSION_RETENTION_HOURS = 6
+
+# Pausa (s) após a última resolução/anotação antes de regenerar o PDF e enviá-lo ao Cloudinary
+REPORT_DEBOUNCE_SECONDS = max(0.0, float(os.getenv("REPORT_DEBOUNCE_SECONDS", "1.5") or 1.5))
+# Seções do PDF que dependem apenas das anotações (as demais dependem também das resoluções)
+_ANNOTATION_ONLY_SECTIONS = ("patients_only_compulab", "patients_only_simus")
+
+# Tabelas de resultado por aba: (lista no backend, colunas pesquisáveis)
+RESULT_TABLES = {
+    "patients_only_compulab": ("_patients_only_compulab", ("patient",)),
+    "patients_only_simus": ("_patients_only_simus", ("patient",)),
+    "exams_only_compulab": ("_exams_only_compulab", ("patient", "exam_name")),
+    "exams_only_simus": ("_exams_only_simus", ("patient", "exam_name")),
+    "value_diffs": ("_value_divergences", ("patient", "exam_name")),
+    "patient_matches": ("_patient_matches", ("compulab_name", "simus_name")),
+}
+
+
+def _compare_patients_job(ctx, comp_data: dict, sim_data: dict) -> dict:
+    """Executa a comparação pesada como tarefa do job_service (fora do loop de eventos)."""
+    return reconcile_patients(comp_data, sim_data, progress=ctx.progress)
+
+
+def _convert_pdfs_job(ctx, compulab_path: str, simus_path: str, output_dir: str, fmt: str, workers: int):
+    """Conversão PDF -> planilha (gravada em `output_dir`) como tarefa do job_service."""
+    return pdf_processor.convert_pdfs_to_files(compulab_path, simus_path, output_dir, fmt, ctx.progress, workers=workers)
+
+
+def _conversion_output_dir() -> str:
+    """Cria um diretório de saída no diretório de uploads e remove conversões antigas."""
+    base_dir = os.path.join(str(rx.get_upload_dir()), CONVERSIONS_DIR)
+    os.makedirs(base_dir, exist_ok=True)
+    cutoff = time.time() - CONVERSION_RETENTION_HOURS * 3600
+    with os.scandir(base_dir) as it:
+        for entry in it:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+    return tempfile.mkdtemp(dir=base_dir)
+
+
+def _build_derived_index_job(ctx, key: str, sources: tuple, view_args: Optional[tuple]):
+    """Montagem dos índices derivados da análise (faixa de I/O: os dados ficam no processo)."""
+    index = derived_index_cache.get_or_build(key, lambda: DerivedIndex(*sources))
+    if view_args is not None:
+        index.mapping_view(*view_args)
+
+
+def _render_analysis_pdf_job(ctx, summary: dict, details: list):
+    """Geração do PDF da análise como tarefa do job_service (recebe só os dados das seções)."""
+    return render_analysis_pdf(summary, details)
+
+
+def _upload_pdf_job(ctx, pdf_bytes: bytes):
+    """Upload do PDF para o Cloudinary (faixa de I/O do job_service)."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
+        tmp.write(pdf_bytes)
+        tmp_path = tmp.name
+    try:
+        return cloudinary_service.upload_pdf(tmp_path)
+    finally:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+async def _render_report_snapshot(reconciliation: Reconciliation, snapshot: tuple, name: str,
+                                  priority: int, owner: str) -> bytes:
+    """PDF de um snapshot (assinatura, resumo, seções); reaproveitado enquanto a assinatura não mudar."""
+    signature, summary, details = snapshot
+    cached = reconciliation.lookup("pdf")
+    if cached and cached[0] == signature:
+        return cached[1]
+    pdf_bytes = await job_service.result(job_service.submit(
+        _render_analysis_pdf_job,
+        summary,
+        details,
+        name=name,
+        priority=priority,
+        owner=owner,
+    ))
+    reconciliation.store("pdf", (signature, pdf_bytes))
+    return pdf_bytes
+
+
+async def _upload_report_pdf(reconciliation: Reconciliation, signature: str, pdf_bytes: bytes,
+                             owner: str) -> Optional[str]:
+    """Envia o PDF ao Cloudinary; o mesmo PDF já enviado nesta conciliação não é reenviado."""
+    uploaded = reconciliation.lookup("pdf_url")
+    if uploaded and uploaded[0] == signature:
+        return uploaded[1]
+    try:
+        url = await job_service.result(job_service.submit(
+            _upload_pdf_job,
+            pdf_bytes,
+            name="upload_pdf",
+            lane=LANE_IO,
+            priority=PRIORITY_LOW,
+            owner=owner,
+        ))
+    except JobCancelled:
+        raise
+    except Exception as upload_err:
+        # Se upload falhar, ainda temos o PDF no blob_store
+        logger.debug(f"Upload PDF failed (will use local preview): {upload_err}")
+        return None
+    if url:
+        reconciliation.store("pdf_url", (signature, url))
+        logger.debug(f"PDF uploaded to Cloudinary: {url}")
+    return url
+
+
 class AnalysisState(AuthState):
     """Estado responsável pela análise comparativa e upload de arquivos"""
     
     # Internal Data (Backend Only)
     _compulab_patients: Dict[str, Any] = {}
     _simus_patients: Dict[str, Any] = {}
+    # Chave (reconciliation_service) do resultado canônico da análise atual
+    _reconciliation_key: str = ""
     audit_history: List[Dict[str, Any]] = []
     
     # Upload State
     compulab_file_name: str = ""
     compulab_file_path: str = ""
     compulab_file_url: str = ""
-    compulab_file_bytes: bytes = b""
+    # Bytes do PDF apenas no backend (o upload é gravado em disco; ver compulab_file_path)
+    _compulab_file_bytes: bytes = b""
     compulab_file_size_bytes: int = 0
     
     simus_file_name: str = ""
     simus_file_path: str = ""
     simus_file_url: str = ""
-    simus_file_bytes: bytes = b""
+    _simus_file_bytes: bytes = b""
     simus_file_size_bytes: int = 0
     
     is_uploading: bool = False
@@ -64,22 +200,37 @@ class AnalysisState(AuthState):
     csv_progress_percentage: int = 0
     csv_stage: str = ""
     is_generating_csv: bool = False
+    csv_job_id: str = ""
     
     # Progresso da análise
     analysis_progress_percentage: int = 0
     analysis_stage: str = ""
     is_analyzing: bool = False
+    analysis_job_id: str = ""
     
     # Mensagens
     error_message: str = ""
     success_message: str = ""
     
-    # Analysis Results (Objects)
-    patients_only_compulab: List[AnalysisResult] = []
-    patients_only_simus: List[AnalysisResult] = []
-    exams_only_compulab: List[AnalysisResult] = []
-    value_divergences: List[AnalysisResult] = []
-    exams_only_simus: List[AnalysisResult] = []
+    # Analysis Results (Objects): listas completas só no backend; a tela
+    # recebe a página corrente (result_rows / result_match_rows)
+    _patients_only_compulab: List[AnalysisResult] = []
+    _patients_only_simus: List[AnalysisResult] = []
+    _exams_only_compulab: List[AnalysisResult] = []
+    _value_divergences: List[AnalysisResult] = []
+    _exams_only_simus: List[AnalysisResult] = []
+    _patient_matches: List[PatientMatch] = []  # Pares por nome semelhante
+    _results_version: int = 0  # incrementado a cada novo conjunto de resultados
+
+    # Página corrente da tabela de resultados (aba analysis_active_tab)
+    result_rows: List[AnalysisResult] = []
+    result_match_rows: List[PatientMatch] = []
+    result_total_rows: int = 0
+    result_page: int = 0
+    result_page_size: int = RESULT_PAGE_SIZE
+    result_search: str = ""
+    result_sort_key: str = ""
+    result_sort_desc: bool = False
     
     # Analysis Stats - Attributes with Defaults
     patients_only_compulab_count: int = 0
@@ -91,18 +242,26 @@ class AnalysisState(AuthState):
     divergences_count: int = 0
     divergences_total: float = 0.0
     exams_only_simus_count: int = 0
+    patient_matches_count: int = 0
     compulab_total: float = 0.0
     simus_total: float = 0.0
     
-    # CSVs gerados
-    compulab_csv: str = ""
-    simus_csv: str = ""
+    # Arquivos convertidos: gravados no diretório de uploads, o estado guarda
+    # apenas o caminho relativo (baixado via rx.get_upload_url)
+    export_format: str = "xlsx"
+    compulab_export_file: str = ""
+    simus_export_file: str = ""
+    _conversion_dir: str = ""
     csv_generated: bool = False
     
     # PDF da análise
     analysis_pdf: str = ""
-    pdf_preview_b64: str = "" # Base64 for Split View Preview
+    # PDF gerado fica no blob_store; o estado guarda só o token e a URL de preview
+    _pdf_preview_token: str = ""
+    pdf_preview_url: str = ""
     pdf_url: str = ""  # URL do PDF salvo no Cloudinary
+    # Incrementado a cada pedido de PDF: renderizações adiadas de pedidos anteriores são descartadas
+    _report_generation: int = 0
     
     # Divergence Resolution & Patient History
     resolutions: Dict[str, str] = {} # Key: "patient_name|exam_name"
@@ -199,6 +358,135 @@ class AnalysisState(AuthState):
             "ai": "patients_only_compulab",
         }
         self.analysis_active_tab = mapping.get(val, val)
+        self.result_search = ""
+        self.result_sort_key = ""
+        self.result_sort_desc = False
+        self.result_page = 0
+        self._refresh_result_page()
+
+    # ===== TABELA DE RESULTADOS (paginação no servidor) =====
+
+    def _result_index(self) -> Optional[ResultIndex]:
+        """Índice da lista completa da aba atual (cache por sessão, versão e aba)."""
+        table = RESULT_TABLES.get(self.analysis_active_tab)
+        if table is None:
+            return None
+        attribute, search_keys = table
+        key = f"{self.router.session.client_token}|{self._results_version}|{self.analysis_active_tab}"
+        return result_index_cache.get_or_build(key, lambda: ResultIndex(getattr(self, attribute), search_keys))
+
+    def _refresh_result_page(self):
+        """Publica apenas a página corrente da aba atual."""
+        index = self._result_index()
+        rows, total = index.page(
+            self.result_search, self.result_sort_key, self.result_sort_desc, self.result_page, self.result_page_size
+        ) if index is not None else ([], 0)
+        last_page = max(0, (total - 1) // self.result_page_size)
+        if self.result_page > last_page:
+            self.result_page = last_page
+            rows, total = index.page(
+                self.result_search, self.result_sort_key, self.result_sort_desc, self.result_page, self.result_page_size
+            )
+        self.result_total_rows = total
+        if self.analysis_active_tab == "patient_matches":
+            self.result_match_rows = rows
+            self.result_rows = []
+        else:
+            self.result_rows = rows
+            self.result_match_rows = []
+
+    def _derived_index_sources(self) -> tuple:
+        return self._compulab_patients, self._simus_patients, self._exams_only_compulab, self._value_divergences
+
+    def _derived_index(self) -> DerivedIndex:
+        """Índices derivados da versão atual dos resultados (cache por sessão e versão)."""
+        key = f"{self.router.session.client_token}|{self._results_version}"
+        sources = self._derived_index_sources()
+        return derived_index_cache.get_or_build(key, lambda: DerivedIndex(*sources))
+
+    async def _warm_derived_index(self, mappings: bool = False):
+        """
+        Monta os índices derivados numa thread do job_service, para que as
+        variáveis computadas apenas leiam o cache. `mappings` inclui a parte
+        que depende dos mapeamentos (modal de vínculo).
+        """
+        key = f"{self.router.session.client_token}|{self._results_version}"
+        view_args = (mapping_service.get_fingerprint(), mapping_service.get_all_synonyms() or {}) if mappings else None
+        try:
+            await job_service.result(job_service.submit(
+                _build_derived_index_job,
+                key,
+                self._derived_index_sources(),
+                view_args,
+                name="indices_derivados",
+                lane=LANE_IO,
+                priority=PRIORITY_NORMAL,
+                owner=self._job_owner(),
+            ))
+        except JobCancelled:
+            pass
+        except Exception as e:
+            # As variáveis computadas montam o índice sob demanda
+            logger.debug(f"Pré-montagem dos índices derivados falhou: {e}")
+
+    def _publish_results(self):
+        """Novo conjunto de resultados: invalida os índices e volta à primeira página."""
+        result_index_cache.discard(f"{self.router.session.client_token}|")
+        derived_index_cache.discard(f"{self.router.session.client_token}|")
+        self._results_version += 1
+        self.result_page = 0
+        self._refresh_result_page()
+
+    def set_result_search(self, val: str):
+        self.result_search = val
+        self.result_page = 0
+        self._refresh_result_page()
+
+    def sort_results(self, key: str):
+        """Ordena pela coluna; clicar de novo inverte a ordem e na terceira volta à original."""
+        if self.result_sort_key != key:
+            self.result_sort_key, self.result_sort_desc = key, False
+        elif not self.result_sort_desc:
+            self.result_sort_desc = True
+        else:
+            self.result_sort_key, self.result_sort_desc = "", False
+        self.result_page = 0
+        self._refresh_result_page()
+
+    def set_result_page_size(self, val: str):
+        try:
+            self.result_page_size = max(1, int(val))
+        except (TypeError, ValueError):
+            return
+        self.result_page = 0
+        self._refresh_result_page()
+
+    def next_result_page(self):
+        if self.result_page < self.result_page_count - 1:
+            self.result_page += 1
+            self._refresh_result_page()
+
+    def prev_result_page(self):
+        if self.result_page > 0:
+            self.result_page -= 1
+            self._refresh_result_page()
+
+    @rx.var
+    def result_page_count(self) -> int:
+        return max(1, -(-self.result_total_rows // self.result_page_size))
+
+    @rx.var
+    def result_page_label(self) -> str:
+        """Ex.: "51–100 de 50.000"."""
+        if not self.result_total_rows:
+            return "Nenhum item"
+        start = self.result_page * self.result_page_size + 1
+        end = min(self.result_total_rows, start + self.result_page_size - 1)
+        return f"{start:,}–{end:,} de {self.result_total_rows:,}".replace(",", ".")
+
+    @rx.var
+    def result_page_size_option(self) -> str:
+        return str(self.result_page_size)
 
     def set_is_showing_patient_history(self, val: bool):
         self.is_showing_patient_history = val
@@ -231,6 +519,7 @@ class AnalysisState(AuthState):
         try:
             await mapping_service.load_mappings(force=True)
             self.mapping_version += 1
+            await self._warm_derived_index(mappings=True)
         finally:
             self.is_loading_mappings = False
             yield
@@ -256,12 +545,16 @@ class AnalysisState(AuthState):
             await mapping_service.add_mapping(simus_name, compulab_name)
             await mapping_service.load_mappings(force=True)
             self.mapping_version += 1
+            await self._warm_derived_index(mappings=self.is_link_modal_open)
             self.link_message = "✅ Link salvo."
             self.link_simus_exam = ""
             self.link_compulab_exam = ""
 
             if reprocess:
-                if self.has_files:
+                if self.has_analysis:
+                    async for _ in self.reapply_mappings():
+                        yield
+                elif self.has_files:
                     async for _ in self.run_analysis():
                         yield
                 else:
@@ -290,7 +583,7 @@ class AnalysisState(AuthState):
         mappings = mapping_service.get_all_synonyms() or {}
         payload = json.dumps(mappings, indent=2, ensure_ascii=False)
         filename = f"exam_mappings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        yield rx.download(data=payload.encode("utf-8"), filename=filename)
+        yield blob_download(payload, filename, "application/json")
         self.link_message = "✅ Exportacao gerada."
         yield
 
@@ -337,6 +630,7 @@ class AnalysisState(AuthState):
 
             await mapping_service.load_mappings(force=True)
             self.mapping_version += 1
+            await self._warm_derived_index(mappings=self.is_link_modal_open)
             self.link_message = f"✅ {imported} mapeamentos importados."
         except Exception as e:
             self.link_message = f"❌ Erro ao importar: {str(e)}"
@@ -382,40 +676,12 @@ class AnalysisState(AuthState):
     @rx.var
     def compulab_exam_names(self) -> List[str]:
         """Lista única de exames COMPULAB (para dropdown de mapeamento)."""
-        names = set()
-        for patient_data in self._compulab_patients.values():
-            exams = []
-            if isinstance(patient_data, dict):
-                exams = patient_data.get("exams", [])
-            elif isinstance(patient_data, list):
-                exams = patient_data
-            for exam in exams:
-                if isinstance(exam, dict):
-                    name = exam.get("exam_name", "")
-                else:
-                    name = getattr(exam, "exam_name", "")
-                if name:
-                    names.add(str(name).strip())
-        return sorted(list(names))
+        return self._derived_index().compulab_exam_names
 
     @rx.var
     def simus_exam_names(self) -> List[str]:
         """Lista única de exames SIMUS (para dropdown de mapeamento)."""
-        names = set()
-        for patient_data in self._simus_patients.values():
-            exams = []
-            if isinstance(patient_data, dict):
-                exams = patient_data.get("exams", [])
-            elif isinstance(patient_data, list):
-                exams = patient_data
-            for exam in exams:
-                if isinstance(exam, dict):
-                    name = exam.get("exam_name", "")
-                else:
-                    name = getattr(exam, "exam_name", "")
-                if name:
-                    names.add(str(name).strip())
-        return sorted(list(names))
+        return self._derived_index().simus_exam_names
 
     @rx.var
     def mapping_rows(self) -> List[Dict[str, str]]:
@@ -432,10 +698,6 @@ class AnalysisState(AuthState):
             ]
         return sorted(rows, key=lambda r: (r.get("canonical_name", ""), r.get("original_name", "")))
 
-    def _tokenize_exam_name(self, name: str) -> Set[str]:
-        normalized = pdf_processor.normalize_exam_name_for_comparison(name)
-        return {word for word in normalized.split() if len(word) >= 3}
-
     @rx.var
     def link_conflict_message(self) -> str:
         """Mensagem de conflito quando o SIMUS ja possui mapeamento."""
@@ -452,64 +714,25 @@ class AnalysisState(AuthState):
             return "Este link ja existe."
         return f"Ja existe um link para '{simus_name}' -> '{existing}'. Salvar vai substituir."
 
+    def _mapping_view(self) -> MappingView:
+        """Parte do índice derivado que depende do snapshot atual de mapeamentos."""
+        return self._derived_index().mapping_view(
+            mapping_service.get_fingerprint(), mapping_service.get_all_synonyms() or {}
+        )
+
     @rx.var
     def unmapped_simus_exam_names(self) -> List[str]:
         """Exames do SIMUS sem mapeamento cadastrado."""
         _ = self.mapping_version
-        mappings = mapping_service.get_all_synonyms() or {}
-        mapped_keys = {k.upper().strip() for k in mappings.keys()}
-        return [
-            name for name in self.simus_exam_names
-            if name and name.upper().strip() not in mapped_keys
-        ]
+        return self._mapping_view().unmapped_simus_exam_names
 
     @rx.var
     def suggested_mappings(self) -> List[Dict[str, Any]]:
         """Sugestoes de link baseadas em similaridade de nomes."""
         _ = self.mapping_version
-        if not self.is_link_modal_open:
-            return []
-        simus_candidates = self.unmapped_simus_exam_names[:60]
-        compulab_candidates = self.compulab_exam_names[:200]
-        if not simus_candidates or not compulab_candidates:
+        if not self.is_link_modal_open or self.is_loading_mappings:
             return []
-
-        comp_entries = []
-        for comp_name in compulab_candidates:
-            comp_norm = pdf_processor.normalize_exam_name_for_comparison(comp_name)
-            if not comp_norm:
-                continue
-            comp_entries.append((comp_name, comp_norm, self._tokenize_exam_name(comp_name)))
-
-        suggestions: List[Dict[str, Any]] = []
-        for simus_name in simus_candidates:
-            simus_norm = pdf_processor.normalize_exam_name_for_comparison(simus_name)
-            if not simus_norm:
-                continue
-            simus_tokens = self._tokenize_exam_name(simus_name)
-            best_score = 0.0
-            best_comp = None
-            best_overlap = 0
-            for comp_name, comp_norm, comp_tokens in comp_entries:
-                ratio = SequenceMatcher(None, simus_norm, comp_norm).ratio()
-                overlap = len(simus_tokens & comp_tokens)
-                score = ratio + (0.02 * overlap)
-                if score > best_score or (score == best_score and overlap > best_overlap):
-                    best_score = score
-                    best_comp = comp_name
-                    best_overlap = overlap
-            if best_comp and best_score >= 0.86:
-                score_pct = int(best_score * 100)
-                suggestions.append({
-                    "simus_name": simus_name,
-                    "compulab_name": best_comp,
-                    "score": round(best_score, 2),
-                    "score_pct": score_pct,
-                    "score_label": f"{score_pct}%",
-                })
-
-        suggestions.sort(key=lambda s: (-s.get("score", 0), s.get("simus_name", "")))
-        return suggestions[:12]
+        return self._mapping_view().suggested_mappings
 
     @rx.var
     def formatted_compulab_total(self) -> str:
@@ -550,11 +773,11 @@ class AnalysisState(AuthState):
     @rx.var
     def exams_only_simus_total(self) -> float:
         """Total de valores de exames somente no SIMUS."""
-        if not isinstance(self.exams_only_simus, list):
+        if not isinstance(self._exams_only_simus, list):
             return 0.0
         return sum(
             float(getattr(item, 'simus_value', 0) or getattr(item, 'value', 0))
-            for item in self.exams_only_simus
+            for item in self._exams_only_simus
         )
     
     # ===== NOVAS PROPRIEDADES COMPUTADAS - ANÁLISE PROFUNDA =====
@@ -633,18 +856,6 @@ class AnalysisState(AuthState):
         return "Analise Reaberta"
 
     # Aliases de compatibilidade para nomes antigos
-    @rx.var
-    def missing_patients(self) -> List[AnalysisResult]:
-        return self.patients_only_compulab
-
-    @rx.var
-    def missing_exams(self) -> List[AnalysisResult]:
-        return self.exams_only_compulab
-
-    @rx.var
-    def extra_simus_exams(self) -> List[AnalysisResult]:
-        return self.exams_only_simus
-
     @rx.var
     def missing_patients_count(self) -> int:
         return self.patients_only_compulab_count
@@ -694,20 +905,7 @@ class AnalysisState(AuthState):
     @rx.var
     def top_offenders(self) -> List[TopOffender]:
         """Retorna os top 5 exames com mais problemas (usado no Dashboard)"""
-        counts = {}
-        # Contar ocorrências em exams_only_compulab e value_divergences
-        for item in self.exams_only_compulab:
-            name = item.get("exam_name", "") if isinstance(item, dict) else getattr(item, "exam_name", "")
-            if name:
-                counts[name] = counts.get(name, 0) + 1
-                
-        for item in self.value_divergences:
-            name = item.get("exam_name", "") if isinstance(item, dict) else getattr(item, "exam_name", "")
-            if name:
-                counts[name] = counts.get(name, 0) + 1
-                
-        sorted_exams = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        return [TopOffender(name=str(name), count=int(count)) for name, count in sorted_exams]
+        return [TopOffender(name=name, count=count) for name, count in self._derived_index().top_offenders]
 
     # Patient History & Actions
 
@@ -797,10 +995,10 @@ class AnalysisState(AuthState):
     @rx.var
     def resolution_progress(self) -> int:
         """Percentual de divergências resolvidas na análise atual"""
-        total = len(self.exams_only_compulab) + len(self.value_divergences) + len(self.exams_only_simus)
+        total = len(self._exams_only_compulab) + len(self._value_divergences) + len(self._exams_only_simus)
         if total == 0: return 100
         resolved_count = 0
-        all_items = self.exams_only_compulab + self.value_divergences + self.exams_only_simus
+        all_items = self._exams_only_compulab + self._value_divergences + self._exams_only_simus
         for item in all_items:
             # Handle both dict and object (pydantic)
             patient = item.get('patient', '') if isinstance(item, dict) else getattr(item, 'patient', '')
@@ -841,8 +1039,8 @@ class AnalysisState(AuthState):
                 # Buscar nos itens da análise atual como fallback
                 entries = []
                 all_items = (
-                    self.patients_only_compulab + self.exams_only_compulab +
-                    self.value_divergences + self.exams_only_simus
+                    self._patients_only_compulab + self._exams_only_compulab +
+                    self._value_divergences + self._exams_only_simus
                 )
                 for item in all_items:
                     p = item.get("patient", "") if isinstance(item, dict) else getattr(item, "patient", "")
@@ -889,8 +1087,8 @@ class AnalysisState(AuthState):
         except Exception as e:
             logger.error(f"Erro ao persistir resolução: {e}")
 
-        # Regenerar PDF para refletir mudanças
-        await self.generate_pdf_report()
+        # Regenerar PDF após a pausa nas edições (cliques seguidos geram um único PDF)
+        yield self._schedule_report()
 
     async def set_annotation(self, patient: str, exam: str, error_type: str):
         """Atualiza anotação de um item, persiste no banco e reflete na UI/PDF."""
@@ -918,8 +1116,91 @@ class AnalysisState(AuthState):
         except Exception as e:
             logger.error(f"Erro ao persistir anotação: {e}")
 
-        # Regenerar PDF para refletir mudanças de anotação
-        await self.generate_pdf_report()
+        # Regenerar PDF após a pausa nas edições
+        yield self._schedule_report()
+
+    @staticmethod
+    def _analysis_source(file_path: str, file_url: str, label: str):
+        """Origem da planilha (caminho local ou bytes baixados) e o SHA-256 do conteúdo."""
+        from ..utils.extraction_cache import file_digest
+
+        if file_path and os.path.exists(file_path):
+            logger.debug(f"Carregando {label} de arquivo local: {file_path}")
+            return file_path, file_digest(file_path)
+        if file_url:
+            import requests
+
+            logger.debug(f"Carregando {label} de URL: {file_url}")
+            response = requests.get(file_url)
+            if response.status_code != 200:
+                raise Exception(f"Erro ao baixar {label}: HTTP {response.status_code}")
+            return response.content, hashlib.sha256(response.content).hexdigest()
+        raise Exception(f"Arquivo {label} não disponível")
+
+    def _apply_reconciliation(self, reconciliation: Reconciliation):
+        """Publica no estado o resultado canônico da conciliação."""
+        results = reconciliation.results
+        self._reconciliation_key = reconciliation.key
+        self._compulab_patients = reconciliation.compulab_patients
+        self._simus_patients = reconciliation.simus_patients
+        self.compulab_total = reconciliation.compulab_total
+        self.simus_total = reconciliation.simus_total
+
+        self._patients_only_compulab = list(results["patients_only_compulab"])
+        self._patients_only_simus = list(results["patients_only_simus"])
+        self._exams_only_compulab = list(results["exams_only_compulab"])
+        self._value_divergences = list(results["value_divergences"])
+        self._exams_only_simus = list(results["exams_only_simus"])
+        self._patient_matches = [
+            PatientMatch(
+                compulab_name=match.compulab_name,
+                simus_name=match.simus_name,
+                confidence=match.confidence,
+                kind=match.kind,
+            )
+            for match in reconciliation.matched_patients()
+        ]
+
+        self.patients_only_compulab_count = len(self._patients_only_compulab)
+        self.patients_only_compulab_total = sum(r.total_value for r in self._patients_only_compulab)
+        self.patients_only_simus_count = len(self._patients_only_simus)
+        self.patients_only_simus_total = sum(r.total_value for r in self._patients_only_simus)
+        self.exams_only_compulab_count = len(self._exams_only_compulab)
+        self.exams_only_compulab_total = sum(r.compulab_value for r in self._exams_only_compulab)
+        self.divergences_count = len(self._value_divergences)
+        self.divergences_total = sum(abs(r.difference) for r in self._value_divergences)
+        self.exams_only_simus_count = len(self._exams_only_simus)
+        self.patient_matches_count = len(self._patient_matches)
+        self._publish_results()
+
+    def _reconciliation(self) -> Optional[Reconciliation]:
+        """Resultado canônico da análise atual (recriado a partir do estado se saiu do cache)."""
+        if not self.has_analysis:
+            return None
+        reconciliation = reconciliation_service.get(self._reconciliation_key)
+        if reconciliation is None:
+            key = self._reconciliation_key or reconciliation_service.make_key(
+                self.current_tenant.id if self.current_tenant else "local",
+                patients_digest(self._compulab_patients),
+                patients_digest(self._simus_patients),
+            )
+            reconciliation = reconciliation_service.put(Reconciliation(
+                key,
+                self._compulab_patients,
+                self._simus_patients,
+                self.compulab_total,
+                self.simus_total,
+                {
+                    "patients_only_compulab": self._patients_only_compulab,
+                    "patients_only_simus": self._patients_only_simus,
+                    "exams_only_compulab": self._exams_only_compulab,
+                    "value_divergences": self._value_divergences,
+                    "exams_only_simus": self._exams_only_simus,
+                    "patient_matches": self._patient_matches or None,
+                },
+            ))
+            self._reconciliation_key = key
+        return reconciliation
 
     async def run_analysis(self):
         """Executa a análise comparativa REAL baseada nos arquivos carregados"""
@@ -933,237 +1214,81 @@ class AnalysisState(AuthState):
         
         try:
             # Importar funções de processamento
-            from ..utils.pdf_processor import load_from_excel, exam_names_match, canonicalize_exam_name
-            from decimal import Decimal
-            import requests
-            import io
+            from ..utils.pdf_processor import load_from_excel
 
             # Garantir mapeamentos carregados para comparaÃ§Ã£o correta
             await mapping_service.load_mappings()
             
-            # Verificar se os arquivos estão disponíveis (via URL ou path)
-            compulab_data = None
-            simus_data = None
-            
-            self.analysis_stage = "Carregando arquivo COMPULAB..."
-            self.analysis_progress_percentage = 10
-            yield
-            
-            # Carregar COMPULAB
-            if self.compulab_file_path and os.path.exists(self.compulab_file_path):
-                logger.debug(f"Carregando COMPULAB de arquivo local: {self.compulab_file_path}")
-                compulab_patients, compulab_total_val = load_from_excel(self.compulab_file_path)
-            elif self.compulab_file_url:
-                logger.debug(f"Carregando COMPULAB de URL: {self.compulab_file_url}")
-                response = requests.get(self.compulab_file_url)
-                if response.status_code == 200:
-                    compulab_patients, compulab_total_val = load_from_excel(response.content)
-                else:
-                    raise Exception(f"Erro ao baixar COMPULAB: HTTP {response.status_code}")
-            else:
-                raise Exception("Arquivo COMPULAB não disponível")
-            
-            if compulab_patients is None:
-                raise Exception("Falha ao processar arquivo COMPULAB")
-            
-            self.analysis_stage = "Carregando arquivo SIMUS..."
-            self.analysis_progress_percentage = 30
-            yield
-            
-            # Carregar SIMUS
-            if self.simus_file_path and os.path.exists(self.simus_file_path):
-                logger.debug(f"Carregando SIMUS de arquivo local: {self.simus_file_path}")
-                simus_patients, simus_total_val = load_from_excel(self.simus_file_path)
-            elif self.simus_file_url:
-                logger.debug(f"Carregando SIMUS de URL: {self.simus_file_url}")
-                response = requests.get(self.simus_file_url)
-                if response.status_code == 200:
-                    simus_patients, simus_total_val = load_from_excel(response.content)
-                else:
-                    raise Exception(f"Erro ao baixar SIMUS: HTTP {response.status_code}")
+            tenant_id = self.current_tenant.id if self.current_tenant else "local"
+            compulab_source, compulab_digest = self._analysis_source(
+                self.compulab_file_path, self.compulab_file_url, "COMPULAB"
+            )
+            simus_source, simus_digest = self._analysis_source(
+                self.simus_file_path, self.simus_file_url, "SIMUS"
+            )
+
+            # Mesmos arquivos e mesmos mapeamentos: reaproveita a conciliação já calculada
+            reconciliation_key = reconciliation_service.make_key(tenant_id, compulab_digest, simus_digest)
+            reconciliation = reconciliation_service.get(reconciliation_key)
+            if reconciliation is not None:
+                logger.debug("Conciliação reaproveitada do cache")
             else:
-                raise Exception("Arquivo SIMUS não disponível")
-            
-            if simus_patients is None:
-                raise Exception("Falha ao processar arquivo SIMUS")
-            
-            logger.debug(f"COMPULAB: {len(compulab_patients)} pacientes, Total: {compulab_total_val}")
-            logger.debug(f"SIMUS: {len(simus_patients)} pacientes, Total: {simus_total_val}")
-            
-            self.analysis_stage = "Comparando dados..."
-            self.analysis_progress_percentage = 50
-            yield
-            
-            # Atualizar totais
-            self.compulab_total = float(compulab_total_val or 0)
-            self.simus_total = float(simus_total_val or 0)
-            
-            # Armazenar dados internos para comparação
-            self._compulab_patients = dict(compulab_patients)
-            self._simus_patients = dict(simus_patients)
-            
-            def build_patient_summary(patient_name: str, exams: list[dict]) -> AnalysisResult:
-                exams_count = len(exams)
-                total_value = sum(float(exam.get('value', 0) or 0) for exam in exams)
-                return AnalysisResult(
-                    patient=patient_name,
-                    exam_name=f"{exams_count} exame(s)",
-                    value=total_value,
-                    exams_count=exams_count,
-                    total_value=total_value,
-                )
+                self.analysis_stage = "Carregando arquivo COMPULAB..."
+                self.analysis_progress_percentage = 10
+                yield
 
-            def compute_results(comp_data: dict, sim_data: dict) -> dict:
-                """Executa a comparação pesada em thread para não bloquear o loop."""
-                patients_only_compulab_list: list[AnalysisResult] = []
-                patients_only_simus_list: list[AnalysisResult] = []
-                exams_only_compulab_list: list[AnalysisResult] = []
-                value_divergences_list: list[AnalysisResult] = []
-                exams_only_simus_list: list[AnalysisResult] = []
-
-                compulab_patient_names = set(comp_data.keys())
-                simus_patient_names = set(sim_data.keys())
-
-                # Pacientes somente COMPULAB
-                for patient_name in compulab_patient_names - simus_patient_names:
-                    patient_data = comp_data[patient_name]
-                    patients_only_compulab_list.append(
-                        build_patient_summary(patient_name, patient_data.get('exams', []))
-                    )
+                compulab_patients, compulab_total_val = load_from_excel(compulab_source)
+                if compulab_patients is None:
+                    raise Exception("Falha ao processar arquivo COMPULAB")
 
-                # Pacientes somente SIMUS
-                for patient_name in simus_patient_names - compulab_patient_names:
-                    patient_data = sim_data[patient_name]
-                    patients_only_simus_list.append(
-                        build_patient_summary(patient_name, patient_data.get('exams', []))
-                    )
+                self.analysis_stage = "Carregando arquivo SIMUS..."
+                self.analysis_progress_percentage = 30
+                yield
 
-                # Exames somente COMPULAB, diferenças e extras no SIMUS
-                common_patients = list(compulab_patient_names & simus_patient_names)
-                for patient_name in common_patients:
-                    compulab_exams = comp_data[patient_name]['exams']
-                    simus_exams = sim_data[patient_name]['exams']
-
-                    simus_exam_map = {}
-                    simus_code_map = {}
-                    for exam in simus_exams:
-                        exam.pop('_matched', None)
-                        exam_key = canonicalize_exam_name(exam['exam_name'])
-                        simus_exam_map.setdefault(exam_key, []).append(exam)
-                        exam_code = str(exam.get('code', '')).strip()
-                        if exam_code:
-                            simus_code_map.setdefault(exam_code, []).append(exam)
-
-                    for comp_exam in compulab_exams:
-                        comp_name = comp_exam['exam_name']
-                        comp_key = canonicalize_exam_name(comp_name)
-                        comp_value = float(comp_exam['value'])
-                        comp_code = str(comp_exam.get('code', '')).strip()
-
-                        found_match = False
-                        matched_simus_exam = None
-
-                        if comp_code and comp_code in simus_code_map:
-                            for simus_exam in simus_code_map[comp_code]:
-                                if not simus_exam.get('_matched'):
-                                    matched_simus_exam = simus_exam
-                                    found_match = True
-                                    simus_exam['_matched'] = True
-                                    break
-
-                        direct_candidates = simus_exam_map.get(comp_key, [])
-                        if not found_match:
-                            for simus_exam in direct_candidates:
-                                if not simus_exam.get('_matched'):
-                                    matched_simus_exam = simus_exam
-                                    found_match = True
-                                    simus_exam['_matched'] = True
-                                    break
-
-                        if not found_match:
-                            for simus_key, simus_exam_list in simus_exam_map.items():
-                                if exam_names_match(comp_key, simus_key):
-                                    for simus_exam in simus_exam_list:
-                                        if not simus_exam.get('_matched'):
-                                            matched_simus_exam = simus_exam
-                                            found_match = True
-                                            simus_exam['_matched'] = True
-                                            break
-                                    if found_match:
-                                        break
-
-                        if not found_match:
-                            exams_only_compulab_list.append(
-                                AnalysisResult(
-                                    patient=patient_name,
-                                    exam_name=comp_exam['exam_name'],
-                                    value=comp_value,
-                                    compulab_value=comp_value,
-                                )
-                            )
-                        elif matched_simus_exam:
-                            simus_value = float(matched_simus_exam['value'])
-                            diff = abs(comp_value - simus_value)
-                            if diff > 0.01:
-                                value_divergences_list.append(
-                                    AnalysisResult(
-                                        patient=patient_name,
-                                        exam_name=comp_exam['exam_name'],
-                                        compulab_value=comp_value,
-                                        simus_value=simus_value,
-                                        difference=comp_value - simus_value,
-                                    )
-                                )
-
-                for patient_name in common_patients:
-                    simus_exams = sim_data[patient_name]['exams']
-                    for simus_exam in simus_exams:
-                        if not simus_exam.get('_matched'):
-                            exams_only_simus_list.append(
-                                AnalysisResult(
-                                    patient=patient_name,
-                                    exam_name=simus_exam['exam_name'],
-                                    simus_value=float(simus_exam['value']),
-                                )
-                            )
-
-                return {
-                    "patients_only_compulab": patients_only_compulab_list,
-                    "patients_only_simus": patients_only_simus_list,
-                    "exams_only_compulab": exams_only_compulab_list,
-                    "value_divergences": value_divergences_list,
-                    "exams_only_simus": exams_only_simus_list,
-                }
+                simus_patients, simus_total_val = load_from_excel(simus_source)
+                if simus_patients is None:
+                    raise Exception("Falha ao processar arquivo SIMUS")
 
-            self.analysis_stage = "Analisando exames..."
-            self.analysis_progress_percentage = 70
-            yield
+                logger.debug(f"COMPULAB: {len(compulab_patients)} pacientes, Total: {compulab_total_val}")
+                logger.debug(f"SIMUS: {len(simus_patients)} pacientes, Total: {simus_total_val}")
+
+                self.analysis_stage = "Analisando exames..."
+                self.analysis_progress_percentage = 70
+                yield
+
+                job_id = job_service.submit(
+                    _compare_patients_job,
+                    compulab_patients,
+                    simus_patients,
+                    name="comparacao",
+                    priority=PRIORITY_HIGH,
+                    owner=self._job_owner(),
+                )
+                self.analysis_job_id = job_id
+                try:
+                    async for job in job_service.watch(job_id):
+                        if job.status == STATUS_QUEUED:
+                            self.analysis_stage = f"Aguardando na fila ({job_service.queue_position(job_id)})..."
+                        else:
+                            self.analysis_stage = "Analisando exames..."
+                            self.analysis_progress_percentage = 70 + job.progress * 25 // 100
+                        yield
+                    results = await job_service.result(job_id)
+                finally:
+                    job_service.cancel(job_id)
+
+                reconciliation = reconciliation_service.put(Reconciliation(
+                    reconciliation_key,
+                    compulab_patients,
+                    simus_patients,
+                    float(compulab_total_val or 0),
+                    float(simus_total_val or 0),
+                    results,
+                ))
+
+            self._apply_reconciliation(reconciliation)
+            await self._warm_derived_index()
 
-            results = await asyncio.to_thread(compute_results, compulab_patients, simus_patients)
-
-            patients_only_compulab_list = results["patients_only_compulab"]
-            patients_only_simus_list = results["patients_only_simus"]
-            exams_only_compulab_list = results["exams_only_compulab"]
-            value_divergences_list = results["value_divergences"]
-            exams_only_simus_list = results["exams_only_simus"]
-            # Atualizar estados com resultados
-            self.patients_only_compulab = patients_only_compulab_list
-            self.patients_only_simus = patients_only_simus_list
-            self.exams_only_compulab = exams_only_compulab_list
-            self.value_divergences = value_divergences_list
-            self.exams_only_simus = exams_only_simus_list
-            
-            # Calcular totais
-            self.patients_only_compulab_count = len(patients_only_compulab_list)
-            self.patients_only_compulab_total = sum(r.total_value for r in patients_only_compulab_list)
-            self.patients_only_simus_count = len(patients_only_simus_list)
-            self.patients_only_simus_total = sum(r.total_value for r in patients_only_simus_list)
-            self.exams_only_compulab_count = len(exams_only_compulab_list)
-            self.exams_only_compulab_total = sum(r.compulab_value for r in exams_only_compulab_list)
-            self.divergences_count = len(value_divergences_list)
-            self.divergences_total = sum(abs(r.difference) for r in value_divergences_list)
-            self.exams_only_simus_count = len(exams_only_simus_list)
-            
             self.analysis_progress_percentage = 100
             self.analysis_stage = "Concluído"
             
@@ -1181,6 +1306,10 @@ class AnalysisState(AuthState):
             async for _ in self.run_deep_analysis():
                 yield
             
+        except JobCancelled:
+            self.error_message = "Análise cancelada."
+            self.analysis_stage = "Cancelado"
+            yield
         except Exception as e:
             logger.debug(f"run_analysis EXCEPTION: {e}")
             import traceback
@@ -1196,6 +1325,42 @@ class AnalysisState(AuthState):
             if not self.error_message:
                 await self.generate_pdf_report()
             
+    async def reapply_mappings(self):
+        """
+        Reconcilia a análise atual sob os mapeamentos vigentes sem reler os arquivos.
+
+        Só os pacientes com exames afetados pelos mapeamentos alterados são
+        recomparados (reconciliation_service.relink); a análise profunda é
+        reaproveitada e apenas o breakdown e o resumo são refeitos.
+        """
+        reconciliation = self._reconciliation()
+        if reconciliation is None:
+            return
+
+        self.is_analyzing = True
+        self.analysis_stage = "Aplicando mapeamentos..."
+        self.error_message = ""
+        yield
+
+        try:
+            reconciliation = reconciliation_service.relink(reconciliation)
+            self._apply_reconciliation(reconciliation)
+            await self._warm_derived_index(mappings=self.is_link_modal_open)
+            self.analysis_stage = "Concluído"
+            yield
+            async for _ in self.run_deep_analysis():
+                yield
+        except Exception as e:
+            logger.error(f"Erro ao aplicar mapeamentos: {e}")
+            self.error_message = f"Erro na análise: {str(e)}"
+            self.analysis_stage = "Erro"
+            yield
+        finally:
+            self.is_analyzing = False
+            yield
+            if not self.error_message:
+                await self.generate_pdf_report()
+
     # generate_ai_analysis foi movido para AIState
     
     async def run_deep_analysis(self):
@@ -1206,65 +1371,30 @@ class AnalysisState(AuthState):
         
         try:
             from ..utils.analysis_module import (
-                analyze_patient_count_difference,
-                detect_repeated_exams,
                 calculate_difference_breakdown,
                 generate_executive_summary,
             )
-            import pandas as pd
             from datetime import datetime
             
-            self.analysis_stage = "Análise profunda: processando..."
-            yield
-            
-            # Construir DataFrames
-            compulab_rows = []
-            for patient_name, data in self._compulab_patients.items():
-                exams = data.get('exams', []) if isinstance(data, dict) else (data if isinstance(data, list) else [])
-                for exam in exams:
-                    if isinstance(exam, dict):
-                        compulab_rows.append({
-                            'Paciente': patient_name,
-                            'Nome_Exame': exam.get('exam_name', ''),
-                            'Codigo_Exame': exam.get('code', ''),
-                            'Valor': exam.get('value', 0) or 0,
-                        })
-            
-            simus_rows = []
-            for patient_name, data in self._simus_patients.items():
-                exams = data.get('exams', []) if isinstance(data, dict) else (data if isinstance(data, list) else [])
-                for exam in exams:
-                    if isinstance(exam, dict):
-                        simus_rows.append({
-                            'Paciente': patient_name,
-                            'Nome_Exame': exam.get('exam_name', ''),
-                            'Codigo_Exame': exam.get('code', ''),
-                            'Valor': exam.get('value', 0) or 0,
-                        })
-            
-            if not compulab_rows or not simus_rows:
+            reconciliation = self._reconciliation()
+            if reconciliation is None or any(df.empty for df in reconciliation.frames()):
                 logger.debug("Dados vazios, pulando análise profunda")
                 return
-                
-            df_compulab = pd.DataFrame(compulab_rows)
-            df_simus = pd.DataFrame(simus_rows)
-            
-            self.analysis_stage = "Análise profunda: pacientes extras..."
+
+            self.analysis_stage = "Análise profunda: pacientes extras e exames repetidos..."
             yield
             
+            # Pacientes extras e exames repetidos: calculados uma vez por conciliação
+            patient_analysis, repeated_analysis = reconciliation.deep_analysis()
+
             # 1. Pacientes extras
-            patient_analysis = analyze_patient_count_difference(df_compulab, df_simus)
             self.extra_patients_analysis = patient_analysis
             self.extra_patients_count = patient_analysis.get("extra_patients_count", 0)
             self.extra_patients_value = patient_analysis.get("extra_patients_value", 0.0)
             logger.debug(f"Extras: {self.extra_patients_count} pacientes, R$ {self.extra_patients_value}")
             yield
             
-            self.analysis_stage = "Análise profunda: exames repetidos..."
-            yield
-            
             # 2. Exames repetidos
-            repeated_analysis = detect_repeated_exams(df_compulab, df_simus)
             self.repeated_exams_analysis = repeated_analysis
             self.repeated_exams_count = repeated_analysis.get("total_repeated_count", 0)
             self.repeated_exams_value = repeated_analysis.get("total_repeated_value", 0.0)
@@ -1320,95 +1450,145 @@ class AnalysisState(AuthState):
             import traceback
             traceback.print_exc()
             
+    def _report_signature(self) -> str:
+        """Resoluções e anotações que alteram o conteúdo do PDF."""
+        resolved = sorted(key for key, status in self.resolutions.items() if status == "resolvido")
+        return json.dumps([resolved, sorted(self.annotations.items())], ensure_ascii=True)
+
+    def _report_snapshot(self, reconciliation: Reconciliation) -> tuple:
+        """
+        (assinatura, resumo, seções) do PDF. Cada seção fica memorizada na
+        conciliação pela parte do estado de que depende: o resumo pelas
+        resoluções, os pacientes pelas anotações e os exames por ambas.
+        """
+        resolved = json.dumps(sorted(key for key, status in self.resolutions.items() if status == "resolvido"))
+        annotated = json.dumps(sorted(self.annotations.items()), ensure_ascii=True)
+        results = reconciliation.results
+        unresolved: Dict[str, list] = {}
+
+        def unresolved_items() -> Dict[str, list]:
+            if not unresolved:
+                unresolved.update(zip(("exams_only_compulab", "divergences", "exams_only_simus"),
+                                      self._get_unresolved_report_items()))
+            return unresolved
+
+        def section(kind: str, signature: str, build) -> Any:
+            cached = reconciliation.lookup(("pdf_section", kind))
+            if cached and cached[0] == signature:
+                return cached[1]
+            data = build()
+            reconciliation.store(("pdf_section", kind), (signature, data))
+            return data
+
+        summary = section("summary", resolved, lambda: report_summary(
+            reconciliation.compulab_total,
+            reconciliation.simus_total,
+            results["patients_only_compulab"],
+            results["patients_only_simus"],
+            *unresolved_items().values(),
+            self.top_offenders,
+        ))
+        details = []
+        for kind in DETAIL_SECTIONS:
+            if kind in _ANNOTATION_ONLY_SECTIONS:
+                details.append(section(kind, annotated, lambda: report_detail(kind, results[kind], self.annotations)))
+            else:
+                details.append(section(kind, f"{resolved}|{annotated}",
+                                       lambda: report_detail(kind, unresolved_items()[kind], self.annotations)))
+        return self._report_signature(), summary, details
+
+    async def _render_report_pdf(self, reconciliation: Reconciliation, name: str, priority: int) -> bytes:
+        """PDF da conciliação; reaproveitado enquanto resoluções e anotações não mudarem."""
+        return await _render_report_snapshot(reconciliation, self._report_snapshot(reconciliation),
+                                             name, priority, self._job_owner())
+
+    def _publish_report_preview(self, pdf_bytes: bytes):
+        """Substitui o PDF de preview no blob_store."""
+        blob_store.delete(self._pdf_preview_token)
+        self._pdf_preview_token = blob_store.put(pdf_bytes, "relatorio_analise.pdf", "application/pdf")
+        self.pdf_preview_url = blob_store.url(self._pdf_preview_token, "relatorio_analise.pdf", inline=True)
+
+    def _schedule_report(self):
+        """Adia a regeneração do PDF; só o último pedido de uma sequência de edições é renderizado."""
+        self._report_generation += 1
+        # A geração segue no evento: tarefas enfileiradas de cliques anteriores ficam obsoletas
+        return AnalysisState.render_report_when_idle(self._report_generation)
+
+    @rx.event(background=True)
+    async def render_report_when_idle(self, generation: int):
+        """Regenera e envia o PDF depois de REPORT_DEBOUNCE_SECONDS sem novas edições."""
+        await asyncio.sleep(REPORT_DEBOUNCE_SECONDS)
+
+        async with self:
+            if generation != self._report_generation:
+                return
+            reconciliation = self._reconciliation()
+            if reconciliation is None:
+                return
+            snapshot = self._report_snapshot(reconciliation)
+            owner = self._job_owner()
+
+        try:
+            # Renderização e upload fora do lock do estado: a tela continua respondendo
+            pdf_bytes = await _render_report_snapshot(reconciliation, snapshot, "relatorio_pdf", PRIORITY_LOW, owner)
+            async with self:
+                if generation != self._report_generation:
+                    return
+                self._publish_report_preview(pdf_bytes)
+                logger.debug("PDF Generated")
+
+            url = await _upload_report_pdf(reconciliation, snapshot[0], pdf_bytes, owner)
+            if url:
+                async with self:
+                    if generation == self._report_generation:
+                        self.pdf_url = url
+        except JobCancelled:
+            logger.debug("Geração do PDF cancelada")
+        except Exception as e:
+            logger.error(f"Erro ao gerar PDF: {e}")
+            async with self:
+                self.error_message = f"Erro ao gerar PDF: {str(e)}"
+
     async def generate_pdf_report(self):
         """Gera relatório PDF da análise e faz upload automático"""
-        if not self.has_analysis:
+        # Descarta regenerações adiadas: este PDF já reflete o estado atual
+        self._report_generation += 1
+        reconciliation = self._reconciliation()
+        if reconciliation is None:
             return
             
         try:
-            filtered_missing, filtered_divergences, filtered_extras = self._get_unresolved_report_items()
-            
-            # Executar em thread pool para não bloquear
-            loop = asyncio.get_event_loop()
-            pdf_bytes = await loop.run_in_executor(
-                None,
-                lambda: generate_analysis_pdf(
-                    self.compulab_total,
-                    self.simus_total,
-                    self.patients_only_compulab,
-                    self.patients_only_simus,
-                    filtered_missing,
-                    filtered_divergences,
-                    filtered_extras,
-                    self.top_offenders,
-                    self.annotations,
-                )
-            )
-            
-            self.pdf_preview_b64 = base64.b64encode(pdf_bytes).decode('utf-8')
+            # Renderizar na fila de tarefas (prioridade baixa: não atrasa conversões/análises)
+            snapshot = self._report_snapshot(reconciliation)
+            pdf_bytes = await _render_report_snapshot(reconciliation, snapshot, "relatorio_pdf", PRIORITY_LOW,
+                                                      self._job_owner())
+            self._publish_report_preview(pdf_bytes)
             logger.debug("PDF Generated")
-            
+
             # Upload automático do PDF para Cloudinary
-            try:
-                import tempfile
-                import os
-                from ..services.cloudinary_service import CloudinaryService
-                
-                cloudinary_service = CloudinaryService()
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                    tmp.write(pdf_bytes)
-                    tmp_path = tmp.name
-                
-                # Usar upload_pdf para melhor visualização
-                url = await loop.run_in_executor(
-                    None,
-                    lambda: cloudinary_service.upload_pdf(tmp_path)
-                )
-                
-                if url:
-                    self.pdf_url = url
-                    logger.debug(f"PDF uploaded to Cloudinary: {url}")
-                
-                # Limpar temp
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
-                    
-            except Exception as upload_err:
-                logger.debug(f"Upload PDF failed (will use base64): {upload_err}")
-                # Se upload falhar, ainda temos o base64
+            url = await _upload_report_pdf(reconciliation, snapshot[0], pdf_bytes, self._job_owner())
+            if url:
+                self.pdf_url = url
             
+        except JobCancelled:
+            logger.debug("Geração do PDF cancelada")
         except Exception as e:
             logger.error(f"Erro ao gerar PDF: {e}")
             self.error_message = f"Erro ao gerar PDF: {str(e)}"
 
     async def download_analysis_pdf(self):
         """Gera e baixa o PDF da análise."""
-        if not self.has_analysis:
+        reconciliation = self._reconciliation()
+        if reconciliation is None:
             self.error_message = "Nenhuma análise disponível para exportar."
             return
 
         try:
-            filtered_missing, filtered_divergences, filtered_extras = self._get_unresolved_report_items()
-            loop = asyncio.get_event_loop()
-            pdf_bytes = await loop.run_in_executor(
-                None,
-                lambda: generate_analysis_pdf(
-                    self.compulab_total,
-                    self.simus_total,
-                    self.patients_only_compulab,
-                    self.patients_only_simus,
-                    filtered_missing,
-                    filtered_divergences,
-                    filtered_extras,
-                    self.top_offenders,
-                    self.annotations,
-                )
-            )
+            pdf_bytes = await self._render_report_pdf(reconciliation, "relatorio_pdf_download", PRIORITY_HIGH)
             filename = f"relatorio_analise_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            yield rx.download(data=pdf_bytes, filename=filename)
+            yield blob_download(pdf_bytes, filename, "application/pdf")
+        except JobCancelled:
+            logger.debug("Download do PDF cancelado")
         except Exception as e:
             logger.error(f"Erro ao gerar PDF para download: {e}")
             self.error_message = f"Erro ao gerar PDF: {str(e)}"
@@ -1438,7 +1618,7 @@ class AnalysisState(AuthState):
             ])
 
         # Divergências de valor
-        for item in self.value_divergences:
+        for item in self._value_divergences:
             write_row(
                 "DIVERGENCIA_VALOR",
                 getattr(item, "patient", ""),
@@ -1448,7 +1628,7 @@ class AnalysisState(AuthState):
             )
 
         # Exames faltantes no SIMUS
-        for item in self.exams_only_compulab:
+        for item in self._exams_only_compulab:
             write_row(
                 "EXAME_FALTANTE_SIMUS",
                 getattr(item, "patient", ""),
@@ -1458,7 +1638,7 @@ class AnalysisState(AuthState):
             )
 
         # Exames extras no SIMUS
-        for item in self.exams_only_simus:
+        for item in self._exams_only_simus:
             write_row(
                 "EXAME_EXTRA_SIMUS",
                 getattr(item, "patient", ""),
@@ -1468,7 +1648,7 @@ class AnalysisState(AuthState):
             )
 
         # Pacientes faltantes no SIMUS
-        for item in self.patients_only_compulab:
+        for item in self._patients_only_compulab:
             write_row(
                 "PACIENTE_FALTANTE_SIMUS",
                 getattr(item, "patient", ""),
@@ -1478,7 +1658,7 @@ class AnalysisState(AuthState):
             )
 
         # Pacientes extras no SIMUS
-        for item in self.patients_only_simus:
+        for item in self._patients_only_simus:
             write_row(
                 "PACIENTE_EXTRA_SIMUS",
                 getattr(item, "patient", ""),
@@ -1489,7 +1669,7 @@ class AnalysisState(AuthState):
 
         csv_content = output.getvalue()
         filename = f"analise_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return rx.download(data=csv_content.encode('utf-8-sig'), filename=filename)
+        return blob_download(csv_content.encode('utf-8-sig'), filename, "text/csv")
 
     # ===== UPLOAD HANDLERS =====
 
@@ -1575,7 +1755,7 @@ class AnalysisState(AuthState):
             self.compulab_file_name = file.name
             self.compulab_file_path = tmp_file_path
             self.compulab_file_size_bytes = total_size
-            self.compulab_file_bytes = b""  # Não armazenar bytes para arquivos grandes
+            self._compulab_file_bytes = b""  # Não armazenar bytes para arquivos grandes
             
             # --- Upload para Cloudinary ---
             self.processing_status = "☁️ Enviando para nuvem (Cloudinary)..."
@@ -1694,7 +1874,7 @@ class AnalysisState(AuthState):
             self.simus_file_name = file.name
             self.simus_file_path = tmp_file_path
             self.simus_file_size_bytes = total_size
-            self.simus_file_bytes = b""  # Não armazenar bytes para arquivos grandes
+            self._simus_file_bytes = b""  # Não armazenar bytes para arquivos grandes
             
             # --- Upload para Cloudinary ---
             self.processing_status = "☁️ Enviando para nuvem (Cloudinary)..."
@@ -1742,12 +1922,12 @@ class AnalysisState(AuthState):
         self.compulab_file_name = ""
         self.compulab_file_path = ""
         self.compulab_file_url = ""
-        self.compulab_file_bytes = b""
+        self._compulab_file_bytes = b""
         self.compulab_file_size_bytes = 0
         self.success_message = ""
         self.error_message = ""
         self.csv_generated = False
-        self.compulab_csv = ""
+        self._discard_converted_files()
     
     def clear_simus_file(self):
         """Remove o arquivo SIMUS"""
@@ -1759,12 +1939,12 @@ class AnalysisState(AuthState):
         self.simus_file_name = ""
         self.simus_file_path = ""
         self.simus_file_url = ""
-        self.simus_file_bytes = b""
+        self._simus_file_bytes = b""
         self.simus_file_size_bytes = 0
         self.success_message = ""
         self.error_message = ""
         self.csv_generated = False
-        self.simus_csv = ""
+        self._discard_converted_files()
     
     def clear_all_files(self):
         """Remove todos os arquivos"""
@@ -1774,11 +1954,11 @@ class AnalysisState(AuthState):
 
     def clear_analysis(self):
         """Limpa resultados da análise"""
-        self.patients_only_compulab = []
-        self.patients_only_simus = []
-        self.exams_only_compulab = []
-        self.value_divergences = []
-        self.exams_only_simus = []
+        self._patients_only_compulab = []
+        self._patients_only_simus = []
+        self._exams_only_compulab = []
+        self._value_divergences = []
+        self._exams_only_simus = []
         self.patients_only_compulab_count = 0
         self.patients_only_compulab_total = 0.0
         self.patients_only_simus_count = 0
@@ -1788,11 +1968,19 @@ class AnalysisState(AuthState):
         self.divergences_count = 0
         self.divergences_total = 0.0
         self.exams_only_simus_count = 0
+        self._patient_matches = []
+        self.patient_matches_count = 0
+        self._publish_results()
+        self._reconciliation_key = ""
         self.analysis_progress_percentage = 0
         self.analysis_stage = ""
         self.is_analyzing = False
         self.resolutions = {}
         self.annotations = {}
+        self._report_generation += 1
+        blob_store.delete(self._pdf_preview_token)
+        self._pdf_preview_token = ""
+        self.pdf_preview_url = ""
         self.clear_deep_analysis()
     
     def clear_deep_analysis(self):
@@ -1828,93 +2016,78 @@ class AnalysisState(AuthState):
         self.csv_stage = "Iniciando conversão..."
         yield
         
+        temp_inputs: List[str] = []
         try:
-            from ..utils.pdf_processor import generate_excel_from_pdfs
             # Garantir mapeamentos carregados para conversÃ£o mais precisa
             await mapping_service.load_mappings()
             
-            # Variável compartilhada para armazenar progresso (thread-safe)
-            progress_state = {"percentage": 0, "stage": ""}
-            
-            # Callback para atualizar progresso
-            def update_progress(percentage: int, stage: str):
-                progress_state["percentage"] = percentage
-                progress_state["stage"] = stage
-            
-            # Ler arquivos do disco se existirem, senão usar bytes (compatibilidade)
-            compulab_bytes = b""
-            simus_bytes = b""
-            
-            # DEBUG: Log para diagnóstico
-            logger.debug(f"generate_csvs: compulab_file_path='{self.compulab_file_path}'")
-            logger.debug(f"generate_csvs: simus_file_path='{self.simus_file_path}'")
-            logger.debug(f"generate_csvs: compulab_file_path exists={os.path.exists(self.compulab_file_path) if self.compulab_file_path else 'N/A'}")
-            logger.debug(f"generate_csvs: simus_file_path exists={os.path.exists(self.simus_file_path) if self.simus_file_path else 'N/A'}")
-            
-            if self.compulab_file_path and os.path.exists(self.compulab_file_path):
-                with open(self.compulab_file_path, 'rb') as f:
-                    compulab_bytes = f.read()
-                logger.debug(f"generate_csvs: compulab_bytes lidos do disco, tamanho={len(compulab_bytes)} bytes")
-            else:
-                compulab_bytes = self.compulab_file_bytes
-                logger.debug(f"generate_csvs: usando compulab_file_bytes em memória, tamanho={len(compulab_bytes)} bytes")
-            
-            if self.simus_file_path and os.path.exists(self.simus_file_path):
-                with open(self.simus_file_path, 'rb') as f:
-                    simus_bytes = f.read()
-                logger.debug(f"generate_csvs: simus_bytes lidos do disco, tamanho={len(simus_bytes)} bytes")
-            else:
-                simus_bytes = self.simus_file_bytes
-                logger.debug(f"generate_csvs: usando simus_file_bytes em memória, tamanho={len(simus_bytes)} bytes")
+            # Usar os arquivos em disco; bytes em memória (compatibilidade) vão para um temporário
+            compulab_path = self._conversion_input_path(self.compulab_file_path, self._compulab_file_bytes, temp_inputs)
+            simus_path = self._conversion_input_path(self.simus_file_path, self._simus_file_bytes, temp_inputs)
+            logger.debug(f"generate_csvs: compulab_path='{compulab_path}', simus_path='{simus_path}'")
             
-            # Validar se os bytes foram lidos
-            if len(compulab_bytes) == 0:
+            # Validar se os arquivos estão disponíveis
+            if not compulab_path:
                 self.error_message = "ERRO: Arquivo COMPULAB está vazio ou não foi carregado. Tente fazer upload novamente."
-                logger.debug("generate_csvs: ERRO - compulab_bytes está vazio!")
+                logger.debug("generate_csvs: ERRO - arquivo COMPULAB vazio!")
                 yield
                 return
                 
-            if len(simus_bytes) == 0:
+            if not simus_path:
                 self.error_message = "ERRO: Arquivo SIMUS está vazio ou não foi carregado. Tente fazer upload novamente."
-                logger.debug("generate_csvs: ERRO - simus_bytes está vazio!")
+                logger.debug("generate_csvs: ERRO - arquivo SIMUS vazio!")
                 yield
                 return
             
-            logger.debug("generate_csvs: Iniciando processamento com ThreadPoolExecutor...")
-            
-            with ThreadPoolExecutor() as executor:
-                future = executor.submit(
-                    generate_excel_from_pdfs,
-                    compulab_bytes,
-                    simus_bytes,
-                    update_progress
-                )
-                
-                while not future.done():
-                    self.csv_progress_percentage = progress_state["percentage"]
-                    self.csv_stage = progress_state["stage"]
+            self._discard_converted_files()
+            output_dir = _conversion_output_dir()
+            self._conversion_dir = output_dir
+            logger.debug("generate_csvs: Enfileirando conversão no job_service...")
+            
+            job_id = job_service.submit(
+                _convert_pdfs_job,
+                compulab_path,
+                simus_path,
+                output_dir,
+                self.export_format,
+                pdf_processor.PDF_PARSER_WORKERS or job_service.parser_workers(),
+                name="conversao_pdf",
+                priority=PRIORITY_NORMAL,
+                owner=self._job_owner(),
+            )
+            self.csv_job_id = job_id
+            try:
+                async for job in job_service.watch(job_id):
+                    if job.status == STATUS_QUEUED:
+                        self.csv_stage = f"Aguardando na fila ({job_service.queue_position(job_id)})..."
+                    else:
+                        self.csv_progress_percentage = job.progress
+                        self.csv_stage = job.stage
                     yield
-                    await asyncio.sleep(0.2)
-                
-                compulab_csv, simus_csv, success = future.result()
-                
-                self.csv_progress_percentage = progress_state["percentage"]
-                self.csv_stage = progress_state["stage"]
-                yield
+                compulab_out, simus_out, success = await job_service.result(job_id)
+            finally:
+                # Handler interrompido (ex.: navegador desconectado): não deixar a tarefa rodando
+                job_service.cancel(job_id)
             
             if success:
-                self.compulab_csv = compulab_csv
-                self.simus_csv = simus_csv
+                upload_dir = str(rx.get_upload_dir())
+                self.compulab_export_file = os.path.relpath(compulab_out, upload_dir).replace(os.sep, "/")
+                self.simus_export_file = os.path.relpath(simus_out, upload_dir).replace(os.sep, "/")
                 self.csv_generated = True
                 self.csv_progress_percentage = 100
                 self.csv_stage = "Concluído"
-                self.success_message = "SUCESSO: CSVs gerados com sucesso!"
-                logger.debug(f"generate_csvs: SUCESSO! compulab_csv={len(compulab_csv) if compulab_csv else 0} chars, simus_csv={len(simus_csv) if simus_csv else 0} chars")
+                self.success_message = "SUCESSO: Arquivos convertidos com sucesso!"
+                logger.debug(f"generate_csvs: SUCESSO! compulab={os.path.getsize(compulab_out)} bytes, simus={os.path.getsize(simus_out)} bytes")
                 yield
             else:
+                self._discard_converted_files()
                 self.error_message = "ERRO: Erro ao gerar CSVs. Verifique os arquivos."
-                logger.debug("generate_csvs: Falha - success=False retornado por generate_excel_from_pdfs")
+                logger.debug("generate_csvs: Falha - success=False retornado por convert_pdfs_to_files")
                 yield
+        except JobCancelled:
+            self.csv_stage = "Cancelado"
+            self.error_message = "Conversão cancelada."
+            yield
         except Exception as e:
             import traceback
             logger.debug(f"generate_csvs: EXCEÇÃO: {e}")
@@ -1923,6 +2096,48 @@ class AnalysisState(AuthState):
             yield
         finally:
             self.is_generating_csv = False
+            for path in temp_inputs:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _conversion_input_path(file_path: str, file_bytes: bytes, temp_inputs: List[str]) -> str:
+        """Caminho do PDF de entrada; bytes em memória são gravados num temporário."""
+        if file_path and os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            return file_path
+        if not file_bytes:
+            return ""
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
+            tmp.write(file_bytes)
+        temp_inputs.append(tmp.name)
+        return tmp.name
+
+    def _discard_converted_files(self):
+        """Remove as planilhas convertidas desta sessão."""
+        if self._conversion_dir:
+            shutil.rmtree(self._conversion_dir, ignore_errors=True)
+        self._conversion_dir = ""
+        self.compulab_export_file = ""
+        self.simus_export_file = ""
+
+    def set_export_format(self, value: str):
+        """Define o formato das planilhas convertidas (xlsx, csv ou parquet)"""
+        if value in TABLE_EXPORT_FORMATS:
+            self.export_format = value
+
+    # ===== TAREFAS EM SEGUNDO PLANO =====
+
+    def _job_owner(self) -> str:
+        """Dono das tarefas do job_service: a sessão do navegador."""
+        return self.router.session.client_token
+
+    @rx.event(background=True)
+    async def cancel_processing(self):
+        """Cancela conversões, análises e relatórios em andamento desta sessão."""
+        cancelled = job_service.cancel_owner(self._job_owner())
+        logger.debug(f"cancel_processing: {cancelled} tarefa(s) cancelada(s)")
 
     # ===== SALVAMENTO DE ANÁLISES =====
     
@@ -1975,13 +2190,17 @@ class AnalysisState(AuthState):
             # Converter data string para date object
             analysis_date = datetime.strptime(self.save_analysis_date, '%Y-%m-%d').date()
             
-            # Converter PDF base64 para bytes se disponível
+            # PDF do estado atual: edições ainda na pausa do debounce são renderizadas agora
+            # (o preview já atualizado sai do cache da conciliação); senão, o do blob_store
             pdf_bytes = None
-            if self.pdf_preview_b64:
+            reconciliation = self._reconciliation()
+            if reconciliation is not None:
                 try:
-                    pdf_bytes = base64.b64decode(self.pdf_preview_b64)
-                except (ValueError, TypeError):
-                    pass
+                    pdf_bytes = await self._render_report_pdf(reconciliation, "relatorio_pdf_salvar", PRIORITY_HIGH)
+                except Exception as e:
+                    logger.debug(f"PDF para salvar não gerado (usando o preview): {e}")
+            if pdf_bytes is None and self._pdf_preview_token:
+                pdf_bytes = blob_store.read(self._pdf_preview_token)
             
             # Obter tenant_id
             tenant_id = self.current_tenant.id if self.current_tenant else ""
@@ -1996,9 +2215,6 @@ class AnalysisState(AuthState):
                 compulab_file_name=self.compulab_file_name,
                 simus_file_url=self.simus_file_url,
                 simus_file_name=self.simus_file_name,
-                # CSVs convertidos (se disponíveis como URLs)
-                converted_compulab_url=self.compulab_csv if self.compulab_csv.startswith('http') else "",
-                converted_simus_url=self.simus_csv if self.simus_csv.startswith('http') else "",
                 # PDF
                 pdf_bytes=pdf_bytes,
                 # Resultados
@@ -2012,10 +2228,10 @@ class AnalysisState(AuthState):
                 divergences_total=self.divergences_total,
                 extra_simus_count=self.exams_only_simus_count,
                 # Listas de itens
-                missing_patients=self.patients_only_compulab,
-                missing_exams=self.exams_only_compulab,
-                value_divergences=self.value_divergences,
-                extra_simus_exams=self.exams_only_simus,
+                missing_patients=self._patients_only_compulab,
+                missing_exams=self._exams_only_compulab,
+                value_divergences=self._value_divergences,
+                extra_simus_exams=self._exams_only_simus,
                 # Tags automáticas
                 tags=[
                     f"compulab:{self.compulab_file_name}" if self.compulab_file_name else None,
@@ -2102,9 +2318,11 @@ class AnalysisState(AuthState):
             self.exams_only_simus_count = analysis.get('extra_simus_count', 0)
             self.patients_only_simus_count = 0
             self.patients_only_simus_total = 0.0
+            self._patient_matches = []
+            self.patient_matches_count = 0
             
             # Restaurar listas de itens
-            self.patients_only_compulab = [
+            self._patients_only_compulab = [
                 AnalysisResult(
                     patient=item.get('patient_name', ''),
                     exam_name=item.get('exam_name', ''),
@@ -2114,9 +2332,9 @@ class AnalysisState(AuthState):
                 )
                 for item in analysis.get('missing_patients', [])
             ]
-            self.patients_only_simus = []
+            self._patients_only_simus = []
             
-            self.exams_only_compulab = [
+            self._exams_only_compulab = [
                 AnalysisResult(
                     patient=item.get('patient_name', ''),
                     exam_name=item.get('exam_name', ''),
@@ -2125,7 +2343,7 @@ class AnalysisState(AuthState):
                 for item in analysis.get('missing_exams', [])
             ]
             
-            self.value_divergences = [
+            self._value_divergences = [
                 AnalysisResult(
                     patient=item.get('patient_name', ''),
                     exam_name=item.get('exam_name', ''),
@@ -2136,7 +2354,7 @@ class AnalysisState(AuthState):
                 for item in analysis.get('divergences', [])
             ]
             
-            self.exams_only_simus = [
+            self._exams_only_simus = [
                 AnalysisResult(
                     patient=item.get('patient_name', ''),
                     exam_name=item.get('exam_name', ''),
@@ -2153,6 +2371,17 @@ class AnalysisState(AuthState):
             
             self.selected_saved_analysis_id = analysis_id
             self.analysis_active_tab = "patients_only_compulab"
+            self.result_search = ""
+            self.result_sort_key = ""
+            self.result_sort_desc = False
+            # Análise salva não guarda os pacientes: o resultado canônico é
+            # recriado a partir das listas restauradas
+            self._compulab_patients = {}
+            self._simus_patients = {}
+            self._publish_results()
+            self._reconciliation_key = reconciliation_service.make_key(
+                self.current_tenant.id if self.current_tenant else "local", f"salva:{analysis_id}", ""
+            )
 
             # Carregar resoluções e anotações persistidas
             try:
@@ -2207,9 +2436,9 @@ class AnalysisState(AuthState):
             e = getattr(item, 'exam_name', '') or item.get('exam_name', '')
             return self.resolutions.get(f"{p}|{e}") == "resolvido"
 
-        filtered_missing = [x for x in self.exams_only_compulab if not is_resolved(x)]
-        filtered_divergences = [x for x in self.value_divergences if not is_resolved(x)]
-        filtered_extras = [x for x in self.exams_only_simus if not is_resolved(x)]
+        filtered_missing = [x for x in self._exams_only_compulab if not is_resolved(x)]
+        filtered_divergences = [x for x in self._value_divergences if not is_resolved(x)]
+        filtered_extras = [x for x in self._exams_only_simus if not is_resolved(x)]
         return filtered_missing, filtered_divergences, filtered_extras
     
     async def delete_saved_analysis(self, analysis_id: str):
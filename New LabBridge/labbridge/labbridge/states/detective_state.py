@@ -59,43 +59,15 @@ class DetectiveState(AIState):
             logger.debug(f"Erro ao carregar chat persistido: {e}")
 
         # Se houver divergências reais carregadas no AnalysisState
-        if self.has_analysis:
-            data_list = []
-            
-            # Adicionar divergências de valor
-            for div in self.value_divergences:
-                data_list.append({
-                    "tipo": "DIVERGENCIA_VALOR",
-                    "paciente": div.patient,
-                    "exame": div.exam_name,
-                    "valor_compulab": div.compulab_value,
-                    "valor_simus": div.simus_value,
-                    "diferenca": div.difference,
-                    "status": "ERRO_VALOR"
-                })
-            
-            # Adicionar exames faltantes
-            for missing in self.missing_exams:
-                data_list.append({
-                    "tipo": "EXAME_FALTANTE_SIMUS",
-                    "paciente": missing.patient,
-                    "exame": missing.exam_name,
-                    "valor": missing.compulab_value,
-                    "status": "GLOSADO_PROVAVEL"
-                })
-
-            # Adicionar pacientes faltantes (resumido)
-            for patient in self.missing_patients:
-                data_list.append({
-                    "tipo": "PACIENTE_NAO_ENCONTRADO",
-                    "paciente": patient.patient,
-                    "qtd_exames": patient.exams_count,
-                    "valor_total": patient.total_value,
-                    "status": "NAO_FATURADO"
-                })
+        reconciliation = self._reconciliation()
+        if reconciliation is not None:
+            # Itens de divergência calculados uma vez por conciliação
+            data_list = reconciliation.context_items()
 
             if data_list:
-                self.data_context = json.dumps(data_list, indent=2, ensure_ascii=False)
+                self.data_context = reconciliation.view(
+                    "context_json", lambda: json.dumps(data_list, indent=2, ensure_ascii=False)
+                )
                 logger.debug(f"DetectiveState loaded REAL data context ({len(data_list)} items).")
             else:
                  self.data_context = "Nenhuma divergência encontrada na análise atual."
@@ -158,17 +130,17 @@ class DetectiveState(AIState):
                         "valor_compulab": div.compulab_value,
                         "valor_simus": div.simus_value,
                         "diferenca": div.difference
-                    } for div in self.value_divergences],
+                    } for div in self._value_divergences],
                     missing_patients=[{
                         "paciente": p.patient,
                         "qtd_exames": p.exams_count,
                         "valor_total": p.total_value
-                    } for p in self.missing_patients],
+                    } for p in self._patients_only_compulab],
                     missing_exams=[{
                         "paciente": m.exam_name,
                         "exame": m.exam_name,
                         "valor": m.compulab_value
-                    } for m in self.missing_exams]
+                    } for m in self._exams_only_compulab]
                 )
                 
                 if result.get("success"):
@@ -0,0 +1,21 @@
+"""
+Downloads gerados no backend.
+
+Em vez de rx.download(data=...) ou de uma data: URL via rx.call_script (o
+arquivo inteiro em base64 no websocket), o conteúdo vai para o blob_store e
+o navegador recebe apenas a URL de download.
+"""
+from typing import Optional, Union
+
+import reflex as rx
+
+from ..services.blob_store import blob_store
+
+
+def blob_download(data: Union[bytes, str], filename: str, content_type: Optional[str] = None):
+    """Evento de download de `data` servido pela rota /api/blobs."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    token = blob_store.put(data, filename, content_type)
+    # rx.download só aceita caminhos relativos como str; a URL do backend é absoluta
+    return rx.download(url=rx.Var.create(blob_store.url(token, filename)), filename=filename)
@@ -5,9 +5,9 @@ Gerencia filtros, exportação e logs de atividades REAIS.
 import reflex as rx
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
-import base64
 import logging
 from .auth_state import AuthState
+from .downloads import blob_download
 
 logger = logging.getLogger(__name__)
 
@@ -228,20 +228,11 @@ class HistoryState(AuthState):
             
             csv_content = "\n".join(csv_lines)
             
-            # Converter para base64 e fazer download
-            csv_b64 = base64.b64encode(csv_content.encode('utf-8-sig')).decode('utf-8')
             filename = f"logs_atividade_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
             self.is_exporting = False
             
-            yield rx.call_script(
-                f'''
-                const link = document.createElement('a');
-                link.href = 'data:text/csv;charset=utf-8;base64,{csv_b64}';
-                link.download = '{filename}';
-                link.click();
-                '''
-            )
+            yield blob_download(csv_content.encode('utf-8-sig'), filename, "text/csv")
             yield rx.toast.success(f"Logs exportados: {filename}")
 
         except Exception as e:
@@ -263,20 +254,12 @@ class HistoryState(AuthState):
             
             # Gerar Excel
             excel_bytes = generate_analyses_excel(self.filtered_analyses)
-            excel_b64 = base64.b64encode(excel_bytes).decode('utf-8')
             
             filename = f"historico_analises_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             
             self.is_exporting = False
             
-            yield rx.call_script(
-                f'''
-                const link = document.createElement('a');
-                link.href = 'data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{excel_b64}';
-                link.download = '{filename}';
-                link.click();
-                '''
-            )
+            yield blob_download(excel_bytes, filename)
             yield rx.toast.success(f"Histórico exportado: {filename}")
 
         except Exception as e:
@@ -298,20 +281,12 @@ class HistoryState(AuthState):
             
             # Gerar PDF
             pdf_bytes = generate_combined_pdf(self.filtered_analyses)
-            pdf_b64 = base64.b64encode(pdf_bytes).decode('utf-8')
             
             filename = f"historico_analises_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             
             self.is_exporting = False
             
-            yield rx.call_script(
-                f'''
-                const link = document.createElement('a');
-                link.href = 'data:application/pdf;base64,{pdf_b64}';
-                link.download = '{filename}';
-                link.click();
-                '''
-            )
+            yield blob_download(pdf_bytes, filename, "application/pdf")
             yield rx.toast.success(f"PDF gerado: {filename}")
 
         except Exception as e:
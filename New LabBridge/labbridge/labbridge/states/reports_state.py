@@ -5,9 +5,9 @@ Gerencia filtros, exportacao e paginacao.
 import reflex as rx
 from typing import List, Dict, Any
 from datetime import datetime
-import base64
 import logging
 from .auth_state import AuthState
+from .downloads import blob_download
 
 logger = logging.getLogger(__name__)
 
@@ -98,23 +98,12 @@ class ReportsState(AuthState):
             # Gerar PDF
             pdf_bytes = generate_combined_pdf(analyses)
             
-            # Converter para base64 para download
-            pdf_b64 = base64.b64encode(pdf_bytes).decode('utf-8')
-            
             # Nome do arquivo
             filename = f"relatorios_labbridge_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             
             self.is_exporting = False
             
-            # Trigger download via JavaScript
-            yield rx.call_script(
-                f'''
-                const link = document.createElement('a');
-                link.href = 'data:application/pdf;base64,{pdf_b64}';
-                link.download = '{filename}';
-                link.click();
-                '''
-            )
+            yield blob_download(pdf_bytes, filename, "application/pdf")
             yield rx.toast.success(f"PDF gerado: {filename}")
 
         except Exception as e:
@@ -142,23 +131,12 @@ class ReportsState(AuthState):
             # Gerar CSV
             csv_content = generate_analyses_csv(analyses)
             
-            # Converter para base64
-            csv_b64 = base64.b64encode(csv_content.encode('utf-8-sig')).decode('utf-8')
-            
             # Nome do arquivo
             filename = f"relatorios_labbridge_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
             self.is_exporting = False
             
-            # Trigger download
-            yield rx.call_script(
-                f'''
-                const link = document.createElement('a');
-                link.href = 'data:text/csv;charset=utf-8;base64,{csv_b64}';
-                link.download = '{filename}';
-                link.click();
-                '''
-            )
+            yield blob_download(csv_content.encode('utf-8-sig'), filename, "text/csv")
             yield rx.toast.success(f"CSV gerado: {filename}")
 
         except Exception as e:
@@ -186,23 +164,12 @@ class ReportsState(AuthState):
             # Gerar Excel
             excel_bytes = generate_analyses_excel(analyses)
             
-            # Converter para base64
-            excel_b64 = base64.b64encode(excel_bytes).decode('utf-8')
-            
             # Nome do arquivo
             filename = f"relatorios_labbridge_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             
             self.is_exporting = False
             
-            # Trigger download
-            yield rx.call_script(
-                f'''
-                const link = document.createElement('a');
-                link.href = 'data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{excel_b64}';
-                link.download = '{filename}';
-                link.click();
-                '''
-            )
+            yield blob_download(excel_bytes, filename)
             yield rx.toast.success(f"Excel gerado: {filename}")
 
         except Exception as e:
@@ -6,6 +6,7 @@ import reflex as rx
 from typing import Optional
 import logging
 from .auth_state import AuthState
+from .downloads import blob_download
 
 logger = logging.getLogger(__name__)
 
@@ -322,7 +323,7 @@ class SettingsState(AuthState):
             import json
             payload = json.dumps(export_data, indent=2, ensure_ascii=False, default=str)
             filename = f"labbridge_dados_{tenant_id}_{datetime.now().strftime('%Y%m%d')}.json"
-            return rx.download(data=payload.encode("utf-8"), filename=filename)
+            return blob_download(payload, filename, "application/json")
 
         except Exception as e:
             logger.error(f"Erro na exportação LGPD: {e}")
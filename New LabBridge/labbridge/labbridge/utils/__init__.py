@@ -6,13 +6,18 @@ from .pdf_processor import (
     normalize_exam_name_for_comparison,
     extract_key_terms,
     exam_names_match,
+    exam_signature,
+    signatures_match,
+    ExamNameIndex,
     map_simus_to_compulab_exam_name,
     extract_compulab_patients,
+    iter_compulab_records,
     extract_simus_patients,
     generate_excel_from_pdfs,
     load_from_csv,
     load_from_excel
 )
+from .exam_table import ExamTable, ExamTableBuilder
 from .comparison import compare_patients, compute_difference_breakdown, format_divergences_to_json
 from .analysis_module import (
     load_data,
@@ -12,164 +12,34 @@ import re
 from typing import Optional, Tuple, Dict, List, Any, Callable
 import json
 from ..services.mapping_service import mapping_service
+from ..services.reconciliation_service import Reconciliation, reconciliation_service
 from .normalize import normalize_patient_name, format_currency_br
 
 
-def identify_discrepancies_locally(compulab_patients: dict, simus_patients: dict) -> Dict[str, Any]:
+def identify_discrepancies_locally(compulab_patients: dict, simus_patients: dict,
+                                   reconciliation: Optional[Reconciliation] = None) -> Dict[str, Any]:
     """
-    Identifica discrepâncias usando o motor robusto de comparação (comparison.py).
-    Garante consistência total com o Dashboard.
+    Identifica discrepâncias a partir da conciliação canônica (reconciliation_service).
+    Garante consistência total com o Dashboard: é o mesmo resultado, calculado
+    uma única vez por par de arquivos e snapshot de mapeamentos.
     """
-    from .comparison import run_complete_analysis
-    
-    # Executar análise robusta
-    report = run_complete_analysis(compulab_patients, simus_patients)
-    
-    # Converter para o formato esperado pelo relatório de IA
-    result = {
-        "pacientes_ausentes_simus": [
-            {"nome": p.name, "valor_total": p.total_value, "qtd_exames": p.total_exams}
-            for p in report.missing_patients
-        ],
-        "pacientes_ausentes_compulab": [
-             # Pacientes extras no SIMUS (que geraram exames extras)
-             # ExtraSimusExam já captura isso, mas aqui a estrutura antiga pedia lista de pacientes
-             # Vamos reconstruir simplificado ou deixar vazio se não for crítico, 
-             # mas o relatório usa isso.
-             # O report v2 tem extra_simus_exams, mas não lista de pacientes extras isolada.
-             # Vamos extrair dos extra_simus_exams agrupando.
-        ],
-        "exames_ausentes_simus": [
-            {"paciente": e.patient, "exame": e.exam_name, "valor": e.value}
-            for e in report.missing_exams
-        ],
-        "exames_ausentes_compulab": [
-            {"paciente": e.patient, "exame": e.exam_name, "valor": e.simus_value}
-            for e in report.extra_simus_exams
-        ],
-        "divergencias_valor": [
-            {
-                "paciente": v.patient, 
-                "exame": v.exam_name, 
-                "valor_compulab": v.compulab_value, 
-                "valor_simus": v.simus_value, 
-                "diferenca": v.difference
-            }
-            for v in report.value_divergences
-        ],
-        "totais": {
-            "compulab_total": report.compulab_total,
-            "simus_total": report.simus_total,
-            "impacto_pacientes": report.impact_missing_patients,
-            "impacto_exames": report.impact_missing_exams,
-            "impacto_divergencias": report.impact_value_divergences,
-        }
-    }
-    
-    # Reconstruir lista de pacientes extras no SIMUS (apenas para manter compatibilidade)
-    # Agrupar report.extra_simus_exams por paciente
-    extra_patients = {}
-    for extra in report.extra_simus_exams:
-        if extra.patient not in extra_patients:
-            extra_patients[extra.patient] = {"nome": extra.patient, "valor_total": 0.0, "qtd_exames": 0}
-        extra_patients[extra.patient]["valor_total"] += extra.simus_value
-        extra_patients[extra.patient]["qtd_exames"] += 1
-        
-    result["pacientes_ausentes_compulab"] = list(extra_patients.values())
-    
-    return result
+    if reconciliation is None:
+        reconciliation = reconciliation_service.build(compulab_patients, simus_patients)
+    return reconciliation.discrepancies()
 
 
-def pre_filter_data(compulab_patients: dict, simus_patients: dict) -> Tuple[Dict, Dict, List[str]]:
+def pre_filter_data(compulab_patients: dict, simus_patients: dict,
+                    reconciliation: Optional[Reconciliation] = None) -> Tuple[Dict, Dict, List[str]]:
     """
     Filtra localmente correspondências exatas para reduzir carga na IA (The Sieve).
+    Pacientes de um lado só seguem completos; nos pacientes comuns seguem apenas
+    os exames que a conciliação canônica não conciliou (sem par ou com valor divergente).
     Retorna: (compulab_filtered, simus_filtered, skipped_results_csv)
     """
-    filtered_compulab = {}
-    filtered_simus = {}
-    skipped_csv_rows = []
-    
-    # 1. Copiar estruturas iniciais (não modificar input original)
-    #    Mas vamos reconstruir apenas o que não der match.
-    
-    # Lista de todos os pacientes únicos
-    all_patients = set(list(compulab_patients.keys()) + list(simus_patients.keys()))
-    
-    for patient in all_patients:
-        c_data = compulab_patients.get(patient)
-        s_data = simus_patients.get(patient)
-        
-        # Se falta em um dos lados, manda pra IA analisar (pode ser erro de nome)
-        if not c_data or not s_data:
-            if c_data: filtered_compulab[patient] = c_data
-            if s_data: filtered_simus[patient] = s_data
-            continue
-            
-        # Ambos existem: Tentar match exato nos exames
-        c_exams = c_data.get('exams', []) if isinstance(c_data, dict) else c_data
-        s_exams = s_data.get('exams', []) if isinstance(s_data, dict) else s_data
-        
-        # Mapear exames do SIMUS por (nome_normalizado, valor) para busca rápida
-        # Usamos uma lista para permitir duplicatas
-        s_map = []
-        for s_ex in s_exams:
-            norm_name = str(s_ex.get('exam_name', '')).upper().strip()
-            code = str(s_ex.get('code', '')).strip()
-            try: val = float(s_ex.get('value', 0))
-            except (ValueError, TypeError): val = 0.0
-            s_map.append({'obj': s_ex, 'name': norm_name, 'code': code, 'val': val, 'matched': False})
-            
-        unmatched_c_exams = []
-        
-        for c_ex in c_exams:
-            c_name = str(c_ex.get('exam_name', '')).upper().strip()
-            c_code = str(c_ex.get('code', '')).strip()
-            try: c_val = float(c_ex.get('value', 0))
-            except (ValueError, TypeError): c_val = 0.0
-            
-            match_found = False
-            # Tentativa 1: Match Exato (Nome/Código + Valor exato)
-            for item in s_map:
-                if not item['matched']:
-                    # Match por Código (se existir) OU Nome
-                    code_match = c_code and item['code'] and c_code == item['code']
-                    name_match = c_name == item['name']
-                    
-                    if (code_match or name_match) and abs(c_val - item['val']) < 0.05:
-                        item['matched'] = True
-                        match_found = True
-                        break
-            
-            if not match_found:
-                unmatched_c_exams.append(c_ex)
-                
-        # Coletar o que sobrou do SIMUS
-        unmatched_s_exams = [item['obj'] for item in s_map if not item['matched']]
-        
-        # Se sobrou algo de qualquer lado, mantem o paciente no dataset da IA
-        # MAS, podemos otimizar e mandar SÓ os exames faltantes?
-        # A IA precisa do contexto do paciente. Vamos simplificar:
-        # Se houve divergência, manda o paciente completo (ou filtrado). 
-        # Mandar filtrado é melhor para economizar tokens.
-        
-        if unmatched_c_exams or unmatched_s_exams:
-            # Reconstrói estrutura
-            if isinstance(c_data, dict):
-                new_c = c_data.copy()
-                new_c['exams'] = unmatched_c_exams
-                filtered_compulab[patient] = new_c
-            else:
-                filtered_compulab[patient] = unmatched_c_exams
-                
-            if isinstance(s_data, dict):
-                new_s = s_data.copy()
-                new_s['exams'] = unmatched_s_exams
-                filtered_simus[patient] = new_s
-            else:
-                filtered_simus[patient] = unmatched_s_exams
-                
-    # Retornar apenas datasets com discrepâncias
-    return filtered_compulab, filtered_simus, skipped_csv_rows
+    if reconciliation is None:
+        reconciliation = reconciliation_service.build(compulab_patients, simus_patients)
+    filtered_compulab, filtered_simus = reconciliation.unreconciled_patients()
+    return dict(filtered_compulab), dict(filtered_simus), []
 
 
 def format_dataset_for_prompt(patients_dict):
@@ -416,11 +286,13 @@ async def generate_ai_analysis(
     simus_patients: dict,
     api_key: str,
     provider: str = "OpenAI",
-    model_name: str = "gpt-4o"
+    model_name: str = "gpt-4o",
+    reconciliation: Optional[Reconciliation] = None,
 ):
     """
     Executa a auditoria de IA com estratégia de Chunking Paralelo e Parsing Robusto.
     Gera relatório no formato FORENSE ESTRUTURADO.
+    `reconciliation` (opcional) é o resultado canônico já calculado pelo dashboard.
     Yields (percentage, status_message) e finally returns (analysis_result, error)
     """
     try:
@@ -435,7 +307,9 @@ async def generate_ai_analysis(
         # ===== FASE 1: CÁLCULO LOCAL (Validação) =====
         yield 2, "Calculando totais locais para validação..."
         
-        local_discrepancies = identify_discrepancies_locally(compulab_patients, simus_patients)
+        if reconciliation is None:
+            reconciliation = reconciliation_service.build(compulab_patients, simus_patients)
+        local_discrepancies = identify_discrepancies_locally(compulab_patients, simus_patients, reconciliation)
         totais = local_discrepancies["totais"]
         
         compulab_total = totais["compulab_total"]
@@ -448,7 +322,7 @@ async def generate_ai_analysis(
         yield 6, "Executando pré-filtragem inteligente..."
         
         # Filtrar o que já está OK para não gastar tempo/tokens de IA
-        filtered_compulab_ai, filtered_simus_ai, _ = pre_filter_data(compulab_patients, simus_patients)
+        filtered_compulab_ai, filtered_simus_ai, _ = pre_filter_data(compulab_patients, simus_patients, reconciliation)
         
         filtered_count = len(compulab_patients) - len(filtered_compulab_ai) if filtered_compulab_ai else len(compulab_patients)
         yield 7, f"Pré-filtragem: {filtered_count} pacientes conciliados localmente."
@@ -14,47 +14,28 @@ import io
 import json
 import os
 import re
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from unidecode import unidecode
 
+from .exam_table import ExamTable
+from .money import cents_from_floats, cents_to_float, decimal_units, money_column, rescale, to_cents
+from .normalize import GENERIC_EXAM_TERMS, normalize_exam_match_key
+from .normalize import normalize_patient_name as _normalize_patient_name
 
-GENERIC_TERMS = [
-    "DOSAGEM DE",
-    "DOSAGEM",
-    "DETERMINACAO DE",
-    "DETERMINACAO",
-    "ANALISE DE",
-    "ANALISE",
-    "AVALIACAO DE",
-    "AVALIACAO",
-    "MEDICAO DE",
-    "MEDICAO",
-    "MEDIDA DE",
-    "MEDIDA",
-    "TESTE DE",
-    "TESTE",
-    "EXAME DE",
-    "EXAME",
-    "QUANTIFICACAO DE",
-    "QUANTIFICACAO",
-    "DETECCAO DE",
-    "DETECCAO",
-    "PESQUISA DE",
-    "PESQUISA",
-    "TRIAGEM DE",
-    "TRIAGEM",
-    "SOROLOGIA DE",
-    "SOROLOGIA",
-    "IMUNOLOGIA DE",
-    "IMUNOLOGIA",
-    "QUALITATIVO DE",
-    "QUALITATIVO",
-    "QUANTITATIVO DE",
-    "QUANTITATIVO",
-]
+
+GENERIC_TERMS = GENERIC_EXAM_TERMS
+
+# attrs de prepare_dataframe com a escala (casas decimais) das unidades de Valor
+MONEY_SCALE_ATTR = "escala_valor"
+
+# Pares (nome_a, nome_b) com Jaro-Winkler memorizado entre pacientes e chamadas
+FUZZY_MEMO_SIZE = 262144
+_fuzzy_memo: Dict[Tuple[str, str], float] = {}
+_fuzzy_profiles: Dict[str, Dict[str, int]] = {}
 
 
 DEFAULT_SYNONYMS = {
@@ -140,8 +121,7 @@ def update_synonyms(base: Dict[str, str], updates: Dict[str, str]) -> Dict[str,
 
 def normalize_patient_name(name: str) -> str:
     """Normaliza nome do paciente para comparacao robusta."""
-    from .normalize import normalize_patient_name as _npn
-    return _npn(name)
+    return _normalize_patient_name(name)
 
 
 def normalize_exam_name(name: str) -> str:
@@ -155,16 +135,7 @@ def normalize_exam_name(name: str) -> str:
     """
     if not name:
         return ""
-    text = unidecode(str(name)).upper().strip()
-    text = text.replace("(", " ").replace(")", " ")
-    text = re.sub(r"[^\w\s]", " ", text)
-    text = " ".join(text.split())
-
-    for term in GENERIC_TERMS:
-        pattern_start = r"^" + re.escape(term) + r"\s+"
-        text = re.sub(pattern_start, "", text)
-
-    return text.strip()
+    return normalize_exam_match_key(str(name))
 
 
 def map_to_canonical(name: str, synonyms: Dict[str, str]) -> str:
@@ -218,7 +189,7 @@ def compare_exams(
     synonyms: Optional[Dict[str, str]] = None,
     *,
     tolerance: float = 0.01,
-    enable_fuzzy: bool = False,
+    enable_fuzzy: bool = True,
     fuzzy_threshold: float = 0.93,
 ) -> Dict[str, Any]:
     """
@@ -227,125 +198,48 @@ def compare_exams(
     Regras:
     - Usa Codigo_Exame quando presente nas duas fontes
     - Usa Nome_Canonico como fallback
-    - Fuzzy matching opcional para variacoes nao cobertas por sinonimos
+    - Fuzzy matching (Jaro-Winkler >= fuzzy_threshold) para as variacoes nao
+      cobertas por sinonimos; desative com enable_fuzzy=False
     - Tolerancia de valor padrao: R$ 0,01
+
+    O pareamento e feito em tabelas (joins por paciente + chave com
+    numeracao cumcount), preservando o pareamento 1:1 e a ordem dos
+    resultados da comparacao paciente a paciente.
     """
     normalized_synonyms = normalize_synonyms(synonyms or {})
 
     comp_df = prepare_dataframe(df_compulab, normalized_synonyms)
     sim_df = prepare_dataframe(df_simus, normalized_synonyms)
 
-    comp_patients = build_patient_records(comp_df)
-    sim_patients = build_patient_records(sim_df)
-
-    all_patient_keys = sorted(set(comp_patients.keys()) | set(sim_patients.keys()))
-
-    missing_in_simus: List[Dict[str, Any]] = []
-    missing_in_compulab: List[Dict[str, Any]] = []
-    value_divergences: List[Dict[str, Any]] = []
-
+    # Valores dos dois lados (e a tolerancia) na mesma escala inteira
     tolerance_dec = Decimal(str(tolerance))
+    scale = max(comp_df.attrs[MONEY_SCALE_ATTR], sim_df.attrs[MONEY_SCALE_ATTR], -min(tolerance_dec.as_tuple().exponent, 0))
+    for frame in (comp_df, sim_df):
+        frame["Valor"] = rescale(frame["Valor"].to_numpy(), frame.attrs[MONEY_SCALE_ATTR], scale)
+
+    comp_table = build_match_table(comp_df)
+    sim_table = build_match_table(sim_df)
+
+    pairs = match_tables(
+        comp_table,
+        sim_table,
+        enable_fuzzy=enable_fuzzy,
+        fuzzy_threshold=fuzzy_threshold,
+    )
 
-    for patient_key in all_patient_keys:
-        comp_data = comp_patients.get(patient_key)
-        sim_data = sim_patients.get(patient_key)
-
-        if not comp_data:
-            for record in sim_data["records"]:
-                missing_in_compulab.append(
-                    build_result_row(
-                        patient=record["patient"],
-                        code=record["code"],
-                        canonical_name=record["canonical_name"],
-                        comp_value=None,
-                        sim_value=record["value"],
-                        comp_exam_name="",
-                        sim_exam_name=record["exam_name"],
-                    )
-                )
-            continue
-
-        if not sim_data:
-            for record in comp_data["records"]:
-                missing_in_simus.append(
-                    build_result_row(
-                        patient=record["patient"],
-                        code=record["code"],
-                        canonical_name=record["canonical_name"],
-                        comp_value=record["value"],
-                        sim_value=None,
-                        comp_exam_name=record["exam_name"],
-                        sim_exam_name="",
-                    )
-                )
-            continue
-
-        comp_records = comp_data["records"]
-        sim_records = sim_data["records"]
-
-        pairs, comp_unmatched, sim_unmatched = match_records(
-            comp_records,
-            sim_records,
-            enable_fuzzy=enable_fuzzy,
-            fuzzy_threshold=fuzzy_threshold,
-        )
-
-        for comp_idx, sim_idx in pairs:
-            comp_record = comp_records[comp_idx]
-            sim_record = sim_records[sim_idx]
-            diff = comp_record["value"] - sim_record["value"]
-            if abs(diff) > tolerance_dec:
-                value_divergences.append(
-                    build_result_row(
-                        patient=comp_record["patient"] or sim_record["patient"],
-                        code=comp_record["code"] or sim_record["code"],
-                        canonical_name=comp_record["canonical_name"] or sim_record["canonical_name"],
-                        comp_value=comp_record["value"],
-                        sim_value=sim_record["value"],
-                        comp_exam_name=comp_record["exam_name"],
-                        sim_exam_name=sim_record["exam_name"],
-                    )
-                )
-
-        for comp_idx in sorted(comp_unmatched):
-            record = comp_records[comp_idx]
-            missing_in_simus.append(
-                build_result_row(
-                    patient=record["patient"],
-                    code=record["code"],
-                    canonical_name=record["canonical_name"],
-                    comp_value=record["value"],
-                    sim_value=None,
-                    comp_exam_name=record["exam_name"],
-                    sim_exam_name="",
-                )
-            )
-
-        for sim_idx in sorted(sim_unmatched):
-            record = sim_records[sim_idx]
-            missing_in_compulab.append(
-                build_result_row(
-                    patient=record["patient"],
-                    code=record["code"],
-                    canonical_name=record["canonical_name"],
-                    comp_value=None,
-                    sim_value=record["value"],
-                    comp_exam_name="",
-                    sim_exam_name=record["exam_name"],
-                )
-            )
-
-    missing_in_simus.sort(key=lambda r: (r["Paciente"], r["Nome_Canonico"], r["Codigo_Exame"]))
-    missing_in_compulab.sort(key=lambda r: (r["Paciente"], r["Nome_Canonico"], r["Codigo_Exame"]))
-    value_divergences.sort(key=lambda r: (r["Paciente"], r["Nome_Canonico"], r["Codigo_Exame"]))
+    value_divergences = divergence_rows(
+        comp_table, sim_table, pairs, decimal_units(tolerance_dec, scale), scale=scale
+    )
+    missing_in_simus = unmatched_rows(comp_table, pairs["Linha_comp"], source="compulab", scale=scale)
+    missing_in_compulab = unmatched_rows(sim_table, pairs["Linha_sim"], source="simus", scale=scale)
 
     summary = {
         "missing_in_simus_count": len(missing_in_simus),
         "missing_in_compulab_count": len(missing_in_compulab),
         "value_divergences_count": len(value_divergences),
-        "missing_in_simus_total": float(sum_decimal(r["Valor_COMPULAB"] for r in missing_in_simus)),
-        "missing_in_compulab_total": float(sum_decimal(r["Valor_SIMUS"] for r in missing_in_compulab)),
-        "divergences_total": float(sum_decimal(abs_decimal(r["Diferenca"]) for r in value_divergences)),
+        "missing_in_simus_total": cents_to_float(cents_from_floats(r["Valor_COMPULAB"] for r in missing_in_simus)),
+        "missing_in_compulab_total": cents_to_float(cents_from_floats(r["Valor_SIMUS"] for r in missing_in_compulab)),
+        "divergences_total": cents_to_float(cents_from_floats(abs(r["Diferenca"]) for r in value_divergences)),
     }
 
     return {
@@ -419,7 +313,10 @@ def analyze_patient_count_difference(
 ) -> Dict[str, Any]:
     """
     Analisa a diferença de quantidade de pacientes entre COMPULAB e SIMUS.
-    Versão otimizada para grandes datasets.
+
+    Todos os pacientes extras do COMPULAB são agregados (qtd. de exames e
+    valor) num único groupby, sem limite de itens; as listas saem em ordem
+    determinística (maior valor primeiro, depois nome).
     """
     if df_compulab.empty or df_simus.empty:
         return {
@@ -435,47 +332,54 @@ def analyze_patient_count_difference(
             "has_extra_in_simus": False,
         }
     
-    # Normalizar nomes de pacientes
-    comp_df = df_compulab.copy()
-    sim_df = df_simus.copy()
-    
-    if "Paciente_Normalizado" not in comp_df.columns:
-        comp_df["Paciente_Normalizado"] = comp_df["Paciente"].apply(normalize_patient_name)
-    if "Paciente_Normalizado" not in sim_df.columns:
-        sim_df["Paciente_Normalizado"] = sim_df["Paciente"].apply(normalize_patient_name)
+    comp_keys = patient_keys(df_compulab)
+    sim_keys = patient_keys(df_simus)
     
     # Pacientes únicos em cada sistema
-    comp_patients = set(comp_df["Paciente_Normalizado"].unique())
-    sim_patients = set(sim_df["Paciente_Normalizado"].unique())
+    comp_patients = set(comp_keys.unique())
+    sim_patients = set(sim_keys.unique())
     
     comp_count = len(comp_patients)
     sim_count = len(sim_patients)
     difference = comp_count - sim_count
     
-    # Pacientes extras no COMPULAB
     extra_in_compulab = comp_patients - sim_patients
-    extra_in_simus_list = sim_patients - comp_patients
-    
-    # Calcular valor dos extras no COMPULAB
-    extra_value = Decimal("0")
-    extra_patients_details = []
+    extra_in_simus_list = sorted(sim_patients - comp_patients)
     
-    for patient_key in list(extra_in_compulab)[:100]:  # Limitar a 100 para performance
-        patient_rows = comp_df[comp_df["Paciente_Normalizado"] == patient_key]
-        patient_total = patient_rows["Valor"].apply(lambda x: safe_decimal(x)).sum()
-        
-        extra_patients_details.append({
+    # Valor e quantidade de exames dos extras do COMPULAB (unidades inteiras, exatas)
+    money = money_column(df_compulab["Valor"], safe_decimal)
+    extra_rows = (~comp_keys.isin(sim_patients)).to_numpy()
+    extras = pd.DataFrame({
+        "patient_key": comp_keys.to_numpy(dtype=object)[extra_rows],
+        "patient_name": df_compulab["Paciente"].to_numpy(dtype=object)[extra_rows],
+        "units": money.units[extra_rows],
+    }).groupby("patient_key", sort=True).agg(
+        patient_name=("patient_name", "first"),
+        exams_count=("units", "size"),
+        units=("units", "sum"),
+    )
+    # Maior valor primeiro; empate pela chave (ordem do groupby)
+    extras = extras.sort_values("units", ascending=False, kind="stable")
+    extra_patients_details = [
+        {
             "patient_key": patient_key,
-            "patient_name": patient_rows.iloc[0]["Paciente"] if not patient_rows.empty else patient_key,
-            "exams_count": len(patient_rows),
-            "total_value": float(quantize_decimal(patient_total)),
-        })
-        extra_value += patient_total
+            "patient_name": patient_name,
+            "exams_count": exams_count,
+            "total_value": cents_to_float(to_cents(units, money.scale)),
+        }
+        for patient_key, patient_name, exams_count, units in zip(
+            extras.index.tolist(),
+            extras["patient_name"].tolist(),
+            extras["exams_count"].tolist(),
+            extras["units"].tolist(),
+        )
+    ]
+    extra_value = cents_to_float(to_cents(int(extras["units"].sum()), money.scale))
     
     # Gerar explicação
     if difference > 0:
         breakdown = f"COMPULAB possui {difference} paciente(s) a mais que o SIMUS, " \
-                   f"totalizando R$ {float(quantize_decimal(extra_value)):,.2f} em exames."
+                   f"totalizando R$ {extra_value:,.2f} em exames."
     elif difference < 0:
         breakdown = f"SIMUS possui {abs(difference)} paciente(s) a mais que o COMPULAB."
     else:
@@ -486,15 +390,89 @@ def analyze_patient_count_difference(
         "simus_count": sim_count,
         "difference": difference,
         "extra_patients_compulab": extra_patients_details,
-        "extra_patients_simus": list(extra_in_simus_list)[:50],
+        "extra_patients_simus": extra_in_simus_list,
         "extra_patients_count": len(extra_in_compulab),
-        "extra_patients_value": float(quantize_decimal(extra_value)),
+        "extra_patients_value": extra_value,
         "breakdown": breakdown,
         "has_extra_in_compulab": len(extra_in_compulab) > 0,
         "has_extra_in_simus": len(extra_in_simus_list) > 0,
     }
 
 
+def patient_keys(df: pd.DataFrame) -> pd.Series:
+    """Paciente_Normalizado da tabela (calculado uma vez por nome distinto se ausente)."""
+    if "Paciente_Normalizado" in df.columns:
+        return df["Paciente_Normalizado"].astype(object)
+    return map_unique(df["Paciente"].astype(str), normalize_patient_name)
+
+
+def find_repeated_exams(df: pd.DataFrame, source_name: str) -> List[Dict[str, Any]]:
+    """
+    Grupos de exames repetidos (mesmo paciente + exame canônico + valor em
+    centavos) de uma tabela, num único groupby.
+
+    Cada grupo é descrito pela primeira linha; os grupos saem por número de
+    ocorrências (decrescente) e, no empate, pela posição da primeira linha.
+    """
+    if df.empty or len(df) < 2:
+        return []
+
+    if "Nome_Canonico" in df.columns:
+        canonical = df["Nome_Canonico"].astype(object)
+    else:
+        canonical = map_unique(df["Nome_Exame"].astype(str), normalize_exam_name)
+    money = money_column(df["Valor"], safe_decimal)
+    patient_codes, _ = pd.factorize(patient_keys(df))
+    canonical_codes, _ = pd.factorize(canonical)
+    cent_codes, _ = pd.factorize(to_cents(money.units, money.scale))
+
+    groups = pd.DataFrame({
+        "patient": patient_codes,
+        "canonical": canonical_codes,
+        "cents": cent_codes,
+        "row": np.arange(len(df)),
+    }).groupby(["patient", "canonical", "cents"], sort=False)["row"].agg(["first", "size"])
+    groups = groups[groups["size"].to_numpy() > 1]
+    if groups.empty:
+        return []
+    first_rows = groups["first"].to_numpy()
+    occurrences = groups["size"].to_numpy()
+    order = np.lexsort((first_rows, -occurrences))
+    first_rows, occurrences = first_rows[order], occurrences[order]
+
+    def column(name: str, values: Optional[pd.Series] = None) -> List[str]:
+        source = values if values is not None else df[name]
+        return [str(value) for value in source.to_numpy(dtype=object)[first_rows].tolist()]
+
+    unit_values = money.units[first_rows]
+    duplicate_units = unit_values * (occurrences - 1)
+    codes = column("Codigo_Exame") if "Codigo_Exame" in df.columns else [""] * len(first_rows)
+    return [
+        {
+            "source": source_name,
+            "patient": patient,
+            "patient_normalized": patient_normalized,
+            "exam_name": exam_name,
+            "canonical_name": canonical_name,
+            "code": code,
+            "unit_value": unit_value,
+            "occurrences": count,
+            "duplicate_count": count - 1,
+            "total_duplicate_value": total_value,
+        }
+        for patient, patient_normalized, exam_name, canonical_name, code, unit_value, count, total_value in zip(
+            column("Paciente"),
+            column("Paciente_Normalizado", patient_keys(df)),
+            column("Nome_Exame"),
+            column("Nome_Canonico", canonical),
+            codes,
+            cents_to_float(to_cents(unit_values, money.scale)).tolist(),
+            occurrences.tolist(),
+            cents_to_float(to_cents(duplicate_units, money.scale)).tolist(),
+        )
+    ]
+
+
 def detect_repeated_exams(
     df_compulab: pd.DataFrame,
     df_simus: pd.DataFrame,
@@ -502,7 +480,9 @@ def detect_repeated_exams(
 ) -> Dict[str, Any]:
     """
     Detecta exames repetidos nos dados (mesmo paciente + mesmo exame + mesmo valor).
-    Versão otimizada para grandes datasets.
+
+    Todos os grupos de cada sistema são considerados (find_repeated_exams),
+    sem limite de itens.
     """
     if df_compulab.empty or df_simus.empty:
         return {
@@ -517,64 +497,6 @@ def detect_repeated_exams(
             "has_repeated": False,
         }
     
-    def find_repeated_exams(df: pd.DataFrame, source_name: str) -> List[Dict[str, Any]]:
-        """Encontra exames repetidos em um DataFrame."""
-        if df.empty or len(df) < 2:
-            return []
-        
-        # Garantir colunas necessárias
-        if "Paciente_Normalizado" not in df.columns:
-            df = df.copy()
-            df["Paciente_Normalizado"] = df["Paciente"].apply(normalize_patient_name)
-        if "Nome_Canonico" not in df.columns:
-            df = df.copy()
-            df["Nome_Canonico"] = df["Nome_Exame"].apply(normalize_exam_name)
-        
-        # Criar chave de comparação de forma vetorizada
-        df_copy = df.copy()
-        df_copy["_valor_str"] = df_copy["Valor"].apply(
-            lambda x: f"{float(quantize_decimal(safe_decimal(x))):.2f}"
-        )
-        df_copy["_match_key"] = (
-            df_copy["Paciente_Normalizado"].astype(str) + "|" +
-            df_copy["Nome_Canonico"].astype(str) + "|" +
-            df_copy["_valor_str"]
-        )
-        
-        # Contar ocorrências
-        counts = df_copy["_match_key"].value_counts()
-        repeated_keys = counts[counts > 1].index.tolist()
-        
-        if not repeated_keys:
-            return []
-        
-        repeated = []
-        for key in repeated_keys[:100]:  # Limitar a 100 tipos de repetidos para performance
-            matches = df_copy[df_copy["_match_key"] == key]
-            if len(matches) < 2:
-                continue
-            
-            first = matches.iloc[0]
-            value = safe_decimal(first["Valor"])
-            count = len(matches)
-            total_value = value * (count - 1)
-            
-            repeated.append({
-                "source": source_name,
-                "patient": str(first["Paciente"]),
-                "patient_normalized": str(first["Paciente_Normalizado"]),
-                "exam_name": str(first["Nome_Exame"]),
-                "canonical_name": str(first["Nome_Canonico"]),
-                "code": str(first.get("Codigo_Exame", "")),
-                "unit_value": float(quantize_decimal(value)),
-                "occurrences": count,
-                "duplicate_count": count - 1,
-                "total_duplicate_value": float(quantize_decimal(total_value)),
-            })
-        
-        return repeated
-    
-    # Encontrar repetidos em cada sistema (sem prepare_dataframe pesado)
     comp_repeated = find_repeated_exams(df_compulab, "COMPULAB")
     sim_repeated = find_repeated_exams(df_simus, "SIMUS")
     
@@ -582,23 +504,18 @@ def detect_repeated_exams(
     
     # Calcular totais
     total_repeated_count = sum(r["duplicate_count"] for r in all_repeated)
-    total_repeated_value = sum(
-        Decimal(str(r["total_duplicate_value"])) for r in all_repeated
-    )
+    total_repeated_value = cents_to_float(cents_from_floats(r["total_duplicate_value"] for r in all_repeated))
     
     # Agrupar por paciente
-    by_patient = {}
+    by_patient: Dict[str, List[Dict[str, Any]]] = {}
     for r in all_repeated:
-        patient = r["patient"]
-        if patient not in by_patient:
-            by_patient[patient] = []
-        by_patient[patient].append(r)
+        by_patient.setdefault(r["patient"], []).append(r)
     
     # Gerar resumo
     if all_repeated:
         summary = f"Detectados {len(all_repeated)} tipos de exames repetidos, " \
                  f"totalizando {total_repeated_count} ocorrências duplicadas " \
-                 f"(R$ {float(quantize_decimal(total_repeated_value)):,.2f})."
+                 f"(R$ {total_repeated_value:,.2f})."
     else:
         summary = "Nenhum exame repetido detectado."
     
@@ -608,7 +525,7 @@ def detect_repeated_exams(
         "all_repeated": all_repeated,
         "total_types": len(all_repeated),
         "total_repeated_count": total_repeated_count,
-        "total_repeated_value": float(quantize_decimal(total_repeated_value)),
+        "total_repeated_value": total_repeated_value,
         "breakdown_by_patient": by_patient,
         "summary": summary,
         "has_repeated": len(all_repeated) > 0,
@@ -1027,16 +944,23 @@ def run_deep_analysis(
 def prepare_dataframe(df: pd.DataFrame, synonyms: Dict[str, str]) -> pd.DataFrame:
     """
     Padroniza colunas e cria campos auxiliares para comparacao.
+
+    Valor sai em unidades inteiras (centavos, ou a escala registrada em
+    attrs[MONEY_SCALE_ATTR] quando ha fracao de centavo) e Ordem_Valor
+    guarda a ordem textual do valor usada no desempate.
     """
     standardized = standardize_columns(df)
     standardized["Paciente"] = standardized["Paciente"].astype(str).fillna("")
     standardized["Nome_Exame"] = standardized["Nome_Exame"].astype(str).fillna("")
     standardized["Codigo_Exame"] = standardized["Codigo_Exame"].astype(str).fillna("")
 
-    standardized["Paciente_Normalizado"] = standardized["Paciente"].apply(normalize_patient_name)
-    standardized["Codigo_Exame"] = standardized["Codigo_Exame"].apply(clean_code)
-    standardized["Nome_Canonico"] = standardized["Nome_Exame"].apply(lambda x: map_to_canonical(x, synonyms))
-    standardized["Valor"] = standardized["Valor"].apply(safe_decimal)
+    standardized["Paciente_Normalizado"] = map_unique(standardized["Paciente"], normalize_patient_name)
+    standardized["Codigo_Exame"] = map_unique(standardized["Codigo_Exame"], clean_code)
+    standardized["Nome_Canonico"] = map_unique(standardized["Nome_Exame"], lambda x: map_to_canonical(x, synonyms))
+    money = money_column(standardized["Valor"], safe_decimal)
+    standardized["Valor"] = money.units
+    standardized["Ordem_Valor"] = money.text_rank
+    standardized.attrs[MONEY_SCALE_ATTR] = money.scale
 
     return standardized
 
@@ -1172,150 +1096,444 @@ def safe_decimal(value: Any, default: Decimal = Decimal("0")) -> Decimal:
         return default
 
 
-def build_patient_records(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+def map_unique(series: pd.Series, func: Callable[[str], Any]) -> pd.Series:
     """
-    Agrupa exames por paciente normalizado.
+    Aplica `func` uma unica vez por valor distinto de uma coluna de texto sem nulos.
     """
-    patients: Dict[str, Dict[str, Any]] = {}
-    for row in df.itertuples(index=False):
-        patient = getattr(row, "Paciente", "")
-        patient_norm = getattr(row, "Paciente_Normalizado", "")
-        if not patient_norm:
-            continue
-        entry = patients.setdefault(patient_norm, {"records": []})
-        entry["records"].append(
-            {
-                "patient": patient,
-                "exam_name": getattr(row, "Nome_Exame", ""),
-                "canonical_name": getattr(row, "Nome_Canonico", ""),
-                "code": getattr(row, "Codigo_Exame", ""),
-                "value": getattr(row, "Valor", Decimal("0")),
-            }
-        )
-    return patients
+    codes, uniques = pd.factorize(series)
+    mapped = np.array([func(value) for value in np.asarray(uniques, dtype=object)] + [None], dtype=object)
+    return pd.Series(mapped[codes], index=series.index, dtype=object)
 
 
-def match_records(
-    comp_records: List[Dict[str, Any]],
-    sim_records: List[Dict[str, Any]],
-    *,
-    enable_fuzzy: bool = False,
-    fuzzy_threshold: float = 0.93,
-) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
-    """
-    Executa o matching por codigo, nome canonico e fuzzy opcional.
-    """
-    comp_unmatched = set(range(len(comp_records)))
-    sim_unmatched = set(range(len(sim_records)))
-    pairs: List[Tuple[int, int]] = []
-
-    # Match por codigo
-    comp_by_code = group_by(comp_records, comp_unmatched, key="code")
-    sim_by_code = group_by(sim_records, sim_unmatched, key="code")
-    for code in sorted(set(comp_by_code.keys()) & set(sim_by_code.keys())):
-        comp_indices = sort_indices(comp_by_code[code], comp_records)
-        sim_indices = sort_indices(sim_by_code[code], sim_records)
-        for comp_idx, sim_idx in zip(comp_indices, sim_indices):
-            if comp_idx in comp_unmatched and sim_idx in sim_unmatched:
-                pairs.append((comp_idx, sim_idx))
-                comp_unmatched.remove(comp_idx)
-                sim_unmatched.remove(sim_idx)
-
-    # Match por nome canonico
-    comp_by_name = group_by(comp_records, comp_unmatched, key="canonical_name")
-    sim_by_name = group_by(sim_records, sim_unmatched, key="canonical_name")
-    for name in sorted(set(comp_by_name.keys()) & set(sim_by_name.keys())):
-        comp_indices = sort_indices(comp_by_name[name], comp_records)
-        sim_indices = sort_indices(sim_by_name[name], sim_records)
-        for comp_idx, sim_idx in zip(comp_indices, sim_indices):
-            if comp_idx in comp_unmatched and sim_idx in sim_unmatched:
-                pairs.append((comp_idx, sim_idx))
-                comp_unmatched.remove(comp_idx)
-                sim_unmatched.remove(sim_idx)
-
-    if enable_fuzzy and comp_unmatched and sim_unmatched:
-        fuzzy_pairs = fuzzy_match_pairs(
-            comp_records,
-            sim_records,
-            comp_unmatched,
-            sim_unmatched,
-            threshold=fuzzy_threshold,
-        )
-        for comp_idx, sim_idx in fuzzy_pairs:
-            if comp_idx in comp_unmatched and sim_idx in sim_unmatched:
-                pairs.append((comp_idx, sim_idx))
-                comp_unmatched.remove(comp_idx)
-                sim_unmatched.remove(sim_idx)
+def build_match_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Monta a tabela de matching: exames com paciente normalizado, na ordem
+    original (Linha = posicao na tabela), com a chave de nome canonico e a
+    ordem textual do valor usadas no desempate.
+    """
+    table = df[["Paciente", "Paciente_Normalizado", "Nome_Exame", "Nome_Canonico", "Codigo_Exame", "Valor", "Ordem_Valor"]]
+    table = table[table["Paciente_Normalizado"].astype(bool).to_numpy()].reset_index(drop=True)
+    # Codigo_Exame ja sai de clean_code sem espacos nas bordas
+    table["Chave_Nome"] = map_unique(table["Nome_Canonico"], lambda name: str(name).strip())
+    table["Linha"] = np.arange(len(table))
+    return table
+
 
-    return pairs, sorted(comp_unmatched), sorted(sim_unmatched)
+def shared_codes(left: pd.Series, right: pd.Series, *, sort: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Codigos inteiros comuns aos dois lados (com sort=True, na ordem dos textos).
+    """
+    codes, _ = pd.factorize(pd.concat([left.astype(object), right.astype(object)], ignore_index=True), sort=sort)
+    return codes[: len(left)], codes[len(left):]
 
 
-def group_by(records: List[Dict[str, Any]], indices: Iterable[int], key: str) -> Dict[str, List[int]]:
+def tiebreak_order(table: pd.DataFrame) -> np.ndarray:
     """
-    Agrupa indices por chave de record.
+    Linhas da tabela na ordem de desempate do pareamento (nome canonico, valor, linha).
     """
-    grouped: Dict[str, List[int]] = {}
-    for idx in indices:
-        value = str(records[idx].get(key, "")).strip()
-        if not value:
-            continue
-        grouped.setdefault(value, []).append(idx)
-    return grouped
+    name_codes, _ = pd.factorize(table["Nome_Canonico"], sort=True)
+    return np.lexsort((table["Linha"].to_numpy(), table["Ordem_Valor"].to_numpy(), name_codes))
 
 
-def sort_indices(indices: List[int], records: List[Dict[str, Any]]) -> List[int]:
+def rank_within(groups: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Ordena indices para matching deterministico.
+    Numera (cumcount) as linhas de cada grupo (paciente, chave).
+
+    `rows` ja vem na ordem de desempate; a ordenacao estavel por grupo a
+    preserva. Retorna (grupo, ordem no grupo, linha).
     """
-    return sorted(
-        indices,
-        key=lambda idx: (
-            records[idx].get("canonical_name", ""),
-            str(records[idx].get("value", "")),
-        ),
+    rows = rows[np.argsort(groups[rows], kind="stable")]
+    group = groups[rows]
+    positions = np.arange(len(rows))
+    starts = np.ones(len(rows), dtype=bool)
+    starts[1:] = group[1:] != group[:-1]
+    first = np.maximum.accumulate(np.where(starts, positions, 0)) if len(rows) else positions
+    return group, positions - first, rows
+
+
+def pair_by_key(
+    comp: Dict[str, np.ndarray],
+    sim: Dict[str, np.ndarray],
+    key: str,
+    comp_free: np.ndarray,
+    sim_free: np.ndarray,
+    stage: int,
+) -> pd.DataFrame:
+    """
+    Pareia 1:1 exames livres com a mesma chave no mesmo paciente.
+
+    O k-esimo exame de cada lado (cumcount) forma par com o k-esimo do
+    outro; excedentes de qualquer lado ficam sem par.
+    """
+    key_count = int(max(comp[key].max(initial=0), sim[key].max(initial=0))) + 1
+    comp_group, comp_rank, comp_rows = rank_within(
+        comp["patient"].astype(np.int64) * key_count + comp[key], comp["order"][comp_free[comp["order"]]]
+    )
+    sim_group, sim_rank, sim_rows = rank_within(
+        sim["patient"].astype(np.int64) * key_count + sim[key], sim["order"][sim_free[sim["order"]]]
+    )
+    rank_count = int(max(comp_rank.max(initial=0), sim_rank.max(initial=0))) + 1
+    _, comp_idx, sim_idx = np.intersect1d(
+        comp_group * rank_count + comp_rank,
+        sim_group * rank_count + sim_rank,
+        assume_unique=True,
+        return_indices=True,
+    )
+    return pd.DataFrame(
+        {
+            "Etapa": stage,
+            "Grupo": comp_group[comp_idx] % key_count,
+            "Ordem": comp_rank[comp_idx],
+            "Linha_comp": comp_rows[comp_idx],
+            "Linha_sim": sim_rows[sim_idx],
+        }
     )
 
 
-def fuzzy_match_pairs(
-    comp_records: List[Dict[str, Any]],
-    sim_records: List[Dict[str, Any]],
-    comp_unmatched: Iterable[int],
-    sim_unmatched: Iterable[int],
+def fuzzy_pair_tables(
+    comp_table: pd.DataFrame,
+    sim_table: pd.DataFrame,
+    comp_rows: np.ndarray,
+    sim_rows: np.ndarray,
     *,
     threshold: float,
-) -> List[Tuple[int, int]]:
-    """
-    Gera pares usando Jaro-Winkler quando codigos nao estao disponiveis.
+    stage: int,
+) -> pd.DataFrame:
     """
-    candidates: List[Tuple[float, int, int]] = []
-    for comp_idx in comp_unmatched:
-        comp_record = comp_records[comp_idx]
-        comp_name = comp_record.get("canonical_name", "")
-        if not comp_name:
-            continue
-        for sim_idx in sim_unmatched:
-            sim_record = sim_records[sim_idx]
-            sim_name = sim_record.get("canonical_name", "")
-            if not sim_name:
-                continue
-            if comp_record.get("code") and sim_record.get("code"):
-                continue
-            score = jaro_winkler_similarity(comp_name, sim_name)
-            if score >= threshold:
-                candidates.append((score, comp_idx, sim_idx))
+    Pareamento fuzzy dos exames restantes de pacientes presentes nos dois lados.
 
-    candidates.sort(key=lambda item: (-item[0], comp_records[item[1]].get("canonical_name", "")))
+    Os candidatos (mesmo paciente, nao codificados nos dois lados) saem de um
+    join por paciente; cada par distinto de nomes e pontuado uma unica vez
+    (fuzzy_scores) e a escolha gulosa por paciente segue a da comparacao
+    exaustiva (fuzzy_match_pairs em benchmarks/reference.py).
+    """
+    empty = pd.DataFrame(
+        np.empty((0, 5), dtype=np.int64),
+        columns=["Etapa", "Grupo", "Ordem", "Linha_comp", "Linha_sim"],
+    )
+    comp_names = comp_table["Nome_Canonico"].to_numpy(dtype=object)
+    sim_names = sim_table["Nome_Canonico"].to_numpy(dtype=object)
+    comp_rows = comp_rows[comp_names[comp_rows].astype(bool)]
+    sim_rows = sim_rows[sim_names[sim_rows].astype(bool)]
+    if not len(comp_rows) or not len(sim_rows):
+        return empty
+
+    comp_keys, sim_keys = shared_codes(
+        pd.Series(comp_table["Paciente_Normalizado"].to_numpy(dtype=object)[comp_rows], dtype=object),
+        pd.Series(sim_table["Paciente_Normalizado"].to_numpy(dtype=object)[sim_rows], dtype=object),
+        sort=False,
+    )
 
-    pairs: List[Tuple[int, int]] = []
+    # Produto cartesiano por paciente (linhas COMPULAB e SIMUS em ordem crescente)
+    sim_order = np.argsort(sim_keys, kind="stable")
+    sim_sorted_keys = sim_keys[sim_order]
+    starts = np.searchsorted(sim_sorted_keys, comp_keys, side="left")
+    counts = np.searchsorted(sim_sorted_keys, comp_keys, side="right") - starts
+    total = int(counts.sum())
+    if not total:
+        return empty
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    cand_comp = np.repeat(comp_rows, counts)
+    cand_sim = sim_rows[sim_order[np.arange(total) + offsets]]
+    cand_patient = np.repeat(comp_keys, counts)
+
+    comp_coded = comp_table["Codigo_Exame"].to_numpy(dtype=object).astype(bool)
+    sim_coded = sim_table["Codigo_Exame"].to_numpy(dtype=object).astype(bool)
+    keep = np.flatnonzero(~(comp_coded[cand_comp] & sim_coded[cand_sim]))
+    scores = fuzzy_scores(comp_names[cand_comp[keep]], sim_names[cand_sim[keep]], threshold)
+    selected = scores >= threshold
+    keep, scores = keep[selected], scores[selected]
+    if not len(keep):
+        return empty
+
+    # Ordem da escolha exaustiva: maior score, nome COMPULAB, ordem de geracao
+    _, name_rank = np.unique(comp_names[cand_comp[keep]], return_inverse=True)
+    order = np.lexsort((keep, name_rank, -scores, cand_patient[keep]))
+
+    pairs: List[Tuple[int, int, int, int, int]] = []
     used_comp = set()
     used_sim = set()
-    for _, comp_idx, sim_idx in candidates:
-        if comp_idx in used_comp or sim_idx in used_sim:
+    patient_order: Dict[int, int] = {}
+    for patient, comp_line, sim_line in zip(
+        cand_patient[keep][order].tolist(),
+        cand_comp[keep][order].tolist(),
+        cand_sim[keep][order].tolist(),
+    ):
+        if comp_line in used_comp or sim_line in used_sim:
             continue
-        pairs.append((comp_idx, sim_idx))
-        used_comp.add(comp_idx)
-        used_sim.add(sim_idx)
-    return pairs
+        used_comp.add(comp_line)
+        used_sim.add(sim_line)
+        position = patient_order.get(patient, 0)
+        patient_order[patient] = position + 1
+        pairs.append((stage, 0, position, comp_line, sim_line))
+    return pd.DataFrame(
+        np.array(pairs, dtype=np.int64).reshape(-1, 5),
+        columns=["Etapa", "Grupo", "Ordem", "Linha_comp", "Linha_sim"],
+    )
+
+
+def match_tables(
+    comp_table: pd.DataFrame,
+    sim_table: pd.DataFrame,
+    *,
+    enable_fuzzy: bool = True,
+    fuzzy_threshold: float = 0.93,
+) -> pd.DataFrame:
+    """
+    Executa o matching por codigo, nome canonico e fuzzy.
+
+    Retorna um par por linha (Linha_comp, Linha_sim) com a etapa, o grupo
+    (codigo inteiro na ordem alfabetica da chave) e a ordem em que o par
+    foi formado, usados para ordenar os resultados.
+    """
+    comp: Dict[str, np.ndarray] = {"order": tiebreak_order(comp_table)}
+    sim: Dict[str, np.ndarray] = {"order": tiebreak_order(sim_table)}
+    comp["patient"], sim["patient"] = shared_codes(
+        comp_table["Paciente_Normalizado"], sim_table["Paciente_Normalizado"], sort=False
+    )
+    comp["code"], sim["code"] = shared_codes(comp_table["Codigo_Exame"], sim_table["Codigo_Exame"])
+    comp["name"], sim["name"] = shared_codes(comp_table["Chave_Nome"], sim_table["Chave_Nome"])
+
+    comp_free = np.ones(len(comp_table), dtype=bool)
+    sim_free = np.ones(len(sim_table), dtype=bool)
+    stages = []
+    for stage, (key, column) in enumerate((("code", "Codigo_Exame"), ("name", "Chave_Nome"))):
+        pairs = pair_by_key(
+            comp,
+            sim,
+            key,
+            comp_free & (comp_table[column].to_numpy(dtype=object) != ""),
+            sim_free & (sim_table[column].to_numpy(dtype=object) != ""),
+            stage,
+        )
+        comp_free[pairs["Linha_comp"].to_numpy()] = False
+        sim_free[pairs["Linha_sim"].to_numpy()] = False
+        stages.append(pairs)
+
+    if enable_fuzzy:
+        stages.append(
+            fuzzy_pair_tables(
+                comp_table,
+                sim_table,
+                np.flatnonzero(comp_free),
+                np.flatnonzero(sim_free),
+                threshold=fuzzy_threshold,
+                stage=len(stages),
+            )
+        )
+
+    return pd.concat(stages, ignore_index=True)
+
+
+def divergence_rows(
+    comp_table: pd.DataFrame,
+    sim_table: pd.DataFrame,
+    pairs: pd.DataFrame,
+    tolerance: int,
+    *,
+    scale: int,
+) -> List[Dict[str, Any]]:
+    """
+    Registros de divergencia de valor para os pares acima da tolerancia.
+
+    Valores e tolerancia chegam em unidades inteiras na escala `scale`; a
+    comparacao e exata e os campos de saida sao arredondados a centavos.
+    """
+    comp_lines = pairs["Linha_comp"].to_numpy()
+    sim_lines = pairs["Linha_sim"].to_numpy()
+    comp_units = comp_table["Valor"].to_numpy()[comp_lines]
+    sim_units = sim_table["Valor"].to_numpy()[sim_lines]
+    selected = np.flatnonzero(np.abs(comp_units - sim_units) > tolerance)
+    comp_lines, sim_lines = comp_lines[selected], sim_lines[selected]
+    comp_cents = to_cents(comp_units[selected], scale)
+    sim_cents = to_cents(sim_units[selected], scale)
+
+    def pick(table: pd.DataFrame, column: str, lines: np.ndarray) -> np.ndarray:
+        return table[column].take(lines).to_numpy(dtype=object)
+
+    def first_filled(column: str) -> np.ndarray:
+        comp_column, sim_column = pick(comp_table, column, comp_lines), pick(sim_table, column, sim_lines)
+        return np.where(comp_column.astype(bool), comp_column, sim_column)
+
+    patients = first_filled("Paciente")
+    canonical_names = first_filled("Nome_Canonico")
+    codes = first_filled("Codigo_Exame")
+    patient_keys, _ = pd.factorize(pick(comp_table, "Paciente_Normalizado", comp_lines), sort=True)
+    order = result_order(
+        patients,
+        canonical_names,
+        codes,
+        patient_keys,
+        pairs["Etapa"].to_numpy()[selected],
+        pairs["Grupo"].to_numpy()[selected],
+        pairs["Ordem"].to_numpy()[selected],
+    )
+    comp_exam_names = pick(comp_table, "Nome_Exame", comp_lines)
+    sim_exam_names = pick(sim_table, "Nome_Exame", sim_lines)
+    comp_cents, sim_cents = comp_cents[order], sim_cents[order]
+    return [
+        {
+            "Paciente": patient,
+            "Codigo_Exame": code,
+            "Nome_Canonico": canonical_name,
+            "Nome_Exame_Compulab": comp_exam_name,
+            "Nome_Exame_Simus": sim_exam_name,
+            "Valor_COMPULAB": comp_value,
+            "Valor_SIMUS": sim_value,
+            "Diferenca": difference,
+        }
+        for patient, code, canonical_name, comp_exam_name, sim_exam_name, comp_value, sim_value, difference in zip(
+            patients[order].tolist(),
+            codes[order].tolist(),
+            canonical_names[order].tolist(),
+            comp_exam_names[order].tolist(),
+            sim_exam_names[order].tolist(),
+            cents_to_float(comp_cents).tolist(),
+            cents_to_float(sim_cents).tolist(),
+            cents_to_float(comp_cents - sim_cents).tolist(),
+        )
+    ]
+
+
+def unmatched_rows(table: pd.DataFrame, matched_lines: pd.Series, *, source: str, scale: int) -> List[Dict[str, Any]]:
+    """
+    Registros de exames sem par (source="compulab" -> ausentes no SIMUS e vice-versa).
+    """
+    free = np.ones(len(table), dtype=bool)
+    free[matched_lines.to_numpy()] = False
+    rest = table[free]
+    patient_keys, _ = pd.factorize(rest["Paciente_Normalizado"], sort=True)
+    order = result_order(
+        rest["Paciente"].to_numpy(dtype=object),
+        rest["Nome_Canonico"].to_numpy(dtype=object),
+        rest["Codigo_Exame"].to_numpy(dtype=object),
+        patient_keys,
+        rest["Linha"].to_numpy(),
+    )
+    rest = rest.iloc[order]
+
+    cents = to_cents(rest["Valor"].to_numpy(), scale)
+    from_compulab = source == "compulab"
+    values = cents_to_float(cents).tolist()
+    differences = values if from_compulab else cents_to_float(-cents).tolist()
+
+    return [
+        {
+            "Paciente": patient,
+            "Codigo_Exame": code,
+            "Nome_Canonico": canonical_name,
+            "Nome_Exame_Compulab": exam_name if from_compulab else "",
+            "Nome_Exame_Simus": "" if from_compulab else exam_name,
+            "Valor_COMPULAB": value if from_compulab else None,
+            "Valor_SIMUS": None if from_compulab else value,
+            "Diferenca": difference,
+        }
+        for patient, code, canonical_name, exam_name, value, difference in zip(
+            rest["Paciente"].tolist(),
+            rest["Codigo_Exame"].tolist(),
+            rest["Nome_Canonico"].tolist(),
+            rest["Nome_Exame"].tolist(),
+            values,
+            differences,
+        )
+    ]
+
+
+def result_order(patient: np.ndarray, canonical_name: np.ndarray, code: np.ndarray, *tiebreak: np.ndarray) -> np.ndarray:
+    """
+    Ordem dos resultados por Paciente, Nome_Canonico e Codigo_Exame, desempatando
+    pela ordem em que o matching por paciente os produziria.
+    """
+    keys = [pd.factorize(values, sort=True)[0] for values in (patient, canonical_name, code)]
+    return np.lexsort(tuple(reversed(keys + list(tiebreak))))
+
+
+def fuzzy_scores(names_a: np.ndarray, names_b: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    fuzzy_score para pares alinhados; cada par distinto de nomes e avaliado uma vez.
+
+    Antes de pontuar, os pares distintos passam por um filtro vetorizado de
+    comprimento: com no maximo min(len) casamentos e prefixo de ate 4
+    caracteres, pares de tamanhos muito diferentes nao alcancam o limiar.
+    """
+    codes_a, uniques_a = pd.factorize(pd.Series(names_a, dtype=object))
+    codes_b, uniques_b = pd.factorize(pd.Series(names_b, dtype=object))
+    if not len(codes_a):
+        return np.empty(0, dtype=float)
+    width = max(len(uniques_b), 1)
+    distinct, inverse = np.unique(codes_a.astype(np.int64) * width + codes_b, return_inverse=True)
+    uniques_a = np.asarray(uniques_a, dtype=object)
+    uniques_b = np.asarray(uniques_b, dtype=object)
+    index_a, index_b = np.divmod(distinct, width)
+
+    lengths_a = np.array([len(name) for name in uniques_a], dtype=float)[index_a]
+    lengths_b = np.array([len(name) for name in uniques_b], dtype=float)[index_b]
+    shortest = np.minimum(lengths_a, lengths_b)
+    jaro = (shortest / lengths_a + shortest / lengths_b + 1.0) / 3.0
+    reachable = np.flatnonzero(jaro + 0.4 * (1.0 - jaro) >= threshold - 1e-9)
+
+    scores = np.zeros(len(distinct), dtype=float)
+    scores[reachable] = [
+        fuzzy_score(uniques_a[a], uniques_b[b], threshold)
+        for a, b in zip(index_a[reachable].tolist(), index_b[reachable].tolist())
+    ]
+    return scores[inverse]
+
+
+def fuzzy_score(name_a: str, name_b: str, threshold: float) -> float:
+    """
+    Jaro-Winkler memorizado de um par de nomes.
+
+    Pares cujo limite superior (fuzzy_upper_bound) ja fica abaixo de
+    `threshold` nao sao calculados e retornam 0.0; para os demais o valor e
+    exatamente o de jaro_winkler_similarity.
+    """
+    key = (name_a, name_b)
+    score = _fuzzy_memo.get(key)
+    if score is not None:
+        return score
+    if name_a != name_b and fuzzy_upper_bound(name_a, name_b) < threshold - 1e-9:
+        return 0.0
+    score = jaro_winkler_similarity(name_a, name_b)
+    if len(_fuzzy_memo) >= FUZZY_MEMO_SIZE:
+        _fuzzy_memo.clear()
+    _fuzzy_memo[key] = score
+    return score
+
+
+def fuzzy_upper_bound(name_a: str, name_b: str, prefix_scale: float = 0.1, max_prefix: int = 4) -> float:
+    """
+    Limite superior barato de jaro_winkler_similarity(name_a, name_b).
+
+    Os casamentos do Jaro nao passam do numero de caracteres em comum
+    (multiconjunto) e o bonus de prefixo usa o prefixo comum real. Serve de
+    bloqueio sem perda: nenhum par acima do limiar e descartado.
+    """
+    chars_a, chars_b = _fuzzy_profile(name_a), _fuzzy_profile(name_b)
+    if len(chars_a) > len(chars_b):
+        chars_a, chars_b = chars_b, chars_a
+    common = sum(min(count, chars_b.get(char, 0)) for char, count in chars_a.items())
+    if not common:
+        return 0.0
+    prefix = 0
+    for i in range(min(len(name_a), len(name_b), max_prefix)):
+        if name_a[i] != name_b[i]:
+            break
+        prefix += 1
+    jaro = (common / len(name_a) + common / len(name_b) + 1.0) / 3.0
+    return jaro + prefix * prefix_scale * (1.0 - jaro)
+
+
+def _fuzzy_profile(name: str) -> Dict[str, int]:
+    profile = _fuzzy_profiles.get(name)
+    if profile is None:
+        profile = {}
+        for char in name:
+            profile[char] = profile.get(char, 0) + 1
+        if len(_fuzzy_profiles) >= FUZZY_MEMO_SIZE:
+            _fuzzy_profiles.clear()
+        _fuzzy_profiles[name] = profile
+    return profile
 
 
 def jaro_winkler_similarity(s1: str, s2: str, prefix_scale: float = 0.1, max_prefix: int = 4) -> float:
@@ -1385,76 +1603,6 @@ def jaro_similarity(s1: str, s2: str) -> float:
     ) / 3.0
 
 
-def build_result_row(
-    *,
-    patient: str,
-    code: str,
-    canonical_name: str,
-    comp_value: Optional[Decimal],
-    sim_value: Optional[Decimal],
-    comp_exam_name: str,
-    sim_exam_name: str,
-) -> Dict[str, Any]:
-    """
-    Monta um registro padrao para resultados.
-    """
-    comp_val = decimal_to_float(quantize_decimal(comp_value)) if comp_value is not None else None
-    sim_val = decimal_to_float(quantize_decimal(sim_value)) if sim_value is not None else None
-    diff_val = None
-    if comp_val is not None and sim_val is not None:
-        diff_val = decimal_to_float(quantize_decimal(Decimal(str(comp_val)) - Decimal(str(sim_val))))
-    elif comp_val is not None:
-        diff_val = comp_val
-    elif sim_val is not None:
-        diff_val = decimal_to_float(quantize_decimal(Decimal("0") - Decimal(str(sim_val))))
-
-    return {
-        "Paciente": patient,
-        "Codigo_Exame": code,
-        "Nome_Canonico": canonical_name,
-        "Nome_Exame_Compulab": comp_exam_name,
-        "Nome_Exame_Simus": sim_exam_name,
-        "Valor_COMPULAB": comp_val,
-        "Valor_SIMUS": sim_val,
-        "Diferenca": diff_val,
-    }
-
-
-def quantize_decimal(value: Any) -> Decimal:
-    """
-    Arredonda valor para 2 casas decimais.
-    """
-    if isinstance(value, Decimal):
-        return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-
-def decimal_to_float(value: Decimal) -> float:
-    """
-    Converte Decimal para float com duas casas.
-    """
-    return float(value)
-
-
-def sum_decimal(values: Iterable[Any]) -> Decimal:
-    """
-    Soma valores convertendo para Decimal.
-    """
-    total = Decimal("0")
-    for value in values:
-        if value is None:
-            continue
-        total += safe_decimal(value, Decimal("0"))
-    return quantize_decimal(total)
-
-
-def abs_decimal(value: Any) -> Decimal:
-    """
-    Valor absoluto como Decimal.
-    """
-    return abs(safe_decimal(value, Decimal("0")))
-
-
 def _read_csv_bytes(data: bytes) -> pd.DataFrame:
     for encoding in ("utf-8-sig", "utf-8", "latin-1"):
         try:
@@ -1503,23 +1651,10 @@ def _load_from_pdf_path(path: str, source: Optional[str]) -> pd.DataFrame:
     from . import pdf_processor
 
     if source.lower() == "compulab":
-        patients, _ = pdf_processor.extract_compulab_patients(path)
+        patients, _ = pdf_processor.extract_compulab_patients_cached(path)
     elif source.lower() == "simus":
-        patients, _, _, _ = pdf_processor.extract_simus_patients(path)
+        patients, _, _, _ = pdf_processor.extract_simus_patients_cached(path)
     else:
         raise ValueError("Source invalido para PDF. Use 'compulab' ou 'simus'.")
 
-    rows: List[Dict[str, Any]] = []
-    for patient_name, data in (patients or {}).items():
-        exams = data.get("exams", []) if isinstance(data, dict) else data
-        for exam in exams:
-            rows.append(
-                {
-                    "Paciente": patient_name,
-                    "Nome_Exame": exam.get("exam_name", ""),
-                    "Codigo_Exame": exam.get("code", ""),
-                    "Valor": exam.get("value", 0),
-                }
-            )
-
-    return standardize_columns(pd.DataFrame(rows))
+    return standardize_columns(ExamTable.from_patients(patients).to_frame())
@@ -1,6 +1,14 @@
 """
 Gerador de Relatório PDF para Análise de Diferenças
 LabBridge
+
+O relatório é montado em duas etapas: report_summary/report_detail reduzem
+as listas da análise aos dados de cada seção (totais e as linhas exibidas,
+já formatadas) e render_analysis_pdf desenha o documento a partir desses
+dados. Cada seção de detalhe começa numa página nova e depende só da sua
+lista e das anotações, de modo que quem regenera o relatório (ver
+AnalysisState._report_sections) reaproveita as seções que não mudaram e
+envia ao job de renderização apenas alguns KB.
 """
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -10,8 +18,124 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from datetime import datetime
 from io import BytesIO
+from typing import Any, Dict, List, Optional
 from ..styles import Color
 
+# Linhas exibidas por seção de detalhe (o preview não comporta listas inteiras)
+REPORT_DETAIL_LIMIT = 50
+
+# Seções de detalhe, na ordem do relatório: título, cabeçalho, larguras (cm) e estilo extra
+DETAIL_SECTIONS = ("patients_only_compulab", "patients_only_simus", "exams_only_compulab",
+                   "divergences", "exams_only_simus")
+_DETAIL_LAYOUTS = {
+    "patients_only_compulab": ("Detalhamento: Pacientes somente COMPULAB",
+                               ['Paciente', 'Qtd Exames', 'Valor Total', 'Anotação'], [7, 3, 4, 4], []),
+    "patients_only_simus": ("Detalhamento: Pacientes somente SIMUS",
+                            ['Paciente', 'Qtd Exames', 'Valor Total', 'Anotação'], [7, 3, 4, 4], []),
+    "exams_only_compulab": ("Detalhamento: Exames somente COMPULAB",
+                            ['Paciente', 'Exame', 'Valor Compulab', 'Anotação'], [5, 7, 3, 3], []),
+    "divergences": ("Detalhamento: Diferença de Valores",
+                    ['Paciente', 'Exame', 'Compulab', 'Simus', 'Dif.', 'Anotação'], [3.5, 5.5, 2.2, 2.2, 2.1, 2.5],
+                    [('TEXTCOLOR', (4, 1), (4, -1), colors.red)]),
+    "exams_only_simus": ("Detalhamento: Exames somente SIMUS",
+                         ['Paciente', 'Exame', 'Valor Simus', 'Anotação'], [5, 7, 3, 3], []),
+}
+
+
+# Helper para somar valores de AnalysisResult objects ou dicts
+def get_val(item, attr):
+    return getattr(item, attr, 0) if not isinstance(item, dict) else item.get(attr, 0)
+
+
+def report_summary(
+    compulab_total: float,
+    simus_total: float,
+    patients_only_compulab: list,
+    patients_only_simus: list,
+    exams_only_compulab: list,
+    divergences: list,
+    exams_only_simus: list,
+    top_offenders: list,
+) -> Dict[str, Any]:
+    """Dados da primeira página: totais, tabela de perdas e top offensores."""
+    loss_data = [['Categoria', 'Qtd. Ocorrências', 'Impacto Financeiro']]
+
+    # Pacientes somente COMPULAB
+    poc_total = sum(get_val(x, 'total_value') or get_val(x, 'value') for x in patients_only_compulab)
+    loss_data.append(['Pacientes somente COMPULAB', str(len(patients_only_compulab)), f"R$ {poc_total:,.2f}"])
+
+    # Pacientes somente SIMUS
+    pos_total = sum(get_val(x, 'total_value') or get_val(x, 'value') for x in patients_only_simus)
+    loss_data.append(['Pacientes somente SIMUS', str(len(patients_only_simus)), f"R$ {pos_total:,.2f}"])
+    
+    # Exames somente COMPULAB
+    eoc_total = sum(get_val(x, 'compulab_value') or get_val(x, 'value') for x in exams_only_compulab)
+    loss_data.append(['Exames somente COMPULAB', str(len(exams_only_compulab)), f"R$ {eoc_total:,.2f}"])
+    
+    # Divergences
+    div_total = sum(abs(get_val(x, 'difference')) for x in divergences)
+    loss_data.append(['Diferença de Valores', str(len(divergences)), f"R$ {div_total:,.2f}"])
+    
+    # Exames somente SIMUS
+    eos_total = sum(get_val(x, 'simus_value') for x in exams_only_simus)
+    loss_data.append(['Exames somente SIMUS', str(len(exams_only_simus)), f"R$ {eos_total:,.2f}"])
+    
+    # Total Leakage (COMPULAB)
+    total_leakage = poc_total + eoc_total + div_total
+    loss_data.append(['TOTAL DE PERDAS MENSURÁVEIS (COMPULAB)', '', f"R$ {total_leakage:,.2f}"])
+
+    return {
+        "compulab_total": compulab_total,
+        "simus_total": simus_total,
+        "loss_rows": loss_data,
+        "offender_rows": [[off.name, str(off.count)] for off in top_offenders or []],
+    }
+
+
+def report_detail(kind: str, items: list, annotations: dict = None) -> Optional[Dict[str, Any]]:
+    """Linhas exibidas de uma seção de detalhe (None se a lista estiver vazia)."""
+    if not items:
+        return None
+    annotations = annotations or {}
+
+    def annotation_label(patient: str, exam: str = "") -> str:
+        value = annotations.get(f"{patient}|{exam}", "") if annotations else ""
+        if not value:
+            return "-"
+        return value.replace("_", " ")
+
+    rows = []
+    for item in items[:REPORT_DETAIL_LIMIT]:
+        patient_name = get_val(item, 'patient')
+        if kind in ("patients_only_compulab", "patients_only_simus"):
+            rows.append([
+                patient_name,
+                str(get_val(item, 'exams_count')),
+                f"R$ {get_val(item, 'total_value'):,.2f}",
+                annotation_label(patient_name),
+            ])
+            continue
+        exam_name = get_val(item, 'exam_name')
+        if kind == "divergences":
+            rows.append([
+                patient_name[:15],
+                exam_name[:22],
+                f"{get_val(item, 'compulab_value'):,.2f}",
+                f"{get_val(item, 'simus_value'):,.2f}",
+                f"{get_val(item, 'difference'):,.2f}",
+                annotation_label(patient_name, exam_name),
+            ])
+        else:
+            value_key = 'compulab_value' if kind == "exams_only_compulab" else 'simus_value'
+            rows.append([
+                patient_name[:20],
+                exam_name[:35],
+                f"R$ {get_val(item, value_key):,.2f}",
+                annotation_label(patient_name, exam_name),
+            ])
+    return {"kind": kind, "rows": rows, "total": len(items)}
+
+
 def generate_analysis_pdf(
     compulab_total: float,
     simus_total: float,
@@ -26,7 +150,17 @@ def generate_analysis_pdf(
     """
     Gera PDF com o relatório completo da análise de auditoria.
     """
-    annotations = annotations or {}
+    summary = report_summary(compulab_total, simus_total, patients_only_compulab, patients_only_simus,
+                             exams_only_compulab, divergences, exams_only_simus, top_offenders)
+    lists = (patients_only_compulab, patients_only_simus, exams_only_compulab, divergences, exams_only_simus)
+    details = [report_detail(kind, items, annotations) for kind, items in zip(DETAIL_SECTIONS, lists)]
+    return render_analysis_pdf(summary, details)
+
+
+def render_analysis_pdf(summary: Dict[str, Any], details: List[Optional[Dict[str, Any]]]) -> bytes:
+    """Desenha o relatório a partir de report_summary e das seções de report_detail."""
+    compulab_total = summary["compulab_total"]
+    simus_total = summary["simus_total"]
     buffer = BytesIO()
     doc = SimpleDocTemplate(
         buffer,
@@ -117,44 +251,8 @@ def generate_analysis_pdf(
     
     # === SEÇÃO 1: DETALHAMENTO DE DIFERENÇAS ===
     story.append(Paragraph("Detalhamento de Diferenças Identificadas", h2_style))
-    
-    loss_data = [['Categoria', 'Qtd. Ocorrências', 'Impacto Financeiro']]
-    
-    # Helper para somar valores de AnalysisResult objects ou dicts
-    def get_val(item, attr):
-        return getattr(item, attr, 0) if not isinstance(item, dict) else item.get(attr, 0)
-
-    def annotation_label(patient: str, exam: str = "") -> str:
-        value = annotations.get(f"{patient}|{exam}", "") if annotations else ""
-        if not value:
-            return "-"
-        return value.replace("_", " ")
 
-    # Pacientes somente COMPULAB
-    poc_total = sum(get_val(x, 'total_value') or get_val(x, 'value') for x in patients_only_compulab)
-    loss_data.append(['Pacientes somente COMPULAB', str(len(patients_only_compulab)), f"R$ {poc_total:,.2f}"])
-
-    # Pacientes somente SIMUS
-    pos_total = sum(get_val(x, 'total_value') or get_val(x, 'value') for x in patients_only_simus)
-    loss_data.append(['Pacientes somente SIMUS', str(len(patients_only_simus)), f"R$ {pos_total:,.2f}"])
-    
-    # Exames somente COMPULAB
-    eoc_total = sum(get_val(x, 'compulab_value') or get_val(x, 'value') for x in exams_only_compulab)
-    loss_data.append(['Exames somente COMPULAB', str(len(exams_only_compulab)), f"R$ {eoc_total:,.2f}"])
-    
-    # Divergences
-    div_total = sum(abs(get_val(x, 'difference')) for x in divergences)
-    loss_data.append(['Diferença de Valores', str(len(divergences)), f"R$ {div_total:,.2f}"])
-    
-    # Exames somente SIMUS
-    eos_total = sum(get_val(x, 'simus_value') for x in exams_only_simus)
-    loss_data.append(['Exames somente SIMUS', str(len(exams_only_simus)), f"R$ {eos_total:,.2f}"])
-    
-    # Total Leakage (COMPULAB)
-    total_leakage = poc_total + eoc_total + div_total
-    loss_data.append(['TOTAL DE PERDAS MENSURÁVEIS (COMPULAB)', '', f"R$ {total_leakage:,.2f}"])
-
-    loss_table = Table(loss_data, colWidths=[9*cm, 4*cm, 5*cm])
+    loss_table = Table(summary["loss_rows"], colWidths=[9*cm, 4*cm, 5*cm])
     loss_table.setStyle(TableStyle([
         ('BACKGROUND', (0,0), (-1,0), colors.HexColor(Color.PRIMARY_LIGHT)),
         ('TEXTCOLOR', (0,0), (-1,0), colors.HexColor(Color.DEEP)),
@@ -171,11 +269,9 @@ def generate_analysis_pdf(
     story.append(Spacer(1, 0.5*cm))
     
     # === SEÇÃO 2: TOP OFFENSORES ===
-    if top_offenders:
+    if summary["offender_rows"]:
         story.append(Paragraph("Top 5 Exames Problemáticos", h2_style))
-        offender_data = [['Exame', 'Ocorrências']]
-        for off in top_offenders:
-            offender_data.append([off.name, str(off.count)])
+        offender_data = [['Exame', 'Ocorrências']] + summary["offender_rows"]
             
         off_table = Table(offender_data, colWidths=[13*cm, 5*cm])
         off_table.setStyle(TableStyle([
@@ -187,127 +283,23 @@ def generate_analysis_pdf(
         story.append(off_table)
         story.append(Spacer(1, 1*cm))
 
-    # === SEÇÃO 3: LISTAS DETALHADAS (Limitado a 50 itens para não quebrar preview) ===
-    
-    # Pacientes somente COMPULAB
-    if patients_only_compulab:
+    # === SEÇÃO 3: LISTAS DETALHADAS (Limitado a REPORT_DETAIL_LIMIT itens para não quebrar preview) ===
+    for detail in details:
+        if not detail:
+            continue
+        title, header, widths, extra_style = _DETAIL_LAYOUTS[detail["kind"]]
         story.append(PageBreak())
-        story.append(Paragraph("Detalhamento: Pacientes somente COMPULAB", h2_style))
-        p_data = [['Paciente', 'Qtd Exames', 'Valor Total', 'Anotação']]
-        for p in patients_only_compulab[:50]: # Limit
-            patient_name = get_val(p, 'patient')
-            p_data.append([
-                patient_name,
-                str(get_val(p, 'exams_count')),
-                f"R$ {get_val(p, 'total_value'):,.2f}",
-                annotation_label(patient_name),
-            ])
-        
-        p_table = Table(p_data, colWidths=[7*cm, 3*cm, 4*cm, 4*cm])
-        p_table.setStyle(TableStyle([
+        story.append(Paragraph(title, h2_style))
+        table = Table([header] + detail["rows"], colWidths=[width*cm for width in widths])
+        table.setStyle(TableStyle([
              ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
              ('GRID', (0,0), (-1,-1), 0.2, colors.grey),
              ('FONTSIZE', (0,0), (-1,-1), 8),
-        ]))
-        story.append(p_table)
-        if len(patients_only_compulab) > 50:
-             story.append(Paragraph(f"... e mais {len(patients_only_compulab)-50} pacientes.", styles['Italic']))
-
-    # Pacientes somente SIMUS
-    if patients_only_simus:
-        story.append(PageBreak())
-        story.append(Paragraph("Detalhamento: Pacientes somente SIMUS", h2_style))
-        p_data = [['Paciente', 'Qtd Exames', 'Valor Total', 'Anotação']]
-        for p in patients_only_simus[:50]:
-            patient_name = get_val(p, 'patient')
-            p_data.append([
-                patient_name,
-                str(get_val(p, 'exams_count')),
-                f"R$ {get_val(p, 'total_value'):,.2f}",
-                annotation_label(patient_name),
-            ])
-        
-        p_table = Table(p_data, colWidths=[7*cm, 3*cm, 4*cm, 4*cm])
-        p_table.setStyle(TableStyle([
-             ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-             ('GRID', (0,0), (-1,-1), 0.2, colors.grey),
-             ('FONTSIZE', (0,0), (-1,-1), 8),
-        ]))
-        story.append(p_table)
-        if len(patients_only_simus) > 50:
-             story.append(Paragraph(f"... e mais {len(patients_only_simus)-50} pacientes.", styles['Italic']))
-
-    # Exames somente COMPULAB
-    if exams_only_compulab:
-        story.append(PageBreak())
-        story.append(Paragraph("Detalhamento: Exames somente COMPULAB", h2_style))
-        e_data = [['Paciente', 'Exame', 'Valor Compulab', 'Anotação']]
-        for e in exams_only_compulab[:50]:
-            patient_name = get_val(e, 'patient')
-            exam_name = get_val(e, 'exam_name')
-            e_data.append([
-                patient_name[:20],
-                exam_name[:35],
-                f"R$ {get_val(e, 'compulab_value'):,.2f}",
-                annotation_label(patient_name, exam_name),
-            ])
-            
-        e_table = Table(e_data, colWidths=[5*cm, 7*cm, 3*cm, 3*cm])
-        e_table.setStyle(TableStyle([
-             ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-             ('GRID', (0,0), (-1,-1), 0.2, colors.grey),
-             ('FONTSIZE', (0,0), (-1,-1), 8),
-        ]))
-        story.append(e_table)
-
-    # Diferença de Valores
-    if divergences:
-        story.append(PageBreak())
-        story.append(Paragraph("Detalhamento: Diferença de Valores", h2_style))
-        d_data = [['Paciente', 'Exame', 'Compulab', 'Simus', 'Dif.', 'Anotação']]
-        for d in divergences[:50]:
-            patient_name = get_val(d, 'patient')
-            exam_name = get_val(d, 'exam_name')
-            d_data.append([
-                patient_name[:15],
-                exam_name[:22],
-                f"{get_val(d, 'compulab_value'):,.2f}",
-                f"{get_val(d, 'simus_value'):,.2f}",
-                f"{get_val(d, 'difference'):,.2f}",
-                annotation_label(patient_name, exam_name),
-            ])
-            
-        d_table = Table(d_data, colWidths=[3.5*cm, 5.5*cm, 2.2*cm, 2.2*cm, 2.1*cm, 2.5*cm])
-        d_table.setStyle(TableStyle([
-             ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-             ('GRID', (0,0), (-1,-1), 0.2, colors.grey),
-             ('FONTSIZE', (0,0), (-1,-1), 8),
-             ('TEXTCOLOR', (4,1), (4,-1), colors.red),
-        ]))
-        story.append(d_table)
-
-    # Exames somente SIMUS
-    if exams_only_simus:
-        story.append(PageBreak())
-        story.append(Paragraph("Detalhamento: Exames somente SIMUS", h2_style))
-        e_data = [['Paciente', 'Exame', 'Valor Simus', 'Anotação']]
-        for e in exams_only_simus[:50]:
-            patient_name = get_val(e, 'patient')
-            exam_name = get_val(e, 'exam_name')
-            e_data.append([
-                patient_name[:20],
-                exam_name[:35],
-                f"R$ {get_val(e, 'simus_value'):,.2f}",
-                annotation_label(patient_name, exam_name),
-            ])
-            
-        e_table = Table(e_data, colWidths=[5*cm, 7*cm, 3*cm, 3*cm])
-        e_table.setStyle(TableStyle([
-             ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-             ('GRID', (0,0), (-1,-1), 0.2, colors.grey),
-             ('FONTSIZE', (0,0), (-1,-1), 8),
-        ]))
-        story.append(e_table)
+        ] + extra_style))
+        story.append(table)
+        remaining = detail["total"] - REPORT_DETAIL_LIMIT
+        if detail["kind"] in ("patients_only_compulab", "patients_only_simus") and remaining > 0:
+             story.append(Paragraph(f"... e mais {remaining} pacientes.", styles['Italic']))
 
     doc.build(story)
     buffer.seek(0)
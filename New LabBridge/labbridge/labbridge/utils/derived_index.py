@@ -0,0 +1,206 @@
+"""
+Indices derivados da analise
+LabBridge
+
+Listas que a tela deriva dos dados completos da analise (nomes de exame de
+cada sistema, top offenders) sao calculadas uma vez por versao dos
+resultados; as que dependem tambem dos mapeamentos (exames SIMUS sem
+mapeamento, sugestoes de vinculo) uma vez por snapshot de mapeamentos
+(impressao digital do mapping_service). As variaveis computadas do estado
+apenas leem o indice.
+
+Os indices ficam num cache LRU do processo (derived_index_cache), pela
+chave (sessao, versao dos resultados), e podem ser montados de antemao numa
+thread (ver AnalysisState._warm_derived_index).
+"""
+import os
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .exam_table import ExamTable
+from .pdf_processor import normalize_exam_name_for_comparison
+
+# Indices mantidos em memoria (todas as sessoes do processo)
+DERIVED_INDEX_CACHE_SIZE = max(1, int(os.getenv("DERIVED_INDEX_CACHE_SIZE", "32") or 32))
+# Candidatos avaliados nas sugestoes de vinculo (SIMUS x COMPULAB) e sugestoes exibidas
+SUGGESTION_SIMUS_CANDIDATES = 60
+SUGGESTION_COMPULAB_CANDIDATES = 200
+SUGGESTION_MIN_SCORE = 0.86
+SUGGESTION_LIMIT = 12
+TOP_OFFENDERS_LIMIT = 5
+# Snapshots de mapeamento memorizados por indice
+_MAPPING_VIEWS = 2
+
+
+def _item_field(item: Any, key: str) -> Any:
+    if isinstance(item, dict):
+        return item.get(key, "")
+    return getattr(item, key, "")
+
+
+def exam_names(patients: Any) -> List[str]:
+    """Nomes de exame distintos (sem espacos nas pontas), ordenados."""
+    if isinstance(patients, ExamTable):
+        return sorted({str(name).strip() for name in patients.exam_name_set() if name})
+    names = set()
+    for patient_data in (patients or {}).values():
+        exams = []
+        if isinstance(patient_data, dict):
+            exams = patient_data.get("exams", [])
+        elif isinstance(patient_data, list):
+            exams = patient_data
+        for exam in exams:
+            name = _item_field(exam, "exam_name")
+            if name:
+                names.add(str(name).strip())
+    return sorted(names)
+
+
+def top_offenders(*item_lists: Iterable[Any], limit: int = TOP_OFFENDERS_LIMIT) -> List[Tuple[str, int]]:
+    """(exame, ocorrencias) dos exames mais frequentes; empates na ordem de aparicao."""
+    counts: Dict[str, int] = {}
+    for items in item_lists:
+        for item in items:
+            name = _item_field(item, "exam_name")
+            if name:
+                counts[name] = counts.get(name, 0) + 1
+    return [(str(name), int(count))
+            for name, count in sorted(counts.items(), key=lambda x: x[1], reverse=True)[:limit]]
+
+
+def _tokens(normalized: str) -> Set[str]:
+    return {word for word in normalized.split() if len(word) >= 3}
+
+
+def suggest_mappings(simus_names: List[str], compulab_names: List[str]) -> List[Dict[str, Any]]:
+    """Sugestoes de vinculo SIMUS -> COMPULAB por similaridade de nomes."""
+    simus_candidates = simus_names[:SUGGESTION_SIMUS_CANDIDATES]
+    compulab_candidates = compulab_names[:SUGGESTION_COMPULAB_CANDIDATES]
+    if not simus_candidates or not compulab_candidates:
+        return []
+
+    comp_entries = []
+    for comp_name in compulab_candidates:
+        comp_norm = normalize_exam_name_for_comparison(comp_name)
+        if not comp_norm:
+            continue
+        # Um SequenceMatcher por candidato COMPULAB (`b`): o indice de `b` e montado uma vez
+        comp_entries.append((comp_name, SequenceMatcher(None, b=comp_norm), _tokens(comp_norm)))
+
+    suggestions: List[Dict[str, Any]] = []
+    for simus_name in simus_candidates:
+        simus_norm = normalize_exam_name_for_comparison(simus_name)
+        if not simus_norm:
+            continue
+        simus_tokens = _tokens(simus_norm)
+        best_score = 0.0
+        best_comp = None
+        best_overlap = 0
+        for comp_name, matcher, comp_tokens in comp_entries:
+            matcher.set_seq1(simus_norm)
+            ratio = matcher.ratio()
+            overlap = len(simus_tokens & comp_tokens)
+            score = ratio + (0.02 * overlap)
+            if score > best_score or (score == best_score and overlap > best_overlap):
+                best_score = score
+                best_comp = comp_name
+                best_overlap = overlap
+        if best_comp and best_score >= SUGGESTION_MIN_SCORE:
+            score_pct = int(best_score * 100)
+            suggestions.append({
+                "simus_name": simus_name,
+                "compulab_name": best_comp,
+                "score": round(best_score, 2),
+                "score_pct": score_pct,
+                "score_label": f"{score_pct}%",
+            })
+
+    suggestions.sort(key=lambda s: (-s.get("score", 0), s.get("simus_name", "")))
+    return suggestions[:SUGGESTION_LIMIT]
+
+
+class MappingView(NamedTuple):
+    """Parte do indice que depende do snapshot de mapeamentos."""
+    unmapped_simus_exam_names: List[str]
+    suggested_mappings: List[Dict[str, Any]]
+
+
+class DerivedIndex:
+    """Indices derivados de uma versao dos resultados da analise."""
+
+    def __init__(self, compulab_patients: Any, simus_patients: Any,
+                 exams_only_compulab: Iterable[Any], value_divergences: Iterable[Any]):
+        self.compulab_exam_names = exam_names(compulab_patients)
+        self.simus_exam_names = exam_names(simus_patients)
+        self.top_offenders = top_offenders(exams_only_compulab, value_divergences)
+        self._views: "OrderedDict[str, MappingView]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mapping_view(self, fingerprint: str, mappings: Dict[str, str]) -> MappingView:
+        """Exames SIMUS sem mapeamento e sugestoes para o snapshot `fingerprint`."""
+        with self._lock:
+            view = self._views.get(fingerprint)
+            if view is not None:
+                self._views.move_to_end(fingerprint)
+                return view
+            mapped_keys = {key.upper().strip() for key in (mappings or {})}
+            unmapped = [name for name in self.simus_exam_names
+                        if name and name.upper().strip() not in mapped_keys]
+            view = self._views[fingerprint] = MappingView(unmapped, suggest_mappings(unmapped, self.compulab_exam_names))
+            while len(self._views) > _MAPPING_VIEWS:
+                self._views.popitem(last=False)
+        return view
+
+
+class DerivedIndexCache:
+    """Cache LRU dos indices derivados, com montagem unica por chave."""
+
+    _entries: "OrderedDict[str, DerivedIndex]" = OrderedDict()
+    _building: Dict[str, threading.Lock] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, key: str) -> Optional[DerivedIndex]:
+        with cls._lock:
+            index = cls._entries.get(key)
+            if index is not None:
+                cls._entries.move_to_end(key)
+            return index
+
+    @classmethod
+    def get_or_build(cls, key: str, build: Callable[[], DerivedIndex]) -> DerivedIndex:
+        index = cls.get(key)
+        if index is not None:
+            return index
+        with cls._lock:
+            building = cls._building.setdefault(key, threading.Lock())
+        # Quem chega durante a montagem (ex.: a thread de pre-montagem) espera em vez de repetir
+        with building:
+            index = cls.get(key)
+            if index is None:
+                index = build()
+                with cls._lock:
+                    cls._entries[key] = index
+                    while len(cls._entries) > DERIVED_INDEX_CACHE_SIZE:
+                        cls._entries.popitem(last=False)
+        with cls._lock:
+            cls._building.pop(key, None)
+        return index
+
+    @classmethod
+    def discard(cls, prefix: str) -> None:
+        """Remove os indices cuja chave comeca com `prefix` (ex.: de uma sessao)."""
+        with cls._lock:
+            for key in [key for key in cls._entries if key.startswith(prefix)]:
+                del cls._entries[key]
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries.clear()
+
+
+# Singleton para uso simplificado
+derived_index_cache = DerivedIndexCache()
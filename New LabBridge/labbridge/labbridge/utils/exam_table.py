@@ -0,0 +1,276 @@
+"""
+Tabela compacta de exames
+LabBridge
+
+Formato de troca entre os parsers (pdf_processor), o cache de extracao, a
+conciliacao e o estado da analise. Em vez de um dicionario com um Decimal
+por exame, os exames ficam em colunas numpy agrupadas por paciente:
+
+- nomes de paciente, de exame, codigos e valores em vocabularios (strings
+  internadas, um Decimal por valor distinto), com um indice int32 por linha;
+- unidades inteiras por valor distinto (centavos, ou escala maior quando a
+  entrada traz fracao de centavo; ver money.py);
+- offsets: as linhas do paciente i sao [offsets[i], offsets[i + 1]).
+
+A tabela e um Mapping somente leitura paciente -> {"exams": [...], "total":
+Decimal} montado sob demanda com os mesmos objetos Decimal lidos pelo
+parser, de modo que o codigo que espera o dicionario aninhado continua
+funcionando. Quem precisa de desempenho usa as colunas (to_frame,
+exam_name_set, total, digest).
+"""
+import hashlib
+import sys
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .money import CENTS_SCALE, _fraction_digits, _units_array, decimal_units
+
+# Colunas aceitas por ExamTableBuilder.build(sort_exams=...)
+SORT_COLUMNS = ("exam_name", "value", "code")
+
+
+def _as_decimal(value: Any) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value if value is not None else 0))
+
+
+def _object_array(values: Sequence[Any]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+
+class ExamTable(Mapping):
+    """Exames por paciente em colunas (ver docstring do modulo)."""
+
+    __slots__ = (
+        "patient_names", "exam_names", "codes", "values", "value_units", "scale",
+        "offsets", "exam_ids", "code_ids", "value_ids", "_positions",
+    )
+
+    def __init__(self, patient_names: Sequence[str], exam_names: Sequence[str], codes: Sequence[str],
+                 values: Sequence[Decimal], offsets: np.ndarray, exam_ids: np.ndarray,
+                 code_ids: np.ndarray, value_ids: np.ndarray):
+        self.patient_names: List[str] = list(patient_names)
+        self.exam_names: List[str] = list(exam_names)
+        self.codes: List[str] = list(codes)
+        self.values: List[Decimal] = list(values)
+        self.offsets = offsets
+        self.exam_ids = exam_ids
+        self.code_ids = code_ids
+        self.value_ids = value_ids
+        finite = [value for value in self.values if value.is_finite()]
+        self.scale = max([CENTS_SCALE] + [_fraction_digits(value) for value in finite])
+        self.value_units = _units_array(
+            [decimal_units(value, self.scale) if value.is_finite() else 0 for value in self.values],
+            len(value_ids),
+        )
+        self._positions: Dict[str, int] = {name: position for position, name in enumerate(self.patient_names)}
+
+    @classmethod
+    def empty(cls) -> "ExamTable":
+        return ExamTableBuilder().build()
+
+    @classmethod
+    def from_patients(cls, patients: Any) -> "ExamTable":
+        """Tabela a partir do dicionario aninhado {paciente: {"exams": [...]}} (ou da propria tabela)."""
+        if isinstance(patients, ExamTable):
+            return patients
+        builder = ExamTableBuilder()
+        for patient_name, data in (patients or {}).items():
+            builder.touch(patient_name)
+            for exam in data.get("exams", []) if isinstance(data, dict) else []:
+                builder.add_exam(patient_name, exam)
+        return builder.build()
+
+    # ----- Mapping (visao compativel) -----
+
+    def __getitem__(self, patient_name: str) -> Dict[str, Any]:
+        exams = self.exams(patient_name)
+        return {"exams": exams, "total": sum((exam["value"] for exam in exams), Decimal("0"))}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.patient_names)
+
+    def __len__(self) -> int:
+        return len(self.patient_names)
+
+    def __contains__(self, patient_name: object) -> bool:
+        return patient_name in self._positions
+
+    def __repr__(self) -> str:
+        return f"ExamTable({len(self)} pacientes, {self.rows} exames)"
+
+    def __reduce__(self):
+        return (ExamTable, (self.patient_names, self.exam_names, self.codes, self.values,
+                            self.offsets, self.exam_ids, self.code_ids, self.value_ids))
+
+    # ----- Colunas -----
+
+    @property
+    def rows(self) -> int:
+        return len(self.value_ids)
+
+    @property
+    def units(self) -> np.ndarray:
+        """Unidades inteiras por linha na escala 10**-scale."""
+        return self.value_units[self.value_ids]
+
+    def patient_ids(self) -> np.ndarray:
+        """Indice do paciente de cada linha."""
+        return np.repeat(np.arange(len(self.patient_names), dtype=np.int32), np.diff(self.offsets))
+
+    def exams(self, patient_name: str) -> List[Dict[str, Any]]:
+        """Exames de um paciente como dicionarios novos (exam_name, code, value)."""
+        position = self._positions[patient_name]
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        exam_names, codes, values = self.exam_names, self.codes, self.values
+        return [
+            {"exam_name": exam_names[exam_id], "code": codes[code_id], "value": values[value_id]}
+            for exam_id, code_id, value_id in zip(
+                self.exam_ids[start:end].tolist(), self.code_ids[start:end].tolist(),
+                self.value_ids[start:end].tolist(),
+            )
+        ]
+
+    def total(self) -> Decimal:
+        """Soma exata de todos os exames (igual a somar os Decimal linha a linha)."""
+        counts = np.bincount(self.value_ids, minlength=len(self.values)).tolist()
+        return sum((value * count for value, count in zip(self.values, counts) if count), Decimal("0"))
+
+    def exam_name_set(self) -> set:
+        """Nomes de exame presentes na tabela."""
+        return {self.exam_names[exam_id] for exam_id in np.unique(self.exam_ids).tolist()}
+
+    def iter_rows(self) -> Iterator[Tuple[str, str, str, Decimal]]:
+        """(paciente, exame, codigo, valor) na ordem da tabela."""
+        patient_names, exam_names, codes, values = self.patient_names, self.exam_names, self.codes, self.values
+        for patient_id, exam_id, code_id, value_id in zip(
+            self.patient_ids().tolist(), self.exam_ids.tolist(), self.code_ids.tolist(), self.value_ids.tolist()
+        ):
+            yield patient_names[patient_id], exam_names[exam_id], codes[code_id], values[value_id]
+
+    def to_frame(self):
+        """DataFrame (Paciente, Nome_Exame, Codigo_Exame, Valor) com Valor em Decimal, na ordem da tabela."""
+        import pandas as pd
+
+        return pd.DataFrame({
+            "Paciente": _object_array(self.patient_names)[self.patient_ids()],
+            "Nome_Exame": _object_array(self.exam_names)[self.exam_ids],
+            "Codigo_Exame": _object_array(self.codes)[self.code_ids],
+            "Valor": _object_array(self.values)[self.value_ids],
+        }, columns=["Paciente", "Nome_Exame", "Codigo_Exame", "Valor"])
+
+    def digest(self) -> str:
+        """SHA-256 do conteudo (vocabularios e colunas)."""
+        digest = hashlib.sha256()
+        for vocabulary in (self.patient_names, self.exam_names, self.codes, map(str, self.values)):
+            digest.update("\x1f".join(vocabulary).encode("utf-8"))
+            digest.update(b"\x1e")
+        for column in (self.offsets, self.exam_ids, self.code_ids, self.value_ids):
+            digest.update(np.ascontiguousarray(column, dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    def nbytes(self) -> int:
+        """Memoria aproximada da tabela (colunas, vocabularios e indice de pacientes)."""
+        columns = (self.offsets, self.exam_ids, self.code_ids, self.value_ids, self.value_units)
+        vocabularies = (self.patient_names, self.exam_names, self.codes, self.values)
+        return (
+            sum(column.nbytes for column in columns)
+            + sum(sys.getsizeof(item) for vocabulary in vocabularies for item in vocabulary)
+            + sum(sys.getsizeof(container) for container in vocabularies + (self._positions,))
+        )
+
+
+class ExamTableBuilder:
+    """
+    Acumula exames (paciente, exame, codigo, valor) na ordem de leitura e
+    monta a ExamTable.
+
+    Como no dicionario aninhado que os parsers montavam, os pacientes ficam
+    na ordem da primeira ocorrencia e os exames de cada paciente na ordem de
+    leitura (ou na ordem pedida em build).
+    """
+
+    def __init__(self):
+        self._patients: Dict[str, int] = {}
+        self._exam_names: Dict[str, int] = {}
+        self._codes: Dict[str, int] = {}
+        # Valores pelo texto: 10.5 e 10.50 continuam objetos distintos, como no parser
+        self._values: Dict[str, int] = {}
+        self._value_list: List[Decimal] = []
+        self._patient_ids: List[int] = []
+        self._exam_ids: List[int] = []
+        self._code_ids: List[int] = []
+        self._value_ids: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._value_ids)
+
+    @staticmethod
+    def _intern(vocabulary: Dict[str, int], text: str) -> int:
+        position = vocabulary.get(text)
+        if position is None:
+            position = vocabulary[sys.intern(text)] = len(vocabulary)
+        return position
+
+    def touch(self, patient_name: str) -> int:
+        """Registra o paciente (mesmo sem exames) e retorna seu indice."""
+        return self._intern(self._patients, patient_name)
+
+    def add(self, patient_name: str, exam_name: str, code: Any, value: Any) -> None:
+        value = _as_decimal(value)
+        text = str(value)
+        value_id = self._values.get(text)
+        if value_id is None:
+            value_id = self._values[text] = len(self._value_list)
+            self._value_list.append(value)
+        self._patient_ids.append(self.touch(patient_name))
+        self._exam_ids.append(self._intern(self._exam_names, str(exam_name)))
+        self._code_ids.append(self._intern(self._codes, "" if code is None else str(code)))
+        self._value_ids.append(value_id)
+
+    def add_exam(self, patient_name: str, exam: Dict[str, Any]) -> None:
+        """add() a partir de um dicionario de exame (exam_name, code, value)."""
+        self.add(patient_name, exam.get("exam_name", ""), exam.get("code", ""), exam.get("value", 0))
+
+    def build(self, sort_exams: Optional[Sequence[str]] = None) -> ExamTable:
+        """
+        Monta a tabela. `sort_exams` ordena de forma estavel os exames de cada
+        paciente pelas colunas indicadas (ver SORT_COLUMNS), como o
+        list.sort(key=...) que os carregadores aplicavam a cada paciente.
+        """
+        patient_ids = np.array(self._patient_ids, dtype=np.int32)
+        exam_ids = np.array(self._exam_ids, dtype=np.int32)
+        code_ids = np.array(self._code_ids, dtype=np.int32)
+        value_ids = np.array(self._value_ids, dtype=np.int32)
+
+        keys = [patient_ids]
+        for column in sort_exams or ():
+            if column == "exam_name":
+                keys.append(_ranks(list(self._exam_names))[exam_ids])
+            elif column == "code":
+                keys.append(_ranks(list(self._codes))[code_ids])
+            elif column == "value":
+                # Valores numericamente iguais (10.5 e 10.50) empatam, como no sort por Decimal
+                rank = {value: position for position, value in enumerate(sorted(set(self._value_list)))}
+                keys.append(np.array([rank[value] for value in self._value_list], dtype=np.int64)[value_ids])
+            else:
+                raise ValueError(f"Coluna de ordenacao invalida: {column} (use {', '.join(SORT_COLUMNS)})")
+        order = np.lexsort(tuple(reversed(keys)))
+
+        counts = np.bincount(patient_ids, minlength=len(self._patients))
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return ExamTable(self._patients, self._exam_names, self._codes, self._value_list, offsets,
+                         exam_ids[order], code_ids[order], value_ids[order])
+
+
+def _ranks(vocabulary: List[str]) -> np.ndarray:
+    # Posicao de cada string do vocabulario na ordem lexicografica
+    ranks = np.empty(len(vocabulary), dtype=np.int64)
+    ranks[sorted(range(len(vocabulary)), key=vocabulary.__getitem__)] = np.arange(len(vocabulary))
+    return ranks
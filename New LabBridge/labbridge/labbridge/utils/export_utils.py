@@ -4,11 +4,107 @@ Para exportação de análises salvas e relatórios
 """
 from io import BytesIO
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Sequence
 import csv
 import json
 
 
+# Formatos de saída das conversões (extensão -> MIME)
+TABLE_EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+PARQUET_BATCH_ROWS = 50000
+
+
+def write_rows_xlsx(path: str, columns: Sequence[str], rows: Iterable[Sequence[Any]], sheet_name: str = "Dados") -> int:
+    """
+    Grava linhas em .xlsx com memória constante (openpyxl write-only).
+
+    Returns:
+        int: Número de linhas de dados gravadas
+    """
+    try:
+        import openpyxl
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+    except ImportError:
+        raise ImportError("openpyxl é necessário para exportar Excel. Instale com: pip install openpyxl")
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+    header_font = Font(bold=True)
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(ws, value=column)
+        cell.font = header_font
+        header.append(cell)
+    ws.append(header)
+
+    count = 0
+    for row in rows:
+        ws.append(list(row))
+        count += 1
+    wb.save(path)
+    return count
+
+
+def write_rows_csv(path: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """Grava linhas em CSV (';' e vírgula decimal, como load_from_csv espera)."""
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8-sig") as handle:
+        writer = csv.writer(handle, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([f"{value:.2f}".replace('.', ',') if isinstance(value, float) else value for value in row])
+            count += 1
+    return count
+
+
+def write_rows_parquet(path: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                       batch_rows: int = PARQUET_BATCH_ROWS) -> int:
+    """Grava linhas em Parquet em lotes de `batch_rows` (memória limitada ao lote)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow é necessário para exportar Parquet. Instale com: pip install pyarrow")
+
+    count = 0
+    writer = None
+    batch: List[List[Any]] = [[] for _ in columns]
+    try:
+        for row in rows:
+            for values, value in zip(batch, row):
+                values.append(value)
+            count += 1
+            if len(batch[0]) >= batch_rows:
+                table = pa.table(dict(zip(columns, batch)))
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                batch = [[] for _ in columns]
+        if batch[0] or writer is None:
+            table = pa.table(dict(zip(columns, batch)))
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def write_rows(path: str, fmt: str, columns: Sequence[str], rows: Iterable[Sequence[Any]], sheet_name: str = "Dados") -> int:
+    """Grava linhas no formato `fmt` (ver TABLE_EXPORT_FORMATS) direto em `path`."""
+    if fmt == "xlsx":
+        return write_rows_xlsx(path, columns, rows, sheet_name=sheet_name)
+    if fmt == "csv":
+        return write_rows_csv(path, columns, rows)
+    if fmt == "parquet":
+        return write_rows_parquet(path, columns, rows)
+    raise ValueError(f"Formato de exportação inválido: {fmt}")
+
+
 def generate_analyses_excel(analyses: List[Dict[str, Any]]) -> bytes:
     """
     Gera arquivo Excel (.xlsx) com resumo das análises salvas
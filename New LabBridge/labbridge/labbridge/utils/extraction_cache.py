@@ -0,0 +1,199 @@
+"""
+Cache em disco de extrações de PDF (COMPULAB/SIMUS)
+LabBridge
+
+Cada extração é endereçada pelo SHA-256 dos bytes do PDF somado a uma tag
+de versão (versão do parser e, no SIMUS, o snapshot de mapeamentos). O
+resultado é gravado em formato colunar compacto (JSON + gzip, com nomes de
+paciente/exame/código deduplicados) e o diretório é limitado por tamanho,
+com remoção LRU pela data de último acesso. As colunas são as mesmas da
+ExamTable, que é o que uma leitura do cache devolve.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .exam_table import ExamTable
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "1").strip().lower() in {"1", "true", "yes", "on"}
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "") or os.path.join(
+    tempfile.gettempdir(), "labbridge_extraction_cache"
+)
+EXTRACTION_CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512") or 512)
+
+CACHE_FORMAT_VERSION = 1
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 do arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _encode(patients: Any, extras: Tuple[Any, ...]) -> Dict[str, Any]:
+    table = ExamTable.from_patients(patients)
+    value_texts = [str(value) for value in table.values]
+    return {
+        "format": CACHE_FORMAT_VERSION,
+        "patients": table.patient_names,
+        "exam_names": table.exam_names,
+        "codes": table.codes,
+        "rows": [
+            table.patient_ids().tolist(),
+            table.exam_ids.tolist(),
+            table.code_ids.tolist(),
+            [value_texts[value_id] for value_id in table.value_ids.tolist()],
+        ],
+        "extras": [None if value is None else str(value) for value in extras],
+    }
+
+
+def _decode(payload: Dict[str, Any]) -> Tuple[Any, ...]:
+    patient_ids, name_ids, code_ids, value_texts = payload["rows"]
+    value_idx: Dict[str, int] = {}
+    value_ids = [value_idx.setdefault(text, len(value_idx)) for text in value_texts]
+    patient_ids = np.array(patient_ids, dtype=np.int32)
+    order = np.argsort(patient_ids, kind="stable")
+    counts = np.bincount(patient_ids, minlength=len(payload["patients"]))
+    patients = ExamTable(
+        payload["patients"],
+        payload["exam_names"],
+        payload["codes"],
+        [Decimal(text) for text in value_idx],
+        np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+        np.array(name_ids, dtype=np.int32)[order],
+        np.array(code_ids, dtype=np.int32)[order],
+        np.array(value_ids, dtype=np.int32)[order],
+    )
+    extras = tuple(None if value is None else Decimal(value) for value in payload["extras"])
+    return (patients,) + extras
+
+
+class ExtractionCache:
+    """Cache LRU de extrações, limitado pelo tamanho total do diretório."""
+
+    def __init__(self, directory: str = EXTRACTION_CACHE_DIR, max_mb: int = EXTRACTION_CACHE_MAX_MB,
+                 enabled: bool = EXTRACTION_CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max(0, max_mb) * 1024 * 1024
+        self.enabled = enabled and self.max_bytes > 0
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, digest: str, version: str) -> str:
+        key = hashlib.sha256(f"{kind}:{digest}:{version}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{kind}_{key}.json.gz")
+
+    def get(self, kind: str, digest: str, version: str) -> Optional[Tuple[Any, ...]]:
+        """Retorna a extração em cache ou None."""
+        if not self.enabled:
+            return None
+        path = self._path(kind, digest, version)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as handle:
+                payload = json.load(handle)
+            if payload.get("format") != CACHE_FORMAT_VERSION:
+                return None
+            os.utime(path)  # marca como usado recentemente (LRU)
+            return _decode(payload)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Cache de extracao invalido ({os.path.basename(path)}): {e}")
+            self._remove(path)
+            return None
+
+    def put(self, kind: str, digest: str, version: str, result: Tuple[Any, ...]) -> None:
+        """Grava uma extração (patients, *totais) de forma atômica."""
+        if not self.enabled:
+            return
+        patients, extras = result[0], tuple(result[1:])
+        path = self._path(kind, digest, version)
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=5) as handle:
+                handle.write(json.dumps(_encode(patients, extras), separators=(",", ":")).encode("utf-8"))
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except Exception as e:
+            logger.warning(f"Falha ao gravar cache de extracao: {e}")
+        finally:
+            if tmp_path:
+                self._remove(tmp_path)
+        self._evict()
+
+    def get_or_extract(self, kind: str, pdf_path: str, version: str,
+                       extractor: Callable[[], Tuple[Any, ...]], digest: Optional[str] = None) -> Tuple[Any, ...]:
+        """Retorna a extração em cache ou executa `extractor` e grava o resultado."""
+        if not self.enabled:
+            return extractor()
+        try:
+            digest = digest or file_digest(pdf_path)
+        except OSError as e:
+            logger.warning(f"Nao foi possivel calcular hash de {pdf_path}: {e}")
+            return extractor()
+
+        cached = self.get(kind, digest, version)
+        if cached is not None:
+            logger.debug(f"Cache de extracao HIT ({kind}, {digest[:12]})")
+            return cached
+
+        result = extractor()
+        if result and result[0]:
+            self.put(kind, digest, version, result)
+        return result
+
+    def clear(self) -> None:
+        """Remove todas as entradas do cache."""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".json.gz"):
+                        stat = entry.stat()
+                        entries.append((entry.path, stat.st_mtime, stat.st_size))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, _, size in entries)
+            if total <= self.max_bytes:
+                return
+            for path, _, size in sorted(entries, key=lambda item: item[1]):
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# Singleton para uso simplificado
+extraction_cache = ExtractionCache()
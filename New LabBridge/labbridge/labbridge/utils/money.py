@@ -0,0 +1,139 @@
+"""
+Valores monetarios como inteiros
+LabBridge
+
+Os motores em DataFrame (compare_exams e a analise profunda) guardam
+dinheiro como inteiros em colunas numpy: centavos em int64 no caso comum.
+Quando a entrada traz fracao de centavo (ex.: 0.30000000000000004 vindo de
+uma planilha) a coluna usa uma escala decimal maior, e inteiros Python se
+passar do int64, para que somas, diferencas e comparacoes continuem exatas
+como eram em Decimal. O texto e interpretado uma unica vez por valor
+distinto; Decimal/float so aparecem na saida, ja arredondados a centavos
+(ROUND_HALF_UP).
+"""
+from decimal import Decimal
+from typing import Any, Callable, Iterable, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Casas decimais dos centavos
+CENTS_SCALE = 2
+# Soma das unidades de uma coluna acima disso passa a inteiros Python (dtype object)
+_INT64_LIMIT = 2 ** 61
+# Floats de centavos (c / 100) voltam exatamente a c ate este modulo
+_FLOAT_CENTS_LIMIT = 2 ** 53
+
+
+class MoneyColumn(NamedTuple):
+    """Coluna monetaria: unidades inteiras por linha na escala 10**-scale."""
+    units: np.ndarray
+    scale: int
+    # Posicao densa do texto do Decimal (str) entre os valores distintos, por linha
+    # (valores de mesmo texto empatam); reproduz o desempate pela representacao textual
+    text_rank: np.ndarray
+
+
+def _fraction_digits(value: Decimal) -> int:
+    exponent = value.as_tuple().exponent
+    return -exponent if isinstance(exponent, int) and exponent < 0 else 0
+
+
+def _units_array(values: list, rows: int) -> np.ndarray:
+    # Garante que somas e diferencas de ate `rows` valores nao estourem o int64
+    if values and max(abs(value) for value in values) >= _INT64_LIMIT // max(rows, 1):
+        return np.array(values, dtype=object)
+    return np.array(values, dtype=np.int64)
+
+
+def money_column(series: pd.Series, parse: Callable[[Any], Decimal]) -> MoneyColumn:
+    """
+    Converte uma coluna de valores (texto, numero ou Decimal) com `parse`,
+    uma vez por valor distinto.
+
+    Texto e numeros nativos sao agrupados direto pelo valor; colunas de
+    objetos (Decimal, tipos mistos) usam (tipo Decimal, texto) como chave,
+    para que valores iguais com textos diferentes (10.0 e 10.00) mantenham
+    a ordem de desempate de cada um.
+    """
+    if _factorize_directly(series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        parsed = [parse(value) for value in np.asarray(uniques, dtype=object)]
+    else:
+        values = series.to_numpy(dtype=object)
+        codes, _ = pd.factorize(
+            pd.Series([(isinstance(value, Decimal), str(value)) for value in values.tolist()], dtype=object)
+        )
+        _, first = np.unique(codes, return_index=True)
+        parsed = [parse(values[position]) for position in first.tolist()]
+
+    scale = max([CENTS_SCALE] + [_fraction_digits(value) for value in parsed])
+    distinct_units = _units_array([decimal_units(value, scale) for value in parsed], len(codes))
+    # Posicao densa do texto do valor interpretado: textos de entrada diferentes que
+    # resultam no mesmo Decimal ("R$ 10,00" e "10,00", "" e "abc") empatam e caem na linha
+    _, text_rank = np.unique(np.array([str(value) for value in parsed], dtype=object), return_inverse=True)
+    return MoneyColumn(distinct_units[codes], scale, text_rank.reshape(-1)[codes])
+
+
+def _factorize_directly(series: pd.Series) -> bool:
+    # Texto: valores iguais tem o mesmo texto. Numeros: exceto 0.0 / -0.0
+    if pd.api.types.is_string_dtype(series.dtype) and not pd.api.types.is_object_dtype(series.dtype):
+        return True
+    if series.dtype.kind in "iu":
+        return True
+    if series.dtype.kind == "f":
+        floats = series.to_numpy()
+        return not bool(np.any((floats == 0) & np.signbit(floats)))
+    return False
+
+
+def rescale(units: np.ndarray, scale: int, target_scale: int) -> np.ndarray:
+    """Unidades na escala `scale` convertidas para `target_scale` (>= scale)."""
+    if target_scale == scale:
+        return units
+    factor = 10 ** (target_scale - scale)
+    if units.dtype != object and len(units) and int(np.abs(units).max()) >= _INT64_LIMIT // factor // len(units):
+        units = units.astype(object)
+    return units * factor
+
+
+def decimal_units(value: Decimal, scale: int) -> int:
+    """Unidades inteiras de um Decimal na escala 10**-scale (deve caber na escala)."""
+    return int(value.scaleb(scale))
+
+
+def to_cents(units: Any, scale: int) -> Any:
+    """Arredonda unidades para centavos (ROUND_HALF_UP); aceita escalar ou array."""
+    if scale == CENTS_SCALE:
+        return units
+    step = 10 ** (scale - CENTS_SCALE)
+    half = step // 2
+    if isinstance(units, np.ndarray):
+        return np.where(units < 0, -((-units + half) // step), (units + half) // step)
+    return -((-units + half) // step) if units < 0 else (units + half) // step
+
+
+def cents_to_float(cents: Any) -> Any:
+    """Centavos para reais em float (escalar ou array), como float(Decimal quantizado)."""
+    return cents / 100
+
+
+def cents_to_decimal(cents: int) -> Decimal:
+    """Centavos para Decimal com duas casas."""
+    return Decimal(int(cents)).scaleb(-CENTS_SCALE)
+
+
+def cents_from_floats(values: Iterable[Any]) -> int:
+    """
+    Soma, em centavos, valores float produzidos por cents_to_float (None ignorado).
+
+    Cada float c / 100 volta exatamente a c por arredondamento enquanto
+    |c| < 2**53, entao a soma e exata.
+    """
+    floats = np.fromiter((value for value in values if value is not None), dtype=float)
+    if not len(floats):
+        return 0
+    cents = np.rint(floats * 100)
+    if np.abs(cents).max() >= _FLOAT_CENTS_LIMIT:
+        return sum(int((Decimal(repr(value)) * 100).to_integral_value()) for value in floats.tolist())
+    return int(cents.astype(np.int64).sum())
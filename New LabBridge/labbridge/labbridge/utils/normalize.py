@@ -1,12 +1,111 @@
 """
 Funcoes de normalizacao compartilhadas - fonte unica de verdade.
 Usadas por comparison.py, ai_analysis.py, analysis_module.py, pdf_processor.py
+
+Os mesmos poucos milhares de nomes de exame/paciente se repetem centenas de
+milhares de vezes por relatorio, entao todas as variantes usam padroes
+pre-compilados, tabelas de `str.translate` e um cache LRU limitado.
 """
 import re
 import unicodedata
 from decimal import Decimal
+from functools import lru_cache
 from typing import Any
 
+from unidecode import unidecode
+
+# Tamanho maximo de cada cache LRU de normalizacao (entradas distintas)
+NORMALIZE_CACHE_SIZE = 65536
+
+# Termos genericos removidos do inicio do nome do exame, na ordem de aplicacao
+GENERIC_EXAM_TERMS = [
+    "DOSAGEM DE", "DOSAGEM", "DETERMINACAO DE", "DETERMINACAO",
+    "ANALISE DE", "ANALISE", "AVALIACAO DE", "AVALIACAO",
+    "MEDICAO DE", "MEDICAO", "MEDIDA DE", "MEDIDA",
+    "TESTE DE", "TESTE", "EXAME DE", "EXAME",
+    "QUANTIFICACAO DE", "QUANTIFICACAO", "DETECCAO DE", "DETECCAO",
+    "PESQUISA DE", "PESQUISA", "TRIAGEM DE", "TRIAGEM",
+    "SOROLOGIA DE", "SOROLOGIA", "IMUNOLOGIA DE", "IMUNOLOGIA",
+    "QUALITATIVO DE", "QUALITATIVO", "QUANTITATIVO DE", "QUANTITATIVO",
+]
+
+# Primeira palavra de cada termo generico (atalho para saber se ha algo a remover)
+GENERIC_EXAM_FIRST_WORDS = frozenset(term.split()[0] for term in GENERIC_EXAM_TERMS)
+
+# Trechos que normalize_parsed_exam_name reescreve apos remover os termos genericos
+PARSED_EXAM_REWRITE_MARKERS = ("G O T", "G P T", "TIROXINA LIVRE")
+
+_GENERIC_TERM_INDEX = {term: idx for idx, term in enumerate(GENERIC_EXAM_TERMS)}
+_GENERIC_TERMS_RE = re.compile(
+    r"^(" + "|".join(re.escape(term) for term in GENERIC_EXAM_TERMS) + r")\s+",
+    re.IGNORECASE,
+)
+_GENERIC_TERM_RES = [
+    re.compile(r"^" + re.escape(term) + r"\s+", re.IGNORECASE) for term in GENERIC_EXAM_TERMS
+]
+
+# Acentos maiusculos tratados pelo parser de PDF (demais caracteres sao preservados)
+_PDF_ACCENTS = str.maketrans({
+    "Á": "A", "À": "A", "Â": "A", "Ã": "A",
+    "É": "E", "Ê": "E",
+    "Í": "I",
+    "Ó": "O", "Ô": "O", "Õ": "O",
+    "Ú": "U", "Û": "U",
+    "Ç": "C",
+})
+
+# Latin-1/Latin Extended-A -> ASCII, equivalente a NFKD + encode('ASCII', 'ignore')
+_ASCII_FOLD = str.maketrans({
+    chr(code): unicodedata.normalize("NFKD", chr(code)).encode("ASCII", "ignore").decode("ASCII")
+    for code in range(0xC0, 0x180)
+})
+
+_NON_ALNUM_SPACE_RE = re.compile(r"[^A-Z0-9\s]")
+_NON_WORD_SPACE_RE = re.compile(r"[^\w\s]")
+_NON_WORD_SPACE_PAREN_RE = re.compile(r"[^\w\s\(\)]")
+
+
+def strip_generic_terms(text: str) -> str:
+    """
+    Remove termos genericos do inicio do nome ("DOSAGEM DE", "EXAME", ...).
+
+    Equivale a aplicar cada termo de GENERIC_EXAM_TERMS uma vez, na ordem,
+    mas usando uma unica alternancia pre-compilada no caso comum.
+    """
+    next_idx = 0
+    while next_idx < len(GENERIC_EXAM_TERMS):
+        match = _GENERIC_TERMS_RE.match(text)
+        if not match:
+            return text
+        idx = _GENERIC_TERM_INDEX.get(match.group(1).upper(), -1)
+        if idx < next_idx:
+            # Termo ja aplicado voltou a aparecer: segue a ordem termo a termo
+            for pattern in _GENERIC_TERM_RES[next_idx:]:
+                text = pattern.sub("", text, count=1)
+            return text
+        text = text[match.end():]
+        next_idx = idx + 1
+    return text
+
+
+def fold_to_ascii(text: str) -> str:
+    """Remove acentos (NFKD + ASCII), com atalho via tabela para Latin-1."""
+    folded = text.translate(_ASCII_FOLD)
+    if folded.isascii():
+        return folded
+    return unicodedata.normalize('NFKD', folded).encode('ASCII', 'ignore').decode('ASCII')
+
+
+def _cached(func):
+    return lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(func)
+
+
+@_cached
+def _normalize_ascii_name(name: str) -> str:
+    name = fold_to_ascii(name).upper()
+    name = _NON_ALNUM_SPACE_RE.sub('', name)
+    return ' '.join(name.split())
+
 
 def normalize_patient_name(name: str) -> str:
     """
@@ -18,11 +117,7 @@ def normalize_patient_name(name: str) -> str:
     """
     if not name:
         return ""
-    name = unicodedata.normalize('NFKD', str(name)).encode('ASCII', 'ignore').decode('ASCII')
-    name = name.upper()
-    name = re.sub(r'[^A-Z0-9\s]', '', name)
-    name = ' '.join(name.split())
-    return name.strip()
+    return _normalize_ascii_name(str(name))
 
 
 def normalize_exam_name(name: str) -> str:
@@ -34,11 +129,114 @@ def normalize_exam_name(name: str) -> str:
     """
     if not name:
         return ""
-    name = unicodedata.normalize('NFKD', str(name)).encode('ASCII', 'ignore').decode('ASCII')
-    name = name.upper()
-    name = re.sub(r'[^A-Z0-9\s]', '', name)
-    name = ' '.join(name.split())
-    return name.strip()
+    return _normalize_ascii_name(str(name))
+
+
+@_cached
+def normalize_parsed_patient_name(name: str) -> str:
+    """Variante do parser de PDF: maiusculas, acentos comuns e sem pontuacao."""
+    name = ' '.join(name.strip().upper().split())
+    name = name.translate(_PDF_ACCENTS)
+    return _NON_WORD_SPACE_RE.sub('', name)
+
+
+@_cached
+def normalize_parsed_exam_name(exam_name: str) -> str:
+    """Variante do parser de PDF: preserva parenteses e remove termos genericos."""
+    exam_name = ' '.join(exam_name.strip().upper().split())
+    exam_name = exam_name.translate(_PDF_ACCENTS)
+    exam_name = _NON_WORD_SPACE_PAREN_RE.sub(' ', exam_name)
+    exam_name = ' '.join(exam_name.split())
+    exam_name = strip_generic_terms(exam_name)
+
+    # Normalizações específicas de acrônimos (Solicitado: sem separação)
+    exam_name = exam_name.replace('G O T', 'GOT')
+    exam_name = exam_name.replace('G P T', 'GPT')
+
+    # Renomeações específicas solicitadas pelo usuário
+    if 'TIROXINA LIVRE' in exam_name:
+        if '(T4)' in exam_name or 'T4' in exam_name:
+            if '(T4 LIVRE)' not in exam_name:
+                exam_name = exam_name.replace('(T4)', '(T4 LIVRE)').replace('T4', '(T4 LIVRE)')
+                exam_name = ' '.join(exam_name.split())
+
+    return exam_name.strip()
+
+
+@_cached
+def parsed_exam_tokens(text: str) -> tuple:
+    """
+    Tokens de `text` apos a etapa inicial de normalize_parsed_exam_name
+    (maiusculas, acentos e pontuacao), antes dos termos genericos e das
+    reescritas. Como essa etapa atua caractere a caractere, os tokens de uma
+    frase sao a concatenacao dos tokens de cada palavra.
+    """
+    text = text.upper().translate(_PDF_ACCENTS)
+    return tuple(_NON_WORD_SPACE_PAREN_RE.sub(' ', text).split())
+
+
+@_cached
+def normalize_exam_match_key(name: str) -> str:
+    """Variante do modulo de DataFrames: unidecode, sem parenteses e termos genericos."""
+    text = unidecode(name).upper().strip()
+    text = text.replace("(", " ").replace(")", " ")
+    text = _NON_WORD_SPACE_RE.sub(" ", text)
+    text = " ".join(text.split())
+    return strip_generic_terms(text).strip()
+
+
+# Digrafos reescritos por phonetic_key antes da troca letra a letra
+# (GUE/GUI guardam o G duro num marcador para nao virarem J)
+_PHONETIC_DIGRAPHS = (
+    ("PH", "F"), ("TH", "T"), ("CH", "X"), ("SH", "X"), ("LH", "L"),
+    ("NH", "N"), ("QU", "K"), ("GUE", "\x01E"), ("GUI", "\x01I"),
+)
+_PHONETIC_LETTERS = str.maketrans({"Z": "S", "Y": "I", "W": "V", "Q": "K", "H": None, "\x01": "G"})
+
+
+@_cached
+def phonetic_key(token: str) -> str:
+    """
+    Chave fonetica simplificada (portugues) de um token ja normalizado.
+
+    Unifica grafias como SOUZA/SOUSA, LUIZ/LUIS, THIAGO/TIAGO, ELLEN/ELEN:
+    reescreve digrafos, C/G antes de E/I, letras equivalentes e letras
+    repetidas, e mantem a primeira letra mais o esqueleto de consoantes.
+    """
+    if not token:
+        return ""
+    for digraph, replacement in _PHONETIC_DIGRAPHS:
+        token = token.replace(digraph, replacement)
+    letters = []
+    for position, char in enumerate(token):
+        following = token[position + 1:position + 2]
+        if char == "C":
+            char = "S" if following in ("E", "I") else "K"
+        elif char == "G" and following in ("E", "I"):
+            char = "J"
+        letters.append(char)
+    token = "".join(letters).translate(_PHONETIC_LETTERS)
+    if not token:
+        return ""
+    collapsed = [token[0]]
+    for char in token[1:]:
+        if char != collapsed[-1]:
+            collapsed.append(char)
+    key = collapsed[0] + "".join(char for char in collapsed[1:] if char not in "AEIOU")
+    return key[:-1] + "N" if key.endswith("M") and len(key) > 1 else key
+
+
+def clear_normalization_caches() -> None:
+    """Esvazia os caches LRU (ex.: entre benchmarks)."""
+    for func in (
+        _normalize_ascii_name,
+        normalize_parsed_patient_name,
+        normalize_parsed_exam_name,
+        parsed_exam_tokens,
+        normalize_exam_match_key,
+        phonetic_key,
+    ):
+        func.cache_clear()
 
 
 def safe_decimal(value: Any, default: Decimal = Decimal('0')) -> Decimal:
@@ -0,0 +1,227 @@
+"""
+Conciliacao de nomes de pacientes entre sistemas
+LabBridge
+
+Propoe pares entre os pacientes "somente COMPULAB" e "somente SIMUS" cujo
+nome difere apenas por grafia (SOUZA/SOUSA, THIAGO/TIAGO, letra trocada) ou
+por sobrenome omitido. Cada nome e reduzido uma unica vez a tokens e chaves
+foneticas; os candidatos de um nome vem de blocos (pares de chaves
+foneticas e prefixos) de um indice invertido, sem comparar todos os pares.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .analysis_module import jaro_winkler_similarity
+from .normalize import normalize_patient_name, phonetic_key
+
+# Confianca minima para propor um par
+PATIENT_MATCH_THRESHOLD = 0.90
+# Blocos maiores que isso (nomes muito comuns) nao geram candidatos
+PATIENT_BLOCK_MAX_SIZE = 256
+# Sobrenomes que podem faltar em um dos lados
+MAX_MISSING_TOKENS = 2
+# Penalidade por token ausente no nome mais curto
+MISSING_TOKEN_PENALTY = 0.04
+# Similaridade minima entre os primeiros nomes e entre cada token alinhado
+FIRST_TOKEN_MIN_SIMILARITY = 0.85
+TOKEN_MIN_SIMILARITY = 0.75
+# Similaridade atribuida a tokens com a mesma chave fonetica e a iniciais
+PHONETIC_SIMILARITY = 0.95
+INITIAL_SIMILARITY = 0.90
+# Pares de tokens memorizados (o vocabulario de nomes e pequeno e repetitivo)
+TOKEN_SIMILARITY_CACHE_SIZE = 262144
+
+NAME_PARTICLES = frozenset({"DE", "DA", "DO", "DAS", "DOS", "E", "D"})
+
+# Tipos de divergencia (mesmos valores de AnalysisState.ERROR_TYPES)
+KIND_SPELLING = "erro_de_grafia"
+KIND_MISSING_SURNAME = "paciente_sem_sobrenome"
+
+
+@dataclass(frozen=True)
+class PatientNameMatch:
+    """Par proposto entre um paciente COMPULAB e um paciente SIMUS."""
+    compulab_name: str
+    simus_name: str
+    confidence: float
+    kind: str
+
+
+@dataclass(frozen=True)
+class _NameProfile:
+    tokens: Tuple[str, ...]
+    phonetics: Tuple[str, ...]
+    token_set: Tuple[str, ...]
+
+
+def name_tokens(name: str) -> Tuple[str, ...]:
+    """Tokens do nome normalizado, sem particulas (DE, DA, DOS...)."""
+    return tuple(token for token in normalize_patient_name(name).split() if token not in NAME_PARTICLES)
+
+
+def _profile(name: str) -> _NameProfile:
+    tokens = name_tokens(name)
+    return _NameProfile(tokens, tuple(phonetic_key(token) for token in tokens), tuple(sorted(tokens)))
+
+
+def blocking_keys(profile: _NameProfile) -> List[tuple]:
+    """
+    Chaves de bloco de um nome.
+
+    Dois nomes caem no mesmo bloco quando compartilham primeiro e ultimo
+    nome foneticos (em qualquer ordem), o primeiro nome fonetico e o
+    prefixo do ultimo, o ultimo fonetico e o prefixo do primeiro, ou os
+    dois primeiros nomes foneticos (sobrenome final omitido).
+    """
+    tokens, phonetics = profile.tokens, profile.phonetics
+    if len(tokens) < 2:
+        return []
+    first, last = phonetics[0], phonetics[-1]
+    return [
+        ("FL",) + tuple(sorted((first, last))),
+        ("F", first, tokens[-1][:2]),
+        ("L", last, tokens[0][:2]),
+        ("FF", first, phonetics[1]),
+    ]
+
+
+@lru_cache(maxsize=TOKEN_SIMILARITY_CACHE_SIZE)
+def token_similarity(token_a: str, token_b: str) -> float:
+    """Similaridade entre dois tokens de nome (iniciais e grafias foneticamente iguais pontuam alto)."""
+    if token_a == token_b:
+        return 1.0
+    if len(token_a) == 1 or len(token_b) == 1:
+        return INITIAL_SIMILARITY if token_a[0] == token_b[0] else 0.0
+    score = jaro_winkler_similarity(token_a, token_b)
+    if phonetic_key(token_a) == phonetic_key(token_b):
+        score = max(score, PHONETIC_SIMILARITY)
+    return score
+
+
+def score_profiles(profile_a: _NameProfile, profile_b: _NameProfile) -> Optional[Tuple[float, str]]:
+    """
+    (confianca, tipo) de dois nomes, ou None se nao forem o mesmo paciente.
+
+    Cada token do nome mais curto e alinhado ao token livre mais parecido
+    do mais longo; a confianca e a media das similaridades, penalizada por
+    token ausente. Sem grafia diferente (todos os alinhamentos exatos) o
+    tipo e sobrenome omitido; do contrario, erro de grafia.
+    """
+    short, long_ = (profile_a, profile_b) if len(profile_a.tokens) <= len(profile_b.tokens) else (profile_b, profile_a)
+    missing = len(long_.tokens) - len(short.tokens)
+    if len(short.tokens) < 2 or missing > MAX_MISSING_TOKENS:
+        return None
+    if short.token_set == long_.token_set:
+        # Mesmos tokens: so particulas ou a ordem dos nomes mudaram
+        return (1.0 if short.tokens == long_.tokens else 1.0 - MISSING_TOKEN_PENALTY), KIND_SPELLING
+
+    first = token_similarity(short.tokens[0], long_.tokens[0])
+    if first < FIRST_TOKEN_MIN_SIMILARITY:
+        return None
+
+    used: Set[int] = set()
+    scores: List[float] = []
+    for token in short.tokens:
+        best_score, best_position = 0.0, -1
+        for position, other in enumerate(long_.tokens):
+            if position in used:
+                continue
+            score = token_similarity(token, other)
+            if score > best_score:
+                best_score, best_position = score, position
+                if score == 1.0:
+                    break
+        if best_score < TOKEN_MIN_SIMILARITY:
+            return None
+        used.add(best_position)
+        scores.append(best_score)
+
+    confidence = sum(scores) / len(scores) * (1.0 - MISSING_TOKEN_PENALTY * missing)
+    if missing and all(score == 1.0 for score in scores):
+        return confidence, KIND_MISSING_SURNAME
+    return confidence, KIND_SPELLING
+
+
+def score_names(name_a: str, name_b: str) -> Optional[Tuple[float, str]]:
+    """score_profiles para dois nomes brutos."""
+    return score_profiles(_profile(name_a), _profile(name_b))
+
+
+class PatientNameIndex:
+    """Indice invertido (chave de bloco -> posicoes) sobre uma lista de nomes."""
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self.profiles = [_profile(name) for name in self.names]
+        self.blocks: Dict[tuple, List[int]] = {}
+        for position, profile in enumerate(self.profiles):
+            for key in blocking_keys(profile):
+                self.blocks.setdefault(key, []).append(position)
+
+    def candidates(self, profile: _NameProfile) -> List[int]:
+        """Posicoes que compartilham ao menos um bloco (nao gigante) com o nome."""
+        found: Set[int] = set()
+        for key in blocking_keys(profile):
+            block = self.blocks.get(key)
+            if block and len(block) <= PATIENT_BLOCK_MAX_SIZE:
+                found.update(block)
+        return sorted(found)
+
+    def search(self, name: str, threshold: float = PATIENT_MATCH_THRESHOLD) -> List[Tuple[int, float, str]]:
+        """(posicao, confianca, tipo) dos nomes do indice acima do limiar, do melhor para o pior."""
+        profile = _profile(name)
+        hits = []
+        for position in self.candidates(profile):
+            scored = score_profiles(profile, self.profiles[position])
+            if scored is not None and scored[0] >= threshold:
+                hits.append((position, scored[0], scored[1]))
+        hits.sort(key=lambda hit: (-hit[1], self.names[hit[0]]))
+        return hits
+
+
+def match_patient_names(compulab_names: Iterable[str], simus_names: Iterable[str],
+                        threshold: float = PATIENT_MATCH_THRESHOLD) -> List[PatientNameMatch]:
+    """
+    Pares um-para-um entre pacientes sem correspondencia exata.
+
+    Os pares candidatos sao aceitos do mais confiavel para o menos, com
+    desempate pelos nomes, de modo que o resultado nao depende da ordem
+    de entrada. Um nome com dois candidatos empatados no topo e deixado
+    para revisao manual.
+    """
+    compulab_names = sorted(set(compulab_names))
+    index = PatientNameIndex(sorted(set(simus_names)))
+    if not compulab_names or not index.names:
+        return []
+
+    edges = []
+    for compulab_name in compulab_names:
+        for position, confidence, kind in index.search(compulab_name, threshold):
+            edges.append((-confidence, compulab_name, index.names[position], kind))
+    edges.sort()
+
+    best_by_name: Dict[Tuple[str, str], List[float]] = {}
+    for negative, compulab_name, simus_name, _ in edges:
+        for name in (("C", compulab_name), ("S", simus_name)):
+            best_by_name.setdefault(name, []).append(-negative)
+
+    def ambiguous(name: Tuple[str, str], confidence: float) -> bool:
+        scores = best_by_name[name]
+        return len(scores) > 1 and scores[0] == confidence and scores[1] == confidence
+
+    matches: List[PatientNameMatch] = []
+    used_compulab: Set[str] = set()
+    used_simus: Set[str] = set()
+    for negative, compulab_name, simus_name, kind in edges:
+        if compulab_name in used_compulab or simus_name in used_simus:
+            continue
+        confidence = -negative
+        if ambiguous(("C", compulab_name), confidence) or ambiguous(("S", simus_name), confidence):
+            continue
+        used_compulab.add(compulab_name)
+        used_simus.add(simus_name)
+        matches.append(PatientNameMatch(compulab_name, simus_name, round(confidence, 4), kind))
+    return matches
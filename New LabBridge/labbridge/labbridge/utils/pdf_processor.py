@@ -11,14 +11,25 @@ import logging
 import pdfplumber
 from decimal import Decimal
 import re
-from collections import defaultdict
+from collections import defaultdict, deque
 import pandas as pd
 import tempfile
 import os
 import gc
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
-from typing import Optional, Tuple, Dict, List, Any, Callable
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import Optional, Tuple, Dict, List, Any, Callable, NamedTuple
 from ..services.mapping_service import mapping_service
+from .normalize import (
+    normalize_parsed_patient_name,
+    normalize_parsed_exam_name,
+    parsed_exam_tokens,
+    strip_generic_terms,
+    GENERIC_EXAM_FIRST_WORDS,
+    PARSED_EXAM_REWRITE_MARKERS,
+)
+from .extraction_cache import extraction_cache
+from .exam_table import ExamTable, ExamTableBuilder
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +38,21 @@ MAX_PAGES_PER_BATCH = 20  # Processar páginas em lotes
 PDF_PROCESSING_TIMEOUT = 300  # 5 minutos de timeout
 LARGE_FILE_THRESHOLD_MB = 5  # Arquivos acima disso são considerados grandes
 
+# Extração paralela do SIMUS (0 = automático pelo número de CPUs, 1 = sequencial)
+PDF_PARSER_WORKERS = int(os.getenv("PDF_PARSER_WORKERS", "0") or 0)
+MAX_PARSER_WORKERS = 8  # Teto do modo automático
+PARALLEL_MIN_PAGES = 2 * MAX_PAGES_PER_BATCH  # Abaixo disso o custo do pool não compensa
+
+# Páginas lidas antecipadamente pelo extrator COMPULAB para aprender nomes de exame
+COMPULAB_LOOKAHEAD_PAGES = 10
+
+# Páginas iniciais amostradas para escolher a estratégia de extração do SIMUS
+STRATEGY_SAMPLE_PAGES = 3
+
+# Incrementar ao alterar a saída dos parsers (invalida o cache de extração)
+COMPULAB_PARSER_VERSION = 1
+SIMUS_PARSER_VERSION = 2
+
 
 # EXAM_NAME_MAPPING removido e movido para o banco de dados via MappingService
 
@@ -47,73 +73,19 @@ def normalize_name(name):
     """Normaliza nome para comparação (remove acentos, espaços extras, etc)"""
     if not name:
         return ""
-    name = str(name).strip().upper()
-    name = ' '.join(name.split())
-    replacements = {
-        'Á': 'A', 'À': 'A', 'Â': 'A', 'Ã': 'A',
-        'É': 'E', 'Ê': 'E',
-        'Í': 'I',
-        'Ó': 'O', 'Ô': 'O', 'Õ': 'O',
-        'Ú': 'U', 'Û': 'U',
-        'Ç': 'C'
-    }
-    for old, new in replacements.items():
-        name = name.replace(old, new)
-    name = re.sub(r'[^\w\s]', '', name)
-    return name
+    return normalize_parsed_patient_name(str(name))
 
 
 def normalize_exam_name(exam_name):
-    """Normaliza nome do exame para comparação"""
+    """Normaliza nome do exame para comparação
+
+    Mantém parênteses (nomenclaturas como "(T4 LIVRE)"), remove termos
+    genéricos do início e unifica acrônimos (G O T -> GOT). Resultado em
+    cache: ver utils.normalize.normalize_parsed_exam_name.
+    """
     if not exam_name:
         return ""
-    exam_name = str(exam_name).strip().upper()
-    exam_name = ' '.join(exam_name.split())
-    replacements = {
-        'Á': 'A', 'À': 'A', 'Â': 'A', 'Ã': 'A',
-        'É': 'E', 'Ê': 'E',
-        'Í': 'I',
-        'Ó': 'O', 'Ô': 'O', 'Õ': 'O',
-        'Ú': 'U', 'Û': 'U',
-        'Ç': 'C'
-    }
-    for old, new in replacements.items():
-        exam_name = exam_name.replace(old, new)
-    
-    # Manter parênteses pois o usuário solicitou nomenclaturas específicas como (T4 LIVRE)
-    # exam_name = re.sub(r'\([^)]*\)', '', exam_name) 
-    
-    exam_name = re.sub(r'[^\w\s\(\)]', ' ', exam_name) # Permite ( e )
-    exam_name = ' '.join(exam_name.split())
-    
-    # Remover palavras genéricas para o nome ficar limpo na exibição
-    generic_words = [
-        'DOSAGEM DE', 'DOSAGEM', 'DETERMINACAO DE', 'DETERMINACAO',
-        'ANALISE DE', 'ANALISE', 'AVALIACAO DE', 'AVALIACAO',
-        'MEDICAO DE', 'MEDICAO', 'MEDIDA DE', 'MEDIDA',
-        'TESTE DE', 'TESTE', 'EXAME DE', 'EXAME',
-        'QUANTIFICACAO DE', 'QUANTIFICACAO', 'DETECCAO DE', 'DETECCAO',
-        'PESQUISA DE', 'PESQUISA', 'TRIAGEM DE', 'TRIAGEM',
-        'SOROLOGIA DE', 'SOROLOGIA', 'IMUNOLOGIA DE', 'IMUNOLOGIA',
-        'QUALITATIVO DE', 'QUALITATIVO', 'QUANTITATIVO DE', 'QUANTITATIVO'
-    ]
-    
-    for word in generic_words:
-        pattern_start = r'^' + re.escape(word) + r'\s+'
-        exam_name = re.sub(pattern_start, '', exam_name, flags=re.IGNORECASE)
-    
-    # Normalizações específicas de acrônimos (Solicitado: sem separação)
-    exam_name = exam_name.replace('G O T', 'GOT')
-    exam_name = exam_name.replace('G P T', 'GPT')
-    
-    # Renomeações específicas solicitadas pelo usuário
-    if 'TIROXINA LIVRE' in exam_name:
-        if '(T4)' in exam_name or 'T4' in exam_name:
-             if '(T4 LIVRE)' not in exam_name:
-                 exam_name = exam_name.replace('(T4)', '(T4 LIVRE)').replace('T4', '(T4 LIVRE)')
-                 exam_name = ' '.join(exam_name.split()) # Limpar espaços extras
-    
-    return exam_name.strip()
+    return normalize_parsed_exam_name(str(exam_name))
 
 
 def normalize_exam_name_for_comparison(exam_name):
@@ -132,19 +104,31 @@ def normalize_exam_name_for_comparison(exam_name):
     return normalized
 
 
+# Palavras ignoradas por extract_key_terms
+EXAM_STOP_WORDS = frozenset({'DE', 'DA', 'DO', 'DAS', 'DOS', 'E', 'OU', 'COM', 'SEM', 'POR', 'PARA'})
+
+# Classes de sinônimos de exam_names_match (URINA tem regra própria)
+EXAM_SYNONYM_CLASSES = {
+    'URINA': frozenset({
+        'URINA', 'EAS', 'ELEMENTOS', 'SEDIMENTO', 'CARACTERES', 'FISICOS',
+        'QUIMICOS', 'QUALITATIVO', 'QUANTITATIVO'
+    }),
+    'HEMOGRAMA': frozenset({'HEMOGRAMA', 'HEMATOLOGICO', 'COMPLETO', 'SERIE'}),
+    'GLICOSE': frozenset({'GLICOSE', 'GLICEMIA'}),
+    'TSH': frozenset({'TSH', 'TIREOTROFINA', 'TIREOESTIMULANTE'}),
+    'T4': frozenset({'T4', 'TIROXINA'}),
+    'T3': frozenset({'T3', 'TRIODOTIRONINA'}),
+}
+URINA_RELATED_TERMS = frozenset({
+    'ELEMENTOS', 'SEDIMENTO', 'CARACTERES', 'FISICOS',
+    'QUIMICOS', 'QUALITATIVO', 'QUANTITATIVO', 'EAS'
+})
+
+
 def extract_key_terms(exam_name):
     """Extrai termos-chave importantes do nome do exame"""
     normalized = normalize_exam_name_for_comparison(exam_name)
-    words = normalized.split()
-    
-    key_terms = []
-    stop_words = {'DE', 'DA', 'DO', 'DAS', 'DOS', 'E', 'OU', 'COM', 'SEM', 'POR', 'PARA'}
-    
-    for word in words:
-        if len(word) >= 3 and word not in stop_words:
-            key_terms.append(word)
-    
-    return set(key_terms)
+    return {word for word in normalized.split() if len(word) >= 3 and word not in EXAM_STOP_WORDS}
 
 def canonicalize_exam_name(exam_name):
     """Aplica mapeamento de sinônimos e normaliza para comparação."""
@@ -154,109 +138,211 @@ def canonicalize_exam_name(exam_name):
     return normalize_exam_name(mapped)
 
 
-def exam_names_match(exam_name1, exam_name2):
-    """Verifica se dois nomes de exame representam o mesmo exame"""
-    canon1 = canonicalize_exam_name(exam_name1)
-    canon2 = canonicalize_exam_name(exam_name2)
-    norm1 = normalize_exam_name_for_comparison(canon1)
-    norm2 = normalize_exam_name_for_comparison(canon2)
-    
-    if norm1 == norm2:
+class ExamSignature(NamedTuple):
+    """Formas de um nome de exame usadas por exam_names_match, calculadas uma vez."""
+    canonical: str
+    comparison: str
+    key_terms: frozenset
+    words: frozenset
+    synonym_classes: frozenset
+
+
+def exam_signature(exam_name) -> ExamSignature:
+    """Assinatura (canônico, forma de comparação, termos-chave, classes de sinônimo) de um exame."""
+    canonical = canonicalize_exam_name(exam_name)
+    comparison = normalize_exam_name_for_comparison(canonical)
+    words = frozenset(word for word in comparison.split() if len(word) >= 3)
+    key_terms = words - EXAM_STOP_WORDS
+    synonym_classes = frozenset(
+        exam_type for exam_type, synonyms in EXAM_SYNONYM_CLASSES.items()
+        if exam_type != 'URINA' and key_terms & synonyms
+    )
+    return ExamSignature(canonical, comparison, key_terms, words, synonym_classes)
+
+
+def signatures_match(signature1: ExamSignature, signature2: ExamSignature) -> bool:
+    """Regra de exam_names_match aplicada a duas assinaturas já calculadas."""
+    if signature1.comparison == signature2.comparison:
         return True
-    
-    exam_synonyms = {
-        'URINA': [
-            'URINA', 'EAS', 'ELEMENTOS', 'SEDIMENTO', 'CARACTERES', 'FISICOS',
-            'QUIMICOS', 'QUALITATIVO', 'QUANTITATIVO'
-        ],
-        'HEMOGRAMA': ['HEMOGRAMA', 'HEMATOLOGICO', 'COMPLETO', 'SERIE'],
-        'GLICOSE': ['GLICOSE', 'GLICEMIA'],
-        'TSH': ['TSH', 'TIREOTROFINA', 'TIREOESTIMULANTE'],
-        'T4': ['T4', 'TIROXINA'],
-        'T3': ['T3', 'TRIODOTIRONINA'],
-    }
-    
-    key_terms1 = extract_key_terms(canon1)
-    key_terms2 = extract_key_terms(canon2)
-    
+
+    key_terms1 = signature1.key_terms
+    key_terms2 = signature2.key_terms
     if key_terms1 and key_terms2:
-        if key_terms1.issubset(key_terms2) or key_terms2.issubset(key_terms1):
+        if key_terms1 <= key_terms2 or key_terms2 <= key_terms1:
             return True
-    
-    common_terms = key_terms1 & key_terms2
-    
+
     if 'URINA' in key_terms1 and 'URINA' in key_terms2:
-        if len(common_terms) >= 2:
+        if len(key_terms1 & key_terms2) >= 2:
             return True
-        urina_related = {'ELEMENTOS', 'SEDIMENTO', 'CARACTERES', 'FISICOS', 
-                        'QUIMICOS', 'QUALITATIVO', 'QUANTITATIVO', 'EAS'}
-        if (key_terms1 & urina_related) and (key_terms2 & urina_related):
+        if (key_terms1 & URINA_RELATED_TERMS) and (key_terms2 & URINA_RELATED_TERMS):
             return True
-    
-    for exam_type, synonyms in exam_synonyms.items():
-        if exam_type == 'URINA':
-            continue
-        if (key_terms1 & set(synonyms)) and (key_terms2 & set(synonyms)):
-            return True
-    
-    if norm1 and norm2:
-        words1 = {w for w in norm1.split() if len(w) >= 3}
-        words2 = {w for w in norm2.split() if len(w) >= 3}
-        
+
+    if signature1.synonym_classes & signature2.synonym_classes:
+        return True
+
+    if signature1.comparison and signature2.comparison:
+        words1 = signature1.words
+        words2 = signature2.words
         if not words1 or not words2:
             return False
-        
-        if words1.issubset(words2) or words2.issubset(words1):
+        if words1 <= words2 or words2 <= words1:
             return True
-    
+
     return False
 
+
+def exam_names_match(exam_name1, exam_name2):
+    """Verifica se dois nomes de exame representam o mesmo exame"""
+    return signatures_match(exam_signature(exam_name1), exam_signature(exam_name2))
+
+
+def _signature_tokens(signature: ExamSignature):
+    # Dois nomes só podem casar se compartilham a forma de comparação, uma
+    # palavra (termos-chave e URINA são palavras) ou uma classe de sinônimo
+    yield ('=', signature.comparison)
+    for word in signature.words:
+        yield ('w', word)
+    for exam_type in signature.synonym_classes:
+        yield ('s', exam_type)
+
+
+class ExamNameIndex:
+    """
+    Índice invertido sobre as assinaturas de uma lista de nomes de exame.
+
+    matches() devolve, na ordem da lista, as posições que satisfazem
+    exam_names_match, avaliando só os candidatos que compartilham algum
+    token de assinatura em vez de todos os nomes.
+    """
+
+    def __init__(self, names: List[str], signature: Callable[[str], ExamSignature] = exam_signature):
+        self.signatures = [signature(name) for name in names]
+        self._postings: Dict[tuple, List[int]] = defaultdict(list)
+        for position, name_signature in enumerate(self.signatures):
+            for token in _signature_tokens(name_signature):
+                self._postings[token].append(position)
+
+    def candidates(self, signature: ExamSignature) -> List[int]:
+        found = set()
+        for token in _signature_tokens(signature):
+            found.update(self._postings.get(token, ()))
+        return sorted(found)
+
+    def matches(self, signature: ExamSignature):
+        for position in self.candidates(signature):
+            if signatures_match(signature, self.signatures[position]):
+                yield position
+
 def map_simus_to_compulab_exam_name(simus_exam_name):
-    """Mapeia nome do exame do SIMUS para o nome equivalente no COMPULAB"""
+    """Mapeia nome do exame do SIMUS para o nome equivalente no COMPULAB
+
+    Ordem de busca (via MappingService.get_resolver):
+    1. Mapeamento exato cadastrado
+    2. Chave normalizada igual
+    3. Match parcial (substring com pelo menos 2 palavras em comum)
+    """
     if not simus_exam_name:
         return simus_exam_name
-        
-    simus_clean = str(simus_exam_name).strip().upper()
-    
-    # 1. Tentar mapeamento exato via Banco de Dados (MappingService)
-    canonical = mapping_service.get_canonical_name_sync(simus_clean)
-    if canonical != simus_clean:
-        return canonical
-    
-    # 2. Tentar mapeamento via normalização
-    normalized_simus = normalize_exam_name(simus_clean)
-    all_mappings = mapping_service.get_all_synonyms()
-    
-    for original, canonical in all_mappings.items():
-        if normalize_exam_name(original) == normalized_simus:
-            return canonical
-            
-    # 3. Tentar match parcial se as palavras baterem significativamente (Heurística)
-    for original, canonical in all_mappings.items():
-        normalized_key = normalize_exam_name(original)
-        if normalized_key in normalized_simus or normalized_simus in normalized_key:
-            key_words = set(normalized_key.split())
-            simus_words = set(normalized_simus.split())
-            common_words = key_words & simus_words
-            if len(common_words) >= 2:
-                return canonical
-    
-    return simus_exam_name
 
+    canonical = mapping_service.get_resolver().resolve(str(simus_exam_name))
+    if canonical is None:
+        return simus_exam_name
+    return canonical
 
-def _collect_compulab_lines(pdf_file):
-    lines_all = []
+
+def _iter_compulab_pages(pdf_file):
+    """Gera as linhas de texto de cada página, liberando o layout logo após a leitura."""
     with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
+        total_pages = len(pdf.pages)
+        for page_number, page in enumerate(pdf.pages, start=1):
             text = page.extract_text()
-            if not text:
-                continue
-            lines_all.extend(text.split("\n"))
-    return lines_all
+            page.close()
+            yield page_number, total_pages, text.split("\n") if text else []
+
+
+class ExamNameTrie:
+    """
+    Vocabulário de nomes de exame do COMPULAB indexado por tokens.
+
+    Os nomes normalizados ficam numa trie percorrida do último token para o
+    primeiro, de modo que a fronteira paciente/exame de uma linha é achada
+    com uma única passagem da direita para a esquerda sobre os tokens já
+    pré-normalizados (cada palavra é normalizada uma vez e memorizada), em
+    vez de normalizar cada sufixo da linha.
+    """
+
+    _END = None  # marca de nome completo (tokens nunca são None)
+
+    def __init__(self):
+        self._names = set()
+        self._root = {}
+
+    def add(self, name: str) -> None:
+        if name in self._names:
+            return
+        self._names.add(name)
+        node = self._root
+        for token in reversed(name.split()):
+            node = node.setdefault(token, {})
+        node[self._END] = True
+
+    def __contains__(self, name) -> bool:
+        return name in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def find_split(self, tokens) -> Optional[int]:
+        """
+        Menor índice i > 0 tal que normalize_exam_name(" ".join(tokens[i:]))
+        é um nome conhecido, ou None.
+        """
+        pieces = [parsed_exam_tokens(token) for token in tokens]
+        flat = [sub for piece in pieces for sub in piece]
+        if ("G" in flat or "TIROXINA" in flat) and any(
+            marker in " ".join(flat) for marker in PARSED_EXAM_REWRITE_MARKERS
+        ):
+            # "G O T", "T4"... são reescritos sobre a frase inteira: busca exata
+            return self._scan_split(tokens)
+
+        # is_name[k]: flat[k:] é um nome conhecido
+        is_name = [False] * (len(flat) + 1)
+        node = self._root
+        for k in range(len(flat) - 1, -1, -1):
+            node = node.get(flat[k])
+            if node is None:
+                break
+            is_name[k] = self._END in node
+
+        start = len(flat)
+        starts = []
+        for piece in reversed(pieces):
+            start -= len(piece)
+            starts.append(start)
+        starts.reverse()
+
+        for i in range(1, len(tokens)):
+            k = starts[i]
+            if k < len(flat) and flat[k] in GENERIC_EXAM_FIRST_WORDS:
+                # Termos genéricos do início do sufixo são removidos pela normalização
+                remaining = strip_generic_terms(" ".join(flat[k:])).split()
+                k = len(flat) - len(remaining)
+            if is_name[k]:
+                return i
+        return None
+
+    def _scan_split(self, tokens) -> Optional[int]:
+        for i in range(1, len(tokens)):
+            if normalize_exam_name(" ".join(tokens[i:])) in self._names:
+                return i
+        return None
 
 
-def _build_exam_name_set(lines):
-    exam_names = set()
+def _build_exam_name_set(lines, exam_names=None):
+    exam_names = ExamNameTrie() if exam_names is None else exam_names
     for line in lines:
         line = line.strip()
         if not line:
@@ -273,40 +359,89 @@ def _build_exam_name_set(lines):
     return exam_names
 
 
-def _split_patient_exam(tokens, exam_name_set):
+def _split_patient_exam(tokens, exam_names):
     if not tokens:
         return [], []
-    for i in range(len(tokens)):
-        suffix_tokens = tokens[i:]
-        exam_name = normalize_exam_name(" ".join(suffix_tokens))
-        if exam_name in exam_name_set and i > 0:
-            return tokens[:i], suffix_tokens
+    split_idx = exam_names.find_split(tokens)
+    if split_idx is not None:
+        return tokens[:split_idx], tokens[split_idx:]
     split_idx = min(4, max(2, len(tokens) - 1))
     return tokens[:split_idx], tokens[split_idx:]
 
 
-def extract_compulab_patients(pdf_file, progress_callback: Optional[Callable[[int], None]] = None):
-    """Extrai dados de pacientes do COMPULAB com separação por exame
-    
-    Args:
-        pdf_file: Caminho para o arquivo PDF
-        progress_callback: Função callback(percentage: int) para reportar progresso (0-100)
+class CompulabStreamParser:
     """
-    patients = defaultdict(lambda: {"exams": [], "total": Decimal("0")})
-    total_value = Decimal("0")
+    Extrator COMPULAB em passagem única.
 
-    try:
-        lines_all = _collect_compulab_lines(pdf_file)
-        total_lines = len(lines_all)
-        exam_name_set = _build_exam_name_set(lines_all)
+    As páginas são lidas sob demanda e os registros (paciente, exame) são
+    emitidos à medida que as linhas são processadas. O vocabulário de nomes
+    de exame (usado para separar paciente e exame nas linhas que iniciam um
+    paciente) é aprendido incrementalmente com uma janela de leitura
+    antecipada de `lookahead_pages` páginas, de modo que apenas essa janela
+    fica em memória, independentemente do tamanho do documento.
+    """
+
+    def __init__(self, pdf_file, lookahead_pages: int = COMPULAB_LOOKAHEAD_PAGES):
+        self.pdf_file = pdf_file
+        self.lookahead_pages = max(0, lookahead_pages)
+        self.exam_name_set = ExamNameTrie()
+        self.exams_total = Decimal("0")
+        self._last_total_line_value = None
+        self._last_total_value = None
+        self._has_total_line = False
+
+    @property
+    def total_value(self) -> Decimal:
+        """Total geral do relatório (linha de TOTAL do rodapé ou soma dos exames)."""
+        if self._last_total_line_value is not None:
+            return self._last_total_line_value
+        if not self._has_total_line or self.exams_total > Decimal("1000"):
+            return self.exams_total
+        return self._last_total_value or self.exams_total
+
+    def iter_records(self, progress_callback: Optional[Callable[[int], None]] = None):
+        """Gera tuplas (paciente, exame) na ordem do documento."""
+        window = deque()
         current_patient = None
+        for page_number, total_pages, lines in _iter_compulab_pages(self.pdf_file):
+            _build_exam_name_set(lines, self.exam_name_set)
+            window.append(lines)
+            if len(window) > self.lookahead_pages:
+                for record in self._process_lines(window.popleft(), current_patient):
+                    current_patient = record[0]
+                    yield record
+            if progress_callback and total_pages > 0:
+                progress_callback(int((page_number / total_pages) * 100))
+
+        while window:
+            for record in self._process_lines(window.popleft(), current_patient):
+                current_patient = record[0]
+                yield record
 
-        for idx, line in enumerate(lines_all):
-            # Reportar progresso a cada 100 linhas ou no início
-            if progress_callback and (idx % 100 == 0 or idx == 0):
-                if total_lines > 0:
-                    percentage = int((idx / total_lines) * 100)
-                    progress_callback(percentage)
+        # Reportar progresso final do processamento de linhas
+        if progress_callback:
+            progress_callback(100)
+
+    def _track_grand_total(self, line):
+        if "TOTAL" not in line.upper() or "R$" not in line:
+            return
+        self._has_total_line = True
+        self._last_total_line_value = None
+        for val in re.findall(r'R\$\s*([\d.]+,\d{2})', line):
+            parsed = parse_currency_value(val)
+            if parsed and parsed > Decimal("1000"):
+                self._last_total_line_value = parsed
+                self._last_total_value = parsed
+                break
+
+    def _process_lines(self, lines, current_patient):
+        """Processa as linhas de uma página, emitindo (paciente, exame).
+
+        Linhas de cabeçalho de paciente sem exame emitem (paciente, None) para
+        que o contexto seja propagado ao chamador.
+        """
+        for line in lines:
+            self._track_grand_total(line)
             line = line.strip()
             if not line:
                 continue
@@ -316,6 +451,7 @@ def extract_compulab_patients(pdf_file, progress_callback: Optional[Callable[[in
             header_match = re.match(r'^(\d+)\s+([A-ZÁÉÍÓÚÂÊÔÇ\s]+)$', line)
             if header_match and not re.search(r'\d{10}', line):
                 current_patient = normalize_name(header_match.group(2))
+                yield current_patient, None
                 continue
 
             code_match = re.search(r'(\d{10})\s+\d+\s+([\d,]+)', line)
@@ -332,7 +468,7 @@ def extract_compulab_patients(pdf_file, progress_callback: Optional[Callable[[in
 
             if re.match(r'^\d+$', tokens[0]):
                 tokens = tokens[1:]
-                patient_tokens, exam_tokens = _split_patient_exam(tokens, exam_name_set)
+                patient_tokens, exam_tokens = _split_patient_exam(tokens, self.exam_name_set)
                 patient_name = normalize_name(" ".join(patient_tokens))
                 exam_name = normalize_exam_name(" ".join(exam_tokens))
                 if not patient_name:
@@ -347,31 +483,40 @@ def extract_compulab_patients(pdf_file, progress_callback: Optional[Callable[[in
             if not exam_name or len(exam_name) < 3:
                 exam_name = f"EXAME {exam_code}"
 
-            patients[patient_name]["exams"].append(
-                {"exam_name": exam_name, "code": exam_code, "value": exam_value}
-            )
-            patients[patient_name]["total"] += exam_value
-            total_value += exam_value
+            self.exams_total += exam_value
+            yield patient_name, {"exam_name": exam_name, "code": exam_code, "value": exam_value}
+
+
+def iter_compulab_records(pdf_file, progress_callback: Optional[Callable[[int], None]] = None,
+                          lookahead_pages: int = COMPULAB_LOOKAHEAD_PAGES):
+    """Gera (paciente, exame) do COMPULAB em streaming, sem materializar o documento."""
+    parser = CompulabStreamParser(pdf_file, lookahead_pages=lookahead_pages)
+    for patient_name, exam in parser.iter_records(progress_callback):
+        if exam is not None:
+            yield patient_name, exam
 
-        # Reportar progresso final do processamento de linhas
-        if progress_callback:
-            progress_callback(100)
 
-        for line in reversed(lines_all):
-            if "TOTAL" in line.upper() and "R$" in line:
-                currency_values = re.findall(r'R\$\s*([\d.]+,\d{2})', line)
-                for val in currency_values:
-                    parsed = parse_currency_value(val)
-                    if parsed and parsed > Decimal("1000"):
-                        total_value = parsed
-                        break
-                if total_value > Decimal("1000"):
-                    break
+def extract_compulab_patients(pdf_file, progress_callback: Optional[Callable[[int], None]] = None):
+    """Extrai dados de pacientes do COMPULAB com separação por exame
+    
+    Args:
+        pdf_file: Caminho para o arquivo PDF
+        progress_callback: Função callback(percentage: int) para reportar progresso (0-100)
+    """
+    builder = ExamTableBuilder()
+
+    try:
+        parser = CompulabStreamParser(pdf_file)
+        for patient_name, exam in parser.iter_records(progress_callback):
+            if exam is None:
+                continue
+            builder.add_exam(patient_name, exam)
+        total_value = parser.total_value
     except Exception as e:
         logger.error(f"Erro ao processar COMPULAB: {e}")
         return None, None
 
-    return patients, total_value
+    return builder.build(), total_value
 
 
 def _find_patient_in_tokens(tokens, candidate_patients):
@@ -392,20 +537,35 @@ class SimusPDFParser:
     """
     Parser robusto para arquivos PDF do SIMUS.
     Implementa múltiplas estratégias de extração para máxima compatibilidade.
+
+    A estratégia é escolhida por página: as primeiras páginas são amostradas
+    para decidir se o documento é tabular ('table') ou textual ('text'). No
+    modo tabular, páginas sem linhas de grade não passam pela detecção de
+    tabelas e páginas sem linhas de tabela válidas caem para a análise
+    textual, reaproveitando o layout já extraído da própria página.
+    O resultado de cada página fica em `page_strategies`.
+
+    Documentos grandes podem ser processados em paralelo: as páginas são
+    divididas em intervalos de MAX_PAGES_PER_BATCH, cada intervalo é lido em
+    um processo separado e os resultados são mesclados na ordem das páginas,
+    produzindo exatamente a mesma saída do modo sequencial.
     """
     
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, workers: Optional[int] = None):
         self.pdf_path = pdf_path
+        self.workers = resolve_parser_workers(workers)
         self.total_sigtap = Decimal('0')
         self.total_contratualizado = Decimal('0')
-        self.extracted_patients = defaultdict(lambda: {'exams': [], 'total': Decimal('0')})
+        self.extracted_patients = ExamTableBuilder()
+        self.document_strategy = ''
+        self.page_strategies: List[Tuple[int, str, float]] = []  # (página, estratégia, segundos)
         
     def extract(self, progress_callback=None) -> Tuple[Dict, Decimal, Optional[Decimal], Optional[Decimal]]:
         """
         Executa a extração usando a melhor estratégia disponível.
         1. Tenta extrair totais da primeira página
-        2. Tenta estratégia baseada em tabelas (mais precisa)
-        3. Se falhar ou retornar pouco, tenta estratégia baseada em texto (fallback)
+        2. Amostra as primeiras páginas para escolher tabela ou texto
+        3. Processa cada página uma única vez, caindo para texto por página
         """
         try:
             with pdfplumber.open(self.pdf_path) as pdf:
@@ -413,27 +573,24 @@ class SimusPDFParser:
                 self._extract_header_totals(pdf.pages[0])
                 
                 total_pages = len(pdf.pages)
-                
-                # FASE 1: Estratégia de Tabelas
-                table_success = self._strategy_table_extraction(pdf, total_pages, progress_callback)
-                
-                # Validação: Se extraiu muito pouco comparado ao esperado, tentar fallback
-                extracted_total = sum(p['total'] for p in self.extracted_patients.values())
-                expected_total = self.total_contratualizado or Decimal('999999999')
-                
-                # Se recuperamos menos de 10% do valor esperado ou nenhum paciente, tentar fallback
-                if not table_success or (len(self.extracted_patients) == 0):
-                    logger.debug("Estrategia de tabela falhou ou insuficiente. Tentando analise textual...")
-                    # Limpar parcial
-                    self.extracted_patients.clear()
-                    self._strategy_text_analysis(pdf, total_pages, progress_callback)
-            
-            final_total = sum(p['total'] for p in self.extracted_patients.values())
-            return self.extracted_patients, final_total, self.total_sigtap, self.total_contratualizado
+                use_parallel = self.workers > 1 and total_pages >= PARALLEL_MIN_PAGES
+
+                # FASE 1: Planejamento pela amostra inicial
+                self.document_strategy = self._plan_strategy(pdf.pages[:STRATEGY_SAMPLE_PAGES])
+
+                # FASE 2: Extração página a página
+                if not (use_parallel and self._extract_parallel(total_pages, progress_callback)):
+                    self.extracted_patients = ExamTableBuilder()
+                    self.page_strategies = []
+                    self._extract_sequential(pdf, total_pages, progress_callback)
+
+            self._log_strategy_report()
+            patients = self.extracted_patients.build()
+            return patients, patients.total(), self.total_sigtap, self.total_contratualizado
             
         except Exception as e:
             logger.error(f"Erro fatal no parser SIMUS: {e}")
-            return {}, Decimal('0'), None, None
+            return ExamTable.empty(), Decimal('0'), None, None
 
     def _extract_header_totals(self, first_page):
         """Extrai valores totais do cabeçalho da primeira página"""
@@ -451,29 +608,45 @@ class SimusPDFParser:
         except Exception as e:
             logger.error(f"Erro ao extrair totais do cabeçalho: {e}")
 
-    def _strategy_table_extraction(self, pdf, total_pages, progress_callback) -> bool:
-        """Estratégia 1: Extração estruturada de tabelas"""
-        try:
-            current_patient = None
-            
-            for i, page in enumerate(pdf.pages):
-                if progress_callback:
-                    progress_callback(i + 1, total_pages)
-                
-                tables = page.extract_tables()
-                if not tables:
-                    continue
-                    
-                for table in tables:
-                    self._process_table(table, current_patient)
-                    
-            return len(self.extracted_patients) > 0
-        except Exception as e:
-            logger.error(f"Erro na estratégia de tabelas: {e}")
-            return False
+    def _add_exam(self, patient_name, exam):
+        self.extracted_patients.add_exam(patient_name, exam)
+
+    @staticmethod
+    def _plan_strategy(sample_pages) -> str:
+        """Escolhe 'table' se alguma página da amostra gera linhas de tabela válidas."""
+        for page in sample_pages:
+            if any(True for _ in _page_table_rows(page)):
+                return 'table'
+        return 'text'
+
+    def _extract_sequential(self, pdf, total_pages, progress_callback):
+        text_patient = None
+        for i, page in enumerate(pdf.pages):
+            if progress_callback:
+                progress_callback(i + 1, total_pages)
+
+            rows, text_patient, report = _process_simus_page(page, self.document_strategy, text_patient)
+            self.page_strategies.append(report)
+            for patient_name, exam in rows:
+                self._add_exam(patient_name, exam)
+
+    def _log_strategy_report(self):
+        if not self.page_strategies:
+            return
+        summary: Dict[str, List[float]] = {}
+        for _, strategy, seconds in self.page_strategies:
+            entry = summary.setdefault(strategy, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+        details = ", ".join(f"{name}={count} pag/{secs:.2f}s" for name, (count, secs) in sorted(summary.items()))
+        logger.debug(f"SIMUS estrategia do documento={self.document_strategy}: {details}")
+
+    @staticmethod
+    def _iter_table_rows(table, current_patient):
+        """Gera (paciente, exame) para cada linha válida de uma tabela.
 
-    def _process_table(self, table, current_patient):
-        """Processa uma única tabela identificando colunas dinamicamente"""
+        O contexto de paciente vale apenas dentro da própria tabela.
+        """
         if not table or len(table) < 2:
             return
             
@@ -547,239 +720,371 @@ class SimusPDFParser:
                 val = Decimal('0')
                 
             if val and val > 0:
-                self.extracted_patients[active_patient]['exams'].append({
+                yield active_patient, {
                     'exam_name': exam_name,
                     'code': exam_code,
                     'value': val
-                })
-                self.extracted_patients[active_patient]['total'] += val
+                }
 
-    def _strategy_text_analysis(self, pdf, total_pages, progress_callback):
-        """Estratégia 2: Análise linha a linha (Fallback)"""
-        current_patient = None
-        
-        for i, page in enumerate(pdf.pages):
-            if progress_callback:
-                progress_callback(i + 1, total_pages)
+    @staticmethod
+    def _parse_text_page(text, current_patient):
+        """Analisa o texto de uma página a partir do paciente corrente.
+
+        Retorna as linhas (paciente, exame) encontradas e o paciente ativo ao
+        final da página, que deve ser repassado para a página seguinte.
+        """
+        rows = []
+        lines = text.split('\n')
+        for line in lines:
+            # Pular cabeçalhos/rodapés comuns
+            if any(x in line.upper() for x in ['PAGINA', 'RELATORIO', 'EMISSAO', 'TOTAL']):
+                continue
                 
-            text = page.extract_text()
-            if not text: continue
-            
-            lines = text.split('\n')
-            for line in lines:
-                # Pular cabeçalhos/rodapés comuns
-                if any(x in line.upper() for x in ['PAGINA', 'RELATORIO', 'EMISSAO', 'TOTAL']):
+            # Identificar Paciente (Linha começa com número seq e tem nome)
+            # Ex: 001 NOME DO PACIENTE                                 ...
+            patient_match = re.match(r'^\d+\s+([A-Z\s]+?)\s+\d{2}/\d{2}/\d{4}', line)
+            if patient_match:
+                possible_name = patient_match.group(1).strip()
+                if len(possible_name) > 3 and not re.search(r'\d', possible_name):
+                    current_patient = normalize_name(possible_name)
                     continue
-                    
-                # Identificar Paciente (Linha começa com número seq e tem nome)
-                # Ex: 001 NOME DO PACIENTE                                 ...
-                patient_match = re.match(r'^\d+\s+([A-Z\s]+?)\s+\d{2}/\d{2}/\d{4}', line)
-                if patient_match:
-                    possible_name = patient_match.group(1).strip()
-                    if len(possible_name) > 3 and not re.search(r'\d', possible_name):
-                        current_patient = normalize_name(possible_name)
-                        continue
+            
+            # Se temos um paciente ativo, procurar exames na linha
+            if current_patient:
+                # Tentar achar padrão de exame: Código + Nome + Valor
+                # Ex: 0202010123 HEMOGRAMA COMPLETO ... 10,00
                 
-                # Se temos um paciente ativo, procurar exames na linha
-                if current_patient:
-                    # Tentar achar padrão de exame: Código + Nome + Valor
-                    # Ex: 0202010123 HEMOGRAMA COMPLETO ... 10,00
+                # Regex flexível para capturar código, nome e valor
+                # Procura código 8-10 digitos, seguido de texto, seguido de valor monetário
+                line_match = re.search(r'(\d{8,10})\s+(.+?)\s+([\d.]+,\d{2})', line)
+                if not line_match:
+                    # Tentar sem código inicial (as vezes codigo ta em outra coluna)
+                    line_match = re.search(r'()(.+?)\s+([\d.]+,\d{2})', line)
                     
-                    # Regex flexível para capturar código, nome e valor
-                    # Procura código 8-10 digitos, seguido de texto, seguido de valor monetário
-                    line_match = re.search(r'(\d{8,10})\s+(.+?)\s+([\d.]+,\d{2})', line)
-                    if not line_match:
-                        # Tentar sem código inicial (as vezes codigo ta em outra coluna)
-                        line_match = re.search(r'()(.+?)\s+([\d.]+,\d{2})', line)
+                if line_match:
+                    code = line_match.group(1)
+                    name_raw = line_match.group(2).strip()
+                    val_str = line_match.group(3)
+                    
+                    # Validar se o "nome" não é lixo
+                    if len(name_raw) < 3 or re.search(r'\d{2}/\d{2}', name_raw): 
+                        continue
                         
-                    if line_match:
-                        code = line_match.group(1)
-                        name_raw = line_match.group(2).strip()
-                        val_str = line_match.group(3)
+                    val = parse_currency_value(val_str)
+                    if val and val > 0:
+                        # Mapear nome
+                        name_mapped = map_simus_to_compulab_exam_name(name_raw)
+                        normalized_name = normalize_exam_name(name_mapped)
                         
-                        # Validar se o "nome" não é lixo
-                        if len(name_raw) < 3 or re.search(r'\d{2}/\d{2}', name_raw): 
-                            continue
-                            
-                        val = parse_currency_value(val_str)
-                        if val and val > 0:
-                            # Mapear nome
-                            name_mapped = map_simus_to_compulab_exam_name(name_raw)
-                            normalized_name = normalize_exam_name(name_mapped)
-                            
-                            # Adicionar
-                            self.extracted_patients[current_patient]['exams'].append({
-                                'exam_name': normalized_name,
-                                'code': code,
-                                'value': val
-                            })
-                            self.extracted_patients[current_patient]['total'] += val
-
-
-def extract_simus_patients(pdf_file, known_patient_names=None, progress_callback: Optional[Callable[[int, int], None]] = None):
+                        # Adicionar
+                        rows.append((current_patient, {
+                            'exam_name': normalized_name,
+                            'code': code,
+                            'value': val
+                        }))
+        return rows, current_patient
+
+    def _extract_parallel(self, total_pages, progress_callback) -> bool:
+        """Processa intervalos de páginas num pool de processos.
+
+        Os intervalos são mesclados na ordem das páginas. Linhas textuais no
+        início de um intervalo (antes de qualquer cabeçalho de paciente)
+        voltam marcadas com _CARRY_PATIENT e são atribuídas ao último paciente
+        textual do intervalo anterior, exatamente como no modo sequencial.
+        Retorna False se o pool falhar, para que o chamador use o modo sequencial.
+        """
+        ranges = [
+            (start, min(start + MAX_PAGES_PER_BATCH, total_pages))
+            for start in range(0, total_pages, MAX_PAGES_PER_BATCH)
+        ]
+        results = {}
+        pages_done = 0
+        executor = None
+        try:
+            executor = ProcessPoolExecutor(
+                max_workers=min(self.workers, len(ranges)),
+                initializer=_init_simus_worker,
+                initargs=(dict(mapping_service.get_all_synonyms()),),
+            )
+            futures = {
+                executor.submit(_simus_range_worker, self.pdf_path, start, end, self.document_strategy): (start, end)
+                for start, end in ranges
+            }
+            for future in as_completed(futures):
+                start, end = futures[future]
+                results[start] = future.result()
+                pages_done += end - start
+                if progress_callback:
+                    progress_callback(pages_done, total_pages)
+        except BaseException as e:
+            # Cancelamento (JobCancelled vem do callback de progresso) ou erro:
+            # descarta os intervalos ainda na fila em vez de esperar por eles
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"Erro no processamento paralelo: {e}")
+            return False
+        executor.shutdown()
+
+        current_patient = None
+        for start, _ in ranges:
+            rows, last_patient, reports = results[start]
+            for patient_name, exam in rows:
+                if patient_name == _CARRY_PATIENT:
+                    if not current_patient:
+                        continue
+                    patient_name = current_patient
+                self._add_exam(patient_name, exam)
+            if last_patient != _CARRY_PATIENT:
+                current_patient = last_patient
+            self.page_strategies.extend(reports)
+        return True
+
+
+# Marcador de "paciente herdado do intervalo anterior" usado pelos workers.
+# normalize_name remove caracteres de controle, então não colide com nomes reais.
+_CARRY_PATIENT = "\x00CARRY"
+
+
+def _page_table_rows(page):
+    """Linhas de tabela da página; páginas sem linhas de grade não têm tabelas
+    na configuração padrão do pdfplumber (estratégia 'lines'), então a
+    detecção, que é a operação mais cara, é pulada."""
+    if not page.edges:
+        return
+    for table in page.extract_tables() or []:
+        yield from SimusPDFParser._iter_table_rows(table, None)
+
+
+def _process_simus_page(page, document_strategy, text_patient):
+    """Extrai uma página SIMUS com a estratégia planejada.
+
+    Retorna (linhas, paciente textual corrente, (página, estratégia, segundos)).
+    O layout da página é calculado uma vez e compartilhado entre tabela e texto.
+    """
+    started = time.perf_counter()
+    rows = []
+    strategy = 'text'
+    if document_strategy == 'table':
+        rows = list(_page_table_rows(page))
+        strategy = 'table' if rows else 'table->text'
+    if not rows:
+        text = page.extract_text()
+        if text:
+            rows, text_patient = SimusPDFParser._parse_text_page(text, text_patient)
+    page.close()
+    return rows, text_patient, (page.page_number, strategy, time.perf_counter() - started)
+
+
+def _init_simus_worker(mappings):
+    """Inicializa um processo de trabalho com o snapshot de mapeamentos do pai."""
+    mapping_service.load_snapshot(mappings)
+
+
+def _simus_range_worker(pdf_path, start, end, document_strategy):
+    """Extrai as linhas (paciente, exame) das páginas [start, end) de um PDF SIMUS."""
+    rows = []
+    reports = []
+    text_patient = _CARRY_PATIENT
+    with pdfplumber.open(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+        for page in pdf.pages:
+            page_rows, text_patient, report = _process_simus_page(page, document_strategy, text_patient)
+            rows.extend(page_rows)
+            reports.append(report)
+    return rows, text_patient, reports
+
+
+def resolve_parser_workers(workers: Optional[int] = None) -> int:
+    """Resolve o número de processos do parser (argumento > PDF_PARSER_WORKERS > CPUs)."""
+    if workers is None:
+        workers = PDF_PARSER_WORKERS
+    if workers <= 0:
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = os.cpu_count() or 1
+        workers = min(cpus, MAX_PARSER_WORKERS)
+    return max(1, workers)
+
+
+def extract_simus_patients(pdf_file, known_patient_names=None, progress_callback: Optional[Callable[[int, int], None]] = None, workers: Optional[int] = None):
     """
     Wrapper para o novo parser SIMUS.
     Mantém compatibilidade com a assinatura antiga.
+
+    Args:
+        workers: Número de processos para extração paralela (1 = sequencial,
+            None = PDF_PARSER_WORKERS/CPUs disponíveis)
     """
-    parser = SimusPDFParser(pdf_file)
+    parser = SimusPDFParser(pdf_file, workers=workers)
     return parser.extract(progress_callback)
 
 
-def generate_excel_from_pdfs(compulab_pdf_bytes, simus_pdf_bytes, progress_callback: Optional[Callable[[int, str], None]] = None):
-    """Gera arquivos Excel (.xlsx) a partir dos bytes dos PDFs
-    
+def extract_compulab_patients_cached(pdf_file, progress_callback: Optional[Callable[[int], None]] = None):
+    """extract_compulab_patients com cache em disco pelo conteúdo do PDF."""
+    return extraction_cache.get_or_extract(
+        "compulab",
+        pdf_file,
+        f"v{COMPULAB_PARSER_VERSION}",
+        lambda: extract_compulab_patients(pdf_file, progress_callback=progress_callback),
+    )
+
+
+def extract_simus_patients_cached(pdf_file, progress_callback: Optional[Callable[[int, int], None]] = None, workers: Optional[int] = None):
+    """extract_simus_patients com cache em disco pelo conteúdo do PDF e snapshot de mapeamentos."""
+    return extraction_cache.get_or_extract(
+        "simus",
+        pdf_file,
+        f"v{SIMUS_PARSER_VERSION}:{mapping_service.get_fingerprint()}",
+        lambda: extract_simus_patients(pdf_file, progress_callback=progress_callback, workers=workers),
+    )
+
+
+CONVERTED_COLUMNS = ['Paciente', 'Nome_Exame', 'Codigo_Exame', 'Valor']
+CONVERSION_PROGRESS_EVERY = 5000
+
+
+def _iter_converted_rows(patients, progress=None):
+    """Linhas (paciente, exame, código, valor) ordenadas por paciente e nome do exame.
+
+    Equivale a ordenar a tabela inteira por ['Paciente', 'Nome_Exame'] (ordenação
+    estável), mas só mantém em memória os exames de um paciente por vez.
+    """
+    total = sum(len(data['exams']) for data in patients.values())
+    written = 0
+    for patient_name in sorted(patients):
+        for exam in sorted(patients[patient_name]['exams'], key=lambda e: e['exam_name']):
+            yield patient_name, exam['exam_name'], exam.get('code', ''), float(exam['value'])
+            written += 1
+            if progress and written % CONVERSION_PROGRESS_EVERY == 0:
+                progress(written, total)
+
+
+def convert_pdfs_to_files(compulab_pdf_path, simus_pdf_path, output_dir, fmt: str = "xlsx",
+                          progress_callback: Optional[Callable[[int, str], None]] = None,
+                          workers: Optional[int] = None):
+    """Converte os PDFs e grava as tabelas direto em arquivos de `output_dir`
+
+    As linhas são geradas já ordenadas e gravadas em streaming (ver
+    export_utils.write_rows), sem montar DataFrames nem buffers em memória.
+
     Args:
-        compulab_pdf_bytes: Bytes do PDF COMPULAB
-        simus_pdf_bytes: Bytes do PDF SIMUS
+        compulab_pdf_path: Caminho do PDF COMPULAB
+        simus_pdf_path: Caminho do PDF SIMUS
+        output_dir: Diretório de saída (criado se necessário)
+        fmt: 'xlsx', 'csv' ou 'parquet'
         progress_callback: Função callback(percentage: int, stage: str) para reportar progresso
+        workers: Processos do parser SIMUS (ver extract_simus_patients)
+
+    Returns:
+        (caminho COMPULAB, caminho SIMUS, sucesso)
     """
-    tmp_compulab_path = None
-    tmp_simus_path = None
-    
-    try:
-        # Estágio 1: Preparação (0-5%)
-        if progress_callback:
-            progress_callback(0, "Preparando arquivos...")
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_compulab:
-            tmp_compulab.write(compulab_pdf_bytes)
-            tmp_compulab_path = tmp_compulab.name
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_simus:
-            tmp_simus.write(simus_pdf_bytes)
-            tmp_simus_path = tmp_simus.name
-        
-        # Estágio 2: Processando COMPULAB (5-45%)
+    from .export_utils import write_rows
+
+    def report(percentage, stage):
         if progress_callback:
-            progress_callback(5, "Processando COMPULAB...")
-        
+            progress_callback(percentage, stage)
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Estágio 1: Processando COMPULAB (5-45%)
+        report(5, "Processando COMPULAB...")
+
         def compulab_progress(percentage):
             # 5% a 45% para COMPULAB
-            if progress_callback:
-                progress = 5 + int(percentage * 0.4)
-                progress_callback(progress, f"Processando COMPULAB... {percentage}%")
-        
-        compulab_patients, compulab_total = extract_compulab_patients(
-            tmp_compulab_path, 
+            report(5 + int(percentage * 0.4), f"Processando COMPULAB... {percentage}%")
+
+        compulab_patients, _ = extract_compulab_patients_cached(
+            compulab_pdf_path,
             progress_callback=compulab_progress if progress_callback else None
         )
         if compulab_patients is None:
             return None, None, False
-        
-        if progress_callback:
-            progress_callback(45, "Organizando dados COMPULAB...")
-        
-        compulab_rows = []
-        total_exams = sum(len(data['exams']) for data in compulab_patients.values())
-        processed_exams = 0
-        
-        for patient_name, data in compulab_patients.items():
-            for exam in data['exams']:
-                compulab_rows.append({
-                    'Paciente': patient_name,
-                    'Nome_Exame': exam['exam_name'],
-                    'Codigo_Exame': exam.get('code', ''),
-                    'Valor': float(exam['value'])
-                })
-                processed_exams += 1
-                if progress_callback and total_exams > 0:
-                    exam_progress = int((processed_exams / total_exams) * 10)
-                    progress_callback(45 + exam_progress, f"Organizando dados COMPULAB... {processed_exams}/{total_exams} exames")
-        
-        compulab_df = pd.DataFrame(compulab_rows)
-        if not compulab_df.empty:
-            compulab_df = compulab_df.sort_values(by=['Paciente', 'Nome_Exame'], ascending=[True, True])
-        
+
+        # Estágio 2: Gravando COMPULAB (45-55%)
+        report(45, "Gravando dados COMPULAB...")
+        compulab_out = os.path.join(output_dir, f"compulab_data.{fmt}")
+        write_rows(
+            compulab_out, fmt, CONVERTED_COLUMNS,
+            _iter_converted_rows(compulab_patients, lambda done, total: report(
+                45 + int(done / total * 10), f"Gravando dados COMPULAB... {done}/{total} exames")),
+            sheet_name='COMPULAB',
+        )
+        del compulab_patients
+
         # Estágio 3: Processando SIMUS (55-90%)
-        if progress_callback:
-            progress_callback(55, "Processando SIMUS...")
-        
+        report(55, "Processando SIMUS...")
+
         def simus_progress(page, total_pages):
             if total_pages > 0:
                 percentage = int((page / total_pages) * 100)
                 # 55% a 90% para SIMUS
-                progress = 55 + int(percentage * 0.35)
-                if progress_callback:
-                    progress_callback(progress, f"Processando SIMUS... Página {page}/{total_pages}")
-        
-        simus_patients, simus_total, _, _ = extract_simus_patients(
-            tmp_simus_path, 
-            known_patient_names=list(compulab_patients.keys()),
-            progress_callback=simus_progress if progress_callback else None
+                report(55 + int(percentage * 0.35), f"Processando SIMUS... Página {page}/{total_pages}")
+
+        simus_patients, _, _, _ = extract_simus_patients_cached(
+            simus_pdf_path,
+            progress_callback=simus_progress if progress_callback else None,
+            workers=workers,
         )
-        
         if simus_patients is None:
             return None, None, False
-        
-        if progress_callback:
-            progress_callback(90, "Organizando dados SIMUS...")
-        
-        simus_rows = []
-        total_simus_exams = sum(len(data['exams']) for data in simus_patients.values())
-        processed_simus_exams = 0
-        
-        for patient_name, data in simus_patients.items():
-            for exam in data['exams']:
-                exam_name = exam['exam_name']
-                simus_rows.append({
-                    'Paciente': patient_name,
-                    'Nome_Exame': exam_name,
-                    'Codigo_Exame': exam.get('code', ''),
-                    'Valor': float(exam['value'])
-                })
-                processed_simus_exams += 1
-                if progress_callback and total_simus_exams > 0:
-                    exam_progress = int((processed_simus_exams / total_simus_exams) * 5)
-                    progress_callback(90 + exam_progress, f"Organizando dados SIMUS... {processed_simus_exams}/{total_simus_exams} exames")
-        
-        simus_df = pd.DataFrame(simus_rows)
-        if not simus_df.empty:
-            simus_df = simus_df.sort_values(by=['Paciente', 'Nome_Exame'], ascending=[True, True])
-        
-        # Estágio 4: Gerando Excels (95-98%)
-        if progress_callback:
-            progress_callback(95, "Gerando arquivos Excel...")
 
-        import io
-        import base64
-        
-        # Gerar Excel COMPULAB
-        output_compulab = io.BytesIO()
-        with pd.ExcelWriter(output_compulab, engine='openpyxl') as writer:
-            compulab_df.to_excel(writer, index=False, sheet_name='COMPULAB')
-        compulab_excel_b64 = base64.b64encode(output_compulab.getvalue()).decode()
-        
-        if progress_callback:
-            progress_callback(98, "Finalizando conversão...")
-        
-        # Gerar Excel SIMUS
-        output_simus = io.BytesIO()
-        with pd.ExcelWriter(output_simus, engine='openpyxl') as writer:
-            simus_df.to_excel(writer, index=False, sheet_name='SIMUS')
-        simus_excel_b64 = base64.b64encode(output_simus.getvalue()).decode()
-        
-        if progress_callback:
-            progress_callback(100, "Concluído")
-        
-        return compulab_excel_b64, simus_excel_b64, True
-            
+        # Estágio 4: Gravando SIMUS (90-100%)
+        report(90, "Gravando dados SIMUS...")
+        simus_out = os.path.join(output_dir, f"simus_data.{fmt}")
+        write_rows(
+            simus_out, fmt, CONVERTED_COLUMNS,
+            _iter_converted_rows(simus_patients, lambda done, total: report(
+                90 + int(done / total * 8), f"Gravando dados SIMUS... {done}/{total} exames")),
+            sheet_name='SIMUS',
+        )
+
+        report(100, "Concluído")
+        return compulab_out, simus_out, True
+
     except Exception as e:
-        logger.error(f"Erro ao gerar Excels: {e}")
-        if progress_callback:
-            progress_callback(0, f"Erro: {str(e)}")
+        logger.error(f"Erro ao converter PDFs: {e}")
+        report(0, f"Erro: {str(e)}")
         return None, None, False
 
-    finally:
-        if tmp_compulab_path and os.path.exists(tmp_compulab_path):
-            try:
-                os.unlink(tmp_compulab_path)
-            except OSError:
-                pass
-        if tmp_simus_path and os.path.exists(tmp_simus_path):
-            try:
-                os.unlink(tmp_simus_path)
-            except OSError:
-                pass
+
+def generate_excel_from_pdfs(compulab_pdf_bytes, simus_pdf_bytes, progress_callback: Optional[Callable[[int, str], None]] = None,
+                             workers: Optional[int] = None):
+    """Gera arquivos Excel (.xlsx) a partir dos bytes dos PDFs, em base64
+
+    Mantido por compatibilidade: para arquivos grandes prefira
+    convert_pdfs_to_files, que grava direto em disco.
+    
+    Args:
+        compulab_pdf_bytes: Bytes do PDF COMPULAB
+        simus_pdf_bytes: Bytes do PDF SIMUS
+        progress_callback: Função callback(percentage: int, stage: str) para reportar progresso
+        workers: Processos do parser SIMUS (ver extract_simus_patients)
+    """
+    import base64
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if progress_callback:
+            progress_callback(0, "Preparando arquivos...")
+        tmp_compulab_path = os.path.join(tmp_dir, "compulab.pdf")
+        tmp_simus_path = os.path.join(tmp_dir, "simus.pdf")
+        with open(tmp_compulab_path, "wb") as f:
+            f.write(compulab_pdf_bytes)
+        with open(tmp_simus_path, "wb") as f:
+            f.write(simus_pdf_bytes)
+
+        compulab_out, simus_out, success = convert_pdfs_to_files(
+            tmp_compulab_path, tmp_simus_path, tmp_dir, "xlsx", progress_callback, workers=workers
+        )
+        if not success:
+            return None, None, False
+        with open(compulab_out, "rb") as f:
+            compulab_excel_b64 = base64.b64encode(f.read()).decode()
+        with open(simus_out, "rb") as f:
+            simus_excel_b64 = base64.b64encode(f.read()).decode()
+        return compulab_excel_b64, simus_excel_b64, True
 
 
 def load_from_csv(csv_content):
@@ -790,7 +1095,7 @@ def load_from_csv(csv_content):
     try:
         import io
         df = pd.read_csv(io.StringIO(csv_content), sep=';', decimal=',', encoding='utf-8-sig')
-        patients = defaultdict(lambda: {'exams': [], 'total': Decimal('0')})
+        patients = ExamTableBuilder()
         total_value = Decimal('0')
         
         # ORDENAR DataFrame antes de iterar para garantir ordem consistente
@@ -802,20 +1107,11 @@ def load_from_csv(csv_content):
             exam_name = normalize_exam_name(str(row['Nome_Exame']))
             value = Decimal(str(row['Valor']))
             
-            patients[patient_name]['exams'].append({
-                'exam_name': exam_name,
-                'code': str(row.get('Codigo_Exame', '')),
-                'value': value
-            })
-            patients[patient_name]['total'] += value
+            patients.add(patient_name, exam_name, str(row.get('Codigo_Exame', '')), value)
             total_value += value
         
         # ORDENAR exames dentro de cada paciente para garantir consistência
-        # Converter para dict ordenado (OrderedDict) ou garantir ordenação
-        for patient_name in patients:
-            patients[patient_name]['exams'].sort(key=lambda x: (x['exam_name'], x['value'], x['code']))
-        
-        return patients, total_value
+        return patients.build(sort_exams=('exam_name', 'value', 'code')), total_value
     except Exception as e:
         logger.error(f"Erro ao ler CSV: {e}")
         return None, None
@@ -832,7 +1128,7 @@ def load_from_excel(file_path):
             file_path = io.BytesIO(file_path)
             
         df = pd.read_excel(file_path, engine='openpyxl' if str(file_path).endswith('.xlsx') else None)
-        patients = defaultdict(lambda: {'exams': [], 'total': Decimal('0')})
+        patients = ExamTableBuilder()
         total_value = Decimal('0')
         
         # Mapeamento flexível de colunas
@@ -891,19 +1187,11 @@ def load_from_excel(file_path):
                 
             code = str(row[col_map['code']]) if 'code' in col_map else ''
             
-            patients[patient_name]['exams'].append({
-                'exam_name': exam_name,
-                'code': code,
-                'value': value
-            })
-            patients[patient_name]['total'] += value
+            patients.add(patient_name, exam_name, code, value)
             total_value += value
             
         # Ordenar exames internos
-        for patient_name in patients:
-            patients[patient_name]['exams'].sort(key=lambda x: (x['exam_name'], x['value']))
-            
-        return patients, total_value
+        return patients.build(sort_exams=('exam_name', 'value')), total_value
     except Exception as e:
         logger.error(f"Erro ao carregar Excel: {e}")
         return None, Decimal('0')
@@ -0,0 +1,172 @@
+"""
+Paginacao, ordenacao e busca das tabelas de resultado
+LabBridge
+
+As listas completas da conciliacao ficam em variaveis de backend do estado;
+a tela recebe apenas a pagina corrente. ResultIndex guarda, por lista, o
+texto de busca de cada item (sem acentos, minusculo) e as ordenacoes por
+coluna, calculadas sob demanda e reaproveitadas. A ultima consulta (busca +
+ordenacao) fica memorizada, de modo que trocar de pagina custa
+O(tamanho da pagina).
+
+Os indices ficam num cache LRU do processo (result_index_cache), pela
+chave (sessao, versao dos resultados, aba), e referenciam as mesmas listas
+do estado.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .normalize import fold_to_ascii
+
+# Itens por pagina das tabelas de resultado
+RESULT_PAGE_SIZE = max(1, int(os.getenv("RESULT_PAGE_SIZE", "50") or 50))
+# Tamanhos de pagina oferecidos na tela
+RESULT_PAGE_SIZES = [str(size) for size in sorted({25, 50, 100, 250, RESULT_PAGE_SIZE})]
+# Indices mantidos em memoria (todas as sessoes do processo)
+RESULT_INDEX_CACHE_SIZE = max(1, int(os.getenv("RESULT_INDEX_CACHE_SIZE", "32") or 32))
+# Buscas memorizadas por indice
+_FILTER_CACHE_SIZE = 8
+
+
+def _field(item: Any, key: str) -> Any:
+    if isinstance(item, dict):
+        return item.get(key, "")
+    return getattr(item, key, "")
+
+
+def _search_text(text: Any) -> str:
+    return fold_to_ascii(str(text or "")).lower()
+
+
+class ResultIndex:
+    """Indice de uma lista de resultados (AnalysisResult, PatientMatch ou dicts)."""
+
+    def __init__(self, items: Sequence[Any], search_keys: Sequence[str]):
+        self.items = items
+        self.search_keys = tuple(search_keys)
+        self._haystack: Optional[List[str]] = None
+        self._ranks: Dict[str, np.ndarray] = {}
+        self._filters: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._last: Optional[Tuple[Tuple[str, str, bool], np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _rank(self, key: str) -> np.ndarray:
+        # Posicao densa de cada item na ordem da coluna (empates com a mesma posicao)
+        rank = self._ranks.get(key)
+        if rank is None:
+            values = [_field(item, key) for item in self.items]
+            if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+                _, rank = np.unique(np.array(values, dtype=float), return_inverse=True)
+            else:
+                distinct, inverse = np.unique(np.array([str(value or "") for value in values], dtype=object),
+                                              return_inverse=True)
+                _, distinct_rank = np.unique(np.array([_search_text(text) for text in distinct], dtype=object),
+                                             return_inverse=True)
+                rank = distinct_rank.reshape(-1)[inverse.reshape(-1)]
+            rank = self._ranks[key] = rank.reshape(-1)
+        return rank
+
+    def _matches(self, search: str) -> Optional[np.ndarray]:
+        # Posicoes (em ordem) dos itens que contem todos os termos da busca
+        terms = _search_text(search).split()
+        if not terms:
+            return None
+        cache_key = " ".join(terms)
+        positions = self._filters.get(cache_key)
+        if positions is None:
+            if self._haystack is None:
+                # Nomes se repetem muito entre os itens: normaliza cada texto distinto uma vez
+                folded: Dict[Any, str] = {}
+
+                def fold(value: Any) -> str:
+                    text = folded.get(value)
+                    if text is None:
+                        text = folded[value] = _search_text(value)
+                    return text
+
+                self._haystack = [
+                    "\x1f".join(fold(_field(item, key)) for key in self.search_keys)
+                    for item in self.items
+                ]
+            positions = np.fromiter(
+                (position for position, text in enumerate(self._haystack) if all(term in text for term in terms)),
+                dtype=np.int64,
+            )
+            self._filters[cache_key] = positions
+            while len(self._filters) > _FILTER_CACHE_SIZE:
+                self._filters.popitem(last=False)
+        else:
+            self._filters.move_to_end(cache_key)
+        return positions
+
+    def query(self, search: str = "", sort_key: str = "", descending: bool = False) -> np.ndarray:
+        """Posicoes dos itens filtrados por `search` e ordenados (estavel) por `sort_key`."""
+        query_key = (search or "", sort_key or "", bool(descending))
+        if self._last is not None and self._last[0] == query_key:
+            return self._last[1]
+
+        positions = self._matches(search)
+        if sort_key:
+            rank = self._rank(sort_key)
+            order = np.argsort(-rank if descending else rank, kind="stable")
+            if positions is not None:
+                selected = np.zeros(len(self.items), dtype=bool)
+                selected[positions] = True
+                order = order[selected[order]]
+            positions = order
+        elif positions is None:
+            positions = np.arange(len(self.items))
+
+        self._last = (query_key, positions)
+        return positions
+
+    def page(self, search: str = "", sort_key: str = "", descending: bool = False,
+             page: int = 0, page_size: int = RESULT_PAGE_SIZE) -> Tuple[List[Any], int]:
+        """Itens da pagina `page` (a partir de 0) e total de itens da consulta."""
+        positions = self.query(search, sort_key, descending)
+        start = max(0, page) * page_size
+        return [self.items[position] for position in positions[start:start + page_size].tolist()], len(positions)
+
+
+class ResultIndexCache:
+    """Cache LRU dos indices das tabelas de resultado."""
+
+    _entries: "OrderedDict[str, ResultIndex]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_or_build(cls, key: str, build: Callable[[], ResultIndex]) -> ResultIndex:
+        with cls._lock:
+            index = cls._entries.get(key)
+            if index is not None:
+                cls._entries.move_to_end(key)
+                return index
+        index = build()
+        with cls._lock:
+            cls._entries[key] = index
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > RESULT_INDEX_CACHE_SIZE:
+                cls._entries.popitem(last=False)
+        return index
+
+    @classmethod
+    def discard(cls, prefix: str) -> None:
+        """Remove os indices cuja chave comeca com `prefix` (ex.: de uma sessao)."""
+        with cls._lock:
+            for key in [key for key in cls._entries if key.startswith(prefix)]:
+                del cls._entries[key]
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries.clear()
+
+
+# Singleton para uso simplificado
+result_index_cache = ResultIndexCache()